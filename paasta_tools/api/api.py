@@ -24,12 +24,16 @@ import manhole
 import requests_cache
 import service_configuration_lib
 from pyramid.config import Configurator
+from pyramid.tweens import EXCVIEW
 from wsgicors import CORS
 
 import paasta_tools.api
 from paasta_tools import kubernetes_tools
 from paasta_tools import marathon_tools
+from paasta_tools.api import profiling
+from paasta_tools.api import response_cache
 from paasta_tools.api import settings
+from paasta_tools.marathon_dashboard import MarathonDashboardRefresher
 from paasta_tools.utils import load_system_paasta_config
 
 
@@ -69,8 +73,18 @@ def make_app(global_config=None):
     })
 
     config.include('pyramid_swagger')
+    # Over the exception view tween, so that the time spent rendering errors is profiled too
+    config.add_tween('paasta_tools.api.tweens.profiling_tween_factory', over=EXCVIEW)
+    # Over the swagger validation tween, so that cached responses aren't validated again, and under the exception
+    # view tween, so that failed requests never make it into the cache
+    config.add_tween(
+        'paasta_tools.api.tweens.response_cache_tween_factory',
+        over='pyramid_swagger.tween.validation_tween_factory',
+        under=EXCVIEW,
+    )
     config.add_route('resources.utilization', '/v1/resources/utilization')
     config.add_route('service.instance.status', '/v1/services/{service}/{instance}/status')
+    config.add_route('instances.status', '/v1/instances/status')
     config.add_route('service.instance.delay', '/v1/services/{service}/{instance}/delay')
     config.add_route('service.instance.tasks', '/v1/services/{service}/{instance}/tasks')
     config.add_route('service.instance.tasks.task', '/v1/services/{service}/{instance}/tasks/{task_id}')
@@ -84,6 +98,8 @@ def make_app(global_config=None):
     config.add_route('version', '/v1/version')
     config.add_route('marathon_dashboard', '/v1/marathon_dashboard', request_method="GET")
     config.add_route('metastatus', '/v1/metastatus')
+    config.add_route('cache_stats', '/v1/cache_stats')
+    config.add_route('admin.slow_requests', '/v1/admin/slow_requests')
     config.scan()
     return CORS(config.make_wsgi_app(), headers="*", methods="*", maxage="180", origin="*")
 
@@ -138,6 +154,23 @@ def setup_paasta_api():
     # concern here. Thus remove_expired_responses is not needed.
     requests_cache.install_cache("paasta-api", backend="memory", expire_after=5)
 
+    # The workers are forked before the app is made, so each of them gets its own refresher thread
+    settings.marathon_dashboard_refresher = MarathonDashboardRefresher(
+        cluster=settings.cluster,
+        soa_dir=settings.soa_dir,
+        marathon_clients=settings.marathon_clients,
+        system_paasta_config=settings.system_paasta_config,
+    )
+    settings.marathon_dashboard_refresher.start()
+
+    settings.response_cache = response_cache.ResponseCache({
+        **response_cache.DEFAULT_ROUTE_TTLS,
+        **settings.system_paasta_config.get_api_response_cache_ttls(),
+    })
+
+    settings.request_profiler = profiling.RequestProfiler(settings.system_paasta_config.get_api_profiling_config())
+    profiling.instrument_outbound_calls()
+
 
 def main(argv=None):
     args = parse_paasta_api_args()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# Copyright 2015-2019 Yelp Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Per-request profiling of the paasta API.
+
+Every request served by the profiling tween gets a RequestProfile, which
+collects a span for each outbound call (marathon, mesos, kubernetes, zookeeper,
+soa-configs reads, ...) the request makes. The outbound calls are found by
+wrapping the client library functions registered with ``register_outbound_call``;
+other code can time anything else it wants to show up with ``span()``.
+
+The latency of every request is reported as an ``api.request`` timer, by route.
+A configurable fraction of the requests also runs under cProfile, and requests
+slower than a threshold are kept (spans and profile included) for the
+``/v1/admin/slow_requests`` endpoint. See the ``api_profiling`` key of the
+system paasta config.
+"""
+import asyncio
+import collections
+import cProfile
+import functools
+import io
+import logging
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any
+from typing import Callable
+from typing import Deque
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from urllib.parse import urlparse
+
+import aiohttp
+import requests
+import service_configuration_lib
+from kazoo.client import KazooClient
+from kazoo.client import TransactionRequest
+from kubernetes.client import ApiClient
+
+from paasta_tools.metrics import metrics_lib
+from paasta_tools.utils import ApiProfilingConfig
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CPROFILE_SAMPLE_RATE = 0.0
+DEFAULT_SLOW_REQUEST_SECONDS = 2.0
+DEFAULT_SLOW_REQUEST_DUMPS = 50
+# Number of functions listed in the cProfile stats of a slow request
+PROFILE_STATS_LINES = 40
+
+
+class Span(NamedTuple):
+    kind: str
+    name: str
+    # Seconds since the request started
+    start: float
+    duration: float
+    error: Optional[str]
+
+
+class RequestProfile:
+    def __init__(self, route_name: str, method: str, path: str) -> None:
+        self.route_name = route_name
+        self.method = method
+        self.path = path
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.status_code: Optional[int] = None
+        self.spans: List[Span] = []
+        self.profile_stats: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'route': self.route_name,
+            'method': self.method,
+            'path': self.path,
+            'start': self.start,
+            'duration': self.duration,
+            'status_code': self.status_code,
+            'spans': [span._asdict() for span in self.spans],
+            'profile': self.profile_stats,
+        }
+
+
+_current = threading.local()
+
+
+def get_current_profile() -> Optional[RequestProfile]:
+    return getattr(_current, 'profile', None)
+
+
+@contextmanager
+def span(kind: str, name: str) -> Iterator[None]:
+    """Records how long the body of the with statement takes as a span of the request being profiled
+    by this thread, if there is one.
+
+    :param kind: What is being called, e.g. 'marathon' or 'zookeeper'
+    :param name: What the call does, e.g. the method and path of an http request
+    """
+    profile = get_current_profile()
+    if profile is None:
+        yield
+        return
+    start = time.time()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        profile.spans.append(Span(kind, name, start - profile.start, time.time() - start, error))
+
+
+class OutboundCall(NamedTuple):
+    kind: str
+    target: Any
+    attr: str
+    # Called with the arguments of the call, returns the name of its span
+    describe: Callable[..., str]
+
+
+_outbound_calls: List[OutboundCall] = []
+_originals: Dict[OutboundCall, Callable] = {}
+
+
+def register_outbound_call(kind: str, target: Any, attr: str, describe: Callable[..., str]) -> None:
+    """Makes calls to target.attr show up as spans of the requests that make them, once
+    instrument_outbound_calls is called.
+
+    :param kind: The kind of the spans
+    :param target: The class or module the function is an attribute of
+    :param attr: The name of the function; coroutine functions are supported too
+    :param describe: Returns the name of a span, given the arguments of the call
+    """
+    _outbound_calls.append(OutboundCall(kind, target, attr, describe))
+
+
+def _describe(outbound_call: OutboundCall, args: Any, kwargs: Any) -> str:
+    try:
+        return outbound_call.describe(*args, **kwargs)
+    except Exception:
+        return outbound_call.attr
+
+
+def _wrap(outbound_call: OutboundCall, func: Callable) -> Callable:
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(outbound_call.kind, _describe(outbound_call, args, kwargs)):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with span(outbound_call.kind, _describe(outbound_call, args, kwargs)):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def instrument_outbound_calls() -> None:
+    """Wraps every registered outbound call that isn't wrapped yet."""
+    for outbound_call in _outbound_calls:
+        if outbound_call not in _originals:
+            original = getattr(outbound_call.target, outbound_call.attr)
+            _originals[outbound_call] = original
+            setattr(outbound_call.target, outbound_call.attr, _wrap(outbound_call, original))
+
+
+def uninstrument_outbound_calls() -> None:
+    """Puts back the functions instrument_outbound_calls wrapped."""
+    for outbound_call, original in _originals.items():
+        setattr(outbound_call.target, outbound_call.attr, original)
+    _originals.clear()
+
+
+def _describe_url(method: str, url: Any) -> str:
+    parsed = urlparse(str(url))
+    return f'{method} {parsed.netloc}{parsed.path}'
+
+
+# marathon (and anything else using requests)
+register_outbound_call(
+    'http', requests.Session, 'send',
+    lambda self, request, **kwargs: _describe_url(request.method, request.url),
+)
+# mesos, and the http utilization of autoscaled services
+register_outbound_call(
+    'http', aiohttp.ClientSession, '_request',
+    lambda self, method, url, **kwargs: _describe_url(method, url),
+)
+register_outbound_call(
+    'kubernetes', ApiClient, 'request',
+    lambda self, method, url, *args, **kwargs: f'{method} {urlparse(url).path}',
+)
+for zookeeper_method in ('get', 'get_children', 'exists', 'create', 'set', 'delete', 'ensure_path'):
+    register_outbound_call(
+        'zookeeper', KazooClient, zookeeper_method,
+        functools.partial(lambda method, self, path, *args, **kwargs: f'{method} {path}', zookeeper_method),
+    )
+register_outbound_call(
+    'zookeeper', TransactionRequest, 'commit',
+    lambda self: f'transaction of {len(self.operations)} operations',
+)
+register_outbound_call(
+    'soa', service_configuration_lib, '_read_yaml_file',
+    lambda file_name: file_name,
+)
+
+
+class RequestProfiler:
+    """Profiles the requests of a paasta API worker, and keeps the slowest recent ones.
+
+    :param config: The api_profiling system paasta config
+    """
+
+    def __init__(self, config: ApiProfilingConfig) -> None:
+        self.cprofile_sample_rate = config.get('cprofile_sample_rate', DEFAULT_CPROFILE_SAMPLE_RATE)
+        self.slow_request_seconds = config.get('slow_request_seconds', DEFAULT_SLOW_REQUEST_SECONDS)
+        self.slow_requests: Deque[RequestProfile] = collections.deque(
+            maxlen=config.get('slow_request_dumps', DEFAULT_SLOW_REQUEST_DUMPS),
+        )
+        self._lock = threading.Lock()
+        self._metrics: Optional[metrics_lib.BaseMetrics] = None
+
+    @property
+    def metrics(self) -> metrics_lib.BaseMetrics:
+        if self._metrics is None:
+            self._metrics = metrics_lib.get_metrics_interface('paasta')
+        return self._metrics
+
+    def profile(self, profile: RequestProfile, handler: Callable[[], Any]) -> Any:
+        """Calls handler, with profile collecting the spans of the calls it makes."""
+        timer = self.metrics.create_timer('api.request', route=profile.route_name, method=profile.method)
+        profiler = cProfile.Profile() if random.random() < self.cprofile_sample_rate else None
+        _current.profile = profile
+        timer.start()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            response = handler()
+            profile.status_code = response.status_code
+            return response
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            timer.stop()
+            _current.profile = None
+            profile.duration = time.time() - profile.start
+            if profile.duration >= self.slow_request_seconds:
+                if profiler is not None:
+                    profile.profile_stats = format_profile_stats(profiler)
+                log.warning(f'{profile.method} {profile.path} took {profile.duration:.2f}s')
+                with self._lock:
+                    self.slow_requests.append(profile)
+
+    def get_slow_requests(self) -> List[Dict[str, Any]]:
+        """Returns the slow requests that are kept, slowest first."""
+        with self._lock:
+            slow_requests = list(self.slow_requests)
+        return [profile.to_dict() for profile in sorted(slow_requests, key=lambda p: p.duration, reverse=True)]
+
+
+def format_profile_stats(profiler: cProfile.Profile) -> str:
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_STATS_LINES)
+    return output.getvalue()
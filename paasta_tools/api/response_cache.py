@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# Copyright 2015-2019 Yelp Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Caches the responses of the paasta API routes dashboards keep polling.
+
+Successful GET responses of the routes that have a TTL are kept for that many
+seconds, keyed by route and query string, and served with an ETag so clients
+sending ``If-None-Match`` get a 304 back instead of the whole body. Requests for
+a response that is being computed wait for that computation rather than
+starting their own one.
+
+TTLs default to ``DEFAULT_ROUTE_TTLS`` and can be changed (or set to 0 to turn
+the cache off for a route) with the ``api_response_cache_ttls`` key of the
+system paasta config. Every paasta-api worker has its own cache, and its own
+stats.
+"""
+import hashlib
+import math
+import threading
+import time
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Mapping
+from typing import NamedTuple
+from typing import Tuple
+from typing import Union
+
+from pyramid.httpexceptions import HTTPNotModified
+from pyramid.request import Request
+from pyramid.response import Response
+
+DEFAULT_ROUTE_TTLS: Dict[str, float] = {
+    'metastatus': 10,
+    'resources.utilization': 10,
+    'marathon_dashboard': 10,
+    'services': 10,
+}
+
+STAT_NAMES = ('hits', 'misses', 'coalesced', 'not_modified')
+
+# (route name, path and query string)
+CacheKey = Tuple[str, str]
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    headerlist: List[Tuple[str, str]]
+    etag: str
+    expires: float
+
+    def to_response(self, request: Request) -> Response:
+        """Returns a response for request: a 304 if it already has this version of the body, or the whole body."""
+        if self.etag in request.if_none_match:
+            response: Response = HTTPNotModified()
+        else:
+            response = Response(body=self.body, headerlist=list(self.headerlist))
+        response.etag = self.etag
+        response.cache_control.max_age = max(0, math.ceil(self.expires - time.time()))
+        return response
+
+
+class ResponseCache:
+    def __init__(self, route_ttls: Mapping[str, float]) -> None:
+        """
+        :param route_ttls: seconds to cache the responses of each route for, by route name
+        """
+        self.route_ttls = dict(route_ttls)
+        self._lock = threading.Lock()
+        self._entries: Dict[CacheKey, CachedResponse] = {}
+        self._in_flight: Dict[CacheKey, threading.Event] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def get_ttl(self, route_name: str) -> float:
+        return self.route_ttls.get(route_name, 0)
+
+    def _count(self, route_name: str, stat: str) -> None:
+        route_stats = self._stats.setdefault(route_name, dict.fromkeys(STAT_NAMES, 0))
+        route_stats[stat] += 1
+
+    def get(
+        self,
+        key: CacheKey,
+        compute: Callable[[], Response],
+    ) -> Union[CachedResponse, Response]:
+        """Returns the cached response for key, computing it first if it is missing or expired.
+
+        Only one request computes a given key at a time; the others wait for it and share its response. Responses
+        other than 200s aren't cached, and are returned as they are to the request that computed them (requests that
+        were waiting for it compute their own).
+
+        :param key: the CacheKey of the request
+        :param compute: computes the response of the request, uncached
+        """
+        route_name, _ = key
+        waited = False
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.expires > time.time():
+                    if not waited:
+                        self._count(route_name, 'hits')
+                    return entry
+                in_flight = self._in_flight.get(key)
+                if in_flight is None:
+                    in_flight = self._in_flight[key] = threading.Event()
+                    self._count(route_name, 'misses')
+                    break
+                if not waited:
+                    self._count(route_name, 'coalesced')
+                    waited = True
+            in_flight.wait()
+
+        try:
+            response = compute()
+            if response.status_code != 200:
+                return response
+            now = time.time()
+            entry = CachedResponse(
+                body=response.body,
+                headerlist=list(response.headerlist),
+                etag=hashlib.sha1(response.body).hexdigest(),
+                expires=now + self.get_ttl(route_name),
+            )
+            with self._lock:
+                # Keys include query strings, so drop expired entries rather than letting them pile up
+                for expired_key in [k for k, e in self._entries.items() if e.expires <= now]:
+                    del self._entries[expired_key]
+                self._entries[key] = entry
+            return entry
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            in_flight.set()
+
+    def count_not_modified(self, route_name: str) -> None:
+        with self._lock:
+            self._count(route_name, 'not_modified')
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Returns the TTL, number of cached responses and hit/miss counts of every cached route, by route name."""
+        now = time.time()
+        with self._lock:
+            stats: Dict[str, Dict[str, float]] = {}
+            for route_name, ttl in self.route_ttls.items():
+                if not ttl:
+                    continue
+                route_stats = stats[route_name] = {'ttl': ttl, 'entries': 0}
+                route_stats.update(self._stats.get(route_name, dict.fromkeys(STAT_NAMES, 0)))
+            for (route_name, _), entry in self._entries.items():
+                if route_name in stats and entry.expires > now:
+                    stats[route_name]['entries'] += 1
+            return stats
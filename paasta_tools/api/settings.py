@@ -17,7 +17,10 @@ Settings of the paasta-api server.
 import os
 from typing import Optional
 
+from paasta_tools.api.profiling import RequestProfiler
+from paasta_tools.api.response_cache import ResponseCache
 from paasta_tools.kubernetes_tools import KubeClient
+from paasta_tools.marathon_dashboard import MarathonDashboardRefresher
 from paasta_tools.marathon_tools import MarathonClients
 from paasta_tools.utils import DEFAULT_SOA_DIR
 
@@ -29,3 +32,6 @@ soa_dir: str = os.environ.get("PAASTA_API_SOA_DIR", DEFAULT_SOA_DIR)
 cluster: str = None  # type: ignore
 marathon_clients: MarathonClients = None  # type: ignore
 kubernetes_client: Optional[KubeClient] = None
+response_cache: Optional[ResponseCache] = None
+marathon_dashboard_refresher: Optional[MarathonDashboardRefresher] = None
+request_profiler: Optional[RequestProfiler] = None
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# Copyright 2015-2019 Yelp Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Tweens of the paasta-api server.
+"""
+from pyramid.interfaces import IRoutesMapper
+
+from paasta_tools.api import settings
+from paasta_tools.api.profiling import RequestProfile
+from paasta_tools.api.response_cache import CachedResponse
+
+
+def response_cache_tween_factory(handler, registry):
+    """Serves GET requests of the routes settings.response_cache has a TTL for out of it.
+
+    The router only runs below the tweens, so the route of the request is looked up here the same way it does."""
+    routes_mapper = registry.queryUtility(IRoutesMapper)
+
+    def response_cache_tween(request):
+        cache = settings.response_cache
+        if cache is None or request.method != 'GET':
+            return handler(request)
+        route = routes_mapper(request)['route']
+        if route is None or not cache.get_ttl(route.name):
+            return handler(request)
+
+        response = cache.get((route.name, request.path_qs), lambda: handler(request))
+        if not isinstance(response, CachedResponse):
+            return response
+        if response.etag in request.if_none_match:
+            cache.count_not_modified(route.name)
+        return response.to_response(request)
+
+    return response_cache_tween
+
+
+def profiling_tween_factory(handler, registry):
+    """Profiles every request with settings.request_profiler. Sits at the top of the tween chain, so that the
+    time spent in the other tweens (and cached responses) are part of the latencies it reports."""
+    routes_mapper = registry.queryUtility(IRoutesMapper)
+
+    def profiling_tween(request):
+        profiler = settings.request_profiler
+        if profiler is None:
+            return handler(request)
+        route = routes_mapper(request)['route']
+        profile = RequestProfile(
+            route_name=route.name if route is not None else 'unknown',
+            method=request.method,
+            path=request.path_qs,
+        )
+        return profiler.profile(profile, lambda: handler(request))
+
+    return profiling_tween
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# Copyright 2015-2019 Yelp Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+PaaSTA API admin endpoints.
+"""
+from pyramid.view import view_config
+
+from paasta_tools.api import settings
+
+
+@view_config(route_name='admin.slow_requests', request_method='GET', renderer='json')
+def slow_requests(request):
+    if settings.request_profiler is None:
+        return {'requests': []}
+    return {'requests': settings.request_profiler.get_slow_requests()}
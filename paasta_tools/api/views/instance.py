@@ -19,10 +19,12 @@ import logging
 import traceback
 from typing import Any
 from typing import Dict
+from typing import List
 from typing import Mapping
 from typing import MutableMapping
 from typing import Optional
 from typing import Sequence
+from typing import Tuple
 
 import a_sync
 import marathon
@@ -37,6 +39,7 @@ from paasta_tools import marathon_tools
 from paasta_tools.api import settings
 from paasta_tools.api.views.exception import ApiFailure
 from paasta_tools.cli.cmds.status import get_actual_deployments
+from paasta_tools.mesos.task import Task
 from paasta_tools.mesos_tools import get_cached_list_of_running_tasks_from_frameworks
 from paasta_tools.mesos_tools import get_running_tasks_from_frameworks
 from paasta_tools.mesos_tools import get_task
@@ -44,12 +47,91 @@ from paasta_tools.mesos_tools import get_tasks_from_app_id
 from paasta_tools.mesos_tools import select_tasks_by_id
 from paasta_tools.mesos_tools import TaskNotFound
 from paasta_tools.paasta_serviceinit import get_deployment_version
+from paasta_tools.utils import list_all_instances_for_service
 from paasta_tools.utils import NoConfigurationForServiceError
 from paasta_tools.utils import NoDockerImageError
 from paasta_tools.utils import validate_service_instance
 log = logging.getLogger(__name__)
 
 
+class MarathonClientSnapshot:
+    """Wraps a MarathonClient so that the apps and the launch queue it lists are
+    only fetched once, and apps it has listed are looked up without a request of
+    their own. Anything else is passed on to the client."""
+
+    def __init__(self, client: marathon.MarathonClient) -> None:
+        self.client = client
+        self.apps: Dict[Tuple, List[marathon.MarathonApp]] = {}
+        self.queues: Dict[Tuple, List[marathon.models.queue.MarathonQueueItem]] = {}
+
+    def list_apps(self, **kwargs: Any) -> List[marathon.MarathonApp]:
+        key = tuple(sorted(kwargs.items()))
+        if key not in self.apps:
+            self.apps[key] = self.client.list_apps(**kwargs)
+        return self.apps[key]
+
+    def list_queue(self, **kwargs: Any) -> List[marathon.models.queue.MarathonQueueItem]:
+        key = tuple(sorted(kwargs.items()))
+        if key not in self.queues:
+            self.queues[key] = self.client.list_queue(**kwargs)
+        return self.queues[key]
+
+    def get_app(self, app_id: str, **kwargs: Any) -> marathon.MarathonApp:
+        if not kwargs:
+            for apps in self.apps.values():
+                for app in apps:
+                    if app.id == '/' + app_id.lstrip('/'):
+                        return app
+        return self.client.get_app(app_id, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+
+class InstanceStatusSnapshot:
+    """The state of marathon, mesos and kubernetes that the statuses of many
+    instances are computed from. Each piece of it is fetched once, when first
+    needed, so the statuses of all the instances of a service cost about as many
+    requests as the status of one."""
+
+    def __init__(self) -> None:
+        self.marathon_clients: Dict[int, MarathonClientSnapshot] = {}
+        self.running_tasks: Optional[List[Task]] = None
+        self.kubernetes_pods: Dict[str, Sequence[V1Pod]] = {}
+        self.actual_deployments: Dict[str, Mapping[str, str]] = {}
+
+    def get_marathon_client(self, client: marathon.MarathonClient) -> MarathonClientSnapshot:
+        if id(client) not in self.marathon_clients:
+            self.marathon_clients[id(client)] = MarathonClientSnapshot(client)
+        return self.marathon_clients[id(client)]
+
+    def get_running_tasks(self, app_id: str) -> List[Task]:
+        if self.running_tasks is None:
+            self.running_tasks = a_sync.block(get_running_tasks_from_frameworks, '')
+        return select_tasks_by_id(self.running_tasks, app_id)
+
+    def get_kubernetes_pods(
+        self,
+        service: str,
+        instance: str,
+        client: kubernetes_tools.KubeClient,
+    ) -> Sequence[V1Pod]:
+        if service not in self.kubernetes_pods:
+            self.kubernetes_pods[service] = client.core.list_namespaced_pod(
+                namespace='paasta',
+                label_selector=f'yelp.com/paasta_service={service}',
+            ).items
+        return [
+            pod for pod in self.kubernetes_pods[service]
+            if (pod.metadata.labels or {}).get('paasta_instance') == instance
+        ]
+
+    def get_actual_deployments(self, service: str) -> Mapping[str, str]:
+        if service not in self.actual_deployments:
+            self.actual_deployments[service] = get_actual_deployments(service, settings.soa_dir)
+        return self.actual_deployments[service]
+
+
 def chronos_instance_status(
     instance_status: Mapping[str, Any],
     service: str,
@@ -147,6 +229,7 @@ def kubernetes_instance_status(
     service: str,
     instance: str,
     verbose: bool,
+    snapshot: Optional[InstanceStatusSnapshot] = None,
 ) -> Mapping[str, Any]:
     kstatus: Dict[str, Any] = {}
     job_config = kubernetes_tools.load_kubernetes_service_config(
@@ -155,7 +238,10 @@ def kubernetes_instance_status(
     client = settings.kubernetes_client
     if client is not None:
         # bouncing status can be inferred from app_count, ref get_bouncing_status
-        pod_list = kubernetes_tools.pods_for_service_instance(job_config.service, job_config.instance, client)
+        if snapshot is not None:
+            pod_list = snapshot.get_kubernetes_pods(job_config.service, job_config.instance, client)
+        else:
+            pod_list = kubernetes_tools.pods_for_service_instance(job_config.service, job_config.instance, client)
         active_shas = kubernetes_tools.get_active_shas_for_service(pod_list)
         kstatus['app_count'] = max(
             len(active_shas['config_sha']),
@@ -194,6 +280,7 @@ def marathon_job_status(
     client,
     job_config,
     verbose: bool,
+    snapshot: Optional[InstanceStatusSnapshot] = None,
 ) -> None:
     try:
         app_id = job_config.format_marathon_app_dict()['id']
@@ -204,9 +291,11 @@ def marathon_job_status(
 
     mstatus['app_id'] = app_id
     if verbose is True:
-        mstatus['slaves'] = list(
-            {a_sync.block(task.slave)['hostname'] for task in a_sync.block(get_running_tasks_from_frameworks, app_id)},
-        )
+        if snapshot is not None:
+            running_tasks = snapshot.get_running_tasks(app_id)
+        else:
+            running_tasks = a_sync.block(get_running_tasks_from_frameworks, app_id)
+        mstatus['slaves'] = list({a_sync.block(task.slave)['hostname'] for task in running_tasks})
     mstatus['expected_instance_count'] = job_config.get_instances()
 
     try:
@@ -233,19 +322,23 @@ def marathon_instance_status(
     service: str,
     instance: str,
     verbose: bool,
+    snapshot: Optional[InstanceStatusSnapshot] = None,
 ) -> Mapping[str, Any]:
     mstatus: Dict[str, Any] = {}
     job_config = marathon_tools.load_marathon_service_config(
         service, instance, settings.cluster, soa_dir=settings.soa_dir,
     )
-    client = settings.marathon_clients.get_current_client_for_service(job_config)
+    # A MarathonClientSnapshot quacks like a MarathonClient
+    client: Any = settings.marathon_clients.get_current_client_for_service(job_config)
+    if snapshot is not None:
+        client = snapshot.get_marathon_client(client)
     apps = marathon_tools.get_matching_appids(service, instance, client)
 
     # bouncing status can be inferred from app_count, ref get_bouncing_status
     mstatus['app_count'] = len(apps)
     mstatus['desired_state'] = job_config.get_desired_state()
     mstatus['bounce_method'] = job_config.get_bounce_method()
-    marathon_job_status(mstatus, client, job_config, verbose)
+    marathon_job_status(mstatus, client, job_config, verbose, snapshot)
     return mstatus
 
 
@@ -254,7 +347,63 @@ def instance_status(request):
     service = request.swagger_data.get('service')
     instance = request.swagger_data.get('instance')
     verbose = request.swagger_data.get('verbose', False)
+    return get_instance_status(service, instance, verbose)
+
+
+@view_config(route_name='instances.status', request_method='GET', renderer='json')
+def bulk_instance_status(request):
+    service_instances = request.swagger_data.get('service_instances') or []
+    service = request.swagger_data.get('service')
+    verbose = request.swagger_data.get('verbose', False)
 
+    instances: List[Tuple[str, str]] = []
+    for service_instance in service_instances:
+        if '.' not in service_instance:
+            raise ApiFailure(f'{service_instance} is not a service_name.instance_name', 400)
+        service_name, instance_name = service_instance.split('.', 1)
+        instances.append((service_name, instance_name))
+    if service:
+        instances.extend(
+            (service, instance) for instance in sorted(
+                list_all_instances_for_service(service, clusters=[settings.cluster], soa_dir=settings.soa_dir),
+            )
+        )
+    if not instances:
+        raise ApiFailure('Either service_instances or service is required', 400)
+
+    # Every instance is computed from the same snapshot, so e.g. marathon apps are listed once rather than per instance
+    snapshot = InstanceStatusSnapshot()
+    statuses = []
+    for service_name, instance_name in instances:
+        try:
+            status = get_instance_status(service_name, instance_name, verbose, snapshot)
+        except ApiFailure as e:
+            statuses.append({
+                'service': service_name,
+                'instance': instance_name,
+                'status_code': e.err,
+                'error_message': e.msg,
+            })
+        else:
+            statuses.append({
+                'service': service_name,
+                'instance': instance_name,
+                'status_code': 200,
+                'status': status,
+            })
+    return {'instances': statuses}
+
+
+def get_instance_status(
+    service: str,
+    instance: str,
+    verbose: bool,
+    snapshot: Optional[InstanceStatusSnapshot] = None,
+) -> Dict[str, Any]:
+    """Returns the status of an instance, raising ApiFailure if it can't be computed.
+
+    :param snapshot: Shared with the statuses of other instances, if given
+    """
     instance_status: Dict[str, Any] = {}
     instance_status['service'] = service
     instance_status['instance'] = instance
@@ -270,7 +419,10 @@ def instance_status(request):
 
     if instance_type != 'flinkcluster':
         try:
-            actual_deployments = get_actual_deployments(service, settings.soa_dir)
+            if snapshot is not None:
+                actual_deployments = snapshot.get_actual_deployments(service)
+            else:
+                actual_deployments = get_actual_deployments(service, settings.soa_dir)
         except Exception:
             error_message = traceback.format_exc()
             raise ApiFailure(error_message, 500)
@@ -287,13 +439,17 @@ def instance_status(request):
 
     try:
         if instance_type == 'marathon':
-            instance_status['marathon'] = marathon_instance_status(instance_status, service, instance, verbose)
+            instance_status['marathon'] = marathon_instance_status(
+                instance_status, service, instance, verbose, snapshot,
+            )
         elif instance_type == 'chronos':
             instance_status['chronos'] = chronos_instance_status(instance_status, service, instance, verbose)
         elif instance_type == 'adhoc':
             instance_status['adhoc'] = adhoc_instance_status(instance_status, service, instance, verbose)
         elif instance_type == 'kubernetes':
-            instance_status['kubernetes'] = kubernetes_instance_status(instance_status, service, instance, verbose)
+            instance_status['kubernetes'] = kubernetes_instance_status(
+                instance_status, service, instance, verbose, snapshot,
+            )
         elif instance_type == 'flinkcluster':
             status = flinkcluster_instance_status(instance_status, service, instance, verbose)
             if status is not None:
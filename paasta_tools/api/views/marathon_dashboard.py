@@ -28,6 +28,13 @@ log = logging.getLogger(__name__)
 @view_config(route_name='marathon_dashboard', request_method='GET', renderer='json')
 def marathon_dashboard(request):
     log.debug("marathon_dashboard view")
+    snapshot = None
+    if settings.marathon_dashboard_refresher is not None:
+        snapshot = settings.marathon_dashboard_refresher.get_dashboard()
+    if snapshot is not None:
+        dashboard, refreshed_at = snapshot
+        request.response.last_modified = refreshed_at
+        return dashboard
     return create_marathon_dashboard(
         cluster=settings.cluster,
         soa_dir=settings.soa_dir,
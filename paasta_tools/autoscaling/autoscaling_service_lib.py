@@ -13,36 +13,46 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import asyncio
+import atexit
 import logging
 import struct
 import time
+from collections import defaultdict
 from collections import namedtuple
 from contextlib import contextmanager
 from datetime import datetime
 from math import ceil
 from math import floor
+from typing import Callable
+from typing import DefaultDict
+from typing import Dict
 from typing import Iterator
+from typing import List
 from typing import Mapping
 from typing import Optional
 from typing import Sequence
 from typing import Tuple
 
 import a_sync
-import gevent
-import requests
-from gevent import monkey
-from gevent import pool
+import aiohttp
+import numpy as np
 from kazoo.client import KazooClient
+from kazoo.exceptions import BadVersionError
+from kazoo.exceptions import NodeExistsError
 from kazoo.exceptions import NoNodeError
+from kazoo.exceptions import RolledBackError
+from kazoo.interfaces import IAsyncResult
 from marathon.models.app import MarathonApp
 from marathon.models.app import MarathonTask
 
+from paasta_tools.autoscaling.forecasting import append_historical_load
 from paasta_tools.autoscaling.forecasting import get_forecast_policy
+from paasta_tools.autoscaling.forecasting import HISTORICAL_LOAD_DTYPE
+from paasta_tools.autoscaling.forecasting import to_historical_load_array
 from paasta_tools.autoscaling.utils import get_autoscaling_component
 from paasta_tools.autoscaling.utils import register_autoscaling_component
 from paasta_tools.bounce_lib import LockHeldException
 from paasta_tools.bounce_lib import LockTimeout
-from paasta_tools.bounce_lib import ZK_LOCK_CONNECT_TIMEOUT_S
 from paasta_tools.long_running_service_tools import compose_autoscaling_zookeeper_root
 from paasta_tools.long_running_service_tools import set_instances_for_marathon_service
 from paasta_tools.long_running_service_tools import ZK_PAUSE_AUTOSCALE_PATH
@@ -91,6 +101,16 @@ DECISION_POLICY_KEY = 'decision_policy'
 
 AUTOSCALING_DELAY = 300
 MAX_TASK_DELTA = 0.3
+MESOS_TASK_STATS_CONCURRENCY = 100
+MESOS_TASK_STATS_TIMEOUT = 60
+HTTP_METRICS_CONCURRENCY = 100
+HTTP_METRICS_CONCURRENCY_PER_HOST = 10
+HTTP_METRICS_CONCURRENCY_PER_SERVICE = 20
+# How many services have their utilization read over http at once when collecting metrics, so that every one of them
+# gets all of its requests in flight straight away rather than spending its timeout budget waiting for the others
+HTTP_METRICS_SERVICES_CONCURRENCY = HTTP_METRICS_CONCURRENCY // HTTP_METRICS_CONCURRENCY_PER_SERVICE
+HTTP_METRICS_TIMEOUT = 2
+HTTP_METRICS_TIMEOUT_BUDGET = 30
 
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
@@ -154,11 +174,16 @@ def proportional_decision_policy(
                    e.g. if the metric you're using is CPU, then how much CPU an idle container would use.
                    This should never be more than your setpoint. (If it takes 50% cpu to run an idle container, we can't
                    get your utilization below 50% no matter how many containers we run.)
-    :param forecast_policy: The method for forecasting future load values. Currently, only two forecasters exist:
+    :param forecast_policy: The method for forecasting future load values. The forecasters are:
                             - "current", which assumes that the load will remain the same as the current value for the
                             near future.
                             - "moving_average", which assumes that total load will remain near the average of data
                             points within a window.
+                            - "linreg", which extrapolates a linear regression of the data points within a window.
+                            - "exponential_smoothing", which assumes that total load will remain near an average of
+                            data points that weights recent ones more.
+                            - "percentile", which assumes that total load will remain near a percentile of the data
+                            points within a window.
     :param good_enough_window: A tuple/array of two utilization values, (low, high). If the utilization per container at
                                the forecasted total load is within this window with the current number of instances,
                                leave the number of instances alone. This can reduce churn. Setpoint should lie within
@@ -169,9 +194,12 @@ def proportional_decision_policy(
 
     current_load = (utilization - offset) * num_healthy_instances
 
-    historical_load = fetch_historical_load(zk_path_prefix=zookeeper_path)
-    historical_load.append((time.time(), current_load))
-    save_historical_load(historical_load, zk_path_prefix=zookeeper_path)
+    historical_load = append_historical_load(
+        fetch_historical_load(zk_path_prefix=zookeeper_path),
+        time.time(),
+        current_load,
+    )
+    save_new_historical_load(historical_load[-1:], zk_path_prefix=zookeeper_path)
 
     predicted_load = forecast_policy_func(historical_load, **kwargs)
 
@@ -196,54 +224,249 @@ SIZE_PER_HISTORICAL_LOAD_RECORD = struct.calcsize(HISTORICAL_LOAD_SERIALIZATION_
 
 
 def zk_historical_load_path(zk_path_prefix):
+    """The node historical load used to be kept in, as a single blob. See :class:`HistoricalLoadRingBuffer`"""
     return "%s/historical_load" % zk_path_prefix
 
 
-def save_historical_load(historical_load, zk_path_prefix):
-    with ZookeeperPool() as zk:
-        historical_load_bytes = serialize_historical_load(historical_load)
-        zk.ensure_path(zk_historical_load_path(zk_path_prefix))
-        zk.set(zk_historical_load_path(zk_path_prefix), historical_load_bytes)
-
-
 def serialize_historical_load(historical_load):
     max_records = 1000000 // SIZE_PER_HISTORICAL_LOAD_RECORD
-    historical_load = historical_load[-max_records:]
-    return b''.join([struct.pack(HISTORICAL_LOAD_SERIALIZATION_FORMAT, *x) for x in historical_load])
+    historical_load = to_historical_load_array(historical_load)[-max_records:]
+    return historical_load.tobytes()
 
 
-def fetch_historical_load(zk_path_prefix):
-    with ZookeeperPool() as zk:
+def deserialize_historical_load(historical_load_bytes):
+    """Decodes serialized historical load into a (read-only) HISTORICAL_LOAD_DTYPE array, without copying it."""
+    return np.frombuffer(
+        historical_load_bytes,
+        dtype=HISTORICAL_LOAD_DTYPE,
+        count=len(historical_load_bytes) // SIZE_PER_HISTORICAL_LOAD_RECORD,
+    )
+
+
+class HistoricalLoadRingBuffer:
+    """The historical load of a service instance, kept in zookeeper as a ring buffer of fixed-size chunks.
+
+    The <zk_path_prefix>/historical_load_ring node holds a header with the number of records appended so far. The
+    record with sequence number n (counting from 0) is kept in its child node (n // records_per_chunk) % num_chunks,
+    serialized the same way as by :func:`serialize_historical_load`. Appending a record only rewrites the last chunk
+    and the header, instead of the whole history. Once every chunk is full, the oldest one is started over, dropping
+    its records.
+
+    Reads are incremental: the records read so far are kept along with a cursor (the sequence number of the next
+    record), and only the chunks holding records past the cursor are read again.
+
+    :param zk_path_prefix: The autoscaling zookeeper path of the service instance
+    """
+    VERSION = 1
+    HEADER_FORMAT = '!BIIQ'  # version, records_per_chunk, num_chunks, number of records appended so far
+    RECORDS_PER_CHUNK = 4096
+    NUM_CHUNKS = 16
+
+    def __init__(self, zk_path_prefix: str) -> None:
+        self.zk_path_prefix = zk_path_prefix
+        self.records_per_chunk = self.RECORDS_PER_CHUNK
+        self.num_chunks = self.NUM_CHUNKS
+        self.reset()
+
+    def reset(self) -> None:
+        """Forgets the records read so far, so the next read starts from scratch"""
+        self.loaded = False
+        # The records with sequence numbers from cursor - len(historical_load) up to cursor
+        self.historical_load = to_historical_load_array([])
+        self.cursor = 0
+        # None if the header node doesn't exist
+        self.header_version: Optional[int] = None
+
+    @property
+    def path(self) -> str:
+        return "%s/historical_load_ring" % self.zk_path_prefix
+
+    def chunk_path(self, chunk: int) -> str:
+        return "%s/%d" % (self.path, chunk % self.num_chunks)
+
+    def oldest_sequence_number(self, cursor: int) -> int:
+        """Returns the sequence number of the oldest record kept once cursor records have been appended"""
+        last_chunk = (cursor - 1) // self.records_per_chunk
+        return max(0, (last_chunk - self.num_chunks + 1) * self.records_per_chunk)
+
+    def read(self, zk: KazooClient) -> np.ndarray:
+        """Returns every record kept, as a HISTORICAL_LOAD_DTYPE array, only reading the chunks with records appended
+        since the last read. Historical load kept in the old single-blob format is migrated first."""
+        try:
+            header, stat = zk.get(self.path)
+        except NoNodeError:
+            self.reset()
+            self.loaded = True
+            self.migrate(zk)
+            return self.historical_load
+
+        version, records_per_chunk, num_chunks, cursor = struct.unpack(self.HEADER_FORMAT, header)
+        if version != self.VERSION:
+            raise ValueError(f"Unknown version {version} of the historical load in {self.path}")
+        if (
+            not self.loaded or cursor < self.cursor or
+            (records_per_chunk, num_chunks) != (self.records_per_chunk, self.num_chunks)
+        ):
+            # Nothing read yet, or the buffer was recreated since
+            self.reset()
+            self.records_per_chunk, self.num_chunks = records_per_chunk, num_chunks
+
+        oldest = self.oldest_sequence_number(cursor)
+        begin = max(self.cursor, oldest)
+        chunks = range(begin // self.records_per_chunk, (cursor - 1) // self.records_per_chunk + 1)
+        async_results = [zk.get_async(self.chunk_path(chunk)) for chunk in chunks]
+
+        historical_load = [self.historical_load[max(0, len(self.historical_load) - (self.cursor - oldest)):]]
+        for chunk, async_result in zip(chunks, async_results):
+            chunk_begin = chunk * self.records_per_chunk
+            records = deserialize_historical_load(async_result.get()[0])
+            historical_load.append(records[max(begin, chunk_begin) - chunk_begin:cursor - chunk_begin])
+
+        self.historical_load = np.concatenate(historical_load)
+        self.cursor = cursor
+        self.header_version = stat.version
+        self.loaded = True
+        return self.historical_load
+
+    def append(self, zk: KazooClient, historical_load: np.ndarray) -> None:
+        """Appends records, only rewriting the chunks they go in and the header. Raises BadVersionError if somebody
+        else appended since the last read.
+
+        :param historical_load: a HISTORICAL_LOAD_DTYPE array, or a list of (timestamp, value)s
+        """
+        if not self.loaded:
+            self.read(zk)
+        self.write(zk, to_historical_load_array(historical_load))
+
+    def migrate(self, zk: KazooClient) -> None:
+        """Moves historical load from the single-blob node it used to be kept in into the (empty) ring buffer"""
         try:
-            historical_load_bytes, _ = zk.get(zk_historical_load_path(zk_path_prefix))
-            return deserialize_historical_load(historical_load_bytes)
+            historical_load_bytes, _ = zk.get(zk_historical_load_path(self.zk_path_prefix))
         except NoNodeError:
-            return []
+            return
+        log.info(f"Migrating the historical load in {zk_historical_load_path(self.zk_path_prefix)} to {self.path}")
+        self.write(
+            zk,
+            deserialize_historical_load(historical_load_bytes),
+            delete_path=zk_historical_load_path(self.zk_path_prefix),
+        )
+
+    def write(self, zk: KazooClient, new_historical_load: np.ndarray, delete_path: Optional[str] = None) -> None:
+        """Appends records in a single transaction, which also deletes delete_path if given"""
+        if len(new_historical_load) == 0 and delete_path is None:
+            return
+        historical_load = np.concatenate([self.historical_load, new_historical_load])
+        cursor = self.cursor + len(new_historical_load)
+        first = cursor - len(historical_load)  # The sequence number of historical_load[0]
+        header = struct.pack(self.HEADER_FORMAT, self.VERSION, self.records_per_chunk, self.num_chunks, cursor)
+
+        if self.header_version is None:
+            zk.ensure_path(self.zk_path_prefix)
+        transaction = zk.transaction()
+        if self.header_version is None:
+            transaction.create(self.path, header)
+        else:
+            transaction.set_data(self.path, header, version=self.header_version)
+        last_chunk = (cursor - 1) // self.records_per_chunk
+        first_chunk = max(self.cursor // self.records_per_chunk, last_chunk - self.num_chunks + 1)
+        for chunk in range(first_chunk, last_chunk + 1):
+            chunk_begin = chunk * self.records_per_chunk
+            chunk_bytes = historical_load[
+                max(chunk_begin, first) - first:min(chunk_begin + self.records_per_chunk, cursor) - first
+            ].tobytes()
+            if self.cursor > (chunk % self.num_chunks) * self.records_per_chunk:
+                transaction.set_data(self.chunk_path(chunk), chunk_bytes)
+            else:
+                transaction.create(self.chunk_path(chunk), chunk_bytes)
+        if delete_path is not None:
+            transaction.delete(delete_path)
 
+        errors = [
+            result for result in transaction.commit()
+            if isinstance(result, Exception) and not isinstance(result, RolledBackError)
+        ]
+        if errors:
+            self.reset()
+            raise errors[0]
 
-def deserialize_historical_load(historical_load_bytes):
-    historical_load = []
-
-    for pos in range(0, len(historical_load_bytes), SIZE_PER_HISTORICAL_LOAD_RECORD):
-        historical_load.append(
-            struct.unpack(
-                # unfortunately struct.unpack doesn't like kwargs.
-                HISTORICAL_LOAD_SERIALIZATION_FORMAT,
-                historical_load_bytes[pos:pos + SIZE_PER_HISTORICAL_LOAD_RECORD],
+        self.historical_load = historical_load[self.oldest_sequence_number(cursor) - first:]
+        self.cursor = cursor
+        self.header_version = 0 if self.header_version is None else self.header_version + 1
+
+
+_historical_load_ring_buffers: Dict[str, HistoricalLoadRingBuffer] = {}
+
+
+def get_historical_load_ring_buffer(zk_path_prefix: str) -> HistoricalLoadRingBuffer:
+    """Returns the ring buffer of the historical load under zk_path_prefix, shared by the whole process so that it is
+    read incrementally"""
+    if zk_path_prefix not in _historical_load_ring_buffers:
+        _historical_load_ring_buffers[zk_path_prefix] = HistoricalLoadRingBuffer(zk_path_prefix)
+    return _historical_load_ring_buffers[zk_path_prefix]
+
+
+def fetch_historical_load(zk_path_prefix):
+    with ZookeeperPool() as zk:
+        return get_historical_load_ring_buffer(zk_path_prefix).read(zk)
+
+
+def save_new_historical_load(new_historical_load, zk_path_prefix):
+    """Appends records to the historical load under zk_path_prefix. Losing them to a concurrent write only costs
+    a datapoint, so that's logged rather than raised."""
+    with ZookeeperPool() as zk:
+        try:
+            get_historical_load_ring_buffer(zk_path_prefix).append(zk, new_historical_load)
+        except (BadVersionError, NodeExistsError) as e:
+            log.warning(f"Failed to save the historical load under {zk_path_prefix}, it changed meanwhile: {e!r}")
+
+
+# The http metrics providers share one keep-alive session per event loop, see get_http_metrics_session
+_http_metrics_sessions: Dict[asyncio.AbstractEventLoop, Tuple[aiohttp.ClientSession, asyncio.Semaphore]] = {}
+
+
+def get_http_metrics_session() -> Tuple[aiohttp.ClientSession, asyncio.Semaphore]:
+    """Returns the keep-alive session the http metrics providers share on the current event loop, along with the
+    semaphore that caps the number of requests in flight on it (so that waiting for a free connection doesn't count
+    against the timeout of a request)."""
+    loop = asyncio.get_event_loop()
+    for other_loop in [other_loop for other_loop in _http_metrics_sessions if other_loop.is_closed()]:
+        _close_http_metrics_session(_http_metrics_sessions.pop(other_loop)[0])
+    if loop not in _http_metrics_sessions or _http_metrics_sessions[loop][0].closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=HTTP_METRICS_CONCURRENCY,
+                limit_per_host=HTTP_METRICS_CONCURRENCY_PER_HOST,
+                loop=loop,
             ),
+            headers={'User-Agent': get_user_agent()},
+            loop=loop,
         )
+        _http_metrics_sessions[loop] = (session, asyncio.Semaphore(HTTP_METRICS_CONCURRENCY, loop=loop))
+    return _http_metrics_sessions[loop]
+
 
-    return historical_load
+def _close_http_metrics_session(session: aiohttp.ClientSession) -> None:
+    # Works even once the loop of the session is closed, see paasta_tools.mesos.session
+    if not session.closed:
+        session.connector.close()
+        session.detach()
 
 
-def get_json_body_from_service(host, port, endpoint, timeout=2):
-    return requests.get(
-        f'http://{host}:{port}/{endpoint}',
-        headers={'User-Agent': get_user_agent()}, timeout=timeout,
-    ).json()
+@atexit.register
+def close_http_metrics_sessions() -> None:
+    for session, _ in _http_metrics_sessions.values():
+        _close_http_metrics_session(session)
+    _http_metrics_sessions.clear()
 
 
-def get_http_utilization_for_a_task(task, service, endpoint, json_mapper):
+async def get_json_body_from_service(host, port, endpoint, timeout=HTTP_METRICS_TIMEOUT):
+    session, semaphore = get_http_metrics_session()
+    async with semaphore:
+        async with session.get(f'http://{host}:{port}/{endpoint}', timeout=timeout) as response:
+            return await response.json(content_type=None)
+
+
+async def get_http_utilization_for_a_task(task, service, endpoint, json_mapper):
     """
     Gets the task utilization by fetching json from an http endpoint
     and applying a function that maps it to a utilization.
@@ -256,19 +479,70 @@ def get_http_utilization_for_a_task(task, service, endpoint, json_mapper):
     :returns: the service's utilization, from 0 to 1, or None
     """
     try:
-        return json_mapper(get_json_body_from_service(task.host, task.ports[0], endpoint))
-    except requests.exceptions.Timeout:
+        return json_mapper(await get_json_body_from_service(task.host, task.ports[0], endpoint))
+    except asyncio.TimeoutError:
         # If we time out querying an endpoint, assume the task is fully loaded
         # This won't trigger in the event of DNS error or when a request is refused
-        # a requests.exception.ConnectionError is raised in those cases
+        # an aiohttp.ClientConnectionError is raised in those cases
         log.debug("Received a timeout when querying %s on %s:%s. Assuming the service "
                   "is at full utilization." % (service, task.host, task.ports[0]))
         return 1.0
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
         log.error("Caught exception when querying {} on {}:{} : {}".format(service, task.host, task.ports[0], str(e)))
 
 
-def get_http_utilization_for_all_tasks(marathon_service_config, marathon_tasks, endpoint, json_mapper):
+async def get_http_utilization_for_tasks(
+    marathon_service_config,
+    marathon_tasks,
+    endpoint,
+    json_mapper,
+    concurrency=HTTP_METRICS_CONCURRENCY_PER_SERVICE,
+    timeout_budget=HTTP_METRICS_TIMEOUT_BUDGET,
+):
+    """
+    Gets the utilization of each of the tasks of a service by fetching json from
+    an http endpoint and applying a function that maps it to a utilization, with
+    at most `concurrency` requests in flight.
+
+    :param timeout_budget: How long to wait for all the tasks, on top of the
+                           timeout of each request
+
+    :returns: a list of the utilization of each task, or None for the tasks it
+              couldn't be read from. Like the tasks whose request timed out, the
+              tasks that weren't read from within the budget are assumed to be
+              fully utilized.
+    """
+    endpoint = endpoint.lstrip('/')
+    service = marathon_service_config.get_service()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def get_utilization(task):
+        async with semaphore:
+            return await get_http_utilization_for_a_task(task, service, endpoint, json_mapper)
+
+    futures = [asyncio.ensure_future(get_utilization(task)) for task in marathon_tasks]
+    if futures:
+        await asyncio.wait(futures, timeout=timeout_budget)
+
+    utilization = []
+    for task, future in zip(marathon_tasks, futures):
+        if future.done():
+            utilization.append(future.result())
+        else:
+            future.cancel()
+            log.warning(
+                f"Ran out of time querying {service} on {task.host}:{task.ports[0]}. Assuming the service is at "
+                "full utilization.",
+            )
+            utilization.append(1.0)
+    return utilization
+
+
+def get_http_utilization_for_all_tasks(
+    marathon_service_config, marathon_tasks, endpoint, json_mapper, collected_metrics=None,
+):
     """
     Gets the mean utilization of a service across all of its tasks by fetching
     json from an http endpoint and applying a function that maps it to a
@@ -278,25 +552,19 @@ def get_http_utilization_for_all_tasks(marathon_service_config, marathon_tasks,
     :param marathon_tasks: Marathon tasks to get data from
     :param endpoint: The http endpoint to get the stats from
     :param json_mapper: A function that takes a dictionary for a task and returns that task's utilization
+    :param collected_metrics: An AutoscalingMetricsCollection that may have collected the utilization already
 
     :returns: the service's mean utilization, from 0 to 1
     """
-
-    endpoint = endpoint.lstrip('/')
-    utilization = []
-    service = marathon_service_config.get_service()
-
-    monkey.patch_socket()
-    gevent_pool = pool.Pool(20)
-    jobs = [
-        gevent_pool.spawn(get_http_utilization_for_a_task, task, service, endpoint, json_mapper)
-        for task in marathon_tasks
-    ]
-    gevent.joinall(jobs)
-
-    for job in jobs:
-        if job.value is not None:
-            utilization.append(job.value)
+    if collected_metrics is not None:
+        tasks_utilization = collected_metrics.get_http_utilization_for_tasks(
+            marathon_service_config, marathon_tasks, endpoint, json_mapper,
+        )
+    else:
+        tasks_utilization = a_sync.block(
+            get_http_utilization_for_tasks, marathon_service_config, marathon_tasks, endpoint, json_mapper,
+        )
+    utilization = [task_utilization for task_utilization in tasks_utilization if task_utilization is not None]
 
     if not utilization:
         raise MetricsProviderNoDataError("Couldn't get any data from http endpoint {} for {}.{}".format(
@@ -305,8 +573,28 @@ def get_http_utilization_for_all_tasks(marathon_service_config, marathon_tasks,
     return mean(utilization)
 
 
+def uwsgi_mapper(json):
+    """Maps the UWSGI stats of a task to its utilization: the percentage of non-idle workers"""
+    workers = json['workers']
+    utilization = [1.0 if worker['status'] != 'idle' else 0.0 for worker in workers]
+    return mean(utilization)
+
+
+def utilization_mapper(json):
+    return float(json['utilization'])
+
+
+# The default endpoint and the json mapper of each metrics provider that reads utilization from the tasks over http
+HTTP_METRICS_PROVIDERS = {
+    'uwsgi': ('status/uwsgi', uwsgi_mapper),
+    'http': ('status', utilization_mapper),
+}
+
+
 @register_autoscaling_component('uwsgi', SERVICE_METRICS_PROVIDER_KEY)
-def uwsgi_metrics_provider(marathon_service_config, marathon_tasks, endpoint='status/uwsgi', **kwargs):
+def uwsgi_metrics_provider(
+    marathon_service_config, marathon_tasks, endpoint='status/uwsgi', collected_metrics=None, **kwargs,
+):
     """
     Gets the mean utilization of a service across all of its tasks, where
     the utilization of a task is the percentage of non-idle workers as read
@@ -315,20 +603,19 @@ def uwsgi_metrics_provider(marathon_service_config, marathon_tasks, endpoint='st
     :param marathon_service_config: the MarathonServiceConfig to get data from
     :param marathon_tasks: Marathon tasks to get data from
     :param endpoint: The http endpoint to get the uwsgi stats from
+    :param collected_metrics: An AutoscalingMetricsCollection that may have collected the utilization already
 
     :returns: the service's mean utilization, from 0 to 1
     """
-
-    def uwsgi_mapper(json):
-        workers = json['workers']
-        utilization = [1.0 if worker['status'] != 'idle' else 0.0 for worker in workers]
-        return mean(utilization)
-
-    return get_http_utilization_for_all_tasks(marathon_service_config, marathon_tasks, endpoint, uwsgi_mapper)
+    return get_http_utilization_for_all_tasks(
+        marathon_service_config, marathon_tasks, endpoint, uwsgi_mapper, collected_metrics=collected_metrics,
+    )
 
 
 @register_autoscaling_component('http', SERVICE_METRICS_PROVIDER_KEY)
-def http_metrics_provider(marathon_service_config, marathon_tasks, endpoint='status', **kwargs):
+def http_metrics_provider(
+    marathon_service_config, marathon_tasks, endpoint='status', collected_metrics=None, **kwargs,
+):
     """
     Gets the mean utilization of a service across all of its tasks, where
     the utilization of a task is read from a HTTP endpoint on the host. The
@@ -338,20 +625,191 @@ def http_metrics_provider(marathon_service_config, marathon_tasks, endpoint='sta
     :param marathon_service_config: the MarathonServiceConfig to get data from
     :param marathon_tasks: Marathon tasks to get data from
     :param endpoint: The http endpoint to get the task utilization from
+    :param collected_metrics: An AutoscalingMetricsCollection that may have collected the utilization already
 
     :returns: the service's mean utilization, from 0 to 1
     """
+    return get_http_utilization_for_all_tasks(
+        marathon_service_config, marathon_tasks, endpoint, utilization_mapper, collected_metrics=collected_metrics,
+    )
+
+
+def get_mesos_cpu_zk_paths(marathon_service_config: MarathonServiceConfig) -> Tuple[str, str]:
+    """Returns the zookeeper paths the mesos_cpu metrics provider keeps the time and
+    cpu data of its previous run in."""
+    autoscaling_root = compose_autoscaling_zookeeper_root(
+        service=marathon_service_config.service,
+        instance=marathon_service_config.instance,
+    )
+    return '%s/cpu_last_time' % autoscaling_root, '%s/cpu_data' % autoscaling_root
+
+
+async def get_mesos_tasks_stats(
+    mesos_tasks: Sequence[Task],
+    concurrency: int = MESOS_TASK_STATS_CONCURRENCY,
+    timeout: float = MESOS_TASK_STATS_TIMEOUT,
+) -> Dict[str, Optional[Dict]]:
+    """Fetches the stats of many mesos tasks at once, with at most `concurrency`
+    requests in flight.
+
+    :returns: a dict of task id to the task's stats, or None if they couldn't be fetched in time
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def get_stats(task):
+        async with semaphore:
+            return await task.stats()
+
+    futures = [asyncio.ensure_future(get_stats(task)) for task in mesos_tasks]
+    if futures:
+        await asyncio.wait(futures, timeout=timeout)
+
+    mesos_tasks_stats = {}
+    for task, future in zip(mesos_tasks, futures):
+        if future.done() and not future.cancelled() and future.exception() is None:
+            mesos_tasks_stats[task['id']] = future.result()
+        else:
+            future.cancel()
+            mesos_tasks_stats[task['id']] = None
+    return mesos_tasks_stats
 
-    def utilization_mapper(json):
-        return float(json['utilization'])
 
-    return get_http_utilization_for_all_tasks(marathon_service_config, marathon_tasks, endpoint, utilization_mapper)
+class AutoscalingMetricsCollection:
+    """Gathers the metrics of many autoscaled service instances up front, so that
+    deciding how to scale each of them doesn't wait on round trips of its own.
+
+    The stats of the mesos tasks of every service instance, and the utilization
+    read from the tasks of the service instances using the http and uwsgi metrics
+    providers, are fetched in a single fan-out on one event loop, with bounded
+    concurrency. Anything that wasn't collected up front is fetched on demand.
+
+    The autoscaling state kept in zookeeper isn't collected up front: it's only
+    consistent while the autoscaling lock of its service instance is held, so it
+    is read with :meth:`read_zk_data` and written with :meth:`set_zk_data` under
+    the lock, and the writes are waited for with :meth:`flush` before the lock is
+    released. The reads and writes of a service instance are pipelined with
+    kazoo's async API.
+
+    :param zk: The KazooClient to read and write zookeeper data with
+    """
+
+    def __init__(self, zk: KazooClient) -> None:
+        self.zk = zk
+        self.mesos_tasks_stats: Dict[str, Optional[Dict]] = {}
+        # When the stats of each task were fetched, in seconds since the epoch
+        self.mesos_tasks_stats_times: Dict[str, int] = {}
+        # (service, instance, endpoint) -> the utilization of each task, or None
+        self.http_utilization: Dict[Tuple[str, str, str], List[Optional[float]]] = {}
+        self.pending_writes: List[Tuple[str, bytes, IAsyncResult]] = []
+
+    def collect(
+        self,
+        configs_with_tasks: Sequence[Tuple[MarathonServiceConfig, Sequence[MarathonTask], Sequence[Task]]],
+    ) -> None:
+        """Collects the metrics of service instances that use the mesos_cpu, http or uwsgi metrics providers.
+
+        :param configs_with_tasks: (config, healthy marathon tasks, mesos tasks) of every service instance
+        """
+        mesos_tasks: List[Task] = []
+        http_configs_with_tasks = []
+        for config, marathon_tasks, config_mesos_tasks in configs_with_tasks:
+            autoscaling_params = config.get_autoscaling_params()
+            metrics_provider = autoscaling_params['metrics_provider']
+            if metrics_provider == 'mesos_cpu':
+                mesos_tasks.extend(config_mesos_tasks)
+            elif metrics_provider in HTTP_METRICS_PROVIDERS:
+                default_endpoint, json_mapper = HTTP_METRICS_PROVIDERS[metrics_provider]
+                endpoint = autoscaling_params.get('endpoint', default_endpoint)
+                http_configs_with_tasks.append((config, marathon_tasks, endpoint, json_mapper))
+
+        async def collect_async():
+            services_semaphore = asyncio.Semaphore(HTTP_METRICS_SERVICES_CONCURRENCY)
+
+            async def get_http_utilization(config_with_tasks):
+                # The timeout budget of a service only starts once it's its turn
+                async with services_semaphore:
+                    return await get_http_utilization_for_tasks(
+                        *config_with_tasks, timeout_budget=HTTP_METRICS_TIMEOUT_BUDGET,
+                    )
+
+            return await asyncio.gather(
+                get_mesos_tasks_stats(mesos_tasks),
+                *(get_http_utilization(config_with_tasks) for config_with_tasks in http_configs_with_tasks),
+            )
+
+        mesos_tasks_stats, *http_utilization = a_sync.block(collect_async)
+        self.add_mesos_tasks_stats(mesos_tasks_stats)
+        for (config, _, endpoint, _), tasks_utilization in zip(http_configs_with_tasks, http_utilization):
+            self.http_utilization[(config.service, config.instance, endpoint)] = tasks_utilization
+
+    def read_zk_data(self, paths: Sequence[str]) -> List[Optional[bytes]]:
+        """Returns the data of zookeeper nodes, with None for the ones that don't exist"""
+        async_results = [self.zk.get_async(path) for path in paths]
+        data: List[Optional[bytes]] = []
+        for async_result in async_results:
+            try:
+                data.append(async_result.get()[0])
+            except NoNodeError:
+                data.append(None)
+        return data
+
+    def set_zk_data(self, path: str, value: bytes) -> None:
+        """Writes to a zookeeper node, without waiting for the write to complete. See :meth:`flush`"""
+        self.pending_writes.append((path, value, self.zk.set_async(path, value)))
+
+    def flush(self) -> None:
+        """Waits for the pending zookeeper writes, creating the nodes that don't exist yet"""
+        pending_writes, self.pending_writes = self.pending_writes, []
+        for path, value, async_result in pending_writes:
+            try:
+                try:
+                    async_result.get()
+                except NoNodeError:
+                    self.zk.ensure_path(path)
+                    self.zk.set(path, value)
+            except Exception as e:
+                log.error(f"Failed to write {path} to zookeeper: {e}")
+
+    def get_http_utilization_for_tasks(
+        self,
+        marathon_service_config: MarathonServiceConfig,
+        marathon_tasks: Sequence[MarathonTask],
+        endpoint: str,
+        json_mapper: Callable[[Dict], float],
+    ) -> List[Optional[float]]:
+        key = (marathon_service_config.service, marathon_service_config.instance, endpoint)
+        if key not in self.http_utilization:
+            self.http_utilization[key] = a_sync.block(
+                get_http_utilization_for_tasks, marathon_service_config, marathon_tasks, endpoint, json_mapper,
+            )
+        return self.http_utilization[key]
+
+    def add_mesos_tasks_stats(self, mesos_tasks_stats: Dict[str, Optional[Dict]]) -> None:
+        fetch_time = int(datetime.now().strftime('%s'))
+        self.mesos_tasks_stats.update(mesos_tasks_stats)
+        self.mesos_tasks_stats_times.update((task_id, fetch_time) for task_id in mesos_tasks_stats)
+
+    def get_mesos_tasks_stats(self, mesos_tasks: Sequence[Task]) -> Tuple[Dict[str, Optional[Dict]], int]:
+        """Returns the stats of mesos tasks, and when they were fetched. The cpu time of the tasks has to be compared
+        with the time their stats were fetched at, rather than the time they are looked at, which can be much later.
+
+        :returns: a tuple of a dict of task id to the task's stats (or None), and the time the oldest of them were
+                  fetched at, in seconds since the epoch
+        """
+        missing_tasks = [task for task in mesos_tasks if task['id'] not in self.mesos_tasks_stats]
+        if missing_tasks:
+            self.add_mesos_tasks_stats(a_sync.block(get_mesos_tasks_stats, missing_tasks))
+        fetch_time = min(
+            (self.mesos_tasks_stats_times[task['id']] for task in mesos_tasks),
+            default=int(datetime.now().strftime('%s')),
+        )
+        return {task['id']: self.mesos_tasks_stats[task['id']] for task in mesos_tasks}, fetch_time
 
 
 @register_autoscaling_component('mesos_cpu', SERVICE_METRICS_PROVIDER_KEY)
 def mesos_cpu_metrics_provider(
     marathon_service_config, system_paasta_config, marathon_tasks, mesos_tasks, log_utilization_data={},
-    noop=False, **kwargs,
+    noop=False, collected_metrics=None, **kwargs,
 ):
     """
     Gets the mean cpu utilization of a service across all of its tasks.
@@ -360,41 +818,38 @@ def mesos_cpu_metrics_provider(
     :param marathon_tasks: Marathon tasks to get data from
     :param mesos_tasks: Mesos tasks to get data from
     :param log_utilization_data: A dict used to transfer utilization data to autoscale_marathon_instance()
+    :param collected_metrics: An AutoscalingMetricsCollection to take the zookeeper data and task stats from,
+                              and to pipeline the zookeeper writes through
 
     :returns: the service's mean utilization, from 0 to 1
     """
 
-    autoscaling_root = compose_autoscaling_zookeeper_root(
-        service=marathon_service_config.service,
-        instance=marathon_service_config.instance,
-    )
-    zk_last_time_path = '%s/cpu_last_time' % autoscaling_root
-    zk_last_cpu_data = '%s/cpu_data' % autoscaling_root
-
-    with ZookeeperPool() as zk:
-        try:
-            last_time = zk.get(zk_last_time_path)[0].decode('utf8')
-            last_cpu_data = zk.get(zk_last_cpu_data)[0].decode('utf8')
-            log_utilization_data[last_time] = last_cpu_data
-            last_time = float(last_time)
-            last_cpu_data = (datum for datum in last_cpu_data.split(',') if datum)
-        except NoNodeError:
-            last_time = 0.0
-            last_cpu_data = []
+    zk_last_time_path, zk_last_cpu_data = get_mesos_cpu_zk_paths(marathon_service_config)
 
-    futures = [asyncio.ensure_future(task.stats()) for task in mesos_tasks]
-    if futures:
-        a_sync.block(asyncio.wait, futures, timeout=60)
-
-    def results_or_None(fut):
-        if fut.exception():
-            return None
-        else:
-            return fut.result()
-
-    mesos_tasks_stats = dict(zip([task['id'] for task in mesos_tasks], [results_or_None(fut) for fut in futures]))
+    if collected_metrics is not None:
+        last_time, last_cpu_data = collected_metrics.read_zk_data([zk_last_time_path, zk_last_cpu_data])
+        mesos_tasks_stats, current_time = collected_metrics.get_mesos_tasks_stats(mesos_tasks)
+    else:
+        with ZookeeperPool() as zk:
+            try:
+                last_time = zk.get(zk_last_time_path)[0]
+                last_cpu_data = zk.get(zk_last_cpu_data)[0]
+            except NoNodeError:
+                last_time = None
+                last_cpu_data = None
+        mesos_tasks_stats = a_sync.block(get_mesos_tasks_stats, mesos_tasks)
+        current_time = int(datetime.now().strftime('%s'))
+
+    if last_time is not None and last_cpu_data is not None:
+        last_time = last_time.decode('utf8')
+        last_cpu_data = last_cpu_data.decode('utf8')
+        log_utilization_data[last_time] = last_cpu_data
+        last_time = float(last_time)
+        last_cpu_data = (datum for datum in last_cpu_data.split(',') if datum)
+    else:
+        last_time = 0.0
+        last_cpu_data = []
 
-    current_time = int(datetime.now().strftime('%s'))
     time_delta = current_time - last_time
 
     mesos_cpu_data = {}
@@ -415,11 +870,15 @@ def mesos_cpu_metrics_provider(
     log_utilization_data[str(current_time)] = cpu_data_csv
 
     if not noop:
-        with ZookeeperPool() as zk:
-            zk.ensure_path(zk_last_cpu_data)
-            zk.ensure_path(zk_last_time_path)
-            zk.set(zk_last_cpu_data, str(cpu_data_csv).encode('utf8'))
-            zk.set(zk_last_time_path, str(current_time).encode('utf8'))
+        if collected_metrics is not None:
+            collected_metrics.set_zk_data(zk_last_cpu_data, str(cpu_data_csv).encode('utf8'))
+            collected_metrics.set_zk_data(zk_last_time_path, str(current_time).encode('utf8'))
+        else:
+            with ZookeeperPool() as zk:
+                zk.ensure_path(zk_last_cpu_data)
+                zk.ensure_path(zk_last_time_path)
+                zk.set(zk_last_cpu_data, str(cpu_data_csv).encode('utf8'))
+                zk.set(zk_last_time_path, str(current_time).encode('utf8'))
 
     utilization = {}
     for datum in last_cpu_data:
@@ -553,6 +1012,7 @@ def get_utilization(
     log_utilization_data,
     marathon_tasks,
     mesos_tasks,
+    collected_metrics=None,
 ):
     autoscaling_metrics_provider = get_service_metrics_provider(autoscaling_params[SERVICE_METRICS_PROVIDER_KEY])
 
@@ -562,6 +1022,7 @@ def get_utilization(
         marathon_tasks=marathon_tasks,
         mesos_tasks=mesos_tasks,
         log_utilization_data=log_utilization_data,
+        collected_metrics=collected_metrics,
         **autoscaling_params,
     )
 
@@ -577,87 +1038,94 @@ def autoscale_marathon_instance(
     system_paasta_config: SystemPaastaConfig,
     marathon_tasks: Sequence[MarathonTask],
     mesos_tasks: Sequence[Task],
+    collected_metrics: Optional[AutoscalingMetricsCollection] = None,
 ) -> None:
     try:
         with create_autoscaling_lock(marathon_service_config.service, marathon_service_config.instance):
-            current_instances = marathon_service_config.get_instances()
-            task_data_insufficient = is_task_data_insufficient(
-                marathon_service_config=marathon_service_config,
-                marathon_tasks=marathon_tasks,
-                current_instances=current_instances,
-            )
-            autoscaling_params = marathon_service_config.get_autoscaling_params()
-            log_utilization_data: Mapping = {}
-            utilization = get_utilization(
-                marathon_service_config=marathon_service_config,
-                system_paasta_config=system_paasta_config,
-                autoscaling_params=autoscaling_params,
-                log_utilization_data=log_utilization_data,
-                marathon_tasks=marathon_tasks,
-                mesos_tasks=mesos_tasks,
-            )
-            error = get_error_from_utilization(
-                utilization=utilization,
-                setpoint=autoscaling_params['setpoint'],
-                current_instances=current_instances,
-            )
-            new_instance_count = get_new_instance_count(
-                utilization=utilization,
-                error=error,
-                autoscaling_params=autoscaling_params,
-                current_instances=current_instances,
-                marathon_service_config=marathon_service_config,
-                num_healthy_instances=len(marathon_tasks),
-            )
+            try:
+                current_instances = marathon_service_config.get_instances()
+                task_data_insufficient = is_task_data_insufficient(
+                    marathon_service_config=marathon_service_config,
+                    marathon_tasks=marathon_tasks,
+                    current_instances=current_instances,
+                )
+                autoscaling_params = marathon_service_config.get_autoscaling_params()
+                log_utilization_data: Mapping = {}
+                utilization = get_utilization(
+                    marathon_service_config=marathon_service_config,
+                    system_paasta_config=system_paasta_config,
+                    autoscaling_params=autoscaling_params,
+                    log_utilization_data=log_utilization_data,
+                    marathon_tasks=marathon_tasks,
+                    mesos_tasks=mesos_tasks,
+                    collected_metrics=collected_metrics,
+                )
+                error = get_error_from_utilization(
+                    utilization=utilization,
+                    setpoint=autoscaling_params['setpoint'],
+                    current_instances=current_instances,
+                )
+                new_instance_count = get_new_instance_count(
+                    utilization=utilization,
+                    error=error,
+                    autoscaling_params=autoscaling_params,
+                    current_instances=current_instances,
+                    marathon_service_config=marathon_service_config,
+                    num_healthy_instances=len(marathon_tasks),
+                )
+
+                safe_downscaling_threshold = int(current_instances * 0.7)
+                if new_instance_count != current_instances:
+                    if new_instance_count < current_instances and task_data_insufficient:
+                        write_to_log(
+                            config=marathon_service_config,
+                            line='Delaying scaling *down* as we found too few healthy tasks running in marathon. '
+                                 'This can happen because tasks are delayed/waiting/unhealthy or because we are '
+                                 'waiting for tasks to be killed. Will wait for sufficient healthy tasks before '
+                                 'we make a decision to scale down.',
+                        )
+                        return
+                    if new_instance_count == safe_downscaling_threshold:
+                        write_to_log(
+                            config=marathon_service_config,
+                            line='Autoscaler clamped: %s' % str(log_utilization_data),
+                            level='debug',
+                        )
 
-            safe_downscaling_threshold = int(current_instances * 0.7)
-            if new_instance_count != current_instances:
-                if new_instance_count < current_instances and task_data_insufficient:
                     write_to_log(
                         config=marathon_service_config,
-                        line='Delaying scaling *down* as we found too few healthy tasks running in marathon. '
-                             'This can happen because tasks are delayed/waiting/unhealthy or because we are '
-                             'waiting for tasks to be killed. Will wait for sufficient healthy tasks before '
-                             'we make a decision to scale down.',
+                        line='Scaling from %d to %d instances (%s)' % (
+                            current_instances, new_instance_count, humanize_error(error),
+                        ),
                     )
-                    return
-                if new_instance_count == safe_downscaling_threshold:
+                    set_instances_for_marathon_service(
+                        service=marathon_service_config.service,
+                        instance=marathon_service_config.instance,
+                        instance_count=new_instance_count,
+                    )
+                else:
                     write_to_log(
                         config=marathon_service_config,
-                        line='Autoscaler clamped: %s' % str(log_utilization_data),
+                        line='Staying at %d instances (%s)' % (current_instances, humanize_error(error)),
                         level='debug',
                     )
-
-                write_to_log(
-                    config=marathon_service_config,
-                    line='Scaling from %d to %d instances (%s)' % (
-                        current_instances, new_instance_count, humanize_error(error),
-                    ),
-                )
-                set_instances_for_marathon_service(
-                    service=marathon_service_config.service,
-                    instance=marathon_service_config.instance,
-                    instance_count=new_instance_count,
-                )
-            else:
-                write_to_log(
-                    config=marathon_service_config,
-                    line='Staying at %d instances (%s)' % (current_instances, humanize_error(error)),
-                    level='debug',
-                )
-            meteorite_dims = {
-                'service_name': marathon_service_config.service,
-                'decision_policy': autoscaling_params[DECISION_POLICY_KEY],  # type: ignore
-                'paasta_cluster': marathon_service_config.cluster,
-                'instance_name': marathon_service_config.instance,
-            }
-            if yelp_meteorite:
-                gauge = yelp_meteorite.create_gauge('paasta.service.instances', meteorite_dims)
-                gauge.set(new_instance_count)
-                gauge = yelp_meteorite.create_gauge('paasta.service.max_instances', meteorite_dims)
-                gauge.set(marathon_service_config.get_max_instances())
-                gauge = yelp_meteorite.create_gauge('paasta.service.min_instances', meteorite_dims)
-                gauge.set(marathon_service_config.get_min_instances())
+                meteorite_dims = {
+                    'service_name': marathon_service_config.service,
+                    'decision_policy': autoscaling_params[DECISION_POLICY_KEY],  # type: ignore
+                    'paasta_cluster': marathon_service_config.cluster,
+                    'instance_name': marathon_service_config.instance,
+                }
+                if yelp_meteorite:
+                    gauge = yelp_meteorite.create_gauge('paasta.service.instances', meteorite_dims)
+                    gauge.set(new_instance_count)
+                    gauge = yelp_meteorite.create_gauge('paasta.service.max_instances', meteorite_dims)
+                    gauge.set(marathon_service_config.get_max_instances())
+                    gauge = yelp_meteorite.create_gauge('paasta.service.min_instances', meteorite_dims)
+                    gauge.set(marathon_service_config.get_min_instances())
+            finally:
+                if collected_metrics is not None:
+                    # The autoscaling state of the service instance has to be written before the lock is let go of
+                    collected_metrics.flush()
     except LockHeldException:
         log.warning("Skipping autoscaling run for {service}.{instance} because the lock is held".format(
             service=marathon_service_config.service,
@@ -738,50 +1206,96 @@ def autoscale_service_configs(
     marathon_clients = get_marathon_clients(get_marathon_servers(system_paasta_config))
     apps_with_clients = get_marathon_apps_with_clients(marathon_clients.get_all_clients(), embed_tasks=True)
     all_mesos_tasks = a_sync.block(get_all_running_tasks)
-    with ZookeeperPool():
+    task_index = AutoscalingTaskIndex([app for (app, client) in apps_with_clients], all_mesos_tasks)
+    with ZookeeperPool() as zk:
+        configs_with_tasks = []
         for config in service_configs:
             try:
-                marathon_tasks, mesos_tasks = filter_autoscaling_tasks(
-                    [app for (app, client) in apps_with_clients],
-                    all_mesos_tasks,
-                    config,
-                )
+                healthy_marathon_tasks, mesos_tasks = task_index.filter_autoscaling_tasks(config)
+            except Exception as e:
+                write_to_log(config=config, line='Caught Exception %s' % e)
+            else:
+                configs_with_tasks.append((config, list(healthy_marathon_tasks.values()), mesos_tasks))
+
+        # Collect the metrics of every service instance first, then decide how to scale each of them
+        collected_metrics = AutoscalingMetricsCollection(zk)
+        collected_metrics.collect(configs_with_tasks)
+        for config, marathon_tasks, mesos_tasks in configs_with_tasks:
+            try:
                 autoscale_marathon_instance(
                     config,
                     system_paasta_config,
-                    list(marathon_tasks.values()),
+                    marathon_tasks,
                     mesos_tasks,
+                    collected_metrics=collected_metrics,
                 )
             except Exception as e:
                 write_to_log(config=config, line='Caught Exception %s' % e)
 
 
-def filter_autoscaling_tasks(
-    marathon_apps: Sequence[MarathonApp],
-    all_mesos_tasks: Sequence[Task],
-    config: MarathonServiceConfig,
-) -> Tuple[Mapping[str, MarathonTask], Sequence[Task]]:
-    job_id_prefix = "{}{}".format(format_job_id(service=config.service, instance=config.instance), MESOS_TASK_SPACER)
-
-    # Get a dict of healthy tasks, we assume tasks with no healthcheck defined
-    # are healthy. We assume tasks with no healthcheck results but a defined
-    # healthcheck to be unhealthy (unless they are "old" in which case we
-    # assume that marathon has screwed up and stopped healthchecking but that
-    # they are healthy
-    log.info("Inspecting %s for autoscaling" % job_id_prefix)
-    marathon_tasks = {}
-    for app in marathon_apps:
-        for task in app.tasks:
+AppTask = Tuple[MarathonTask, MarathonApp]
+
+
+class AutoscalingTaskIndex:
+    """Indexes the tasks of a cluster, so that the tasks of each autoscaled service
+    instance can be looked up without going through every task in the cluster.
+
+    Marathon tasks are grouped by their short job id (service.instance), mesos tasks
+    are keyed by their id. Building the index is O(all tasks), after which
+    :meth:`filter_autoscaling_tasks` is O(the service instance's own tasks).
+    """
+
+    def __init__(
+        self,
+        marathon_apps: Sequence[MarathonApp],
+        all_mesos_tasks: Sequence[Task],
+    ) -> None:
+        self.marathon_tasks_by_short_job_id: DefaultDict[str, List[AppTask]] = defaultdict(list)
+        for app in marathon_apps:
+            for task in app.tasks:
+                self.marathon_tasks_by_short_job_id[get_short_job_id(task.id)].append((task, app))
+        self.mesos_tasks_by_id: Dict[str, Task] = {task['id']: task for task in all_mesos_tasks}
+
+    def filter_autoscaling_tasks(
+        self,
+        config: MarathonServiceConfig,
+    ) -> Tuple[Mapping[str, MarathonTask], Sequence[Task]]:
+        job_id_prefix = "{}{}".format(
+            format_job_id(service=config.service, instance=config.instance), MESOS_TASK_SPACER,
+        )
+
+        # Get a dict of healthy tasks, we assume tasks with no healthcheck defined
+        # are healthy. We assume tasks with no healthcheck results but a defined
+        # healthcheck to be unhealthy (unless they are "old" in which case we
+        # assume that marathon has screwed up and stopped healthchecking but that
+        # they are healthy
+        log.info("Inspecting %s for autoscaling" % job_id_prefix)
+        marathon_tasks = {}
+        # The prefix check still applies, as instance names with a dot in them share
+        # the short job id of a shorter instance name.
+        for task, app in self.marathon_tasks_by_short_job_id.get(get_short_job_id(job_id_prefix), []):
             if task.id.startswith(job_id_prefix) and (
                 is_task_healthy(task) or not
                 app.health_checks or is_old_task_missing_healthchecks(task, app)
             ):
                 marathon_tasks[task.id] = task
 
-    if not marathon_tasks:
-        raise MetricsProviderNoDataError("Couldn't find any healthy marathon tasks")
-    mesos_tasks = [task for task in all_mesos_tasks if task['id'] in marathon_tasks]
-    return (marathon_tasks, mesos_tasks)
+        if not marathon_tasks:
+            raise MetricsProviderNoDataError("Couldn't find any healthy marathon tasks")
+        mesos_tasks = [
+            self.mesos_tasks_by_id[task_id] for task_id in marathon_tasks if task_id in self.mesos_tasks_by_id
+        ]
+        return (marathon_tasks, mesos_tasks)
+
+
+def filter_autoscaling_tasks(
+    marathon_apps: Sequence[MarathonApp],
+    all_mesos_tasks: Sequence[Task],
+    config: MarathonServiceConfig,
+) -> Tuple[Mapping[str, MarathonTask], Sequence[Task]]:
+    """Returns the healthy marathon tasks of a service instance, and their mesos tasks.
+    Use an :class:`AutoscalingTaskIndex` when doing this for many service instances."""
+    return AutoscalingTaskIndex(marathon_apps, all_mesos_tasks).filter_autoscaling_tasks(config)
 
 
 def write_to_log(config, line, level='event'):
@@ -805,16 +1319,14 @@ def create_autoscaling_lock(service: str, instance: str) -> Iterator[None]:
     to avoid autoscaling a service multiple times, and to avoid
     having multiple paasta services all attempting to autoscale and
     fetching mesos data."""
-    zk = KazooClient(hosts=load_system_paasta_config().get_zk_hosts(), timeout=ZK_LOCK_CONNECT_TIMEOUT_S)
-    zk.start()
-    lock = zk.Lock(f'/autoscaling/{service}/{instance}/autoscaling.lock')
-    try:
-        lock.acquire(timeout=1)  # timeout=0 throws some other strange exception
-        yield
-    except LockTimeout:
-        raise LockHeldException(f"Failed to acquire lock for autoscaling! {service}.{instance}")
-    else:
-        lock.release()
-    finally:
-        zk.stop()
-        zk.close()
+    with ZookeeperPool() as zk:
+        lock = zk.Lock(f'/autoscaling/{service}/{instance}/autoscaling.lock')
+        try:
+            lock.acquire(timeout=1)  # timeout=0 throws some other strange exception
+        except LockTimeout:
+            raise LockHeldException(f"Failed to acquire lock for autoscaling! {service}.{instance}")
+        try:
+            yield
+        finally:
+            # The client is shared, so the lock has to be let go of even if scaling failed
+            lock.release()
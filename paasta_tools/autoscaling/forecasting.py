@@ -1,9 +1,15 @@
+import numpy as np
+
 from paasta_tools.autoscaling.utils import get_autoscaling_component
 from paasta_tools.autoscaling.utils import register_autoscaling_component
 
 
 FORECAST_POLICY_KEY = 'forecast_policy'
 
+# Historical load is kept as a structured array of (timestamp, load) records, laid out the same way as the
+# records serialized with struct format 'dd', so it can be decoded without copying.
+HISTORICAL_LOAD_DTYPE = np.dtype([('timestamp', 'd'), ('load', 'd')])
+
 
 def get_forecast_policy(name):
     """
@@ -13,26 +19,56 @@ def get_forecast_policy(name):
     return get_autoscaling_component(name, FORECAST_POLICY_KEY)
 
 
+def to_historical_load_array(historical_load):
+    """Returns historical_load as a HISTORICAL_LOAD_DTYPE array.
+
+    :param historical_load: a HISTORICAL_LOAD_DTYPE array, or a list of (timestamp, value)s
+    """
+    if isinstance(historical_load, np.ndarray):
+        return historical_load
+    return np.array([tuple(datapoint) for datapoint in historical_load], dtype=HISTORICAL_LOAD_DTYPE)
+
+
+def append_historical_load(historical_load, timestamp, value):
+    """Returns a copy of historical_load, as a HISTORICAL_LOAD_DTYPE array, with another datapoint at the end."""
+    return np.append(
+        to_historical_load_array(historical_load),
+        np.array([(timestamp, value)], dtype=HISTORICAL_LOAD_DTYPE),
+    )
+
+
+def sequential_sum(values):
+    """Sums values in order, like the builtin sum() does. numpy's sum() adds pairwise, which can round differently,
+    and the forecasts shouldn't change just because they got vectorized."""
+    if len(values) == 0:
+        return 0.0
+    return float(np.cumsum(values)[-1])
+
+
 @register_autoscaling_component('current', FORECAST_POLICY_KEY)
 def current_value_forecast_policy(historical_load, **kwargs):
     """A prediction policy that assumes that the value any time in the future will be the same as the current value.
 
     :param historical_load: a list of (timestamp, value)s, where timestamp is a unix timestamp and value is load.
     """
-    return historical_load[-1][1]
+    return float(to_historical_load_array(historical_load)['load'][-1])
 
 
 def window_historical_load(historical_load, window_begin, window_end):
     """Filter historical_load down to just the datapoints lying between times window_begin and window_end, inclusive."""
-    filtered = []
-    for timestamp, value in historical_load:
-        if timestamp >= window_begin and timestamp <= window_end:
-            filtered.append((timestamp, value))
-    return filtered
+    historical_load = to_historical_load_array(historical_load)
+    timestamps = historical_load['timestamp']
+    if np.all(timestamps[1:] >= timestamps[:-1]):
+        begin = np.searchsorted(timestamps, window_begin, side='left')
+        end = np.searchsorted(timestamps, window_end, side='right')
+        return historical_load[begin:end]
+    # Only happens if the clock went backwards at some point
+    return historical_load[(timestamps >= window_begin) & (timestamps <= window_end)]
 
 
 def trailing_window_historical_load(historical_load, window_size):
-    window_end, _ = historical_load[-1]
+    historical_load = to_historical_load_array(historical_load)
+    window_end = historical_load['timestamp'][-1]
     window_begin = window_end - window_size
     return window_historical_load(historical_load, window_begin, window_end)
 
@@ -42,9 +78,8 @@ def moving_average_forecast_policy(historical_load, moving_average_window_second
     """Does a simple average of all historical load data points within the moving average window. Weights all data
     points within the window equally."""
 
-    windowed_data = trailing_window_historical_load(historical_load, moving_average_window_seconds)
-    windowed_values = [value for timestamp, value in windowed_data]
-    return sum(windowed_values) / len(windowed_values)
+    windowed_values = trailing_window_historical_load(historical_load, moving_average_window_seconds)['load']
+    return sequential_sum(windowed_values) / len(windowed_values)
 
 
 @register_autoscaling_component('linreg', FORECAST_POLICY_KEY)
@@ -66,16 +101,18 @@ def linreg_forecast_policy(
 
     """
 
+    historical_load = to_historical_load_array(historical_load)
     window = trailing_window_historical_load(historical_load, linreg_window_seconds)
 
-    loads = [load for timestamp, load in window]
-    times = [timestamp for timestamp, load in window]
+    loads = window['load']
+    times = window['timestamp']
 
-    mean_time = sum(times) / len(times)
-    mean_load = sum(loads) / len(loads)
+    mean_time = sequential_sum(times) / len(times)
+    mean_load = sequential_sum(loads) / len(loads)
 
     if len(window) > 1:
-        slope = sum((t - mean_time) * (l - mean_load) for t, l in window) / sum((t - mean_time) ** 2 for t in times)
+        time_deltas = times - mean_time
+        slope = sequential_sum(time_deltas * (loads - mean_load)) / sequential_sum(time_deltas ** 2)
     else:
         slope = linreg_default_slope
 
@@ -87,6 +124,32 @@ def linreg_forecast_policy(
     if isinstance(linreg_extrapolation_seconds, (int, float)):
         linreg_extrapolation_seconds = [linreg_extrapolation_seconds]
 
-    now, _ = historical_load[-1]
+    now = float(historical_load['timestamp'][-1])
     forecasted_values = [predict(now + delta) for delta in linreg_extrapolation_seconds]
     return max(forecasted_values)
+
+
+@register_autoscaling_component('exponential_smoothing', FORECAST_POLICY_KEY)
+def exponential_smoothing_forecast_policy(historical_load, exponential_smoothing_half_life_seconds=600, **kwargs):
+    """Does a weighted average of all historical load data points, where the weight of a data point halves every
+    exponential_smoothing_half_life_seconds it is older than the most recent one. Reacts to changes in load faster than
+    a moving average does, while still smoothing out short spikes.
+
+    :param exponential_smoothing_half_life_seconds: How many seconds it takes for the weight of a data point to halve.
+    """
+    historical_load = to_historical_load_array(historical_load)
+    ages = historical_load['timestamp'][-1] - historical_load['timestamp']
+    weights = np.exp2(-ages / exponential_smoothing_half_life_seconds)
+    return sequential_sum(weights * historical_load['load']) / sequential_sum(weights)
+
+
+@register_autoscaling_component('percentile', FORECAST_POLICY_KEY)
+def percentile_forecast_policy(historical_load, percentile_window_seconds=1800, percentile=95, **kwargs):
+    """Returns a percentile of the historical load data points within the window, so that capacity is planned for
+    the load peaks of the recent past rather than its average.
+
+    :param percentile_window_seconds: Consider all data from this many seconds ago until now.
+    :param percentile: The percentile (0-100) of the load within the window to forecast.
+    """
+    windowed_values = trailing_window_historical_load(historical_load, percentile_window_seconds)['load']
+    return float(np.percentile(windowed_values, percentile))
@@ -14,18 +14,33 @@
 # limitations under the License.
 """PaaSTA log reader for humans"""
 import argparse
+import bisect
 import datetime
+import decimal
+import fnmatch
+import glob
+import gzip
+import heapq
+import itertools
 import logging
+import os
 import re
 import sys
+from collections import deque
 from collections import namedtuple
 from contextlib import contextmanager
-from multiprocessing import Process
-from multiprocessing import Queue
+from functools import lru_cache
+from functools import partial
 from queue import Empty
+from queue import Full
+from queue import Queue
+from threading import Event
+from threading import Thread
 from time import sleep
-from typing import Any
+from typing import Callable
 from typing import Dict
+from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import Set
 
@@ -51,6 +66,7 @@ from paasta_tools.cli.utils import guess_service_name
 from paasta_tools.cli.utils import lazy_choices_completer
 from paasta_tools.utils import list_services
 from paasta_tools.utils import ANY_CLUSTER
+from paasta_tools.utils import ANY_INSTANCE
 from paasta_tools.utils import datetime_convert_timezone
 from paasta_tools.utils import datetime_from_utc_to_local
 from paasta_tools.utils import DEFAULT_LOGLEVEL
@@ -203,6 +219,139 @@ def check_timestamp_in_range(timestamp, start_time, end_time):
         return True
 
 
+# Timestamps the way format_log_line writes them, e.g. 2016-06-08T06:31:52.706609135Z
+LOG_TIMESTAMP_RE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d+))?(Z?)$')
+MICROSECOND = decimal.Decimal('.000001')
+
+
+@lru_cache(maxsize=4096)
+def _parse_log_timestamp_seconds(year, month, day, hour, minute, second, utc):
+    return datetime.datetime(
+        int(year), int(month), int(day), int(hour), int(minute), int(second),
+        tzinfo=isodate.UTC if utc else None,
+    )
+
+
+def parse_log_timestamp(timestamp):
+    """Parses the timestamp of a log line into the same datetime isodate.parse_datetime would, without going
+    through isodate's regexes for the timestamps format_log_line writes. Lines in the same second share the work
+    of building their datetime.
+
+    :raises ValueError: if the timestamp isn't a valid ISO 8601 timestamp
+    """
+    if not isinstance(timestamp, str):
+        raise ValueError(f'Invalid timestamp: {timestamp!r}')
+    match = LOG_TIMESTAMP_RE.match(timestamp)
+    if match is None:
+        return isodate.parse_datetime(timestamp)
+    year, month, day, hour, minute, second, fraction, utc = match.groups()
+    microsecond = 0
+    if fraction:
+        if len(fraction) <= 6:
+            microsecond = int(fraction.ljust(6, '0'))
+        else:
+            # isodate rounds more precise fractions to microseconds, half to even
+            microsecond = int(decimal.Decimal('0.' + fraction).quantize(MICROSECOND) * 1000000)
+            if microsecond == 1000000:
+                return isodate.parse_datetime(timestamp)
+    return _parse_log_timestamp_seconds(year, month, day, hour, minute, second, utc).replace(microsecond=microsecond)
+
+
+_UNDECODED = object()
+
+
+class LogRecord:
+    """A line of a paasta log stream, decoded as it is needed and at most once, so filtering, sorting and printing
+    it all share the work.
+
+    :param raw_line: The JSON encoded log line
+    """
+    __slots__ = ('raw_line', '_fields', '_timestamp')
+
+    def __init__(self, raw_line):
+        self.raw_line = raw_line
+        self._fields = _UNDECODED
+        self._timestamp = _UNDECODED
+
+    @property
+    def fields(self):
+        """The decoded log line, or None if it isn't valid JSON."""
+        if self._fields is _UNDECODED:
+            try:
+                self._fields = json.loads(self.raw_line)
+            except ValueError:
+                log.debug('Trouble parsing line as json. Skipping. Line: %r' % self.raw_line)
+                self._fields = None
+        return self._fields
+
+    def get(self, key, default=None):
+        return self.fields.get(key, default)
+
+    @property
+    def timestamp(self):
+        """The parsed timestamp of the log line.
+
+        :raises ValueError: if the timestamp isn't a valid ISO 8601 timestamp
+        """
+        if self._timestamp is _UNDECODED:
+            try:
+                self._timestamp = parse_log_timestamp(self.fields.get('timestamp'))
+            except ValueError as e:
+                self._timestamp = e
+        if isinstance(self._timestamp, ValueError):
+            raise self._timestamp
+        return self._timestamp
+
+    @property
+    def sort_key(self):
+        """The timestamp of the log line as a naive UTC datetime (timestamps without a timezone are taken to be UTC),
+        or the earliest datetime if it has none. Unlike timezone aware ones, these compare without calling back into
+        Python."""
+        try:
+            return to_naive_utc(self.timestamp)
+        except ValueError:
+            return datetime.datetime.min
+
+
+def to_naive_utc(timestamp):
+    """Returns a datetime as a naive UTC one, taking naive ones to be UTC already."""
+    if timestamp.tzinfo:
+        timestamp = timestamp.astimezone(pytz.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def to_log_record(line):
+    if isinstance(line, LogRecord):
+        return line
+    return LogRecord(line)
+
+
+# Values made of these characters come out of JSON encoding unchanged, except for slashes which ujson escapes
+PREFILTERABLE_RE = re.compile(r'^[A-Za-z0-9_.:/ -]+$')
+
+
+@lru_cache(maxsize=64)
+def _get_prefilter_needles(values):
+    """Returns the substrings at least one of which a JSON encoded line must contain to have a field set to one of
+    values, or None if there's no telling."""
+    if not all(isinstance(value, str) and PREFILTERABLE_RE.match(value) for value in values):
+        return None
+    needles = set(values)
+    needles.update(value.replace('/', '\\/') for value in values)
+    return tuple(needles)
+
+
+def line_may_contain_any(raw_line, values):
+    """Cheaply checks whether the JSON encoded raw_line could have a field set to one of values, before going to the
+    trouble of decoding it. Only returns False when it certainly doesn't."""
+    if values is None:
+        return True
+    needles = _get_prefilter_needles(tuple(values))
+    if needles is None:
+        return True
+    return any(needle in raw_line for needle in needles)
+
+
 def paasta_log_line_passes_filter(
     line,
     levels,
@@ -213,26 +362,30 @@ def paasta_log_line_passes_filter(
     start_time=None,
     end_time=None,
 ):
-    """Given a (JSON-formatted) log line, return True if the line should be
+    """Given a (JSON-formatted) log line, or its LogRecord, return True if the line should be
     displayed given the provided levels, components, and clusters; return False
     otherwise.
     """
-    try:
-        parsed_line = json.loads(line)
-    except ValueError:
-        log.debug('Trouble parsing line as json. Skipping. Line: %r' % line)
+    record = to_log_record(line)
+    if not (
+        line_may_contain_any(record.raw_line, levels) and
+        line_may_contain_any(record.raw_line, components) and
+        line_may_contain_any(record.raw_line, list(clusters) + [ANY_CLUSTER]) and
+        line_may_contain_any(record.raw_line, instances)
+    ):
+        return False
+    if record.fields is None:
         return False
 
-    timestamp = isodate.parse_datetime(parsed_line.get('timestamp'))
-    if not check_timestamp_in_range(timestamp, start_time, end_time):
+    if not check_timestamp_in_range(record.timestamp, start_time, end_time):
         return False
     return (
-        parsed_line.get('level') in levels and
-        parsed_line.get('component') in components and (
-            parsed_line.get('cluster') in clusters or
-            parsed_line.get('cluster') == ANY_CLUSTER
+        record.get('level') in levels and
+        record.get('component') in components and (
+            record.get('cluster') in clusters or
+            record.get('cluster') == ANY_CLUSTER
         ) and
-        (instances is None or parsed_line.get('instance') in instances)
+        (instances is None or record.get('instance') in instances)
     )
 
 
@@ -246,24 +399,28 @@ def paasta_app_output_passes_filter(
     start_time=None,
     end_time=None,
 ):
-    try:
-        parsed_line = json.loads(line)
-    except ValueError:
-        log.debug('Trouble parsing line as json. Skipping. Line: %r' % line)
+    record = to_log_record(line)
+    if not (
+        line_may_contain_any(record.raw_line, components) and
+        line_may_contain_any(record.raw_line, list(clusters) + [ANY_CLUSTER]) and
+        line_may_contain_any(record.raw_line, instances)
+    ):
+        return False
+    if record.fields is None:
         return False
     try:
-        timestamp = isodate.parse_datetime(parsed_line.get('timestamp'))
+        timestamp = record.timestamp
     # https://github.com/gweis/isodate/issues/53
     except ValueError:
         return True
     if not check_timestamp_in_range(timestamp, start_time, end_time):
         return False
     return (
-        parsed_line.get('component') in components and (
-            parsed_line.get('cluster') in clusters or
-            parsed_line.get('cluster') == ANY_CLUSTER
+        record.get('component') in components and (
+            record.get('cluster') in clusters or
+            record.get('cluster') == ANY_CLUSTER
         ) and
-        (instances is None or parsed_line.get('instance') in instances)
+        (instances is None or record.get('instance') in instances)
     )
 
 
@@ -320,6 +477,12 @@ def parse_chronos_log_line(line, clusters, service):
         )
 
 
+def marathon_log_line_prefilter(line, service):
+    """Given a raw line of a Marathon log, return False if it certainly isn't about the provided
+    service, before going to the trouble of parsing it."""
+    return line_may_contain_any(line, [format_job_id(service, '')])
+
+
 def marathon_log_line_passes_filter(
     line,
     levels,
@@ -333,16 +496,20 @@ def marathon_log_line_passes_filter(
     """Given a (JSON-formatted) log line where the message is a Marathon log line,
     return True if the line should be displayed given the provided service; return False
     otherwise."""
-    try:
-        parsed_line = json.loads(line)
-    except ValueError:
-        log.debug('Trouble parsing line as json. Skipping. Line: %r' % line)
+    record = to_log_record(line)
+    job_id = format_job_id(service, '')
+    if not line_may_contain_any(record.raw_line, [job_id]) or record.fields is None:
         return False
 
-    timestamp = isodate.parse_datetime(parsed_line.get('timestamp'))
-    if not check_timestamp_in_range(timestamp, start_time, end_time):
+    if not check_timestamp_in_range(record.timestamp, start_time, end_time):
         return False
-    return format_job_id(service, '') in parsed_line.get('message', '')
+    return job_id in record.get('message', '')
+
+
+def chronos_log_line_prefilter(line, service):
+    """Given a raw line of a Chronos log, return False if it certainly isn't about the provided
+    service, before going to the trouble of parsing it."""
+    return line_may_contain_any(line, [chronos_tools.compose_job_id(service, '')])
 
 
 def chronos_log_line_passes_filter(
@@ -358,33 +525,174 @@ def chronos_log_line_passes_filter(
     """Given a (JSON-formatted) log line where the message is a Marathon log line,
     return True if the line should be displayed given the provided service; return False
     otherwise."""
-    try:
-        parsed_line = json.loads(line)
-    except ValueError:
-        log.debug('Trouble parsing line as json. Skipping. Line: %r' % line)
+    record = to_log_record(line)
+    job_id = chronos_tools.compose_job_id(service, '')
+    if not line_may_contain_any(record.raw_line, [job_id]) or record.fields is None:
         return False
 
-    timestamp = isodate.parse_datetime(parsed_line.get('timestamp'))
-    if not check_timestamp_in_range(timestamp, start_time, end_time):
+    if not check_timestamp_in_range(record.timestamp, start_time, end_time):
+        return False
+    return job_id in record.get('message', '')
+
+
+def filter_log_lines(
+    lines,
+    levels,
+    service,
+    components,
+    clusters,
+    instances,
+    filter_fn,
+    parse_fn=None,
+    prefilter_fn=None,
+    start_time=None,
+    end_time=None,
+):
+    """Yields the LogRecords of the lines of a log stream that should be displayed. Every line goes through
+    prefilter_fn as it is, then through parse_fn to turn it into a paasta log line, and then through filter_fn as a
+    LogRecord, so it is decoded once for filtering, sorting and printing.
+
+    :param lines: The lines of the log stream, as strings or bytes
+    :param filter_fn: One of the *_passes_filter functions, or None to yield every line
+    :param parse_fn: One of the parse_*_log_line functions, for streams that aren't paasta logs
+    :param prefilter_fn: One of the *_prefilter functions, for streams that aren't paasta logs
+    """
+    for line in lines:
+        # temporary until all log lines are strings not byte strings
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if prefilter_fn is not None and not prefilter_fn(line, service):
+            continue
+        if parse_fn is not None:
+            line = parse_fn(line, clusters, service)
+        record = LogRecord(line)
+        if filter_fn is None or filter_fn(
+            record, levels, service, components, clusters,
+            instances, start_time=start_time, end_time=end_time,
+        ):
+            yield record
+
+
+# How many tailed lines can wait to be printed before the tailers stop reading
+TAIL_QUEUE_SIZE = 10000
+# How many tailed lines are printed at once, at most
+TAIL_PRINT_BATCH_SIZE = 500
+# How long to wait for tailed lines before checking on the tailers
+TAIL_QUEUE_TIMEOUT = 0.1
+# How many lines of a stream can come before a line that was logged earlier than them and still be printed in order
+LOG_REORDER_WINDOW = 1000
+# How many filtered lines of each stream can wait to be printed, before its reader stops reading
+LOG_STREAM_BUFFER_SIZE = 1000
+
+
+def reorder_log_records(records, window=LOG_REORDER_WINDOW):
+    """Yields records sorted by time, given records that are in order except for lines no more than window lines
+    too late. The lines of a log stream come from many hosts, so they are only in order give or take a few of them.
+    """
+    heap = []
+    for seq, record in enumerate(records):
+        heapq.heappush(heap, (record.sort_key, seq, record))
+        if len(heap) > window:
+            yield heapq.heappop(heap)[2]
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+
+class _LogStreamError:
+    def __init__(self, exception):
+        self.exception = exception
+
+
+_END_OF_LOG_STREAM = object()
+
+
+def _read_log_stream(read, buffer, stop):
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
         return False
-    return chronos_tools.compose_job_id(service, '') in parsed_line.get('message', '')
+
+    try:
+        for record in reorder_log_records(read(), LOG_REORDER_WINDOW):
+            if not put(record):
+                return
+    except Exception as e:
+        put(_LogStreamError(e))
+    finally:
+        put(_END_OF_LOG_STREAM)
+
+
+def _drain_log_stream(buffer):
+    while True:
+        item = buffer.get()
+        if item is _END_OF_LOG_STREAM:
+            return
+        if isinstance(item, _LogStreamError):
+            raise item.exception
+        yield item
+
+
+def merge_log_streams(
+    streams: Iterable[Callable[[], Iterable[LogRecord]]],
+    buffer_size: int = LOG_STREAM_BUFFER_SIZE,
+) -> Iterator[LogRecord]:
+    """Yields the records of several log streams, merged in time order as they are read.
+
+    Every stream is read by its own thread, which stops reading while buffer_size of its records wait to be merged,
+    so output starts as soon as every stream has something to show and memory use doesn't grow with the number of
+    lines read. An exception raised while reading a stream is raised again here.
+
+    :param streams: Functions reading a log stream, returning its records in about the order they were logged
+    :param buffer_size: How many records of each stream can wait to be merged
+    """
+    stop = Event()
+    buffers = []
+    for read in streams:
+        buffer: Queue = Queue(maxsize=buffer_size)
+        Thread(target=_read_log_stream, args=(read, buffer, stop), daemon=True).start()
+        buffers.append(buffer)
+    try:
+        yield from heapq.merge(*[_drain_log_stream(buffer) for buffer in buffers], key=lambda record: record.sort_key)
+    finally:
+        # Don't leave the readers blocked on full buffers when we stop early
+        stop.set()
 
 
 def print_log(line, requested_levels, raw_mode=False):
     """Mostly a stub to ease testing. Eventually this may do some formatting or
     something.
+
+    :param line: The log line, or its LogRecord
     """
     if raw_mode:
-        paasta_print(line, end=' ')  # suppress trailing newline since scribereader already attached one
+        # suppress trailing newline since scribereader already attached one
+        paasta_print(line.raw_line if isinstance(line, LogRecord) else line, end=' ')
     else:
         paasta_print(prettify_log_line(line, requested_levels))
 
 
+def print_logs(lines, requested_levels, raw_mode=False):
+    """Prints a batch of log lines, or their LogRecords, with a single write."""
+    if not lines:
+        return
+    if raw_mode:
+        # Like print_log, which doesn't add newlines since scribereader already attached them
+        paasta_print(*[line.raw_line if isinstance(line, LogRecord) else line for line in lines], end=' ')
+    else:
+        paasta_print('\n'.join(prettify_log_line(line, requested_levels) for line in lines))
+
+
 def prettify_timestamp(timestamp):
     """Returns more human-friendly form of 'timestamp' without microseconds and
     in local time.
+
+    :param timestamp: An ISO 8601 timestamp, or the datetime it was parsed into
     """
-    dt = isodate.parse_datetime(timestamp)
+    dt = timestamp if isinstance(timestamp, datetime.datetime) else parse_log_timestamp(timestamp)
     pretty_timestamp = datetime_from_utc_to_local(dt)
     return pretty_timestamp.strftime("%Y-%m-%d %H:%M:%S")
 
@@ -417,26 +725,28 @@ def prettify_level(level, requested_levels):
 def prettify_log_line(line, requested_levels):
     """Given a line from the log, which is expected to be JSON and have all the
     things we expect, return a pretty formatted string containing relevant values.
+
+    :param line: The log line, or its LogRecord if it was already decoded for filtering
     """
-    try:
-        parsed_line = json.loads(line)
-    except ValueError:
-        log.debug('Trouble parsing line as json. Skipping. Line: %r' % line)
-        return "Invalid JSON: %s" % line
+    record = to_log_record(line)
+    if record.fields is None:
+        return "Invalid JSON: %s" % record.raw_line
 
     try:
-        pretty_level = prettify_level(parsed_line['level'], requested_levels)
+        pretty_level = prettify_level(record.fields['level'], requested_levels)
+        if 'timestamp' not in record.fields:
+            raise KeyError('timestamp')
         return "%(timestamp)s %(component)s %(cluster)s %(instance)s - %(level)s%(message)s" % ({
-            'timestamp': prettify_timestamp(parsed_line['timestamp']),
-            'component': prettify_component(parsed_line['component']),
-            'cluster': '[%s]' % parsed_line['cluster'],
-            'instance': '[%s]' % parsed_line['instance'],
+            'timestamp': prettify_timestamp(record.timestamp),
+            'component': prettify_component(record.fields['component']),
+            'cluster': '[%s]' % record.fields['cluster'],
+            'instance': '[%s]' % record.fields['instance'],
             'level': '%s' % pretty_level,
-            'message': parsed_line['message'],
+            'message': record.fields['message'],
         })
     except KeyError:
-        log.debug('JSON parsed correctly but was missing a key. Skipping. Line: %r' % line)
-        return "JSON missing keys: %s" % line
+        log.debug('JSON parsed correctly but was missing a key. Skipping. Line: %r' % record.raw_line)
+        return "JSON missing keys: %s" % record.raw_line
 
 
 # The map of name -> LogReader subclasses, used by configure_log.
@@ -490,7 +800,9 @@ class LogReader:
         raise NotImplementedError("print_logs_by_offset is not implemented")
 
 
-ScribeComponentStreamInfo = namedtuple('ScribeComponentStreamInfo', 'per_cluster, stream_name_fn, filter_fn, parse_fn')
+ScribeComponentStreamInfo = namedtuple(
+    'ScribeComponentStreamInfo', 'per_cluster, stream_name_fn, filter_fn, parse_fn, prefilter_fn',
+)
 
 
 @register_log_reader('scribereader')
@@ -505,30 +817,35 @@ class ScribeLogReader(LogReader):
             stream_name_fn=get_log_name_for_service,
             filter_fn=paasta_log_line_passes_filter,
             parse_fn=None,
+            prefilter_fn=None,
         ),
         'stdout': ScribeComponentStreamInfo(
             per_cluster=False,
             stream_name_fn=lambda service: get_log_name_for_service(service, prefix='app_output'),
             filter_fn=paasta_app_output_passes_filter,
             parse_fn=None,
+            prefilter_fn=None,
         ),
         'stderr': ScribeComponentStreamInfo(
             per_cluster=False,
             stream_name_fn=lambda service: get_log_name_for_service(service, prefix='app_output'),
             filter_fn=paasta_app_output_passes_filter,
             parse_fn=None,
+            prefilter_fn=None,
         ),
         'marathon': ScribeComponentStreamInfo(
             per_cluster=True,
             stream_name_fn=lambda service, cluster: 'stream_marathon_%s' % cluster,
             filter_fn=marathon_log_line_passes_filter,
             parse_fn=parse_marathon_log_line,
+            prefilter_fn=marathon_log_line_prefilter,
         ),
         'chronos': ScribeComponentStreamInfo(
             per_cluster=True,
             stream_name_fn=lambda service, cluster: 'stream_chronos_%s' % cluster,
             filter_fn=chronos_log_line_passes_filter,
             parse_fn=parse_chronos_log_line,
+            prefilter_fn=chronos_log_line_prefilter,
         ),
     }
 
@@ -578,35 +895,23 @@ class ScribeLogReader(LogReader):
             return self.COMPONENT_STREAM_INFO['default']
 
     def tail_logs(self, service, levels, components, clusters, instances, raw_mode=False):
-        """Sergeant function for spawning off all the right log tailing functions.
-
-        NOTE: This function spawns concurrent processes and doesn't necessarily
-        worry about cleaning them up! That's because we expect to just exit the
-        main process when this function returns (as main() does). Someone calling
-        this function directly with something like "while True: tail_paasta_logs()"
-        may be very sad.
-
-        NOTE: We try pretty hard to suppress KeyboardInterrupts to prevent big
-        useless stack traces, but it turns out to be non-trivial and we fail ~10%
-        of the time. We decided we could live with it and we're shipping this to
-        see how it fares in real world testing.
-
-        Here are some things we read about this problem:
-        * http://stackoverflow.com/questions/1408356/keyboard-interrupts-with-pythons-multiprocessing-pool
-        * http://jtushman.github.io/blog/2014/01/14/python-%7C-multiprocessing-and-interrupts/
-        * http://bryceboe.com/2010/08/26/python-multiprocessing-and-keyboardinterrupt/
-
-        We could also try harder to terminate processes from more places. We could
-        use process.join() to ensure things have a chance to die. We punted these
-        things.
-
-        It's possible this whole multiprocessing strategy is wrong-headed. If you
-        are reading this code to curse whoever wrote it, see discussion in
-        PAASTA-214 and https://reviewboard.yelpcorp.com/r/87320/ and feel free to
-        implement one of the other options.
+        """Sergeant function for tailing all the right scribe streams.
+
+        Every stream is tailed by its own thread, and they all feed one queue of
+        at most TAIL_QUEUE_SIZE lines: a stream that logs faster than we can print
+        has its tailer wait rather than have lines pile up in memory. Lines are
+        taken off the queue and printed in batches of up to TAIL_PRINT_BATCH_SIZE.
+
+        If any tailer dies we are no longer presenting the user with the full
+        picture, so we quit. Tailers are checked on after every batch, so a noisy
+        stream that never lets the queue get empty doesn't hide a dead one.
+
+        NOTE: The tailer threads are daemon threads that block in scribereader,
+        so they aren't cleaned up when this function returns. That's because we
+        expect to just exit the main process when it does (as main() does).
         """
-        queue = Queue()
-        spawned_processes = []
+        queue = Queue(maxsize=TAIL_QUEUE_SIZE)
+        tailer_threads = []
 
         def callback(component, stream_info, scribe_env, cluster):
             kw = {
@@ -618,6 +923,8 @@ class ScribeLogReader(LogReader):
                 'instances': instances,
                 'queue': queue,
                 'filter_fn': stream_info.filter_fn,
+                'parse_fn': stream_info.parse_fn,
+                'prefilter_fn': stream_info.prefilter_fn,
             }
 
             if stream_info.per_cluster:
@@ -626,82 +933,46 @@ class ScribeLogReader(LogReader):
             else:
                 kw['stream_name'] = stream_info.stream_name_fn(service)
             log.debug("Running the equivalent of 'scribereader -e {} {}'".format(scribe_env, kw['stream_name']))
-            process = Process(target=self.scribe_tail, kwargs=kw)
-            spawned_processes.append(process)
-            process.start()
+            thread = Thread(target=self.scribe_tail, kwargs=kw, daemon=True)
+            tailer_threads.append(thread)
+            thread.start()
 
         self.run_code_over_scribe_envs(clusters=clusters, components=components, callback=callback)
 
-        # Pull things off the queue and output them. If any thread dies we are no
-        # longer presenting the user with the full picture so we quit.
-        #
-        # This is convenient for testing, where a fake scribe_tail() can emit a
-        # fake log and exit. Without the thread aliveness check, we would just sit
-        # here forever even though the threads doing the tailing are all gone.
-        #
-        # NOTE: A noisy tailer in one scribe_env (such that the queue never gets
-        # empty) will prevent us from ever noticing that another tailer has died.
         while True:
             try:
-                # This is a blocking call with a timeout for a couple reasons:
-                #
-                # * If the queue is empty and we get_nowait(), we loop very tightly
-                # and accomplish nothing.
-                #
-                # * Testing revealed a race condition where print_log() is called
-                # and even prints its message, but this action isn't recorded on
-                # the patched-in print_log(). This resulted in test flakes. A short
-                # timeout seems to soothe this behavior: running this test 10 times
-                # with a timeout of 0.0 resulted in 2 failures; running it with a
-                # timeout of 0.1 resulted in 0 failures.
-                #
-                # * There's a race where thread1 emits its log line and exits
-                # before thread2 has a chance to do anything, causing us to bail
-                # out via the Queue Empty and thread aliveness check.
-                #
-                # We've decided to live with this for now and see if it's really a
-                # problem. The threads in test code exit pretty much immediately
-                # and a short timeout has been enough to ensure correct behavior
-                # there, so IRL with longer start-up times for each thread this
-                # will surely be fine.
-                #
-                # UPDATE: Actually this is leading to a test failure rate of about
-                # 1/10 even with timeout of 1s. I'm adding a sleep to the threads
-                # in test code to smooth this out, then pulling the trigger on
-                # moving that test to integration land where it belongs.
-                line = queue.get(block=True, timeout=0.1)
-                print_log(line, levels, raw_mode)
-            except Empty:
+                batch = []
                 try:
-                    # If there's nothing in the queue, take this opportunity to make
-                    # sure all the tailers are still running.
-                    running_processes = [tt.is_alive() for tt in spawned_processes]
-                    if not running_processes or not all(running_processes):
-                        log.warn('Quitting because I expected %d log tailers to be alive but only %d are alive.' % (
-                            len(spawned_processes),
-                            running_processes.count(True),
-                        ))
-                        for process in spawned_processes:
-                            if process.is_alive():
-                                process.terminate()
-                        break
-                except KeyboardInterrupt:
-                    # Die peacefully rather than printing N threads worth of stack
-                    # traces.
-                    #
-                    # This extra nested catch is because it's pretty easy to be in
-                    # the above try block when the user hits Ctrl-C which otherwise
-                    # dumps a stack trace.
-                    log.warn('Terminating.')
+                    # Block for a while, so an idle queue doesn't keep us spinning
+                    batch.append(queue.get(block=True, timeout=TAIL_QUEUE_TIMEOUT))
+                    while len(batch) < TAIL_PRINT_BATCH_SIZE:
+                        batch.append(queue.get_nowait())
+                except Empty:
+                    pass
+                print_logs(batch, levels, raw_mode)
+
+                alive_tailers = [thread.is_alive() for thread in tailer_threads]
+                if not alive_tailers or not all(alive_tailers):
+                    # Print what dead tailers managed to queue before they died
+                    remaining = []
+                    try:
+                        for _ in range(queue.qsize()):
+                            remaining.append(queue.get_nowait())
+                    except Empty:
+                        pass
+                    print_logs(remaining, levels, raw_mode)
+                    log.warn('Quitting because I expected %d log tailers to be alive but only %d are alive.' % (
+                        len(tailer_threads),
+                        alive_tailers.count(True),
+                    ))
                     break
             except KeyboardInterrupt:
-                # Die peacefully rather than printing N threads worth of stack
-                # traces.
+                # Die peacefully rather than printing a stack trace.
                 log.warn('Terminating.')
                 break
 
     def print_logs_by_time(self, service, start_time, end_time, levels, components, clusters, instances, raw_mode):
-        aggregated_logs: List[Dict[str, Any]] = []
+        streams: List[Callable[[], Iterable[LogRecord]]] = []
 
         if 'marathon' in components or 'chronos' in components:
             paasta_print(
@@ -719,9 +990,8 @@ class ScribeLogReader(LogReader):
             else:
                 stream_name = stream_info.stream_name_fn(service)
 
-            ctx = self.scribe_get_from_time(scribe_env, stream_name, start_time, end_time)
-            self.filter_and_aggregate_scribe_logs(
-                scribe_reader_ctx=ctx,
+            streams.append(lambda: self.filter_scribe_logs(
+                scribe_reader_ctx_fn=lambda: self.scribe_get_from_time(scribe_env, stream_name, start_time, end_time),
                 scribe_env=scribe_env,
                 stream_name=stream_name,
                 levels=levels,
@@ -729,12 +999,12 @@ class ScribeLogReader(LogReader):
                 components=components,
                 clusters=clusters,
                 instances=instances,
-                aggregated_logs=aggregated_logs,
                 filter_fn=stream_info.filter_fn,
                 parser_fn=stream_info.parse_fn,
+                prefilter_fn=stream_info.prefilter_fn,
                 start_time=start_time,
                 end_time=end_time,
-            )
+            ))
 
         self.run_code_over_scribe_envs(
             clusters=clusters,
@@ -742,12 +1012,11 @@ class ScribeLogReader(LogReader):
             callback=callback,
         )
 
-        aggregated_logs.sort(key=lambda log_line: log_line['sort_key'])
-        for line in aggregated_logs:
-            print_log(line['raw_line'], levels, raw_mode)
+        for record in merge_log_streams(streams):
+            print_log(record, levels, raw_mode)
 
     def print_last_n_logs(self, service, line_count, levels, components, clusters, instances, raw_mode):
-        aggregated_logs: List[Dict[str, Any]] = []
+        streams: List[Callable[[], Iterable[LogRecord]]] = []
 
         def callback(component, stream_info, scribe_env, cluster):
             stream_info = self.get_stream_info(component)
@@ -757,9 +1026,8 @@ class ScribeLogReader(LogReader):
             else:
                 stream_name = stream_info.stream_name_fn(service)
 
-            ctx = self.scribe_get_last_n_lines(scribe_env, stream_name, line_count)
-            self.filter_and_aggregate_scribe_logs(
-                scribe_reader_ctx=ctx,
+            streams.append(lambda: self.filter_scribe_logs(
+                scribe_reader_ctx_fn=lambda: self.scribe_get_last_n_lines(scribe_env, stream_name, line_count),
                 scribe_env=scribe_env,
                 stream_name=stream_name,
                 levels=levels,
@@ -767,45 +1035,35 @@ class ScribeLogReader(LogReader):
                 components=components,
                 clusters=clusters,
                 instances=instances,
-                aggregated_logs=aggregated_logs,
                 filter_fn=stream_info.filter_fn,
                 parser_fn=stream_info.parse_fn,
-            )
+                prefilter_fn=stream_info.prefilter_fn,
+            ))
 
         self.run_code_over_scribe_envs(clusters=clusters, components=components, callback=callback)
-        aggregated_logs.sort(key=lambda log_line: log_line['sort_key'])
-        for line in aggregated_logs:
-            print_log(line['raw_line'], levels, raw_mode)
+        for record in merge_log_streams(streams):
+            print_log(record, levels, raw_mode)
 
-    def filter_and_aggregate_scribe_logs(
-        self, scribe_reader_ctx, scribe_env, stream_name,
+    def filter_scribe_logs(
+        self, scribe_reader_ctx_fn, scribe_env, stream_name,
         levels, service, components, clusters, instances,
-        aggregated_logs, parser_fn=None, filter_fn=None,
+        parser_fn=None, filter_fn=None, prefilter_fn=None,
         start_time=None, end_time=None,
     ):
-        with scribe_reader_ctx as scribe_reader:
+        """Yields the records of a scribe stream that should be displayed, in the order they were read.
+
+        :param scribe_reader_ctx_fn: Returns the context manager of the scribereader to read the stream with
+        """
+        with scribe_reader_ctx_fn() as scribe_reader:
             try:
-                for line in scribe_reader:
-                    # temporary until all log lines are strings not byte strings
-                    if isinstance(line, bytes):
-                        line = line.decode('utf-8')
-                    if parser_fn:
-                        line = parser_fn(line, clusters, service)
-                    if filter_fn:
-                        if filter_fn(
-                            line, levels, service, components, clusters,
-                            instances, start_time=start_time, end_time=end_time,
-                        ):
-                            try:
-                                parsed_line = json.loads(line)
-                                timestamp = isodate.parse_datetime(parsed_line.get('timestamp'))
-                                if not timestamp.tzinfo:
-                                    timestamp = pytz.utc.localize(timestamp)
-                            except ValueError:
-                                timestamp = pytz.utc.localize(datetime.datetime.min)
-
-                            line = {'raw_line': line, 'sort_key': timestamp}
-                            aggregated_logs.append(line)
+                yield from filter_log_lines(
+                    scribe_reader, levels, service, components, clusters, instances,
+                    filter_fn=filter_fn,
+                    parse_fn=parser_fn,
+                    prefilter_fn=prefilter_fn,
+                    start_time=start_time,
+                    end_time=end_time,
+                )
             except StreamTailerSetupError as e:
                 if 'No data in stream' in str(e):
                     log.warning(f"Scribe stream {stream_name} is empty on {scribe_env}")
@@ -861,14 +1119,14 @@ class ScribeLogReader(LogReader):
 
     def scribe_tail(
         self, scribe_env, stream_name, service, levels, components, clusters, instances, queue, filter_fn,
-        parse_fn=None,
+        parse_fn=None, prefilter_fn=None,
     ):
         """Creates a scribetailer for a particular environment.
 
         When it encounters a line that it should report, it sticks it into the
         provided queue.
 
-        This code is designed to run in a thread as spawned by tail_paasta_logs().
+        This code is designed to run in a thread as spawned by tail_logs().
         """
         try:
             log.debug(f"Going to tail {stream_name} scribe stream in {scribe_env}")
@@ -876,11 +1134,13 @@ class ScribeLogReader(LogReader):
             host = host_and_port['host']
             port = host_and_port['port']
             tailer = scribereader.get_stream_tailer(stream_name, host, port)
-            for line in tailer:
-                if parse_fn:
-                    line = parse_fn(line, clusters, service)
-                if filter_fn(line, levels, service, components, clusters, instances):
-                    queue.put(line)
+            for record in filter_log_lines(
+                tailer, levels, service, components, clusters, instances,
+                filter_fn=filter_fn,
+                parse_fn=parse_fn,
+                prefilter_fn=prefilter_fn,
+            ):
+                queue.put(record)
         except KeyboardInterrupt:
             # Die peacefully rather than printing N threads worth of stack
             # traces.
@@ -931,6 +1191,348 @@ class ScribeLogReader(LogReader):
             return env
 
 
+# Rotated segments of a log file, the way logrotate names them: path.1, path.2.gz, path-20190101.gz, ...
+ROTATED_LOG_FILE_RE = re.compile(r'^(?P<path>.*?)(?:\.\d+|-\d{8,10})(?:\.gz)?$')
+# Bytes between the entries of the time index of a log file
+LOG_FILE_INDEX_INTERVAL = 256 * 1024
+LOG_FILE_INDEX_SUFFIX = '.idx'
+# How far past the end of a time range the lines of a log file are read, in case they were written a bit out of order
+LOG_FILE_ORDER_SLACK = datetime.timedelta(seconds=5)
+LOG_LINE_TIMESTAMP_RE = re.compile(rb'"timestamp":\s*"([^"]+)"')
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def get_log_line_time(line):
+    """Returns the timestamp of a raw paasta log line as seconds since the epoch, without decoding the whole line,
+    or None if it has none."""
+    match = LOG_LINE_TIMESTAMP_RE.search(line)
+    if match is None:
+        return None
+    try:
+        return to_epoch_seconds(parse_log_timestamp(match.group(1).decode('utf-8')))
+    except ValueError:
+        return None
+
+
+def to_epoch_seconds(timestamp):
+    """Returns a datetime as seconds since the epoch, taking naive ones to be UTC."""
+    return (to_naive_utc(timestamp) - EPOCH).total_seconds()
+
+
+class LogFileIndex:
+    """A sparse time index of a log file, so lines from a given time on can be found without reading the file from
+    the start. Every LOG_FILE_INDEX_INTERVAL bytes, it maps the offset of a line to the latest timestamp of the lines
+    before it.
+
+    The index is kept next to the log file when that directory is writable, and only what was appended to the file
+    since it was last indexed gets indexed. It is rebuilt when the file is replaced or truncated.
+
+    :param path: The path of the log file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + LOG_FILE_INDEX_SUFFIX
+        self._reset(inode=None)
+
+    def _reset(self, inode):
+        self.inode = inode
+        self.indexed_size = 0
+        self.latest_time = None
+        # (offset of a line, latest timestamp of the lines before it)
+        self.entries = []
+
+    def load(self):
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+            self.inode = index['inode']
+            self.indexed_size = index['indexed_size']
+            self.latest_time = index['latest_time']
+            self.entries = [tuple(entry) for entry in index['entries']]
+        except (OSError, ValueError, KeyError, TypeError):
+            self._reset(inode=None)
+
+    def save(self):
+        tmp_path = self.index_path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(
+                    {
+                        'inode': self.inode,
+                        'indexed_size': self.indexed_size,
+                        'latest_time': self.latest_time,
+                        'entries': self.entries,
+                    }, f,
+                )
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            # The index just won't be reused by the next query
+            log.debug(f"Couldn't save the index of {self.path}: {e}")
+
+    def update(self):
+        """Indexes what was appended to the log file since it was last indexed."""
+        self.load()
+        stat = os.stat(self.path)
+        if stat.st_ino != self.inode or stat.st_size < self.indexed_size:
+            self._reset(inode=stat.st_ino)
+        if stat.st_size == self.indexed_size:
+            return
+        next_entry_offset = (self.entries[-1][0] if self.entries else 0) + LOG_FILE_INDEX_INTERVAL
+        with open(self.path, 'rb') as f:
+            f.seek(self.indexed_size)
+            offset = self.indexed_size
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # The rest of the line is still being written
+                    break
+                if offset >= next_entry_offset and self.latest_time is not None:
+                    self.entries.append((offset, self.latest_time))
+                    next_entry_offset = offset + LOG_FILE_INDEX_INTERVAL
+                line_time = get_log_line_time(line)
+                if line_time is not None and (self.latest_time is None or line_time > self.latest_time):
+                    self.latest_time = line_time
+                offset += len(line)
+        self.indexed_size = offset
+        self.save()
+
+    def find_offset(self, start_time):
+        """Returns the offset of a line in the log file such that all the lines before it were logged before
+        start_time."""
+        start = to_epoch_seconds(start_time)
+        i = bisect.bisect_left([latest_time for _, latest_time in self.entries], start)
+        return self.entries[i - 1][0] if i > 0 else 0
+
+
+def get_rotated_log_file_path(segment):
+    """Returns the path of the log file segment is a rotated segment of, or None if it isn't one."""
+    match = ROTATED_LOG_FILE_RE.match(segment)
+    return match.group('path') if match else None
+
+
+def get_log_file_segments(path):
+    """Returns the rotated segments of the log file at path oldest first, followed by path itself if it exists."""
+    segments = [
+        candidate for candidate in glob.glob(glob.escape(path) + '[.-]*')
+        if get_rotated_log_file_path(candidate) == path
+    ]
+    segments.sort(key=os.path.getmtime)
+    if os.path.exists(path):
+        segments.append(path)
+    return segments
+
+
+def read_log_file_segment(segment, start_time=None, end_time=None):
+    """Yields the lines of a segment of a log file, which are about in the order they were logged. Given a time
+    range, it skips the lines logged before it, seeking past them unless the segment is compressed, and stops at the
+    first line logged a while after it."""
+    if start_time is not None and datetime.datetime.fromtimestamp(os.path.getmtime(segment), pytz.utc) < start_time:
+        # Nothing was written to it since the time range started
+        return
+    if segment.endswith('.gz'):
+        f = gzip.open(segment, 'rb')
+    else:
+        f = open(segment, 'rb')
+        if start_time is not None:
+            index = LogFileIndex(segment)
+            index.update()
+            f.seek(index.find_offset(start_time))
+    stop_time = to_epoch_seconds(end_time + LOG_FILE_ORDER_SLACK) if end_time is not None else None
+    with f:
+        for line in f:
+            if stop_time is not None:
+                line_time = get_log_line_time(line)
+                if line_time is not None and line_time > stop_time:
+                    return
+            yield line
+
+
+def read_log_file(path, start_time=None, end_time=None):
+    """Yields the lines of the log file at path and of its rotated segments, oldest first. Segments are only opened
+    when their lines are needed."""
+    for segment in get_log_file_segments(path):
+        yield from read_log_file_segment(segment, start_time, end_time)
+
+
+class TailedLogFile:
+    """A log file being tailed, which follows the file at its path when it is rotated or truncated."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.partial_line = b''
+
+    def open(self, at_end):
+        self.close()
+        try:
+            self.file = open(self.path, 'rb')
+        except OSError:
+            return
+        if at_end:
+            self.file.seek(0, os.SEEK_END)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        self.file = None
+        self.partial_line = b''
+
+    def read_lines(self):
+        """Returns the lines appended to the file since they were last read."""
+        if self.file is None:
+            return []
+        if os.fstat(self.file.fileno()).st_size < self.file.tell():
+            # Truncated
+            self.file.seek(0)
+            self.partial_line = b''
+        lines = (self.partial_line + self.file.read()).split(b'\n')
+        self.partial_line = lines.pop()
+        return [line for line in lines if line]
+
+
+@register_log_reader('file')
+class FileLogReader(LogReader):
+    """Reads the logs FileLogWriter writes.
+
+    :param path_format: The path_format of the file log writer; defaults to the one of the log_writer config
+    """
+    SUPPORTS_TAILING = True
+    SUPPORTS_LINE_COUNT = True
+    SUPPORTS_TIME = True
+
+    def __init__(self, path_format=None):
+        super().__init__()
+        if path_format is None:
+            path_format = load_system_paasta_config().get_log_writer()['options']['path_format']
+        self.path_format = path_format
+
+    def get_path_patterns(self, service, levels, components, clusters, instances):
+        """Returns glob patterns of the log files with the given logs, which may not all exist yet."""
+        patterns = set()
+        for level, component, cluster, instance in itertools.product(
+            levels,
+            components,
+            list(clusters) + [ANY_CLUSTER],
+            list(instances) + [ANY_INSTANCE] if instances is not None else ['*'],
+        ):
+            patterns.add(self.path_format.format(
+                service=glob.escape(service),
+                component=glob.escape(component),
+                level=glob.escape(level),
+                cluster=glob.escape(cluster),
+                instance=instance if instance == '*' else glob.escape(instance),
+            ))
+        return patterns
+
+    def get_paths(self, patterns):
+        """Returns the paths of the log files matching patterns, including those only rotated segments are left of."""
+        paths = set()
+        for pattern in patterns:
+            for candidate in glob.glob(pattern) + glob.glob(pattern + '[.-]*'):
+                path = self.match_path(candidate, [pattern])
+                if path is not None:
+                    paths.add(path)
+        return sorted(paths)
+
+    def match_path(self, candidate, patterns):
+        """Returns the path of the log file candidate is, or is a rotated segment of, if it matches one of patterns.
+        """
+        if candidate.endswith(LOG_FILE_INDEX_SUFFIX) or candidate.endswith(LOG_FILE_INDEX_SUFFIX + '.tmp'):
+            return None
+        rotated_path = get_rotated_log_file_path(candidate)
+        for pattern in patterns:
+            if rotated_path is not None and fnmatch.fnmatchcase(rotated_path, pattern):
+                return rotated_path
+        for pattern in patterns:
+            if fnmatch.fnmatchcase(candidate, pattern):
+                return candidate
+        return None
+
+    def print_logs_by_time(self, service, start_time, end_time, levels, components, clusters, instances, raw_mode):
+        patterns = self.get_path_patterns(service, levels, components, clusters, instances)
+        streams = [
+            partial(
+                filter_log_lines, read_log_file(path, start_time, end_time),
+                levels, service, components, clusters, instances,
+                filter_fn=paasta_log_line_passes_filter,
+                start_time=start_time,
+                end_time=end_time,
+            )
+            for path in self.get_paths(patterns)
+        ]
+        for record in merge_log_streams(streams):
+            print_log(record, levels, raw_mode)
+
+    def print_last_n_logs(self, service, line_count, levels, components, clusters, instances, raw_mode):
+        def read_last_n_lines(path):
+            records = deque()
+            # Only read as many segments as it takes, newest first
+            for segment in reversed(get_log_file_segments(path)):
+                segment_records = deque(
+                    filter_log_lines(
+                        read_log_file_segment(segment), levels, service, components, clusters, instances,
+                        filter_fn=paasta_log_line_passes_filter,
+                    ),
+                    maxlen=line_count - len(records),
+                )
+                records.extendleft(reversed(segment_records))
+                if len(records) >= line_count:
+                    break
+            return records
+
+        patterns = self.get_path_patterns(service, levels, components, clusters, instances)
+        streams = [partial(read_last_n_lines, path) for path in self.get_paths(patterns)]
+        for record in deque(merge_log_streams(streams), maxlen=line_count):
+            print_log(record, levels, raw_mode)
+
+    def tail_logs(self, service, levels, components, clusters, instances, raw_mode=False):
+        # inotify only works on Linux, so don't make importing this module depend on it
+        from inotify.adapters import Inotify
+        from inotify.constants import IN_CREATE
+        from inotify.constants import IN_MODIFY
+        from inotify.constants import IN_MOVED_TO
+
+        patterns = self.get_path_patterns(service, levels, components, clusters, instances)
+        inotify = Inotify(block_duration_s=1)
+        for directory in {dirname for pattern in patterns for dirname in glob.glob(os.path.dirname(pattern))}:
+            inotify.add_watch(directory.encode(), IN_CREATE | IN_MODIFY | IN_MOVED_TO)
+
+        tailed_files: Dict[str, TailedLogFile] = {}
+        for path in self.get_paths(patterns):
+            tailed_files[path] = TailedLogFile(path)
+            tailed_files[path].open(at_end=True)
+
+        try:
+            for event in inotify.event_gen():
+                if event is None:
+                    continue
+                _, type_names, watch_path, filename = event
+                path = os.path.join(watch_path.decode(), filename.decode())
+                if self.match_path(path, patterns) != path:
+                    # Not one of our log files, or a segment one of them was just rotated into
+                    continue
+                lines = []
+                if path not in tailed_files:
+                    tailed_files[path] = TailedLogFile(path)
+                    tailed_files[path].open(at_end=False)
+                elif 'IN_CREATE' in type_names or 'IN_MOVED_TO' in type_names:
+                    # The file was rotated: finish reading the old one, then read the new one from its start
+                    lines = tailed_files[path].read_lines()
+                    tailed_files[path].open(at_end=False)
+                lines.extend(tailed_files[path].read_lines())
+                for record in filter_log_lines(
+                    lines, levels, service, components, clusters, instances,
+                    filter_fn=paasta_log_line_passes_filter,
+                ):
+                    print_log(record, levels, raw_mode)
+        except KeyboardInterrupt:
+            # Die peacefully rather than printing a stack trace
+            pass
+        finally:
+            for tailed_file in tailed_files.values():
+                tailed_file.close()
+
+
 def generate_start_end_time(from_string="30m", to_string=None):
     """Parses the --from and --to command line arguments to create python
     datetime objects representing the start and end times for log retrieval
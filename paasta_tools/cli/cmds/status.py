@@ -16,16 +16,19 @@ import concurrent.futures
 import difflib
 import os
 import sys
+import time
 from collections import defaultdict
 from datetime import datetime
 from distutils.util import strtobool
 from itertools import groupby
+from typing import Any
 from typing import Callable
 from typing import DefaultDict
 from typing import Dict
 from typing import Iterable
 from typing import List
 from typing import Mapping
+from typing import Optional
 from typing import Sequence
 from typing import Set
 from typing import Tuple
@@ -77,6 +80,9 @@ SSH_ONLY_INSTANCE_CONFIG = [
     ChronosJobConfig,
     AdhocJobConfig,
 ]
+# How many clusters are reported on at once, and how many instance status requests to the paasta api can be in flight
+STATUS_CLUSTER_CONCURRENCY = 20
+STATUS_API_CONCURRENCY = 20
 
 
 def add_subparser(
@@ -222,19 +228,25 @@ def paasta_status_on_api_endpoint(
     output: List[str],
     system_paasta_config: SystemPaastaConfig,
     verbose: int,
+    client: Any = None,
 ) -> int:
-    client = get_paasta_api_client(cluster, system_paasta_config)
+    if client is None:
+        client = get_paasta_api_client(cluster, system_paasta_config)
     if not client:
         paasta_print('Cannot get a paasta-api client')
         exit(1)
 
+    start = time.time()
     try:
         status = client.service.status_instance(service=service, instance=instance).result()
     except HTTPError as exc:
-        paasta_print(exc.response.text)
+        output.append(exc.response.text)
         return exc.status_code
+    elapsed = time.time() - start
 
     output.append('    instance: %s' % PaastaColors.blue(instance))
+    if verbose:
+        output.append('    Status API request took %.2fs' % elapsed)
     if status.git_sha != '':
         output.append('    Git sha:    %s (desired)' % status.git_sha)
 
@@ -473,9 +485,14 @@ def report_status_for_cluster(
     system_paasta_config: SystemPaastaConfig,
     verbose: int = 0,
     use_api_endpoint: bool = False,
+    api_executor: Optional[concurrent.futures.Executor] = None,
 ) -> Tuple[int, Sequence[str]]:
     """With a given service and cluster, prints the status of the instances
-    in that cluster"""
+    in that cluster
+
+    :param api_executor: If given, the statuses of the instances are requested from the paasta api concurrently, on
+                         this executor. Either way they're reported in deploy order.
+    """
     output = ['', 'service: %s' % service, 'cluster: %s' % cluster]
     seen_instances = []
     deployed_instances = []
@@ -523,17 +540,27 @@ def report_status_for_cluster(
             )
         ]
         if len(http_only_deployed_instances):
-            return_codes = [
-                paasta_status_on_api_endpoint(
+            client = get_paasta_api_client(cluster, system_paasta_config)
+            instance_outputs: List[List[str]] = [[] for _ in http_only_deployed_instances]
+            status_kwargs = [
+                dict(
                     cluster=cluster,
                     service=service,
                     instance=deployed_instance,
-                    output=output,
+                    output=instance_output,
                     system_paasta_config=system_paasta_config,
                     verbose=verbose,
+                    client=client,
                 )
-                for deployed_instance in http_only_deployed_instances
+                for deployed_instance, instance_output in zip(http_only_deployed_instances, instance_outputs)
             ]
+            if api_executor is None:
+                return_codes = [paasta_status_on_api_endpoint(**kwargs) for kwargs in status_kwargs]
+            else:
+                futures = [api_executor.submit(paasta_status_on_api_endpoint, **kwargs) for kwargs in status_kwargs]
+                return_codes = [future.result() for future in futures]
+            for instance_output in instance_outputs:
+                output.extend(instance_output)
             if any(return_codes):
                 api_return_code = 1
         ssh_only_deployed_instances = [
@@ -800,9 +827,14 @@ def paasta_status(
                 paasta_print(missing_deployments_message(service))
                 return_codes.append(1)
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-        tasks = [executor.submit(t[0], **t[1]) for t in tasks]  # type: ignore
-        for future in concurrent.futures.as_completed(tasks):  # type: ignore
+    # Clusters are reported on as soon as they (and the ones before them) are done, so the output is in a stable order
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=STATUS_CLUSTER_CONCURRENCY,
+    ) as executor, concurrent.futures.ThreadPoolExecutor(
+        max_workers=STATUS_API_CONCURRENCY,
+    ) as api_executor:
+        futures = [executor.submit(t[0], api_executor=api_executor, **t[1]) for t in tasks]  # type: ignore
+        for future in futures:
             return_code, output = future.result()
             paasta_print('\n'.join(output))
             return_codes.append(return_code)
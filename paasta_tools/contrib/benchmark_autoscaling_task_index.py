@@ -0,0 +1,99 @@
+#!/usr/bin/env python3.6
+"""Benchmark for looking up the tasks of autoscaled service instances.
+
+Builds a synthetic cluster of marathon apps and tasks, then compares scanning
+every task for every service instance (what filter_autoscaling_tasks does) with
+looking them up in an AutoscalingTaskIndex built once for the whole run. As the
+scan is too slow to do for every service instance, it is only timed for a sample
+of them and extrapolated.
+"""
+import argparse
+import random
+import time
+
+from marathon.models.app import MarathonApp
+from marathon.models.app import MarathonTask
+
+from paasta_tools.autoscaling.autoscaling_service_lib import AutoscalingTaskIndex
+from paasta_tools.autoscaling.autoscaling_service_lib import filter_autoscaling_tasks
+from paasta_tools.marathon_tools import format_job_id
+from paasta_tools.marathon_tools import MarathonServiceConfig
+from paasta_tools.utils import paasta_print
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--apps', type=int, default=5000)
+    parser.add_argument('--tasks', type=int, default=100000)
+    parser.add_argument(
+        '--sample', type=int, default=50,
+        help="number of service instances to time the scan for",
+    )
+    return parser.parse_args()
+
+
+def build_cluster(num_apps, num_tasks):
+    configs = []
+    apps = []
+    for i in range(num_apps):
+        service, instance = f'service{i // 10}', f'instance{i % 10}'
+        configs.append(MarathonServiceConfig(
+            service=service,
+            cluster='benchmark',
+            instance=instance,
+            config_dict={},
+            branch_dict=None,
+        ))
+        apps.append(MarathonApp(
+            id=f'/{format_job_id(service, instance, "gitsha", "config")}',
+            health_checks=[],
+            tasks=[],
+        ))
+
+    mesos_tasks = []
+    for i in range(num_tasks):
+        app = apps[i % num_apps]
+        task_id = f'{app.id.lstrip("/")}.{i}'
+        app.tasks.append(MarathonTask(app_id=app.id, id=task_id, health_check_results=[]))
+        mesos_tasks.append({'id': task_id})
+    random.shuffle(mesos_tasks)
+    return configs, apps, mesos_tasks
+
+
+def main():
+    args = parse_args()
+    configs, apps, mesos_tasks = build_cluster(args.apps, args.tasks)
+    paasta_print(f'{len(apps)} apps, {args.tasks} tasks')
+
+    sample = random.sample(configs, min(args.sample, len(configs)))
+    start = time.perf_counter()
+    scanned = [filter_autoscaling_tasks(apps, mesos_tasks, config) for config in sample]
+    scan_per_config = (time.perf_counter() - start) / len(sample)
+
+    start = time.perf_counter()
+    task_index = AutoscalingTaskIndex(apps, mesos_tasks)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for config in configs:
+        task_index.filter_autoscaling_tasks(config)
+    lookup_time = time.perf_counter() - start
+
+    for config, (marathon_tasks, config_mesos_tasks) in zip(sample, scanned):
+        indexed_marathon_tasks, indexed_mesos_tasks = task_index.filter_autoscaling_tasks(config)
+        assert indexed_marathon_tasks == marathon_tasks
+        assert sorted(t['id'] for t in indexed_mesos_tasks) == sorted(t['id'] for t in config_mesos_tasks)
+
+    scan_time = scan_per_config * len(configs)
+    paasta_print(
+        f'scan: {scan_per_config * 1000:.1f}ms per service instance, '
+        f'{scan_time:.1f}s for all {len(configs)} (extrapolated)',
+    )
+    paasta_print(
+        f'index: {build_time * 1000:.1f}ms to build, {lookup_time / len(configs) * 1000000:.1f}us per service '
+        f'instance, {build_time + lookup_time:.2f}s for all {len(configs)} '
+        f'({scan_time / (build_time + lookup_time):.0f}x faster)',
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3.6
+"""Benchmark for the paasta-deployd Inbox.
+
+Pushes a burst of service instances through the Inbox into the bounce queue and
+reports the throughput, how late a service instance scheduled in the future is
+handed over, and how much CPU the Inbox burns while it has nothing to do.
+"""
+import argparse
+import time
+
+from paasta_tools.deployd.common import PaastaQueue
+from paasta_tools.deployd.common import ServiceInstance
+from paasta_tools.deployd.master import DedupedPriorityQueue
+from paasta_tools.deployd.master import Inbox
+from paasta_tools.utils import paasta_print
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--num-instances', type=int, default=50000)
+    parser.add_argument('--idle-seconds', type=float, default=5)
+    return parser.parse_args()
+
+
+def make_service_instance(i, bounce_by):
+    return ServiceInstance(
+        service=f'benchmark{i // 100}',
+        instance=f'instance{i % 100}',
+        watcher='benchmark',
+        cluster='benchmark',
+        bounce_by=bounce_by,
+        priority=0,
+    )
+
+
+def wait_for_qsize(q, size):
+    while q.qsize() < size:
+        time.sleep(0.001)
+
+
+def main():
+    args = parse_args()
+    inbox_q = PaastaQueue('InboxQueue')
+    bounce_q = DedupedPriorityQueue('BounceQueue')
+    inbox = Inbox(inbox_q, bounce_q)
+    inbox.start()
+
+    now = time.time()
+    for i in range(args.num_instances):
+        inbox_q.put(make_service_instance(i, bounce_by=now))
+    start = time.time()
+    wait_for_qsize(bounce_q, args.num_instances)
+    elapsed = time.time() - start
+    paasta_print(
+        f'{args.num_instances} service instances moved to the bounce queue in {elapsed:.2f}s '
+        f'({args.num_instances / elapsed:.0f}/s)',
+    )
+    while not bounce_q.empty():
+        bounce_q.get()
+
+    due = time.time() + 1
+    inbox_q.put(make_service_instance(args.num_instances, bounce_by=due))
+    wait_for_qsize(bounce_q, 1)
+    paasta_print(f'Service instance scheduled 1s ahead was handed over {(time.time() - due) * 1000:.1f}ms late')
+    bounce_q.get()
+
+    cpu_start = time.process_time()
+    time.sleep(args.idle_seconds)
+    cpu_used = time.process_time() - cpu_start
+    paasta_print(f'CPU used while idle for {args.idle_seconds}s: {cpu_used * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3.6
+"""Benchmark for the FileLogWriter, unbuffered and buffered.
+
+Logs the same lines for a few services to a temporary directory with a
+FileLogWriter that opens, writes and closes a file for every line, and with one
+that buffers lines and writes them in batches, and compares the file syscalls
+(open, write, close, flock and stat) each of them makes per line, and how long
+they take.
+"""
+import argparse
+import collections
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from paasta_tools import utils
+from paasta_tools.utils import paasta_print
+
+SERVICES = ['fake_service_a', 'fake_service_b', 'fake_service_c']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--lines', type=int, default=20000)
+    parser.add_argument('--flock', action='store_true', help="flock the log files while writing them")
+    return parser.parse_args()
+
+
+@contextlib.contextmanager
+def count_syscalls(counts):
+    """Replaces the functions FileLogWriter makes syscalls with by ones that count their calls."""
+
+    class CountingFileIO(io.FileIO):
+        def __init__(self, *args, **kwargs):
+            counts['open'] += 1
+            super().__init__(*args, **kwargs)
+
+        def write(self, data):
+            counts['write'] += 1
+            return super().write(data)
+
+        def close(self):
+            if not self.closed:
+                counts['close'] += 1
+            super().close()
+
+    def counting(name, func):
+        def wrapper(*args, **kwargs):
+            counts[name] += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    replacements = [
+        (io, 'FileIO', CountingFileIO),
+        (utils.fcntl, 'flock', counting('flock', utils.fcntl.flock)),
+        (os, 'stat', counting('stat', os.stat)),
+        (os, 'fstat', counting('stat', os.fstat)),
+    ]
+    originals = [(module, name, getattr(module, name)) for module, name, _ in replacements]
+    for module, name, func in replacements:
+        setattr(module, name, func)
+    try:
+        yield
+    finally:
+        for module, name, func in originals:
+            setattr(module, name, func)
+
+
+def log_lines(writer, num_lines):
+    for i in range(num_lines):
+        writer.log(SERVICES[i % len(SERVICES)], f'deployed fake_service.main to fake_cluster, attempt {i}', 'deploy')
+    if writer.buffered:
+        writer.close()
+
+
+def measure(num_lines, **kwargs):
+    counts = collections.Counter()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        writer = utils.FileLogWriter(os.path.join(tmpdir, '{service}.log'), **kwargs)
+        with count_syscalls(counts):
+            start = time.perf_counter()
+            log_lines(writer, num_lines)
+            elapsed = time.perf_counter() - start
+        for service in SERVICES:
+            with open(os.path.join(tmpdir, f'{service}.log')) as f:
+                assert sum(1 for _ in f) == num_lines // len(SERVICES)
+    return counts, elapsed
+
+
+def main():
+    args = parse_args()
+    num_lines = args.lines - args.lines % len(SERVICES)
+    paasta_print(f'{num_lines} lines over {len(SERVICES)} files')
+
+    results = []
+    for description, buffered in (('unbuffered', False), ('buffered', True)):
+        counts, elapsed = measure(num_lines, flock=args.flock, buffered=buffered)
+        results.append(elapsed)
+        syscalls = ', '.join(f'{name} {counts[name] / num_lines:.3f}' for name in sorted(counts))
+        paasta_print(
+            f'{description}: {sum(counts.values()) / num_lines:.3f} syscalls per line ({syscalls}), '
+            f'{elapsed * 1000:.0f}ms',
+        )
+    paasta_print(f'buffered is {results[0] / results[1]:.1f}x faster')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3.6
+"""Benchmark for decoding historical load and forecasting from it.
+
+Serializes a full historical load blob (as much as fits in the 1MB zookeeper
+node), then compares the struct.unpack and list based implementations the
+autoscaler used to have with the NumPy based ones, for decoding the blob and for
+each forecast policy that has an old implementation.
+"""
+import argparse
+import random
+import struct
+import time
+
+from paasta_tools.autoscaling import forecasting
+from paasta_tools.autoscaling.autoscaling_service_lib import deserialize_historical_load
+from paasta_tools.autoscaling.autoscaling_service_lib import HISTORICAL_LOAD_SERIALIZATION_FORMAT
+from paasta_tools.autoscaling.autoscaling_service_lib import serialize_historical_load
+from paasta_tools.autoscaling.autoscaling_service_lib import SIZE_PER_HISTORICAL_LOAD_RECORD
+from paasta_tools.utils import paasta_print
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--iterations', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=30, help="seconds between historical load datapoints")
+    return parser.parse_args()
+
+
+def old_deserialize_historical_load(historical_load_bytes):
+    historical_load = []
+    for pos in range(0, len(historical_load_bytes), SIZE_PER_HISTORICAL_LOAD_RECORD):
+        historical_load.append(
+            struct.unpack(
+                HISTORICAL_LOAD_SERIALIZATION_FORMAT,
+                historical_load_bytes[pos:pos + SIZE_PER_HISTORICAL_LOAD_RECORD],
+            ),
+        )
+    return historical_load
+
+
+def old_trailing_window_historical_load(historical_load, window_size):
+    window_end, _ = historical_load[-1]
+    window_begin = window_end - window_size
+    return [
+        (timestamp, value) for timestamp, value in historical_load
+        if timestamp >= window_begin and timestamp <= window_end
+    ]
+
+
+def old_moving_average_forecast_policy(historical_load, moving_average_window_seconds=1800, **kwargs):
+    windowed_data = old_trailing_window_historical_load(historical_load, moving_average_window_seconds)
+    windowed_values = [value for timestamp, value in windowed_data]
+    return sum(windowed_values) / len(windowed_values)
+
+
+def old_linreg_forecast_policy(historical_load, linreg_window_seconds, linreg_extrapolation_seconds, **kwargs):
+    window = old_trailing_window_historical_load(historical_load, linreg_window_seconds)
+    loads = [load for timestamp, load in window]
+    times = [timestamp for timestamp, load in window]
+    mean_time = sum(times) / len(times)
+    mean_load = sum(loads) / len(loads)
+    slope = sum((t - mean_time) * (l - mean_load) for t, l in window) / sum((t - mean_time) ** 2 for t in times)
+    intercept = mean_load - slope * mean_time
+    now, _ = historical_load[-1]
+    return max(slope * (now + delta) + intercept for delta in linreg_extrapolation_seconds)
+
+
+def measure(func, iterations, *args, **kwargs):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) / iterations
+
+
+def compare(description, old_func, old_args, new_func, new_args, iterations, **kwargs):
+    old_result, old_elapsed = measure(old_func, iterations, *old_args, **kwargs)
+    new_result, new_elapsed = measure(new_func, iterations, *new_args, **kwargs)
+    if isinstance(old_result, float):
+        assert old_result == new_result, (old_result, new_result)
+    paasta_print(
+        f'{description}: old {old_elapsed * 1000:.2f}ms, new {new_elapsed * 1000:.3f}ms '
+        f'({old_elapsed / new_elapsed:.0f}x faster)',
+    )
+
+
+def main():
+    args = parse_args()
+    num_records = 1000000 // SIZE_PER_HISTORICAL_LOAD_RECORD
+    now = time.time()
+    historical_load_bytes = serialize_historical_load([
+        (now - (num_records - i) * args.interval, random.uniform(0, 100)) for i in range(num_records)
+    ])
+    paasta_print(f'{num_records} records, one every {args.interval}s')
+
+    old_historical_load = old_deserialize_historical_load(historical_load_bytes)
+    historical_load = deserialize_historical_load(historical_load_bytes)
+    assert historical_load.tolist() == old_historical_load
+
+    compare(
+        'decode', old_deserialize_historical_load, [historical_load_bytes],
+        deserialize_historical_load, [historical_load_bytes], args.iterations,
+    )
+    compare(
+        'moving_average', old_moving_average_forecast_policy, [old_historical_load],
+        forecasting.moving_average_forecast_policy, [historical_load], args.iterations,
+    )
+    compare(
+        'linreg (1 day window)', old_linreg_forecast_policy, [old_historical_load],
+        forecasting.linreg_forecast_policy, [historical_load], args.iterations,
+        linreg_window_seconds=86400, linreg_extrapolation_seconds=[0, 600],
+    )
+    for policy, kwargs in (
+        ('exponential_smoothing', {}),
+        ('percentile', {}),
+    ):
+        _, elapsed = measure(forecasting.get_forecast_policy(policy), args.iterations, historical_load, **kwargs)
+        paasta_print(f'{policy}: {elapsed * 1000:.3f}ms')
+
+
+if __name__ == '__main__':
+    main()
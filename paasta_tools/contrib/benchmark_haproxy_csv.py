@@ -0,0 +1,106 @@
+#!/usr/bin/env python3.6
+"""Benchmark for parsing the haproxy stats CSV.
+
+Blows a haproxy CSV snapshot up to a realistic number of lines, then compares
+the csv.DictReader approach smartstack_tools used to take with the streaming
+parse_haproxy_backends parser, reporting the time taken and the peak memory
+allocated to count the up backends of every service, and of just one of them.
+"""
+import argparse
+import collections
+import csv
+import os
+import time
+import tracemalloc
+
+from paasta_tools.smartstack_tools import parse_haproxy_backends
+from paasta_tools.utils import paasta_print
+
+DEFAULT_SNAPSHOT = os.path.join(os.path.dirname(__file__), '..', '..', 'tests', 'haproxy_snapshot.txt')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--snapshot', default=DEFAULT_SNAPSHOT, help="haproxy CSV to base the benchmark on")
+    parser.add_argument(
+        '-c', '--copies', type=int, default=1000,
+        help="number of copies of the snapshot's services to put in the CSV",
+    )
+    parser.add_argument('-n', '--iterations', type=int, default=5)
+    return parser.parse_args()
+
+
+def build_csv(snapshot, copies):
+    header, *rows = snapshot.splitlines()
+    lines = [header]
+    for i in range(copies):
+        for row in rows:
+            pxname, rest = row.split(',', 1)
+            lines.append(f'{pxname}_{i},{rest}')
+    return '\n'.join(lines) + '\n'
+
+
+def count_up_backends_dictreader(haproxy_data, services):
+    backends = []
+    for line in csv.DictReader(haproxy_data.splitlines()):
+        line['pxname'] = line.pop('# pxname')
+        line.pop('')
+        if (services is None or line['pxname'] in services) and line['svname'] not in ('FRONTEND', 'BACKEND'):
+            backends.append(line)
+    return collections.Counter([b['pxname'] for b in backends if str(b['status']).startswith('UP')])
+
+
+def iter_lines(haproxy_data):
+    """Hands over one line at a time, like the streamed response does"""
+    start = 0
+    while True:
+        end = haproxy_data.find('\n', start)
+        if end == -1:
+            return
+        yield haproxy_data[start:end]
+        start = end + 1
+
+
+def count_up_backends_streaming(haproxy_data, services):
+    lines = iter_lines(haproxy_data)
+    return collections.Counter(
+        backend.pxname for backend in parse_haproxy_backends(lines, services=services) if backend.is_up()
+    )
+
+
+def measure(func, haproxy_data, services, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = func(haproxy_data, services)
+    elapsed = (time.perf_counter() - start) / iterations
+
+    tracemalloc.start()
+    func(haproxy_data, services)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    args = parse_args()
+    with open(args.snapshot) as f:
+        haproxy_data = build_csv(f.read(), args.copies)
+    paasta_print(f'{haproxy_data.count(chr(10))} lines, {len(haproxy_data) / 1024 / 1024:.1f}MiB of CSV')
+
+    for description, services in (('all services', None), ('one service', {'service1_0'})):
+        old_result, old_elapsed, old_peak = measure(
+            count_up_backends_dictreader, haproxy_data, services, args.iterations,
+        )
+        new_result, new_elapsed, new_peak = measure(
+            count_up_backends_streaming, haproxy_data, services, args.iterations,
+        )
+        assert old_result == new_result
+        paasta_print(
+            f'{description}: DictReader {old_elapsed * 1000:.1f}ms, {old_peak / 1024 / 1024:.1f}MiB peak; '
+            f'streaming {new_elapsed * 1000:.1f}ms, {new_peak / 1024 / 1024:.1f}MiB peak '
+            f'({old_elapsed / new_elapsed:.1f}x faster, {old_peak / new_peak:.1f}x less memory)',
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3.6
+"""Benchmark for filtering, sorting and prettifying the lines of paasta logs.
+
+Generates a stream of paasta log lines for a few clusters, instances and levels,
+then compares the pipeline `paasta logs` used to have, which decoded the JSON
+and parsed the timestamp of every line once to filter it, once to sort it and
+once to print it, with filter_log_lines, which decodes each line at most once
+and doesn't decode lines the filters can rule out from the raw line.
+"""
+import argparse
+import datetime
+import random
+import time
+
+import isodate
+import pytz
+import ujson as json
+
+from paasta_tools.cli.cmds import logs
+from paasta_tools.utils import datetime_from_utc_to_local
+from paasta_tools.utils import format_log_line
+from paasta_tools.utils import paasta_print
+
+CLUSTERS = ['norcal-devc', 'norcal-stagef', 'pnw-prod', 'nova-prod']
+INSTANCES = ['main', 'canary', 'batch', 'worker']
+LEVELS = ['event', 'debug']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--lines', type=int, default=100000)
+    parser.add_argument('--cluster', default='pnw-prod', help="the cluster to filter logs for")
+    return parser.parse_args()
+
+
+def generate_lines(num_lines):
+    start = datetime.datetime(2019, 1, 1)
+    lines = []
+    for i in range(num_lines):
+        line = format_log_line(
+            level=random.choice(LEVELS),
+            cluster=random.choice(CLUSTERS),
+            service='fake_service',
+            instance=random.choice(INSTANCES),
+            component='deploy',
+            line='fake message %d' % i,
+            timestamp=(start + datetime.timedelta(seconds=i / 10)).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+        )
+        lines.append(line.encode('utf-8'))
+    random.shuffle(lines)
+    return lines
+
+
+def old_pipeline(lines, levels, components, clusters):
+    aggregated_logs = []
+    for line in lines:
+        line = line.decode('utf-8')
+        parsed_line = json.loads(line)
+        isodate.parse_datetime(parsed_line.get('timestamp'))
+        if not (
+            parsed_line.get('level') in levels and
+            parsed_line.get('component') in components and
+            parsed_line.get('cluster') in clusters
+        ):
+            continue
+        parsed_line = json.loads(line)
+        timestamp = isodate.parse_datetime(parsed_line.get('timestamp'))
+        if not timestamp.tzinfo:
+            timestamp = pytz.utc.localize(timestamp)
+        aggregated_logs.append({'raw_line': line, 'sort_key': timestamp})
+    aggregated_logs.sort(key=lambda log_line: log_line['sort_key'])
+    pretty_lines = []
+    for line in aggregated_logs:
+        parsed_line = json.loads(line['raw_line'])
+        datetime_from_utc_to_local(isodate.parse_datetime(parsed_line['timestamp'])).strftime('%Y-%m-%d %H:%M:%S')
+        pretty_lines.append(parsed_line['message'])
+    return pretty_lines
+
+
+def new_pipeline(lines, levels, components, clusters):
+    records = list(logs.filter_log_lines(
+        lines, levels, 'fake_service', components, clusters, None,
+        filter_fn=logs.paasta_log_line_passes_filter,
+    ))
+    records.sort(key=lambda record: record.sort_key)
+    pretty_lines = []
+    for record in records:
+        logs.prettify_timestamp(record.timestamp)
+        pretty_lines.append(record.fields['message'])
+    return pretty_lines
+
+
+def measure(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    args = parse_args()
+    lines = generate_lines(args.lines)
+    paasta_print(f'{args.lines} lines over {len(CLUSTERS)} clusters')
+
+    for description, levels, clusters in (
+        ('all lines', LEVELS, CLUSTERS),
+        (f'{args.cluster} events', ['event'], [args.cluster]),
+    ):
+        old_result, old_elapsed = measure(old_pipeline, lines, levels, ['deploy'], clusters)
+        new_result, new_elapsed = measure(new_pipeline, lines, levels, ['deploy'], clusters)
+        assert old_result == new_result
+        paasta_print(
+            f'{description} ({len(new_result)} lines): old {old_elapsed * 1000:.0f}ms, '
+            f'new {new_elapsed * 1000:.0f}ms ({old_elapsed / new_elapsed:.1f}x faster)',
+        )
+
+
+if __name__ == '__main__':
+    main()
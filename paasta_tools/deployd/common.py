@@ -10,7 +10,12 @@ from typing import List
 from typing import Optional
 from typing import Tuple
 
+from marathon import MarathonClient
+from marathon.models.app import MarathonApp
+
 from paasta_tools.marathon_tools import DEFAULT_SOA_DIR
+from paasta_tools.marathon_tools import does_app_id_match
+from paasta_tools.marathon_tools import format_job_id
 from paasta_tools.marathon_tools import get_all_marathon_apps
 from paasta_tools.marathon_tools import get_marathon_clients
 from paasta_tools.marathon_tools import get_marathon_servers
@@ -195,6 +200,24 @@ def get_service_instances_needing_update(
     return service_instances
 
 
+def get_service_instance_apps_with_clients(
+    marathon_clients: MarathonClients,
+    service: str,
+    instance: str,
+) -> List[Tuple[MarathonApp, MarathonClient]]:
+    """Fetch the apps (with their tasks embedded) of one service instance from every
+    Marathon shard, along with the client of the shard they run on. Only the apps
+    whose id starts with the instance's are listed, so a bounce doesn't need to
+    list every app on every shard."""
+    app_id_prefix = '/' + format_job_id(service, instance)
+    apps_with_clients = []
+    for client in marathon_clients.get_all_clients():
+        for app in client.list_apps(embed_tasks=True, app_id=app_id_prefix):
+            if does_app_id_match(service, instance, app.id):
+                apps_with_clients.append((app, client))
+    return apps_with_clients
+
+
 def get_marathon_clients_from_config() -> MarathonClients:
     system_paasta_config = load_system_paasta_config()
     marathon_servers = get_marathon_servers(system_paasta_config)
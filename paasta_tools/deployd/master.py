@@ -1,5 +1,7 @@
 #!/usr/bin/env python
+import heapq
 import inspect
+import itertools
 import logging
 import socket
 import sys
@@ -58,6 +60,14 @@ class DedupedPriorityQueue(PaastaPriorityQueue):
 
 
 class Inbox(PaastaThread):
+    """Collects service instances from the inbox queue and hands them to the
+    bounce queue once their bounce_by time has come.
+
+    Pending service instances are kept deduplicated in ``to_bounce`` and ordered
+    by bounce_by in ``bounce_heap``, so we only ever look at the ones that are
+    due and can sleep on the inbox queue until the next one is.
+    """
+
     def __init__(self, inbox_q, bounce_q):
         super().__init__()
         self.daemon = True
@@ -65,6 +75,11 @@ class Inbox(PaastaThread):
         self.inbox_q = inbox_q
         self.bounce_q = bounce_q
         self.to_bounce = {}
+        # Entries are (bounce_by, counter, service_instance_key, service_instance). When
+        # a service instance is replaced in to_bounce its old entry is left in the heap
+        # and skipped once it is popped.
+        self.bounce_heap = []
+        self.counter = itertools.count()
 
     def run(self):
         while True:
@@ -72,25 +87,38 @@ class Inbox(PaastaThread):
 
     def process_inbox(self):
         try:
-            service_instance = self.inbox_q.get(block=False)
+            service_instance = self.inbox_q.get(timeout=self.seconds_until_next_bounce())
         except Empty:
             service_instance = None
-        if service_instance:
+        while service_instance:
             self.log.debug("Processing {}.{} to see if we need to add it "
                            "to bounce queue".format(
                                service_instance.service,
                                service_instance.instance,
                            ))
             self.process_service_instance(service_instance)
-        if self.inbox_q.empty() and self.to_bounce:
-            self.process_to_bounce()
-        time.sleep(0.1)
+            try:
+                service_instance = self.inbox_q.get(block=False)
+            except Empty:
+                service_instance = None
+        self.process_to_bounce()
+
+    def seconds_until_next_bounce(self):
+        """How long we can block waiting for the inbox queue before the next service
+        instance is due to be bounced. None means there's nothing to wait for."""
+        if not self.bounce_heap:
+            return None
+        return max(self.bounce_heap[0][0] - time.time(), 0)
 
     def process_service_instance(self, service_instance):
         service_instance_key = f"{service_instance.service}.{service_instance.instance}"
         if self.should_add_to_bounce(service_instance, service_instance_key):
             self.log.info(f"Enqueuing {service_instance} to be bounced in the future")
             self.to_bounce[service_instance_key] = service_instance
+            heapq.heappush(
+                self.bounce_heap,
+                (service_instance.bounce_by, next(self.counter), service_instance_key, service_instance),
+            )
 
     def should_add_to_bounce(self, service_instance, service_instance_key):
         if service_instance_key in self.to_bounce:
@@ -100,15 +128,18 @@ class Inbox(PaastaThread):
         return True
 
     def process_to_bounce(self):
-        bounced = []
-        self.log.debug("Processing %d bounce queue entries..." % len(self.to_bounce.keys()))
-        for service_instance_key in self.to_bounce.keys():
-            if self.to_bounce[service_instance_key].bounce_by < int(time.time()):
-                service_instance = self.to_bounce[service_instance_key]
-                bounced.append(service_instance_key)
-                self.bounce_q.put(service_instance.priority, service_instance)
-        for service_instance_key in bounced:
-            self.to_bounce.pop(service_instance_key)
+        now = time.time()
+        while self.bounce_heap and self.bounce_heap[0][0] <= now:
+            _, __, service_instance_key, service_instance = heapq.heappop(self.bounce_heap)
+            if self.to_bounce.get(service_instance_key) is not service_instance:
+                # This entry was superseded by a later process_service_instance
+                continue
+            del self.to_bounce[service_instance_key]
+            self.bounce_q.put(service_instance.priority, service_instance)
+        # Don't let superseded entries pile up if the same instances keep getting re-added
+        if len(self.bounce_heap) > 2 * len(self.to_bounce) + 1000:
+            self.bounce_heap = [entry for entry in self.bounce_heap if self.to_bounce.get(entry[2]) is entry[3]]
+            heapq.heapify(self.bounce_heap)
         # TODO: if the bounceq is empty we could probably start adding SIs from
         # self.to_bounce to make sure the workers always have something to do.
 
@@ -1,6 +1,7 @@
 import time
 
 from paasta_tools.deployd.common import PaastaThread
+from paasta_tools.metrics.metrics_lib import emit_time_cache_metrics
 
 
 class QueueMetrics(PaastaThread):
@@ -10,6 +11,7 @@ class QueueMetrics(PaastaThread):
         self.inbox_q = inbox.inbox_q
         self.inbox = inbox.to_bounce
         self.bounce_q = bounce_q
+        self.cluster = cluster
         self.metrics = metrics_provider
         self.inbox_q_gauge = self.metrics.create_gauge("inbox_queue", paasta_cluster=cluster)
         self.inbox_gauge = self.metrics.create_gauge("inbox", paasta_cluster=cluster)
@@ -20,4 +22,5 @@ class QueueMetrics(PaastaThread):
             self.inbox_q_gauge.set(self.inbox_q.qsize())
             self.inbox_gauge.set(len(self.inbox.keys()))
             self.bounce_q_gauge.set(self.bounce_q.qsize())
+            emit_time_cache_metrics(self.metrics, paasta_cluster=self.cluster)
             time.sleep(20)
@@ -4,6 +4,8 @@ import time
 from functools import reduce
 from typing import Dict
 from typing import List
+from typing import Optional
+from typing import Sequence
 from typing import Set
 from typing import Tuple
 
@@ -11,6 +13,8 @@ import pyinotify
 from kazoo.protocol.states import EventType
 from kazoo.recipe.watchers import ChildrenWatch
 from kazoo.recipe.watchers import DataWatch
+from marathon import MarathonClient
+from marathon.models.app import MarathonApp
 from requests.exceptions import RequestException
 
 from paasta_tools.deployd.common import get_marathon_clients_from_config
@@ -19,6 +23,7 @@ from paasta_tools.deployd.common import PaastaThread
 from paasta_tools.deployd.common import rate_limit_instances
 from paasta_tools.deployd.common import ServiceInstance
 from paasta_tools.long_running_service_tools import AUTOSCALING_ZK_ROOT
+from paasta_tools.marathon_state_mirror import MarathonStateMirror
 from paasta_tools.marathon_tools import DEFAULT_SOA_DIR
 from paasta_tools.marathon_tools import deformat_job_id
 from paasta_tools.marathon_tools import get_marathon_apps_with_clients
@@ -163,6 +168,9 @@ class MaintenanceWatcher(PaastaWatcher):
         super().__init__(inbox_q, cluster, config)
         self.draining: Set[str] = set()
         self.marathon_clients = get_marathon_clients_from_config()
+        self.marathon_state_mirror: Optional[MarathonStateMirror] = None
+        if self.config.get_deployd_use_marathon_state_mirror():
+            self.marathon_state_mirror = MarathonStateMirror(self.marathon_clients.get_all_clients())
 
     def get_new_draining_hosts(self):
         try:
@@ -179,6 +187,8 @@ class MaintenanceWatcher(PaastaWatcher):
         return new_draining_hosts
 
     def run(self):
+        if self.marathon_state_mirror:
+            self.marathon_state_mirror.start()
         self.is_ready = True
         while True:
             new_draining_hosts = self.get_new_draining_hosts()
@@ -191,10 +201,15 @@ class MaintenanceWatcher(PaastaWatcher):
             time.sleep(self.config.get_deployd_maintenance_polling_frequency())
 
     def get_at_risk_service_instances(self, draining_hosts) -> List[ServiceInstance]:
-        marathon_apps_with_clients = get_marathon_apps_with_clients(
-            clients=self.marathon_clients.get_all_clients(),
-            embed_tasks=True,
-        )
+        marathon_apps_with_clients: Sequence[Tuple[MarathonApp, MarathonClient]]
+        # Until the mirror has listed the apps of every shard, list them ourselves
+        if self.marathon_state_mirror and self.marathon_state_mirror.wait_until_ready(timeout=0):
+            marathon_apps_with_clients = self.marathon_state_mirror.get_marathon_apps_with_clients()
+        else:
+            marathon_apps_with_clients = get_marathon_apps_with_clients(
+                clients=self.marathon_clients.get_all_clients(),
+                embed_tasks=True,
+            )
         at_risk_tasks = []
         for app, client in marathon_apps_with_clients:
             for task in app.tasks:
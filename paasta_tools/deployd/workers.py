@@ -4,6 +4,7 @@ from collections import namedtuple
 from paasta_tools import marathon_tools
 from paasta_tools.deployd.common import BounceTimers
 from paasta_tools.deployd.common import exponential_back_off
+from paasta_tools.deployd.common import get_service_instance_apps_with_clients
 from paasta_tools.deployd.common import PaastaThread
 from paasta_tools.deployd.common import ServiceInstance
 from paasta_tools.setup_marathon_job import deploy_marathon_service
@@ -92,19 +93,25 @@ class PaastaDeployWorker(PaastaThread):
                     failures=failures,
                 )
                 self.inbox_q.put(service_instance)
-            time.sleep(0.1)
 
     def process_service_instance(self, service_instance):
         bounce_timers = self.setup_timers(service_instance)
         self.log.info(f"{self.name} processing {service_instance.service}.{service_instance.instance}")
 
         bounce_timers.setup_marathon.start()
+        # We're about to act on these apps, so they have to be fresh, but only this
+        # instance's apps are needed rather than every app on every shard.
+        marathon_apps_with_clients = get_service_instance_apps_with_clients(
+            marathon_clients=self.marathon_clients,
+            service=service_instance.service,
+            instance=service_instance.instance,
+        )
         return_code, bounce_again_in_seconds = deploy_marathon_service(
             service=service_instance.service,
             instance=service_instance.instance,
             clients=self.marathon_clients,
             soa_dir=marathon_tools.DEFAULT_SOA_DIR,
-            marathon_apps_with_clients=None,
+            marathon_apps_with_clients=marathon_apps_with_clients,
         )
 
         bounce_timers.setup_marathon.stop()
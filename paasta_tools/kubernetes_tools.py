@@ -216,7 +216,24 @@ def load_kubernetes_service_config_no_cache(
     )
 
 
-@time_cache(ttl=5)
+def _get_kubernetes_service_config_files(
+    service: str,
+    instance: str,
+    cluster: str,
+    load_deployments: bool = True,
+    soa_dir: str = DEFAULT_SOA_DIR,
+) -> List[str]:
+    service_dir = os.path.join(soa_dir, service)
+    files = [
+        os.path.join(service_dir, 'service.yaml'),
+        os.path.join(service_dir, f'kubernetes-{cluster}.yaml'),
+    ]
+    if load_deployments:
+        files.append(os.path.join(service_dir, 'deployments.json'))
+    return files
+
+
+@time_cache(ttl=5, maxsize=4096, watch_files=_get_kubernetes_service_config_files)
 def load_kubernetes_service_config(
     service: str,
     instance: str,
@@ -15,10 +15,18 @@
 import argparse
 import json
 import logging
+import os
+import time
 from collections import defaultdict
+from threading import Event
+from threading import Thread
 from typing import Dict
+from typing import FrozenSet
+from typing import Iterable
 from typing import List
+from typing import Optional
 from typing import Set
+from typing import Tuple
 
 from mypy_extensions import TypedDict
 
@@ -26,16 +34,21 @@ from paasta_tools.marathon_tools import get_marathon_clients
 from paasta_tools.marathon_tools import get_marathon_servers
 from paasta_tools.marathon_tools import MarathonClient
 from paasta_tools.marathon_tools import MarathonClients
+from paasta_tools.marathon_tools import MarathonServers
 from paasta_tools.marathon_tools import MarathonServiceConfig
 from paasta_tools.paasta_service_config_loader import PaastaServiceConfigLoader
 from paasta_tools.utils import DEFAULT_SOA_DIR
+from paasta_tools.utils import get_service_instance_list
 from paasta_tools.utils import get_services_for_cluster
 from paasta_tools.utils import load_system_paasta_config
+from paasta_tools.utils import SoaConfigIndex
 from paasta_tools.utils import SystemPaastaConfig
 
 
 log = logging.getLogger(__name__)
 
+MARATHON_DASHBOARD_REFRESH_INTERVAL = 30
+
 
 def parse_args(argv) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -59,6 +72,71 @@ Marathon_Dashboard_Item = TypedDict('Marathon_Dashboard_Item', {'service': str,
 Marathon_Dashboard = Dict[str, List[Marathon_Dashboard_Item]]
 
 
+def get_marathon_links(
+        cluster: str,
+        marathon_servers: MarathonServers,
+        system_paasta_config: SystemPaastaConfig,
+) -> Tuple[Optional[str], Dict[str, str]]:
+    """Returns the 'Marathon RO' dashboard links of a cluster, as a shard url to use for every
+    service instance (if there is a single link) and a dict of marathon server url to link."""
+    dashboard_links = system_paasta_config.get_dashboard_links()
+    marathon_links = dashboard_links.get(cluster, {}).get('Marathon RO')
+
+    # e.g. 'http://10.64.97.75:5052': 'http://marathon-norcal-prod.yelpcorp.com'
+    shard_url_to_marathon_link_dict: Dict[str, str] = {}
+    if isinstance(marathon_links, list):
+        # Sanity check and log error if necessary
+        if len(marathon_links) != len(marathon_servers.current):
+            log.error('len(marathon_links) != len(marathon_servers.current). This may be a cause of concern')
+        for shard_number, shard in enumerate(marathon_servers.current):
+            shard_url_to_marathon_link_dict[shard.url[0]] = marathon_links[shard_number]
+    elif isinstance(marathon_links, str):
+        # In this case, the shard url will be the same for every service instance
+        return marathon_links.split(' ')[0], shard_url_to_marathon_link_dict
+    return None, shard_url_to_marathon_link_dict
+
+
+def create_marathon_dashboard_for_service(
+        service: str,
+        instances: Iterable[str],
+        cluster: str,
+        soa_dir: str,
+        marathon_clients: MarathonClients,
+        static_shard_url: Optional[str],
+        shard_url_to_marathon_link_dict: Dict[str, str],
+) -> List[Marathon_Dashboard_Item]:
+    """Returns the marathon dashboard items of some of the instances of a service.
+
+    :param instances: The marathon instances of the service to return items for
+    :param static_shard_url: The shard url of every instance, and the second return value
+                             of get_marathon_links otherwise
+    """
+    if static_shard_url is not None:
+        return [{'service': service, 'instance': instance, 'shard_url': static_shard_url} for instance in instances]
+
+    instance_set = set(instances)
+    items: List[Marathon_Dashboard_Item] = []
+    pscl = PaastaServiceConfigLoader(
+        service=service,
+        soa_dir=soa_dir,
+        load_deployments=False,
+    )
+    for marathon_service_config in pscl.instance_configs(cluster, MarathonServiceConfig):
+        if marathon_service_config.get_instance() in instance_set:
+            client: MarathonClient = \
+                marathon_clients.get_current_client_for_service(job_config=marathon_service_config)
+            ip_url: str = client.servers[0]
+            # Convert to a marathon link if possible else default to the originalIP address
+            shard_url: str = shard_url_to_marathon_link_dict.get(ip_url, ip_url)
+            service_info: Marathon_Dashboard_Item = {
+                'service': service,
+                'instance': marathon_service_config.get_instance(),
+                'shard_url': shard_url,
+            }
+            items.append(service_info)
+    return items
+
+
 def create_marathon_dashboard(
         cluster: str,
         soa_dir: str = DEFAULT_SOA_DIR,
@@ -80,50 +158,137 @@ def create_marathon_dashboard(
     if marathon_clients is None:
         marathon_clients = get_marathon_clients(marathon_servers=marathon_servers, cached=False)
 
-    dashboard_links = system_paasta_config.get_dashboard_links()
-    marathon_links = dashboard_links.get(cluster, {}).get('Marathon RO')
-
-    # e.g. 'http://10.64.97.75:5052': 'http://marathon-norcal-prod.yelpcorp.com'
-    shard_url_to_marathon_link_dict: Dict[str, str] = {}
-    if isinstance(marathon_links, list):
-        # Sanity check and log error if necessary
-        if len(marathon_links) != len(marathon_servers.current):
-            log.error('len(marathon_links) != len(marathon_servers.current). This may be a cause of concern')
-        for shard_number, shard in enumerate(marathon_servers.current):
-            shard_url_to_marathon_link_dict[shard.url[0]] = marathon_links[shard_number]
-    elif isinstance(marathon_links, str):
-        # In this case, the shard url will be the same for every service instance
-        static_shard_url = marathon_links.split(' ')[0]
-        return {cluster: [{'service': si[0], 'instance': si[1], 'shard_url': static_shard_url} for si in instances]}
+    static_shard_url, shard_url_to_marathon_link_dict = get_marathon_links(
+        cluster, marathon_servers, system_paasta_config,
+    )
 
     # Setup with service as key since will instantiate 1 PSCL per service
-    service_instances_dict: Dict[str, Set[str]] = defaultdict(set)
+    service_instances_dict: Dict[str, List[str]] = defaultdict(list)
     for si in instances:
         service, instance = si[0], si[1]
-        service_instances_dict[service].add(instance)
+        service_instances_dict[service].append(instance)
 
-    for service, instance_set in service_instances_dict.items():
-        pscl = PaastaServiceConfigLoader(
+    for service, service_instances in service_instances_dict.items():
+        dashboard[cluster].extend(create_marathon_dashboard_for_service(
             service=service,
+            instances=service_instances,
+            cluster=cluster,
             soa_dir=soa_dir,
-            load_deployments=False,
-        )
-        for marathon_service_config in pscl.instance_configs(cluster, MarathonServiceConfig):
-            if marathon_service_config.get_instance() in instance_set:
-                client: MarathonClient = \
-                    marathon_clients.get_current_client_for_service(job_config=marathon_service_config)
-                ip_url: str = client.servers[0]
-                # Convert to a marathon link if possible else default to the originalIP address
-                shard_url: str = shard_url_to_marathon_link_dict.get(ip_url, ip_url)
-                service_info: Marathon_Dashboard_Item = {
-                    'service': service,
-                    'instance': marathon_service_config.get_instance(),
-                    'shard_url': shard_url,
-                }
-                dashboard[cluster].append(service_info)
+            marathon_clients=marathon_clients,
+            static_shard_url=static_shard_url,
+            shard_url_to_marathon_link_dict=shard_url_to_marathon_link_dict,
+        ))
     return dashboard
 
 
+# The names, mtimes and sizes of the files in a service's soa_dir directory
+ServiceFingerprint = FrozenSet[Tuple[str, int, int]]
+
+
+def get_service_fingerprint(service_dir: str) -> ServiceFingerprint:
+    fingerprint: Set[Tuple[str, int, int]] = set()
+    for entry in os.scandir(service_dir):
+        if entry.is_file():
+            stat = entry.stat()
+            fingerprint.add((entry.name, stat.st_mtime_ns, stat.st_size))
+    return frozenset(fingerprint)
+
+
+class MarathonDashboardRefresher(Thread):
+    """Keeps the marathon dashboard of a cluster up to date in the background, so it can be served without
+    walking soa_dir first.
+
+    Every refresh only reads the soa configs of the services that have a file in their soa_dir directory added,
+    removed or modified since the previous one; the dashboard items of the other services are reused. (What shard
+    an instance is on only depends on its soa configs and on the marathon servers, so there is no need to ask
+    marathon about its apps.)
+
+    :param refresh_interval: Seconds to wait between refreshes
+    """
+
+    def __init__(
+        self,
+        cluster: str,
+        soa_dir: str,
+        marathon_clients: MarathonClients,
+        system_paasta_config: SystemPaastaConfig,
+        refresh_interval: float = MARATHON_DASHBOARD_REFRESH_INTERVAL,
+    ) -> None:
+        super().__init__(name='MarathonDashboardRefresher', daemon=True)
+        self.cluster = cluster
+        self.soa_dir = soa_dir
+        self.marathon_clients = marathon_clients
+        self.refresh_interval = refresh_interval
+        self.static_shard_url, self.shard_url_to_marathon_link_dict = get_marathon_links(
+            cluster, get_marathon_servers(system_paasta_config), system_paasta_config,
+        )
+        self._services: Dict[str, Tuple[Optional[ServiceFingerprint], List[Marathon_Dashboard_Item]]] = {}
+        self._snapshot: Optional[Tuple[Marathon_Dashboard, float]] = None
+        self._stopped = Event()
+
+    def refresh(self) -> None:
+        """Brings the dashboard up to date with soa_dir."""
+        refreshed_at = time.time()
+        services: Dict[str, Tuple[Optional[ServiceFingerprint], List[Marathon_Dashboard_Item]]] = {}
+        try:
+            service_names = sorted(os.listdir(self.soa_dir))
+        except FileNotFoundError:
+            service_names = []
+        for service in service_names:
+            service_dir = os.path.join(self.soa_dir, service)
+            if not os.path.isdir(service_dir):
+                continue
+            fingerprint = get_service_fingerprint(service_dir)
+            previous = self._services.get(service)
+            if previous is not None and previous[0] == fingerprint:
+                services[service] = previous
+                continue
+            log.debug(f'Refreshing the marathon dashboard items of {service}')
+            instances = [
+                instance for _, instance in get_service_instance_list(
+                    service, cluster=self.cluster, instance_type='marathon', soa_dir=self.soa_dir,
+                ) if not instance.startswith('_')
+            ]
+            items = create_marathon_dashboard_for_service(
+                service=service,
+                instances=instances,
+                cluster=self.cluster,
+                soa_dir=self.soa_dir,
+                marathon_clients=self.marathon_clients,
+                static_shard_url=self.static_shard_url,
+                shard_url_to_marathon_link_dict=self.shard_url_to_marathon_link_dict,
+            )
+            # Files modified this recently could be modified again without their mtime
+            # changing, so they are read again on the next refresh
+            racy_ns = (refreshed_at - SoaConfigIndex.RACY_SECONDS) * 1e9
+            if any(mtime_ns > racy_ns for _, mtime_ns, _ in fingerprint):
+                services[service] = None, items
+            else:
+                services[service] = fingerprint, items
+
+        self._services = services
+        dashboard: Marathon_Dashboard = {
+            self.cluster: [item for _, items in services.values() for item in items],
+        }
+        self._snapshot = dashboard, refreshed_at
+
+    def get_dashboard(self) -> Optional[Tuple[Marathon_Dashboard, float]]:
+        """Returns the latest dashboard and the unix timestamp of the refresh it is from, or None if
+        no refresh has succeeded yet."""
+        return self._snapshot
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                log.exception('Failed to refresh the marathon dashboard')
+            self._stopped.wait(self.refresh_interval)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
 def main(argv=None) -> None:
     args = parse_args(argv)
     dashboard: Marathon_Dashboard = create_marathon_dashboard(cluster=args.cluster, soa_dir=args.soa_dir)
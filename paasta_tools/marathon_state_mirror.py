@@ -0,0 +1,348 @@
+# Copyright 2015-2019 Yelp Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Keeps an in-memory copy of the apps and tasks on every Marathon shard.
+
+Each shard is bootstrapped once with a full ``list_apps`` and then kept up to
+date by applying the deltas from Marathon's ``/v2/events`` stream. Whenever the
+stream drops we reconnect and do a full resync, since any events sent while we
+were disconnected are lost. A shard that sends no events for a while is resynced
+too, by reconnecting once reading its stream times out.
+
+Long-lived processes (like paasta-deployd or the paasta API) can use
+:class:`MarathonStateMirror` instead of polling
+:func:`paasta_tools.marathon_tools.get_marathon_apps_with_clients`. The deployd
+maintenance watcher does, when ``deployd_use_marathon_state_mirror`` is set.
+"""
+import json
+import logging
+import threading
+import time
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import requests
+from marathon import MarathonClient
+from marathon import MarathonError
+from marathon import NotFoundError
+from marathon.models.app import MarathonApp
+from marathon.models.app import MarathonTask
+from marathon.models.events import EventFactory
+
+from paasta_tools.marathon_tools import format_job_id
+
+log = logging.getLogger(__name__)
+
+LIVE_TASK_STATES = frozenset(('TASK_STAGING', 'TASK_STARTING', 'TASK_RUNNING'))
+
+MIRRORED_EVENT_TYPES = (
+    'status_update_event',
+    'health_status_changed_event',
+    'api_post_event',
+    'app_terminated_event',
+    'deployment_info',
+    'deployment_success',
+    'deployment_failed',
+)
+
+
+class EventStreamIdle(Exception):
+    pass
+
+
+def is_task_running(task: MarathonTask) -> bool:
+    # Tasks fetched from old versions of Marathon don't have a state, but only
+    # running tasks have a started_at.
+    if task.state is not None:
+        return task.state == 'TASK_RUNNING'
+    return task.started_at is not None
+
+
+class MarathonShardMirror(threading.Thread):
+    """Mirrors the apps (with their tasks) of a single Marathon shard.
+
+    :param client: A MarathonClient for the shard
+    :param resync_interval: Seconds between full resyncs, as a safety net for
+        events we failed to apply. Also how long the event stream can be idle
+        before we reconnect to it and resync.
+    :param reconnect_backoff: Seconds to wait before reconnecting after the event
+        stream fails.
+    """
+
+    def __init__(
+        self,
+        client: MarathonClient,
+        resync_interval: float = 600,
+        reconnect_backoff: float = 5,
+    ) -> None:
+        super().__init__()
+        self.daemon = True
+        self.name = f'MarathonShardMirror({",".join(client.servers)})'
+        self.client = client
+        self.resync_interval = resync_interval
+        self.reconnect_backoff = reconnect_backoff
+        self.apps: Dict[str, MarathonApp] = {}
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.stopping = threading.Event()
+        self.last_resync_time: Optional[float] = None
+        self.resync_count = 0
+
+    def run(self) -> None:
+        while not self.stopping.is_set():
+            try:
+                self.consume_events()
+            except Exception as e:
+                log.warning(f"Marathon event stream for {self.name} failed, reconnecting: {e}")
+            else:
+                log.info(f"Marathon event stream for {self.name} closed, reconnecting")
+            self.stopping.wait(self.reconnect_backoff)
+
+    def stop(self) -> None:
+        self.stopping.set()
+
+    def consume_events(self) -> None:
+        """Follows the event stream of the shard until it is closed."""
+        while not self.stopping.is_set():
+            events = self.open_event_stream()
+            # Only resync once the stream is connected, so that the events sent
+            # while we list the apps are waiting for us on the stream.
+            self.resync()
+            try:
+                for event in events:
+                    if self.stopping.is_set():
+                        return
+                    self.apply_event(event)
+                    if time.time() - self.last_resync_time > self.resync_interval:
+                        self.resync()
+                return
+            except EventStreamIdle:
+                log.debug(f"No events from {self.name} for {self.resync_interval}s, reconnecting to resync")
+
+    def open_event_stream(self) -> Iterator[Any]:
+        """Connects to the event stream of the shard, and returns its events.
+
+        Unlike ``MarathonClient.event_stream``, which only connects once its
+        first event is asked for, this connects straight away. Reading the events
+        raises EventStreamIdle when none came for resync_interval seconds.
+        """
+        params = {'event_type': list(MIRRORED_EVENT_TYPES)}
+        headers = {'Accept': 'text/event-stream'}
+        if self.client.auth_token:
+            headers['Authorization'] = f'token={self.client.auth_token}'
+        for server in self.client.servers:
+            try:
+                response = self.client.sse_session.get(
+                    server.rstrip('/') + '/v2/events',
+                    params=params,
+                    stream=True,
+                    headers=headers,
+                    auth=self.client.auth,
+                    timeout=(self.client.timeout, self.resync_interval),
+                )
+            except requests.RequestException as e:
+                log.warning(f"Failed to connect to the event stream of {server}: {e}")
+                continue
+            if response.ok:
+                return self.read_events(response)
+            response.close()
+        raise MarathonError('No remaining Marathon servers to try')
+
+    def read_events(self, response: requests.Response) -> Iterator[Any]:
+        event_factory = EventFactory()
+        last_read_time = time.time()
+        try:
+            for line in response.iter_lines():
+                last_read_time = time.time()
+                field, _, value = line.decode('utf8').partition(':')
+                if field == 'data':
+                    yield event_factory.process(json.loads(value))
+        except requests.ConnectionError:
+            # requests reports the read timing out as a ConnectionError
+            if time.time() - last_read_time >= self.resync_interval:
+                raise EventStreamIdle()
+            raise
+        finally:
+            response.close()
+
+    def resync(self) -> None:
+        apps = self.client.list_apps(embed_tasks=True)
+        with self.lock:
+            self.apps = {app.id: app for app in apps}
+        self.last_resync_time = time.time()
+        self.resync_count += 1
+        self.ready.set()
+        log.debug(f"Resynced {len(apps)} apps from {self.name}")
+
+    def get_apps(self) -> List[MarathonApp]:
+        with self.lock:
+            return list(self.apps.values())
+
+    def apply_event(self, event: Any) -> None:
+        if event.event_type == 'status_update_event':
+            self.apply_status_update(event)
+        elif event.event_type == 'health_status_changed_event':
+            self.refetch_app(event.app_id)
+        elif event.event_type == 'api_post_event':
+            app_definition = getattr(event, 'app_definition', None) or {}
+            if 'id' in app_definition:
+                self.refetch_app(app_definition['id'])
+        elif event.event_type == 'app_terminated_event':
+            with self.lock:
+                self.apps.pop(event.app_id, None)
+        elif event.event_type == 'deployment_info':
+            for step in event.plan.steps:
+                for action in step.actions:
+                    if action.app:
+                        self.refetch_app(action.app)
+        elif event.event_type in ('deployment_success', 'deployment_failed'):
+            with self.lock:
+                app_ids = [
+                    app.id for app in self.apps.values()
+                    if any(deployment.id == event.id for deployment in app.deployments)
+                ]
+            for app_id in app_ids:
+                self.refetch_app(app_id)
+
+    def apply_status_update(self, event: Any) -> None:
+        app_id = event.app_id
+        state = event.task_status
+        with self.lock:
+            app = self.apps.get(app_id)
+            if app is not None:
+                self._update_task(app, event)
+                return
+        if state in LIVE_TASK_STATES:
+            # A task for an app we haven't heard of yet, fetch the whole thing
+            self.refetch_app(app_id)
+
+    def _update_task(self, app: MarathonApp, event: Any) -> None:
+        state = event.task_status
+        old_task = None
+        tasks = []
+        for task in app.tasks:
+            if task.id == event.task_id:
+                old_task = task
+            else:
+                tasks.append(task)
+
+        if old_task is not None:
+            if is_task_running(old_task):
+                app.tasks_running = max(app.tasks_running - 1, 0)
+            else:
+                app.tasks_staged = max(app.tasks_staged - 1, 0)
+
+        if state in LIVE_TASK_STATES:
+            started_at = old_task.started_at if old_task is not None else None
+            if started_at is None and state == 'TASK_RUNNING':
+                started_at = event.timestamp
+            new_task = MarathonTask(
+                app_id=app.id,
+                id=event.task_id,
+                host=getattr(event, 'host', None),
+                ports=getattr(event, 'ports', None),
+                slave_id=getattr(event, 'slave_id', None),
+                version=getattr(event, 'version', None),
+                state=state,
+                staged_at=old_task.staged_at if old_task is not None else event.timestamp,
+                started_at=started_at,
+                health_check_results=old_task.health_check_results if old_task is not None else None,
+            )
+            tasks.append(new_task)
+            if state == 'TASK_RUNNING':
+                app.tasks_running += 1
+            else:
+                app.tasks_staged += 1
+        # Replace rather than mutate the list so readers iterating the old one aren't affected
+        app.tasks = tasks
+
+    def refetch_app(self, app_id: str) -> None:
+        try:
+            app = self.client.get_app(app_id, embed_tasks=True)
+        except NotFoundError:
+            with self.lock:
+                self.apps.pop(app_id, None)
+            return
+        with self.lock:
+            self.apps[app.id] = app
+
+
+class MarathonStateMirror:
+    """Mirrors the apps and tasks of several Marathon shards, and answers the same
+    queries as :func:`paasta_tools.marathon_tools.get_marathon_apps_with_clients`
+    from memory.
+
+    :param clients: The MarathonClients of the shards to mirror, as returned by
+        ``MarathonClients.get_all_clients()``
+    """
+
+    def __init__(
+        self,
+        clients: Sequence[MarathonClient],
+        resync_interval: float = 600,
+        reconnect_backoff: float = 5,
+    ) -> None:
+        self.shard_mirrors = [
+            MarathonShardMirror(
+                client,
+                resync_interval=resync_interval,
+                reconnect_backoff=reconnect_backoff,
+            )
+            for client in clients
+        ]
+
+    def start(self) -> None:
+        for shard_mirror in self.shard_mirrors:
+            shard_mirror.start()
+
+    def stop(self) -> None:
+        for shard_mirror in self.shard_mirrors:
+            shard_mirror.stop()
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until every shard has been bootstrapped.
+
+        :returns: False if the timeout expired first"""
+        deadline = None if timeout is None else time.time() + timeout
+        for shard_mirror in self.shard_mirrors:
+            remaining = None if deadline is None else max(deadline - time.time(), 0)
+            if not shard_mirror.ready.wait(remaining):
+                return False
+        return True
+
+    def get_marathon_apps_with_clients(
+        self,
+        service_name: Optional[str] = None,
+    ) -> List[Tuple[MarathonApp, MarathonClient]]:
+        """Return the mirrored apps and the client of the shard each runs on. Tasks
+        are always included, as if ``embed_tasks=True`` had been passed to
+        ``list_apps``."""
+        if service_name:
+            app_id_filter = '/' + format_job_id(service=service_name, instance='')
+        apps_with_clients = []
+        for shard_mirror in self.shard_mirrors:
+            for app in shard_mirror.get_apps():
+                if service_name:
+                    if app_id_filter not in app.id:
+                        continue
+                # Ignore apps inside a folder
+                elif len(app.id.split('/')) > 2:
+                    continue
+                apps_with_clients.append((app, shard_mirror.client))
+        return apps_with_clients
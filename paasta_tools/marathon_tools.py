@@ -205,6 +205,7 @@ class AutoscalingParamsDict(TypedDict, total=False):
     metrics_provider: str
     decision_policy: str
     setpoint: float
+    endpoint: str
 
 
 class MarathonServiceConfigDict(LongRunningServiceConfigDict, total=False):
@@ -393,7 +394,24 @@ def load_marathon_service_config_no_cache(
     )
 
 
-@time_cache(ttl=5)
+def _get_marathon_service_config_files(
+    service: str,
+    instance: str,
+    cluster: str,
+    load_deployments: bool = True,
+    soa_dir: str = DEFAULT_SOA_DIR,
+) -> List[str]:
+    service_dir = os.path.join(soa_dir, service)
+    files = [
+        os.path.join(service_dir, 'service.yaml'),
+        os.path.join(service_dir, f'marathon-{cluster}.yaml'),
+    ]
+    if load_deployments:
+        files.append(os.path.join(service_dir, 'deployments.json'))
+    return files
+
+
+@time_cache(ttl=5, maxsize=4096, watch_files=_get_marathon_service_config_files)
 def load_marathon_service_config(
     service: str,
     instance: str,
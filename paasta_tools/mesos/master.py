@@ -33,6 +33,7 @@ from . import exceptions
 from . import framework
 from . import log
 from . import mesos_file
+from . import session
 from . import slave
 from . import task
 from . import util
@@ -119,22 +120,20 @@ class MesosMaster:
         else:
             host = self.host
 
+        timer = session.create_request_timer('master', url)
+        timer.start()
         try:
-            async with aiohttp.ClientSession(
-                conn_timeout=self.config["response_timeout"],
-                read_timeout=self.config["response_timeout"],
-            ) as session:
-                async with session.request(
-                    method=method,
-                    url=urljoin(host, url),
-                    headers=headers,
-                    **kwargs,
-                ) as resp:
-                    # if nobody awaits resp.text() or resp.json() before we exit the session context manager, then the
-                    # http connection gets closed before we read the response; then later calls to resp.text/json will
-                    # fail.
-                    await resp.text()
-                    return resp
+            async with session.get_session(self.config).request(
+                method=method,
+                url=urljoin(host, url),
+                headers=headers,
+                **kwargs,
+            ) as resp:
+                # if nobody awaits resp.text() or resp.json() before we exit the response context manager, then the
+                # http connection gets released before we read the response; then later calls to resp.text/json will
+                # fail.
+                await resp.text()
+                return resp
 
         except aiohttp.client_exceptions.ClientConnectionError:
             raise exceptions.MasterNotAvailableException(
@@ -147,6 +146,8 @@ class MesosMaster:
                     "an ongoing leader election"
                 ) % host,
             )
+        finally:
+            timer.stop()
 
     async def fetch(self, url, **kwargs):
         return await self._request(url, **kwargs)
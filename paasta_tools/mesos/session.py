@@ -0,0 +1,115 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Shared aiohttp sessions for talking to the mesos masters and agents.
+
+Every event loop gets its own keep-alive session (aiohttp sessions can't be
+shared between loops), so fanning out to hundreds of agents reuses connections
+instead of setting up a new one for every request. The session's connector caps
+both the number of connections per host and the overall number of requests in
+flight; requests over the cap wait for a free connection. The caps can be set
+with the ``max_connections`` and ``max_connections_per_host`` keys of the mesos
+cli config.
+
+The latency of every request is reported as a ``mesos.request`` timer.
+"""
+import asyncio
+import atexit
+import threading
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+
+from paasta_tools.metrics import metrics_lib
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 10
+
+# (response_timeout, max_connections, max_connections_per_host)
+SessionKey = Tuple[float, int, int]
+
+# The sessions hold on to their loops, so loops are dropped from here once they get closed
+_sessions: Dict[asyncio.AbstractEventLoop, Dict[SessionKey, aiohttp.ClientSession]] = {}
+_sessions_lock = threading.Lock()
+_metrics: Optional[metrics_lib.BaseMetrics] = None
+
+
+def _close_session(session: aiohttp.ClientSession) -> None:
+    # The connector closes its connections synchronously, which also works once the
+    # loop has stopped (or been closed). Detaching then marks the session closed.
+    if not session.closed:
+        session.connector.close()
+        session.detach()
+
+
+def get_session(config: Dict[str, Any]) -> aiohttp.ClientSession:
+    """Returns the shared session of the current event loop for the given mesos
+    config, creating it if needed.
+
+    :param config: A mesos cli config, as returned by mesos_tools.get_mesos_config
+    """
+    loop = asyncio.get_event_loop()
+    key = (
+        config["response_timeout"],
+        config.get("max_connections", DEFAULT_MAX_CONNECTIONS),
+        config.get("max_connections_per_host", DEFAULT_MAX_CONNECTIONS_PER_HOST),
+    )
+    with _sessions_lock:
+        for other_loop in [other_loop for other_loop in _sessions if other_loop.is_closed()]:
+            for session in _sessions.pop(other_loop).values():
+                _close_session(session)
+
+        loop_sessions = _sessions.setdefault(loop, {})
+        session = loop_sessions.get(key)
+        if session is None or session.closed:
+            response_timeout, max_connections, max_connections_per_host = key
+            session = loop_sessions[key] = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=max_connections,
+                    limit_per_host=max_connections_per_host,
+                    loop=loop,
+                ),
+                conn_timeout=response_timeout,
+                read_timeout=response_timeout,
+                loop=loop,
+            )
+        return session
+
+
+@atexit.register
+def close_sessions() -> None:
+    """Closes every shared session, on every loop."""
+    with _sessions_lock:
+        for loop_sessions in _sessions.values():
+            for session in loop_sessions.values():
+                _close_session(session)
+        _sessions.clear()
+
+
+def create_request_timer(component: str, url: str) -> metrics_lib.TimerProtocol:
+    """Returns a timer for the latency of a request to a mesos master or agent.
+
+    :param component: 'master' or 'slave'
+    :param url: The URL (or path) being requested; only its path is used as a dimension
+    """
+    global _metrics
+    if _metrics is None:
+        _metrics = metrics_lib.get_metrics_interface('paasta')
+    return _metrics.create_timer('mesos.request', component=component, path=urlparse(url).path)
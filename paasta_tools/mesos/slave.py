@@ -19,6 +19,7 @@ import aiohttp
 
 from . import exceptions
 from . import mesos_file
+from . import session
 from . import util
 from paasta_tools.async_utils import async_ttl_cache
 from paasta_tools.utils import get_user_agent
@@ -49,22 +50,22 @@ class MesosSlave:
 
     async def fetch(self, url, **kwargs) -> aiohttp.ClientResponse:
         headers = {'User-Agent': get_user_agent()}
-        async with aiohttp.ClientSession(
-            conn_timeout=self.config["response_timeout"],
-            read_timeout=self.config["response_timeout"],
-        ) as session:
-            try:
-                async with session.get(
-                    urljoin(self.host, url),
-                    headers=headers,
-                    **kwargs,
-                ) as response:
-                    await response.text()
-                    return response
-            except aiohttp.ClientConnectionError:
-                raise exceptions.SlaveDoesNotExist(
-                    f"Unable to connect to the slave at {self.host}",
-                )
+        timer = session.create_request_timer('slave', url)
+        timer.start()
+        try:
+            async with session.get_session(self.config).get(
+                urljoin(self.host, url),
+                headers=headers,
+                **kwargs,
+            ) as response:
+                await response.text()
+                return response
+        except aiohttp.ClientConnectionError:
+            raise exceptions.SlaveDoesNotExist(
+                f"Unable to connect to the slave at {self.host}",
+            )
+        finally:
+            timer.stop()
 
     @async_ttl_cache(ttl=5, cleanup_self=True)
     async def state(self):
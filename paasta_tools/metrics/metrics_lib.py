@@ -11,6 +11,7 @@ from typing import Union
 
 from typing_extensions import Protocol
 
+from paasta_tools.utils import get_time_caches
 from paasta_tools.utils import load_system_paasta_config
 
 log = logging.getLogger(__name__)
@@ -63,6 +64,13 @@ def get_metrics_interface(base_name: str) -> BaseMetrics:
     return _metrics_interfaces[metrics_provider](base_name)
 
 
+def emit_time_cache_metrics(metrics: BaseMetrics, **kwargs: Any) -> None:
+    """Report the hit, miss, eviction and size counts of every time_cache in this process as gauges."""
+    for cache in get_time_caches():
+        for stat_name, value in cache.stats().items():
+            metrics.create_gauge(f'time_cache.{stat_name}', cache=cache.name, **kwargs).set(value)
+
+
 def register_metrics_interface(name: Optional[str]) -> Callable[[Type[BaseMetrics]], Type[BaseMetrics]]:
     def outer(func: Type[BaseMetrics]) -> Type[BaseMetrics]:
         _metrics_interfaces[name] = func
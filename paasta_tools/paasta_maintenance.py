@@ -30,6 +30,7 @@ from paasta_tools.smartstack_tools import get_backends
 from paasta_tools.smartstack_tools import get_replication_for_services
 from paasta_tools.smartstack_tools import ip_port_hostname_from_svname
 from paasta_tools.smartstack_tools import load_smartstack_info_for_service
+from paasta_tools.smartstack_tools import memoize_haproxy_csv
 from paasta_tools.utils import paasta_print
 
 log = logging.getLogger(__name__)
@@ -171,20 +172,22 @@ def are_local_tasks_in_danger():
     try:
         system_paasta_config = utils.load_system_paasta_config()
         local_services = marathon_services_running_here()
-        local_backends = get_backends(
-            service=None,
-            synapse_host=system_paasta_config.get_default_synapse_host(),
-            synapse_port=system_paasta_config.get_synapse_port(),
-            synapse_haproxy_url_format=system_paasta_config.get_synapse_haproxy_url_format(),
-        )
-        for service, instance, port in local_services:
-            log.info(f"Inspecting {service}.{instance} on {port}")
-            if is_healthy_in_haproxy(port, local_backends) and \
-               synapse_replication_is_low(service, instance, system_paasta_config, local_backends=local_backends):
-                log.warning("{}.{} on port {} is healthy but the service is in danger!".format(
-                    service, instance, port,
-                ))
-                return True
+        # Every local service is checked against the same synapse hosts, so only scrape each of them once
+        with memoize_haproxy_csv():
+            local_backends = get_backends(
+                service=None,
+                synapse_host=system_paasta_config.get_default_synapse_host(),
+                synapse_port=system_paasta_config.get_synapse_port(),
+                synapse_haproxy_url_format=system_paasta_config.get_synapse_haproxy_url_format(),
+            )
+            for service, instance, port in local_services:
+                log.info(f"Inspecting {service}.{instance} on {port}")
+                if is_healthy_in_haproxy(port, local_backends) and \
+                   synapse_replication_is_low(service, instance, system_paasta_config, local_backends=local_backends):
+                    log.warning("{}.{} on port {} is healthy but the service is in danger!".format(
+                        service, instance, port,
+                    ))
+                    return True
         return False
     except Exception:
         log.warning(traceback.format_exc())
@@ -93,6 +93,14 @@ class PaastaServiceConfigLoader():
         :returns: an iterator that yields instance names
         """
         if (cluster, instance_type_class) not in self._framework_configs:
+            index = utils.get_soa_config_index(self._soa_dir)
+            if index is not None:
+                # The names alone can come from the index, without parsing the whole file
+                filename = f'{self._framework_config_filename(cluster, instance_type_class)}.yaml'
+                index.refresh_service(self._service, [filename])
+                index.save()
+                yield from index.get_keys(self._service, filename)
+                return
             self._refresh_framework_config(cluster, instance_type_class)
         for instance in self._framework_configs.get((cluster, instance_type_class), []):
             yield instance
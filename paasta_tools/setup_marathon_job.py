@@ -39,11 +39,15 @@ Command line options:
 
 - -d <SOA_DIR>, --soa-dir <SOA_DIR>: Specify a SOA config dir to read from
 - -v, --verbose: Verbose output
+- -j <N>, --parallelism <N>: Deploy up to N service instances at once
 """
 import argparse
 import asyncio
+import itertools
 import logging
+import multiprocessing
 import sys
+import time
 import traceback
 from collections import defaultdict
 from typing import Any
@@ -51,6 +55,7 @@ from typing import Callable
 from typing import Collection
 from typing import Dict
 from typing import List
+from typing import NamedTuple
 from typing import Optional
 from typing import Sequence
 from typing import Set
@@ -86,6 +91,7 @@ from paasta_tools.utils import load_system_paasta_config
 from paasta_tools.utils import NoConfigurationForServiceError
 from paasta_tools.utils import NoDeploymentsAvailable
 from paasta_tools.utils import NoDockerImageError
+from paasta_tools.utils import paasta_print
 from paasta_tools.utils import SPACER
 from paasta_tools.utils import SystemPaastaConfig
 try:
@@ -124,6 +130,10 @@ def parse_args() -> argparse.Namespace:
         '-v', '--verbose', action='store_true',
         dest="verbose", default=False,
     )
+    parser.add_argument(
+        '-j', '--parallelism', type=int, dest="parallelism", default=1,
+        help="number of service instances to deploy at once, in separate processes",
+    )
     args = parser.parse_args()
     return args
 
@@ -846,25 +856,113 @@ def main() -> None:
     unique_clients = clients.get_all_clients()
     marathon_apps_with_clients = marathon_tools.get_marathon_apps_with_clients(unique_clients, embed_tasks=True)
 
-    num_failed_deployments = 0
-    for service_instance in args.service_instance_list:
-        try:
-            service, instance, _, __ = decompose_job_id(service_instance)
-        except InvalidJobNameError:
-            log.error("Invalid service instance specified. Format is service%sinstance." % SPACER)
-            num_failed_deployments = num_failed_deployments + 1
-        else:
-            if deploy_marathon_service(service, instance, clients, soa_dir, marathon_apps_with_clients)[0]:
-                num_failed_deployments = num_failed_deployments + 1
+    results = deploy_service_instances(
+        service_instance_list=args.service_instance_list,
+        clients=clients,
+        soa_dir=soa_dir,
+        marathon_apps_with_clients=marathon_apps_with_clients,
+        parallelism=args.parallelism,
+    )
 
     requests_cache.uninstall_cache()
 
-    log.debug("%d out of %d service.instances failed to deploy." %
-              (num_failed_deployments, len(args.service_instance_list)))
+    num_failed_deployments = 0
+    for result in results:
+        if result.failed:
+            num_failed_deployments = num_failed_deployments + 1
+        paasta_print("%s %s after %.2fs" % (
+            result.service_instance,
+            'failed' if result.failed else 'finished',
+            result.duration,
+        ))
+    paasta_print("%d of %d service.instances failed to deploy." %
+                 (num_failed_deployments, len(args.service_instance_list)))
 
     sys.exit(1 if num_failed_deployments else 0)
 
 
+class DeployResult(NamedTuple):
+    service_instance: str
+    failed: bool
+    duration: float
+
+
+def deploy_service_instance(
+    service_instance: str,
+    clients: marathon_tools.MarathonClients,
+    soa_dir: str,
+    marathon_apps_with_clients: Optional[Sequence[Tuple[MarathonApp, MarathonClient]]],
+) -> DeployResult:
+    start_time = time.time()
+    try:
+        service, instance, _, __ = decompose_job_id(service_instance)
+    except InvalidJobNameError:
+        log.error("Invalid service instance specified. Format is service%sinstance." % SPACER)
+        failed = True
+    else:
+        failed = bool(deploy_marathon_service(service, instance, clients, soa_dir, marathon_apps_with_clients)[0])
+    return DeployResult(service_instance=service_instance, failed=failed, duration=time.time() - start_time)
+
+
+# Set by deploy_service_instances just before forking the worker pool, so that the
+# workers inherit the marathon clients and the app snapshot rather than having them
+# pickled for every service instance (or fetching their own).
+_pool_deploy_args: Tuple[Any, ...] = ()
+
+
+def _deploy_service_instance_in_pool(service_instance: str) -> DeployResult:
+    start_time = time.time()
+    try:
+        return deploy_service_instance(service_instance, *_pool_deploy_args)
+    except Exception:
+        # Don't let one service instance blowing up take the rest of the pool down with it
+        log.error("Failed to deploy %s:\n%s" % (service_instance, traceback.format_exc()))
+        return DeployResult(service_instance=service_instance, failed=True, duration=time.time() - start_time)
+
+
+def deploy_service_instances(
+    service_instance_list: Sequence[str],
+    clients: marathon_tools.MarathonClients,
+    soa_dir: str,
+    marathon_apps_with_clients: Optional[Sequence[Tuple[MarathonApp, MarathonClient]]],
+    parallelism: int = 1,
+) -> List[DeployResult]:
+    """Deploy each of the given service instances, returning their results in the
+    order they were given.
+
+    With a parallelism above 1 the deploys are spread over a pool of that many
+    forked processes. They all share the marathon_apps_with_clients snapshot taken
+    by the parent, and each deploy still takes the bounce lock of its service
+    instance, so the same instance is never bounced twice at once."""
+    if parallelism <= 1 or len(service_instance_list) <= 1:
+        return [
+            deploy_service_instance(service_instance, clients, soa_dir, marathon_apps_with_clients)
+            for service_instance in service_instance_list
+        ]
+
+    # The workers would otherwise inherit the keep-alive connections the clients already have open, and use the
+    # same sockets at once. Dropping them here makes every worker open its own.
+    for client in itertools.chain(clients.current, clients.previous):
+        client.session.close()
+
+    global _pool_deploy_args
+    _pool_deploy_args = (clients, soa_dir, marathon_apps_with_clients)
+    results_by_service_instance = {}
+    try:
+        with multiprocessing.get_context('fork').Pool(
+            processes=min(parallelism, len(service_instance_list)),
+        ) as pool:
+            for result in pool.imap_unordered(_deploy_service_instance_in_pool, service_instance_list):
+                results_by_service_instance[result.service_instance] = result
+            # Let the workers exit on their own rather than being terminated when the pool is, so that they run
+            # their exit handlers, like the one writing what a buffered log writer hasn't written yet
+            pool.close()
+            pool.join()
+    finally:
+        _pool_deploy_args = ()
+    return [results_by_service_instance[service_instance] for service_instance in service_instance_list]
+
+
 def deploy_marathon_service(
     service: str,
     instance: str,
@@ -13,14 +13,18 @@
 # limitations under the License.
 import abc
 import collections
+import contextlib
 import csv
 import socket
+import threading
+import typing
 from typing import cast
 from typing import Collection
 from typing import Container
 from typing import DefaultDict
 from typing import Dict
 from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import NamedTuple
 from typing import Optional
@@ -41,6 +45,7 @@ from paasta_tools.utils import DEFAULT_SOA_DIR
 from paasta_tools.utils import DeployBlacklist
 from paasta_tools.utils import get_user_agent
 from paasta_tools.utils import InstanceConfig
+from paasta_tools.utils import optionally_load_system_paasta_config
 from paasta_tools.utils import SystemPaastaConfig
 
 
@@ -55,6 +60,117 @@ HaproxyBackend = TypedDict(
 )
 
 
+class HaproxySessionPool:
+    """Hands out one keep-alive requests.Session per synapse host, so that repeated
+    scrapes of the same haproxy reuse their connections instead of paying for a new
+    TCP handshake every time.
+
+    :param pool_maxsize: The number of connections to keep open to each host. By
+        default it is read from the system paasta config when the first session is made.
+    """
+
+    def __init__(self, pool_maxsize: Optional[int] = None) -> None:
+        self.pool_maxsize = pool_maxsize
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def get_session(self, synapse_host: str) -> requests.Session:
+        with self._lock:
+            session = self._sessions.get(synapse_host)
+            if session is None:
+                session = self._sessions[synapse_host] = self._new_session()
+            return session
+
+    def _new_session(self) -> requests.Session:
+        if self.pool_maxsize is None:
+            self.pool_maxsize = optionally_load_system_paasta_config().get_synapse_haproxy_pool_maxsize()
+        session = requests.Session()
+        session.headers.update({'User-Agent': get_user_agent()})
+        # retry 3 times
+        adapter = requests.adapters.HTTPAdapter(
+            max_retries=3,
+            pool_connections=1,
+            pool_maxsize=self.pool_maxsize,
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+
+haproxy_session_pool = HaproxySessionPool()
+
+# The lines of the haproxy CSVs fetched so far, by URI, while inside memoize_haproxy_csv(). Each thread
+# has its own, so that threads fetching CSVs outside of such a block never read or fill one.
+_haproxy_csv_memo = threading.local()
+
+HAPROXY_CSV_CHUNK_SIZE = 64 * 1024
+
+
+@contextlib.contextmanager
+def memoize_haproxy_csv() -> Iterator[None]:
+    """Fetch the haproxy CSV of each synapse host at most once within this block,
+    and reuse it for every service checked against that host. Nested blocks share
+    the memo of the outermost one."""
+    if _get_haproxy_csv_memo() is not None:
+        yield
+        return
+    _haproxy_csv_memo.memo = {}
+    try:
+        yield
+    finally:
+        _haproxy_csv_memo.memo = None
+
+
+def _get_haproxy_csv_memo() -> Optional[Dict[str, List[str]]]:
+    return getattr(_haproxy_csv_memo, 'memo', None)
+
+
+def _iter_response_lines(response: requests.Response) -> Iterator[str]:
+    try:
+        yield from response.iter_lines(chunk_size=HAPROXY_CSV_CHUNK_SIZE, decode_unicode=True)
+    finally:
+        # Once the body has been read to the end the connection is already back in the session's pool. If we
+        # stopped reading early, this closes the connection rather than leaving it checked out of the pool.
+        response.close()
+
+
+def retrieve_haproxy_csv_lines(
+    synapse_host: str,
+    synapse_port: int,
+    synapse_haproxy_url_format: str,
+) -> Iterable[str]:
+    """Retrieves the lines of the haproxy csv from the haproxy web interface.
+    Outside of memoize_haproxy_csv() the response body is streamed, so the whole
+    CSV is never held in memory at once.
+
+    :param synapse_host: The host that this check should contact for replication information.
+    :param synapse_port: The port number that this check should contact for replication information.
+    :param synapse_haproxy_url_format: The format of the synapse haproxy URL.
+    :returns lines: an iterable of the lines of the CSV
+    """
+    synapse_uri = synapse_haproxy_url_format.format(host=synapse_host, port=synapse_port)
+    memo = _get_haproxy_csv_memo()
+    if memo is not None and synapse_uri in memo:
+        return memo[synapse_uri]
+
+    # timeout after 1 second
+    haproxy_request = haproxy_session_pool.get_session(synapse_host)
+    haproxy_response = haproxy_request.get(synapse_uri, timeout=1, stream=True)
+    if haproxy_response.encoding is None:
+        haproxy_response.encoding = 'utf-8'
+    lines = _iter_response_lines(haproxy_response)
+    if memo is not None:
+        memo[synapse_uri] = list(lines)
+        return memo[synapse_uri]
+    return lines
+
+
 def retrieve_haproxy_csv(
     synapse_host: str,
     synapse_port: int,
@@ -66,23 +182,76 @@ def retrieve_haproxy_csv(
                               should contact for replication information.
     :returns reader: a csv.DictReader object
     """
-    synapse_uri = synapse_haproxy_url_format.format(host=synapse_host, port=synapse_port)
+    return csv.DictReader(retrieve_haproxy_csv_lines(synapse_host, synapse_port, synapse_haproxy_url_format))
 
-    # timeout after 1 second and retry 3 times
-    haproxy_request = requests.Session()
-    haproxy_request.headers.update({'User-Agent': get_user_agent()})
-    haproxy_request.mount(
-        'http://',
-        requests.adapters.HTTPAdapter(max_retries=3),
-    )
-    haproxy_request.mount(
-        'https://',
-        requests.adapters.HTTPAdapter(max_retries=3),
-    )
-    haproxy_response = haproxy_request.get(synapse_uri, timeout=1)
-    haproxy_data = haproxy_response.text
-    reader = csv.DictReader(haproxy_data.splitlines())
-    return reader
+
+class HaproxyBackendRecord:
+    """A server line from the haproxy CSV.
+
+    The columns we look at for every line are attributes, the rest are only
+    turned into a HaproxyBackend dict on demand by as_dict().
+    """
+    __slots__ = ('pxname', 'svname', 'status', 'columns', 'values')
+
+    def __init__(
+        self,
+        pxname: str,
+        svname: str,
+        status: str,
+        columns: Sequence[str],
+        values: List[str],
+    ) -> None:
+        self.pxname = pxname
+        self.svname = svname
+        self.status = status
+        self.columns = columns
+        self.values = values
+
+    def is_up(self) -> bool:
+        """Same as backend_is_up()"""
+        return self.status.startswith('UP')
+
+    def as_dict(self) -> HaproxyBackend:
+        backend = dict(zip(self.columns, self.values))
+        # there's a trailing comma on every line, giving an unnamed last column
+        backend.pop('', None)
+        return cast(HaproxyBackend, backend)
+
+
+def parse_haproxy_backends(
+    lines: Iterable[str],
+    services: Optional[Container[str]] = None,
+) -> Iterator[HaproxyBackendRecord]:
+    """Parses the haproxy CSV one line at a time, yielding a record for each
+    backend server of the requested services, regardless of its state.
+
+    The header is only looked at once, and lines for other services or for the
+    fictional FRONTEND/BACKEND hosts are skipped before anything is built for them.
+
+    :param lines: The lines of the CSV, as returned by retrieve_haproxy_csv_lines
+    :param services: If None, yield backends for all services, otherwise only for these services.
+    """
+    rows = csv.reader(lines)
+    header = next(rows, None)
+    if header is None:
+        return
+    # clean up an irregularity of the CSV output: there's a leading "# " for no good reason
+    columns = tuple(column[2:] if column.startswith('# ') else column for column in header)
+    pxname_index = columns.index('pxname')
+    svname_index = columns.index('svname')
+    status_index = columns.index('status')
+    min_length = max(pxname_index, svname_index, status_index) + 1
+
+    for values in rows:
+        if len(values) < min_length:
+            continue
+        svname = values[svname_index]
+        if svname == 'FRONTEND' or svname == 'BACKEND':
+            continue
+        pxname = values[pxname_index]
+        if services is not None and pxname not in services:
+            continue
+        yield HaproxyBackendRecord(pxname, svname, values[status_index], columns, values)
 
 
 def get_backends(
@@ -128,24 +297,26 @@ def get_multiple_backends(
                        services or the requested service
     """
 
-    reader = retrieve_haproxy_csv(synapse_host, synapse_port, synapse_haproxy_url_format=synapse_haproxy_url_format)
-    backends = []
+    lines = retrieve_haproxy_csv_lines(synapse_host, synapse_port, synapse_haproxy_url_format)
+    return [backend.as_dict() for backend in parse_haproxy_backends(lines, services=services)]
 
-    for line in reader:
-        # clean up two irregularities of the CSV output, relative to
-        # DictReader's behavior there's a leading "# " for no good reason:
-        line['pxname'] = line.pop('# pxname')
-        # and there's a trailing comma on every line:
-        line.pop('')
 
-        # Look for the service in question and ignore the fictional
-        # FRONTEND/BACKEND hosts, use starts_with so that hosts that are UP
-        # with 1/X healthchecks to go before going down get counted as UP:
-        ha_slave, ha_service = line['svname'], line['pxname']
-        if (services is None or ha_service in services) and ha_slave not in ('FRONTEND', 'BACKEND'):
-            backends.append(cast(HaproxyBackend, line))
+def count_up_backends(
+    services: Optional[Container[str]],
+    synapse_host: str,
+    synapse_port: int,
+    synapse_haproxy_url_format: str,
+) -> typing.Counter[str]:
+    """Fetches the CSV from haproxy and counts the backends of each service that are up,
+    without building a HaproxyBackend dict for every line.
 
-    return backends
+    :param services: If None, count backends for all services, otherwise only for these services.
+    :returns counter: A Counter of service name to the number of its backends that are up
+    """
+    lines = retrieve_haproxy_csv_lines(synapse_host, synapse_port, synapse_haproxy_url_format)
+    return collections.Counter(
+        backend.pxname for backend in parse_haproxy_backends(lines, services=services) if backend.is_up()
+    )
 
 
 def load_smartstack_info_for_service(
@@ -248,13 +419,12 @@ def get_replication_for_all_services(
     :returns available_instance_counts: A dictionary mapping the service names
                                         to an integer number of available replicas.
     """
-    backends = get_multiple_backends(
+    return count_up_backends(
         services=None,
         synapse_host=synapse_host,
         synapse_port=synapse_port,
         synapse_haproxy_url_format=synapse_haproxy_url_format,
     )
-    return collections.Counter([b['pxname'] for b in backends if backend_is_up(b)])
 
 
 def get_replication_for_services(
@@ -279,14 +449,12 @@ def get_replication_for_services(
                                   replicas
     :returns None: If it cannot connect to the specified synapse host and port
     """
-    backends = get_multiple_backends(
+    counter = count_up_backends(
         services=services,
         synapse_host=synapse_host,
         synapse_port=synapse_port,
         synapse_haproxy_url_format=synapse_haproxy_url_format,
     )
-
-    counter = collections.Counter([b['pxname'] for b in backends if backend_is_up(b)])
     return {sn: counter[sn] for sn in services}
 
 
@@ -427,9 +595,11 @@ class SmartstackReplicationChecker(abc.ABC):
 
     Optimized for multiple queries. Gets the list of backends from synapse-`roxy
     only once per location and reuse it in all subsequent calls of
-    SmartstackReplicationChecker.get_replication_for_instance().
+    SmartstackReplicationChecker.get_replication_for_instance(). Likewise the
+    hosts are only grouped by location once per blacklist and discover type.
 
-    _get_allowed_locations_and_hosts must be implemented in sub class
+    _get_allowed_locations_and_hosts and _group_hosts_by_location must be
+    implemented in sub class
     """
 
     def __init__(
@@ -440,11 +610,37 @@ class SmartstackReplicationChecker(abc.ABC):
         self._synapse_haproxy_url_format = system_paasta_config.get_synapse_haproxy_url_format()
         self._system_paasta_config = system_paasta_config
         self._cache: Dict[str, Dict[str, int]] = {}
+        self._hosts_by_location_cache: Dict[
+            Tuple[str, Tuple[Tuple[str, str], ...]],
+            Dict[str, Sequence[SmartstackHost]],
+        ] = {}
 
     @abc.abstractmethod
     def _get_allowed_locations_and_hosts(self, instance_config: InstanceConfig) -> Dict[str, Sequence[SmartstackHost]]:
         pass
 
+    @abc.abstractmethod
+    def _group_hosts_by_location(
+        self,
+        blacklist: DeployBlacklist,
+        discover_location_type: str,
+    ) -> Dict[str, Sequence[SmartstackHost]]:
+        pass
+
+    def _get_hosts_by_location(
+        self,
+        blacklist: DeployBlacklist,
+        discover_location_type: str,
+    ) -> Dict[str, Sequence[SmartstackHost]]:
+        """Returns the allowed hosts grouped by location, like _group_hosts_by_location,
+        but only works them out once for all the instances sharing a blacklist and
+        discover type.
+        """
+        key = (discover_location_type, tuple((location_type, location) for location_type, location in blacklist))
+        if key not in self._hosts_by_location_cache:
+            self._hosts_by_location_cache[key] = self._group_hosts_by_location(blacklist, discover_location_type)
+        return self._hosts_by_location_cache[key]
+
     def get_replication_for_instance(
         self,
         instance_config: InstanceConfig,
@@ -537,16 +733,23 @@ class MesosSmartstackReplicationChecker(SmartstackReplicationChecker):
         monitoring_blacklist = instance_config.get_monitoring_blacklist(
             system_deploy_blacklist=self._system_paasta_config.get_deploy_blacklist(),
         )
-        filtered_slaves = mesos_tools.filter_mesos_slaves_by_blacklist(
-            slaves=self._mesos_slaves,
-            blacklist=monitoring_blacklist,
-            whitelist=None,
-        )
         discover_location_type = marathon_tools.load_service_namespace_config(
             service=instance_config.service,
             namespace=instance_config.instance,
             soa_dir=instance_config.soa_dir,
         ).get_discover()
+        return self._get_hosts_by_location(monitoring_blacklist, discover_location_type)
+
+    def _group_hosts_by_location(
+        self,
+        blacklist: DeployBlacklist,
+        discover_location_type: str,
+    ) -> Dict[str, Sequence[SmartstackHost]]:
+        filtered_slaves = mesos_tools.filter_mesos_slaves_by_blacklist(
+            slaves=self._mesos_slaves,
+            blacklist=blacklist,
+            whitelist=None,
+        )
         attribute_to_slaves = mesos_tools.get_mesos_slaves_grouped_by_attribute(
             slaves=filtered_slaves,
             attribute=discover_location_type,
@@ -574,16 +777,23 @@ class KubeSmartstackReplicationChecker(SmartstackReplicationChecker):
         monitoring_blacklist = instance_config.get_monitoring_blacklist(
             system_deploy_blacklist=self._system_paasta_config.get_deploy_blacklist(),
         )
-        filtered_nodes = kubernetes_tools.filter_nodes_by_blacklist(
-            nodes=self.nodes,
-            blacklist=monitoring_blacklist,
-            whitelist=None,
-        )
         discover_location_type = kubernetes_tools.load_service_namespace_config(
             service=instance_config.service,
             namespace=instance_config.instance,
             soa_dir=instance_config.soa_dir,
         ).get_discover()
+        return self._get_hosts_by_location(monitoring_blacklist, discover_location_type)
+
+    def _group_hosts_by_location(
+        self,
+        blacklist: DeployBlacklist,
+        discover_location_type: str,
+    ) -> Dict[str, Sequence[SmartstackHost]]:
+        filtered_nodes = kubernetes_tools.filter_nodes_by_blacklist(
+            nodes=self.nodes,
+            blacklist=blacklist,
+            whitelist=None,
+        )
         attribute_to_nodes = kubernetes_tools.get_nodes_grouped_by_attribute(
             nodes=filtered_nodes,
             attribute=discover_location_type,
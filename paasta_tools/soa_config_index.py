@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# Copyright 2015-2019 Yelp Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Usage: ./soa_config_index.py [options] {rebuild,verify}
+
+Manages the index of the instances defined in soa-configs, which is kept in the
+``soa_config_index_dir`` of the system paasta config.
+
+- rebuild: Throw the index away and index every instance config file again
+- verify: Compare the index with soa-configs, and exit 1 if they differ
+
+- -d <SOA_DIR>, --soa-dir <SOA_DIR>: Specify a SOA config dir to read from
+- --index-dir <INDEX_DIR>: Use this directory rather than the configured one
+"""
+import argparse
+import logging
+import sys
+
+from paasta_tools.utils import DEFAULT_SOA_DIR
+from paasta_tools.utils import get_soa_config_index_path
+from paasta_tools.utils import load_system_paasta_config
+from paasta_tools.utils import paasta_print
+from paasta_tools.utils import SoaConfigIndex
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Rebuilds or verifies the index of soa-configs instances.')
+    parser.add_argument(
+        'action', choices=('rebuild', 'verify'),
+        help='Whether to rebuild the index from scratch, or compare it with soa-configs',
+    )
+    parser.add_argument(
+        '-d', '--soa-dir', dest='soa_dir', metavar='SOA_DIR',
+        default=DEFAULT_SOA_DIR,
+        help='Use a different soa config directory',
+    )
+    parser.add_argument(
+        '--index-dir', dest='index_dir', metavar='INDEX_DIR',
+        help='Use this directory for the index, instead of the soa_config_index_dir of the system paasta config',
+    )
+    parser.add_argument(
+        '-v', '--verbose', action='store_true', dest='verbose', default=False,
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+
+    index_dir = args.index_dir or load_system_paasta_config().get_soa_config_index_dir()
+    if not index_dir:
+        paasta_print('No soa_config_index_dir is configured, pass --index-dir')
+        sys.exit(1)
+    index_path = get_soa_config_index_path(index_dir, args.soa_dir)
+    index = SoaConfigIndex(args.soa_dir, index_path)
+
+    if args.action == 'rebuild':
+        index.clear()
+        index.refresh()
+        if index.dirty:
+            paasta_print(f'Failed to save the index to {index_path}')
+            sys.exit(1)
+        num_files = sum(len(service_files) for service_files in index.services.values())
+        paasta_print(f'Indexed {num_files} config files of {len(index.services)} services into {index_path}')
+    else:
+        problems = index.verify()
+        for problem in problems:
+            paasta_print(problem)
+        if problems:
+            paasta_print(f'{index_path} differs from {args.soa_dir} in {len(problems)} places')
+            sys.exit(1)
+        paasta_print(f'{index_path} is up to date')
+
+
+if __name__ == '__main__':
+    main()
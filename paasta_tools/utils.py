@@ -24,6 +24,7 @@ import io
 import json
 import logging
 import math
+import multiprocessing.util
 import os
 import pwd
 import queue
@@ -103,6 +104,7 @@ no_escape = re.compile(r'\x1B\[[0-9;]*[mK]')
 AUDIT_LOG_STREAM = 'stream_paasta-audit-log'
 
 DEFAULT_SYNAPSE_HAPROXY_URL_FORMAT = "http://{host:s}:{port:d}/;csv;norefresh"
+DEFAULT_SYNAPSE_HAPROXY_POOL_MAXSIZE = 4
 
 DEFAULT_CPU_PERIOD = 100000
 DEFAULT_CPU_BURST_ADD = 1
@@ -124,31 +126,159 @@ INSTANCE_TYPES = (
 class TimeCacheEntry(TypedDict):
     data: Any
     fetch_time: float
+    file_mtimes: Optional[Tuple[Optional[int], ...]]
+
+
+class TimeCacheStats(TypedDict):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
 
 
 _CacheRetT = TypeVar('_CacheRetT')
 
 
+class _TimeCacheFetch:
+    """A fetch which is in progress for one cache key. Concurrent callers asking
+    for the same key wait on ``done`` and share the result instead of all calling
+    the wrapped function at once."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.data: Any = None
+        self.error: Optional[BaseException] = None
+
+
+_time_caches: List['time_cache'] = []
+
+
+def get_time_caches() -> List['time_cache']:
+    return list(_time_caches)
+
+
+def _get_file_mtimes(paths: Iterable[str]) -> Tuple[Optional[int], ...]:
+    mtimes: List[Optional[int]] = []
+    for path in paths:
+        try:
+            mtimes.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
 class time_cache:
-    def __init__(self, ttl: float = 0) -> None:
-        self.configs: Dict[Tuple, TimeCacheEntry] = {}
+    """Caches the return value of the decorated function for ``ttl`` seconds.
+
+    :param ttl: number of seconds a cached value is considered fresh. A ttl of 0
+        disables caching. Callers can override it per call with a ``ttl`` kwarg.
+    :param maxsize: if set, the maximum number of entries to keep. The least
+        recently used entry is evicted when the cache grows past it.
+    :param watch_files: optional function which is called with the same arguments
+        as the decorated function and returns the paths of the files the result was
+        built from. An entry is invalidated as soon as the mtime of any of them changes.
+
+    The cache is safe to use from several threads, and concurrent callers asking
+    for the same key wait on a single call to the decorated function.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 0,
+        maxsize: Optional[int] = None,
+        watch_files: Optional[Callable[..., Iterable[str]]] = None,
+    ) -> None:
+        self.configs: 'OrderedDict[Tuple, TimeCacheEntry]' = OrderedDict()
         self.ttl = ttl
+        self.maxsize = maxsize
+        self.watch_files = watch_files
+        self.name = 'unknown'
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._fetches: Dict[Tuple, _TimeCacheFetch] = {}
+        _time_caches.append(self)
 
     def __call__(self, f: Callable[..., _CacheRetT]) -> Callable[..., _CacheRetT]:
+        self.name = '{}.{}'.format(getattr(f, '__module__', None), getattr(f, '__qualname__', repr(f)))
+
         def cache(*args: Any, **kwargs: Any) -> _CacheRetT:
-            if 'ttl' in kwargs:
-                ttl = kwargs['ttl']
-                del kwargs['ttl']
-            else:
-                ttl = self.ttl
+            ttl = kwargs.pop('ttl', self.ttl)
             key = args
-            for item in kwargs.items():
+            for item in sorted(kwargs.items()):
                 key += item
-            if (not ttl) or (key not in self.configs) or (time.time() - self.configs[key]['fetch_time'] > ttl):
-                self.configs[key] = {'data': f(*args, **kwargs), 'fetch_time': time.time()}
-            return self.configs[key]['data']
+            file_mtimes = None
+            if self.watch_files is not None:
+                file_mtimes = _get_file_mtimes(self.watch_files(*args, **kwargs))
+
+            with self._lock:
+                entry = self.configs.get(key)
+                if entry is not None and self._is_fresh(entry, ttl, file_mtimes):
+                    self.hits += 1
+                    self.configs.move_to_end(key)
+                    return entry['data']
+                self.misses += 1
+                fetch = self._fetches.get(key)
+                if fetch is None:
+                    fetch = self._fetches[key] = _TimeCacheFetch()
+                    is_fetcher = True
+                else:
+                    is_fetcher = False
+
+            if not is_fetcher:
+                fetch.done.wait()
+                if fetch.error is not None:
+                    raise fetch.error
+                return fetch.data
+
+            try:
+                fetch.data = f(*args, **kwargs)
+            except BaseException as e:
+                fetch.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._fetches[key]
+                    if fetch.error is None:
+                        self._store(key, fetch.data, file_mtimes)
+                fetch.done.set()
+            return fetch.data
+
+        cache.cache = self  # type: ignore
         return cache
 
+    def _is_fresh(
+        self,
+        entry: TimeCacheEntry,
+        ttl: float,
+        file_mtimes: Optional[Tuple[Optional[int], ...]],
+    ) -> bool:
+        if not ttl or time.time() - entry['fetch_time'] > ttl:
+            return False
+        return file_mtimes is None or file_mtimes == entry['file_mtimes']
+
+    def _store(self, key: Tuple, data: Any, file_mtimes: Optional[Tuple[Optional[int], ...]]) -> None:
+        self.configs[key] = {'data': data, 'fetch_time': time.time(), 'file_mtimes': file_mtimes}
+        self.configs.move_to_end(key)
+        if self.maxsize is not None:
+            while len(self.configs) > self.maxsize:
+                self.configs.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.configs.clear()
+
+    def stats(self) -> TimeCacheStats:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self.configs),
+            }
+
 
 _SortDictsT = TypeVar('_SortDictsT', bound=Mapping)
 
@@ -1079,6 +1209,12 @@ class LogReaderConfig(TypedDict):
     options: Dict
 
 
+class ApiProfilingConfig(TypedDict, total=False):
+    cprofile_sample_rate: float
+    slow_request_seconds: float
+    slow_request_dumps: int
+
+
 # The active log writer.
 _log_writer = None
 # The map of name -> LogWriter subclasses, used by configure_log.
@@ -1369,20 +1505,51 @@ def _empty_context() -> Iterator[None]:
 
 _AnyIO = Union[io.IOBase, IO]
 
+# Buffered writes of a FileLogWriter are at most this big (PIPE_BUF on Linux), so that the lines several processes
+# append to the same file don't interleave even on filesystems where big appends aren't atomic. Longer lines are still
+# written on their own.
+LOG_FILE_WRITE_SIZE = 4096
+DEFAULT_LOG_FLUSH_INTERVAL = 1.0
+DEFAULT_LOG_FLUSH_BYTES = 64 * 1024
+
 
 @register_log_writer('file')
 class FileLogWriter(LogWriter):
+    """Writes logs to files, whose paths are path_format formatted with the service, component, level, cluster and
+    instance of the logs.
+
+    By default, every line is written by opening its file, writing it and closing it. With buffered=True, lines are
+    buffered instead, and written to files kept open by a background thread, every flush_interval seconds or as soon
+    as flush_bytes are buffered, whichever comes first, as well as when the process exits. Lines of the same file are
+    coalesced into writes of up to LOG_FILE_WRITE_SIZE bytes.
+    """
+
     def __init__(
         self,
         path_format: str,
         mode: str = 'a+',
         line_delimiter: str = '\n',
         flock: bool = False,
+        buffered: bool = False,
+        flush_interval: float = DEFAULT_LOG_FLUSH_INTERVAL,
+        flush_bytes: int = DEFAULT_LOG_FLUSH_BYTES,
     ) -> None:
         self.path_format = path_format
         self.mode = mode
         self.flock = flock
         self.line_delimiter = line_delimiter
+        self.buffered = buffered
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self._buffer_lock = threading.Lock()
+        self._buffers: Dict[str, List[bytes]] = {}
+        self._buffered_bytes = 0
+        # Only one flush writes at a time, so lines are written in the order they were logged
+        self._flush_lock = threading.Lock()
+        self._files: Dict[str, io.FileIO] = {}
+        self._flush_needed = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._pid = os.getpid()
 
     def maybe_flock(self, fd: _AnyIO) -> ContextManager:
         if self.flock:
@@ -1401,6 +1568,12 @@ class FileLogWriter(LogWriter):
         )
 
     def _log_message(self, path: str, message: str) -> None:
+        if self.buffered:
+            self._buffer_message(path, message)
+        else:
+            self._write_message(path, message)
+
+    def _write_message(self, path: str, message: str) -> None:
         # We use io.FileIO here because it guarantees that write() is implemented with a single write syscall,
         # and on Linux, writes to O_APPEND files with a single write syscall are atomic.
         #
@@ -1417,6 +1590,99 @@ class FileLogWriter(LogWriter):
                 file=sys.stderr,
             )
 
+    def _check_forked(self) -> None:
+        """Starts over if we were forked since the last time we logged: what is buffered is the parent's to write,
+        the flusher didn't survive the fork, and the locks may have been held by a thread that didn't either.
+        """
+        if os.getpid() == self._pid:
+            return
+        for f in self._files.values():
+            # Only closes our copy of the file descriptor, the parent keeps its own
+            f.close()
+        self._files = {}
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_needed = threading.Event()
+        self._buffers = {}
+        self._buffered_bytes = 0
+        self._flusher = None
+        self._pid = os.getpid()
+
+    def _buffer_message(self, path: str, message: str) -> None:
+        data = message.encode('UTF-8')
+        self._check_forked()
+        with self._buffer_lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+                self._flusher.start()
+                # Unlike atexit hooks, multiprocessing finalizers also run when a multiprocessing child exits
+                multiprocessing.util.Finalize(None, self.flush, exitpriority=0)  # type: ignore
+            self._buffers.setdefault(path, []).append(data)
+            self._buffered_bytes += len(data)
+            if self._buffered_bytes >= self.flush_bytes:
+                self._flush_needed.set()
+
+    def _flush_periodically(self) -> None:
+        while True:
+            self._flush_needed.wait(self.flush_interval)
+            self._flush_needed.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes the lines buffered so far."""
+        self._check_forked()
+        with self._flush_lock:
+            with self._buffer_lock:
+                buffers, self._buffers = self._buffers, {}
+                self._buffered_bytes = 0
+            for path, lines in buffers.items():
+                self._write_lines(path, lines)
+
+    def _get_file(self, path: str) -> io.FileIO:
+        """Returns the cached file of path, reopening it if it was rotated or removed since it was opened."""
+        f = self._files.get(path)
+        if f is not None:
+            try:
+                if os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                    return f
+            except OSError:
+                pass
+            f.close()
+        f = self._files[path] = io.FileIO(path, mode=self.mode, closefd=True)
+        return f
+
+    def _write_lines(self, path: str, lines: List[bytes]) -> None:
+        chunks: List[bytes] = []
+        chunk = b''
+        for line in lines:
+            if chunk and len(chunk) + len(line) > LOG_FILE_WRITE_SIZE:
+                chunks.append(chunk)
+                chunk = b''
+            chunk += line
+        chunks.append(chunk)
+        try:
+            f = self._get_file(path)
+            with self.maybe_flock(f):
+                for chunk in chunks:
+                    # FileIO.write is a single write syscall; see _write_message
+                    f.write(chunk)
+        except IOError as e:
+            self._files.pop(path, None)
+            paasta_print(
+                "Could not log to {}: {}: {} -- would have logged: {}".format(
+                    path, type(e).__name__, str(e), b''.join(lines).decode('UTF-8'),
+                ),
+                file=sys.stderr,
+            )
+
+    def close(self) -> None:
+        """Writes the lines buffered so far, and closes the files kept open to write them."""
+        self.flush()
+        with self._flush_lock:
+            for f in self._files.values():
+                f.close()
+            self._files = {}
+
     def log(
         self,
         service: str,
@@ -1601,12 +1867,14 @@ class SystemPaastaConfigDict(TypedDict, total=False):
     metrics_provider: str
     deployd_worker_failure_backoff_factor: int
     deployd_maintenance_polling_frequency: int
+    deployd_use_marathon_state_mirror: bool
     sensu_host: str
     sensu_port: int
     dockercfg_location: str
     synapse_port: int
     synapse_host: str
     synapse_haproxy_url_format: str
+    synapse_haproxy_pool_maxsize: int
     cluster_autoscaling_resources: IdToClusterAutoscalingResourcesDict
     resource_pool_settings: PoolToResourcePoolSettingsDict
     cluster_fqdn_format: str
@@ -1650,6 +1918,9 @@ class SystemPaastaConfigDict(TypedDict, total=False):
     register_native_services: bool
     nerve_readiness_check_script: str
     tron: Dict
+    soa_config_index_dir: str
+    api_response_cache_ttls: Dict[str, float]
+    api_profiling: ApiProfilingConfig
 
 
 def load_system_paasta_config(path: str = PATH_TO_SYSTEM_PAASTA_CONFIG_DIR) -> 'SystemPaastaConfig':
@@ -1824,6 +2095,15 @@ class SystemPaastaConfig:
         """
         return self.config_dict.get('deployd_maintenance_polling_frequency', 30)
 
+    def get_deployd_use_marathon_state_mirror(self) -> bool:
+        """This controls whether the deployd maintenance watcher keeps a copy of the
+        marathon apps, kept up to date from marathon's event stream, rather than
+        listing the apps of every marathon shard whenever hosts start draining.
+
+        :returns: A boolean
+        """
+        return self.config_dict.get('deployd_use_marathon_state_mirror', False)
+
     def get_deployd_startup_oracle_enabled(self) -> bool:
         """This controls whether deployd will add all services that need a bounce on
         startup. Generally this is desirable behavior. If you are performing a bounce
@@ -1873,6 +2153,13 @@ class SystemPaastaConfig:
         :returns: A format string for constructing the URL of haproxy-synapse's status page."""
         return self.config_dict.get('synapse_haproxy_url_format', DEFAULT_SYNAPSE_HAPROXY_URL_FORMAT)
 
+    def get_synapse_haproxy_pool_maxsize(self) -> int:
+        """Get the number of keep-alive connections to keep open to the haproxy-synapse of each host.
+        Defaults to 4.
+
+        :returns: An integer"""
+        return self.config_dict.get('synapse_haproxy_pool_maxsize', DEFAULT_SYNAPSE_HAPROXY_POOL_MAXSIZE)
+
     def get_cluster_autoscaling_resources(self) -> IdToClusterAutoscalingResourcesDict:
         return self.config_dict.get('cluster_autoscaling_resources', {})
 
@@ -2100,6 +2387,31 @@ class SystemPaastaConfig:
     def get_tron_config(self) -> dict:
         return self.config_dict.get('tron', {})
 
+    def get_soa_config_index_dir(self) -> Optional[str]:
+        """Get the directory the indexes of the soa-configs instance files are kept
+        in. Instances are listed by parsing the soa-configs directly if this isn't set.
+
+        :return: string path, or None
+        """
+        return self.config_dict.get('soa_config_index_dir')
+
+    def get_api_response_cache_ttls(self) -> Dict[str, float]:
+        """Get how many seconds the paasta API should cache the responses of its routes for,
+        by route name. These override the defaults of paasta_tools.api.response_cache.
+
+        :return: dict of route name to seconds
+        """
+        return self.config_dict.get('api_response_cache_ttls', {})
+
+    def get_api_profiling_config(self) -> ApiProfilingConfig:
+        """Get the settings of the request profiling of the paasta API: the fraction of
+        requests to run under cProfile, and how slow a request has to be to be kept for
+        /v1/admin/slow_requests (and how many of them to keep).
+
+        :return: dict of settings, missing ones default to those of paasta_tools.api.profiling
+        """
+        return self.config_dict.get('api_profiling', {})
+
 
 def _run(
     command: Union[str, List[str]],
@@ -2435,13 +2747,9 @@ def list_all_instances_for_service(
     return instances
 
 
-def get_tron_instance_list_from_yaml(service: str, conf_file: str, soa_dir: str) -> Collection[Tuple[str, str]]:
-    instance_list = []
-    tron_config_content = service_configuration_lib.read_extra_service_information(
-        service,
-        conf_file,
-        soa_dir=soa_dir,
-    )
+def get_tron_instances_from_config(tron_config_content: Dict[str, Any]) -> List[str]:
+    """Returns the job.action instance names defined in the contents of a tron-*.yaml file"""
+    instances = []
     jobs = tron_config_content.get('jobs', [])
     if isinstance(jobs, list):
         jobs = [(job['name'], job) for job in jobs]
@@ -2456,9 +2764,17 @@ def get_tron_instance_list_from_yaml(service: str, conf_file: str, soa_dir: str)
             action_names = [action['name'] for action in actions]
 
         for name in action_names:
-            instance = f"{job_name}.{name}"
-            instance_list.append((service, instance))
-    return instance_list
+            instances.append(f"{job_name}.{name}")
+    return instances
+
+
+def get_tron_instance_list_from_yaml(service: str, conf_file: str, soa_dir: str) -> Collection[Tuple[str, str]]:
+    tron_config_content = service_configuration_lib.read_extra_service_information(
+        service,
+        conf_file,
+        soa_dir=soa_dir,
+    )
+    return [(service, instance) for instance in get_tron_instances_from_config(tron_config_content)]
 
 
 def get_instance_list_from_yaml(service: str, conf_file: str, soa_dir: str) -> Collection[Tuple[str, str]]:
@@ -2481,6 +2797,235 @@ def get_pipeline_config(service: str, soa_dir: str = DEFAULT_SOA_DIR) -> List[Di
     return service_configuration.get('deploy', {}).get('pipeline', [])
 
 
+class SoaConfigIndexEntry(TypedDict):
+    mtime_ns: int
+    size: int
+    keys: List[str]
+    instances: List[str]
+
+
+class SoaConfigIndex:
+    """A persistent index of the instances defined by the ``{instance_type}-{cluster}.yaml``
+    files of a soa_dir, so that listing them doesn't mean parsing every one of those files.
+
+    Every indexed file remembers its mtime and size, and only files where either
+    changed get parsed again when the index is refreshed.
+
+    :param soa_dir: The SOA config directory to index
+    :param index_path: The file to persist the index to, or None to keep it in memory
+    """
+    VERSION = 1
+    # Files modified this recently could be modified again without their mtime
+    # changing, so they are parsed again on the next refresh
+    RACY_SECONDS = 2
+
+    def __init__(self, soa_dir: str, index_path: Optional[str] = None) -> None:
+        self.soa_dir = os.path.abspath(soa_dir)
+        self.index_path = index_path
+        self.services: Dict[str, Dict[str, SoaConfigIndexEntry]] = {}
+        self.dirty = False
+        self.lock = threading.RLock()
+        self.load()
+
+    @staticmethod
+    def parse_filename(filename: str) -> Optional[Tuple[str, str]]:
+        """Returns the (instance_type, cluster) of an instance config filename, or
+        None if it isn't one."""
+        if not filename.endswith('.yaml'):
+            return None
+        instance_type, _, cluster = filename[:-len('.yaml')].partition('-')
+        if instance_type not in INSTANCE_TYPES or not cluster:
+            return None
+        return instance_type, cluster
+
+    def load(self) -> None:
+        if self.index_path is None:
+            return
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log.warning(f"Ignoring unreadable soa-configs index {self.index_path}: {e}")
+            return
+        if index.get('version') == self.VERSION and index.get('soa_dir') == self.soa_dir:
+            self.services = index['services']
+
+    def save(self) -> None:
+        """Persists the index if it changed. Failing to do so is logged rather than
+        raised, the index just gets rebuilt in memory next time."""
+        with self.lock:
+            if self.index_path is None or not self.dirty:
+                return
+            tmp_path = f'{self.index_path}.{os.getpid()}.tmp'
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump({'version': self.VERSION, 'soa_dir': self.soa_dir, 'services': self.services}, f)
+                os.replace(tmp_path, self.index_path)
+            except OSError as e:
+                log.warning(f"Failed to save soa-configs index {self.index_path}: {e}")
+                return
+            self.dirty = False
+
+    def clear(self) -> None:
+        with self.lock:
+            self.services = {}
+            self.dirty = True
+
+    def list_services(self) -> List[str]:
+        return sorted(
+            service for service in os.listdir(self.soa_dir)
+            if os.path.isdir(os.path.join(self.soa_dir, service))
+        )
+
+    def list_config_files(self, service: str) -> List[str]:
+        try:
+            filenames = os.listdir(os.path.join(self.soa_dir, service))
+        except OSError:
+            return []
+        return sorted(filename for filename in filenames if self.parse_filename(filename) is not None)
+
+    def parse_config_file(self, service: str, filename: str) -> Tuple[List[str], List[str]]:
+        """Returns the top level keys of a config file, and the instance names defined by it"""
+        instance_type, _ = self.parse_filename(filename)
+        # Not read_extra_service_information, as its yaml cache would hide changes to the file
+        try:
+            with open(os.path.join(self.soa_dir, service, filename), encoding='UTF-8') as f:
+                content = service_configuration_lib.load_yaml(f.read()) or {}
+        except FileNotFoundError:
+            content = {}
+        keys = list(content)
+        if instance_type == 'tron':
+            instances = get_tron_instances_from_config(content)
+        else:
+            instances = [key for key in keys if not key.startswith('_')]
+        return keys, instances
+
+    def refresh_file(self, service: str, filename: str) -> None:
+        try:
+            st = os.stat(os.path.join(self.soa_dir, service, filename))
+        except FileNotFoundError:
+            if self.services.get(service, {}).pop(filename, None) is not None:
+                self.dirty = True
+            return
+        entry = self.services.get(service, {}).get(filename)
+        if entry is not None and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            return
+        keys, instances = self.parse_config_file(service, filename)
+        racy = time.time() - st.st_mtime < self.RACY_SECONDS
+        self.services.setdefault(service, {})[filename] = {
+            'mtime_ns': 0 if racy else st.st_mtime_ns,
+            'size': st.st_size,
+            'keys': keys,
+            'instances': instances,
+        }
+        self.dirty = True
+
+    def refresh_service(self, service: str, filenames: Optional[Iterable[str]] = None) -> None:
+        """Brings the entries of a service up to date.
+
+        :param service: The service name
+        :param filenames: Only look at these config files of the service, rather than all of them
+        """
+        with self.lock:
+            if filenames is None:
+                filenames = self.list_config_files(service)
+                for filename in set(self.services.get(service, {})) - set(filenames):
+                    del self.services[service][filename]
+                    self.dirty = True
+            for filename in filenames:
+                self.refresh_file(service, filename)
+            if service in self.services and not self.services[service]:
+                del self.services[service]
+
+    def refresh(self) -> None:
+        """Brings the whole index up to date, and saves it"""
+        with self.lock:
+            services = self.list_services()
+            for service in set(self.services) - set(services):
+                del self.services[service]
+                self.dirty = True
+            for service in services:
+                self.refresh_service(service)
+            self.save()
+
+    def get_keys(self, service: str, filename: str) -> List[str]:
+        """Returns the top level keys of a config file, as of the last refresh"""
+        with self.lock:
+            entry = self.services.get(service, {}).get(filename)
+            return list(entry['keys']) if entry is not None else []
+
+    def get_service_instance_list(
+        self,
+        service: str,
+        cluster: str,
+        instance_type: str = None,
+    ) -> List[Tuple[str, str]]:
+        """Same as :func:`get_service_instance_list`, as of the last refresh"""
+        instance_types: Tuple[str, ...]
+        if instance_type in INSTANCE_TYPES:
+            instance_types = (instance_type,)
+        else:
+            instance_types = INSTANCE_TYPES
+        instance_list: List[Tuple[str, str]] = []
+        with self.lock:
+            service_files = self.services.get(service, {})
+            for srv_instance_type in instance_types:
+                entry = service_files.get(f'{srv_instance_type}-{cluster}.yaml')
+                if entry is not None:
+                    instance_list.extend((service, instance) for instance in entry['instances'])
+        return instance_list
+
+    def get_indexed_services(self) -> List[str]:
+        with self.lock:
+            return sorted(self.services)
+
+    def verify(self) -> List[str]:
+        """Compares the index with the contents of the soa_dir, without updating it.
+
+        :returns: A description of every difference found
+        """
+        problems = []
+        with self.lock:
+            on_disk = set()
+            for service in self.list_services():
+                for filename in self.list_config_files(service):
+                    on_disk.add((service, filename))
+                    entry = self.services.get(service, {}).get(filename)
+                    if entry is None:
+                        problems.append(f"{service}/{filename} is missing from the index")
+                    elif (entry['keys'], entry['instances']) != self.parse_config_file(service, filename):
+                        problems.append(f"{service}/{filename} is out of date in the index")
+            for service, service_files in self.services.items():
+                for filename in service_files:
+                    if (service, filename) not in on_disk:
+                        problems.append(f"{service}/{filename} is in the index but doesn't exist")
+        return problems
+
+
+_soa_config_indexes: Dict[str, SoaConfigIndex] = {}
+_soa_config_indexes_lock = threading.Lock()
+
+
+def get_soa_config_index_path(index_dir: str, soa_dir: str) -> str:
+    soa_dir_hash = hashlib.sha1(os.path.abspath(soa_dir).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(index_dir, f'soa_config_index_{soa_dir_hash}.json')
+
+
+def get_soa_config_index(soa_dir: str = DEFAULT_SOA_DIR) -> Optional[SoaConfigIndex]:
+    """Returns this process' SoaConfigIndex of a soa_dir, or None if the system
+    paasta config doesn't set a soa_config_index_dir."""
+    index_dir = optionally_load_system_paasta_config().get_soa_config_index_dir()
+    if not index_dir:
+        return None
+    index_path = get_soa_config_index_path(index_dir, soa_dir)
+    with _soa_config_indexes_lock:
+        if index_path not in _soa_config_indexes:
+            _soa_config_indexes[index_path] = SoaConfigIndex(soa_dir, index_path)
+        return _soa_config_indexes[index_path]
+
+
 def get_service_instance_list_no_cache(
     service: str,
     cluster: Optional[str] = None,
@@ -2504,6 +3049,12 @@ def get_service_instance_list_no_cache(
     else:
         instance_types = INSTANCE_TYPES
 
+    index = get_soa_config_index(soa_dir)
+    if index is not None:
+        index.refresh_service(service, [f'{srv_instance_type}-{cluster}.yaml' for srv_instance_type in instance_types])
+        index.save()
+        return index.get_service_instance_list(service, cluster, instance_type)
+
     instance_list: List[Tuple[str, str]] = []
     for srv_instance_type in instance_types:
         conf_file = f"{srv_instance_type}-{cluster}"
@@ -2524,7 +3075,27 @@ def get_service_instance_list_no_cache(
     return instance_list
 
 
-@time_cache(ttl=5)
+def get_service_instance_config_files(
+    service: str,
+    cluster: Optional[str] = None,
+    instance_type: str = None,
+    soa_dir: str = DEFAULT_SOA_DIR,
+) -> List[str]:
+    """Return the soa-configs files an instance listing or instance config for a
+    service is built from, so that cached copies can be invalidated when they change."""
+    if not cluster:
+        return []
+    if instance_type in INSTANCE_TYPES:
+        instance_types: Tuple[str, ...] = (instance_type,)
+    else:
+        instance_types = INSTANCE_TYPES
+    service_dir = os.path.join(soa_dir, service)
+    return [
+        os.path.join(service_dir, f'{srv_instance_type}-{cluster}.yaml') for srv_instance_type in instance_types
+    ]
+
+
+@time_cache(ttl=5, maxsize=4096, watch_files=get_service_instance_config_files)
 def get_service_instance_list(
     service: str,
     cluster: Optional[str] = None,
@@ -2565,8 +3136,17 @@ def get_services_for_cluster(
     rootdir = os.path.abspath(soa_dir)
     log.debug("Retrieving all service instance names from %s for cluster %s", rootdir, cluster)
     instance_list: List[Tuple[str, str]] = []
-    for srv_dir in os.listdir(rootdir):
-        service_instance_list = get_service_instance_list(srv_dir, cluster, instance_type, soa_dir)
+    index = get_soa_config_index(soa_dir)
+    if index is not None:
+        index.refresh()
+        srv_dirs = index.get_indexed_services()
+    else:
+        srv_dirs = os.listdir(rootdir)
+    for srv_dir in srv_dirs:
+        if index is not None:
+            service_instance_list = index.get_service_instance_list(srv_dir, cluster, instance_type)
+        else:
+            service_instance_list = get_service_instance_list(srv_dir, cluster, instance_type, soa_dir)
         for service_instance in service_instance_list:
             service, instance = service_instance
             if instance.startswith('_'):
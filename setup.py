@@ -94,6 +94,7 @@ setup(
             'paasta_chronos_rerun=paasta_tools.chronos_rerun:main',
             'paasta_list_tron_namespaces=paasta_tools.list_tron_namespaces:main',
             'paasta_setup_tron_namespace=paasta_tools.setup_tron_namespace:main',
+            'paasta_soa_config_index=paasta_tools.soa_config_index:main',
             'paasta_cleanup_maintenance=paasta_tools.cleanup_maintenance:main',
             'paasta_docker_wrapper=paasta_tools.docker_wrapper:main',
             'paasta_firewall_update=paasta_tools.firewall_update:main',
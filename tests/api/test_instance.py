@@ -22,6 +22,7 @@ from paasta_tools.api import settings
 from paasta_tools.api.views import instance
 from paasta_tools.api.views.exception import ApiFailure
 from paasta_tools.chronos_tools import ChronosJobConfig
+from paasta_tools.utils import NoConfigurationForServiceError
 
 
 @mock.patch('paasta_tools.api.views.instance.marathon_job_status', autospec=True)
@@ -327,3 +328,106 @@ def test_add_slave_info():
         'slave': {'some': 'thing'},
     }
     assert instance.add_slave_info(mock_task)._Task__items == expected
+
+
+@mock.patch('paasta_tools.api.views.instance.marathon_tools.load_marathon_service_config', autospec=True)
+@mock.patch('paasta_tools.api.views.instance.validate_service_instance', autospec=True)
+@mock.patch('paasta_tools.api.views.instance.get_actual_deployments', autospec=True)
+def test_bulk_instance_status(
+    mock_get_actual_deployments,
+    mock_validate_service_instance,
+    mock_load_marathon_service_config,
+):
+    settings.cluster = 'fake_cluster'
+    mock_get_actual_deployments.return_value = {
+        'fake_cluster.instance_a': 'GIT_SHA',
+        'fake_cluster.instance_b': 'GIT_SHA',
+    }
+
+    def fake_validate_service_instance(service, instance, cluster, soa_dir):
+        if instance == 'missing':
+            raise NoConfigurationForServiceError()
+        return 'marathon'
+    mock_validate_service_instance.side_effect = fake_validate_service_instance
+
+    def fake_load_marathon_service_config(service, instance, cluster, soa_dir):
+        job_config = mock.create_autospec(marathon_tools.MarathonServiceConfig)
+        job_config.format_marathon_app_dict.return_value = {
+            'id': marathon_tools.format_job_id(service, instance, 'gitsha', 'config'),
+        }
+        job_config.get_instances.return_value = 2
+        return job_config
+    mock_load_marathon_service_config.side_effect = fake_load_marathon_service_config
+
+    client = mock.create_autospec(marathon.MarathonClient)
+    client.list_apps.return_value = [
+        marathon.MarathonApp(
+            id='/' + marathon_tools.format_job_id('fake_service', instance, 'gitsha', 'config'),
+            instances=2,
+            tasks_running=2,
+            deployments=[],
+        )
+        for instance in ('instance_a', 'instance_b')
+    ]
+    client.list_queue.return_value = []
+    settings.marathon_clients = mock.Mock(get_current_client_for_service=mock.Mock(return_value=client))
+
+    request = testing.DummyRequest()
+    request.swagger_data = {
+        'service_instances': ['fake_service.instance_a', 'fake_service.instance_b', 'fake_service.missing'],
+    }
+    response = instance.bulk_instance_status(request)
+
+    assert [
+        (status['instance'], status['status_code']) for status in response['instances']
+    ] == [('instance_a', 200), ('instance_b', 200), ('missing', 404)]
+    for status in response['instances'][:2]:
+        assert status['status']['git_sha'] == 'GIT_SHA'
+        assert status['status']['marathon']['app_count'] == 1
+        assert status['status']['marathon']['deploy_status'] == 'Running'
+        assert status['status']['marathon']['running_instance_count'] == 2
+    assert 'deployment key fake_cluster.missing not found' in response['instances'][2]['error_message']
+    # Everything was fetched once, for all the instances
+    assert client.list_apps.call_count == 1
+    assert client.list_queue.call_count == 1
+    assert client.get_app.call_count == 0
+    assert mock_get_actual_deployments.call_count == 1
+
+
+@mock.patch('paasta_tools.api.views.instance.list_all_instances_for_service', autospec=True)
+@mock.patch('paasta_tools.api.views.instance.get_instance_status', autospec=True)
+def test_bulk_instance_status_whole_service(mock_get_instance_status, mock_list_all_instances_for_service):
+    settings.cluster = 'fake_cluster'
+    mock_list_all_instances_for_service.return_value = {'main', 'canary'}
+    request = testing.DummyRequest()
+    request.swagger_data = {'service': 'fake_service', 'verbose': True}
+
+    response = instance.bulk_instance_status(request)
+    assert [status['instance'] for status in response['instances']] == ['canary', 'main']
+    snapshot = mock_get_instance_status.call_args_list[0][0][3]
+    assert mock_get_instance_status.call_args_list == [
+        mock.call('fake_service', 'canary', True, snapshot),
+        mock.call('fake_service', 'main', True, snapshot),
+    ]
+
+    request.swagger_data = {}
+    with raises(ApiFailure) as excinfo:
+        instance.bulk_instance_status(request)
+    assert excinfo.value.err == 400
+
+
+def test_instance_status_snapshot_get_kubernetes_pods():
+    pods = [
+        mock.Mock(metadata=mock.Mock(labels={'paasta_instance': 'main'})),
+        mock.Mock(metadata=mock.Mock(labels={'paasta_instance': 'canary'})),
+        mock.Mock(metadata=mock.Mock(labels=None)),
+    ]
+    client = mock.Mock()
+    client.core.list_namespaced_pod.return_value.items = pods
+
+    snapshot = instance.InstanceStatusSnapshot()
+    assert snapshot.get_kubernetes_pods('fake_service', 'main', client) == [pods[0]]
+    assert snapshot.get_kubernetes_pods('fake_service', 'canary', client) == [pods[1]]
+    client.core.list_namespaced_pod.assert_called_once_with(
+        namespace='paasta', label_selector='yelp.com/paasta_service=fake_service',
+    )
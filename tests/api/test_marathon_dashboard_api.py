@@ -11,11 +11,13 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import mock
 from pyramid import testing
 
 from paasta_tools import marathon_tools
 from paasta_tools.api import settings
 from paasta_tools.api.views.marathon_dashboard import marathon_dashboard
+from paasta_tools.marathon_dashboard import MarathonDashboardRefresher
 from paasta_tools.utils import SystemPaastaConfig
 
 
@@ -67,3 +69,18 @@ def test_list_instances():
     response = marathon_dashboard(request)
     expected_output = {settings.cluster: []}
     assert response == expected_output
+
+
+def test_marathon_dashboard_serves_refreshed_snapshot():
+    refresher = mock.Mock(spec=MarathonDashboardRefresher)
+    refresher.get_dashboard.return_value = ({'fake_cluster': []}, 1500000000)
+    request = testing.DummyRequest()
+    with mock.patch.object(settings, 'marathon_dashboard_refresher', refresher), mock.patch(
+        'paasta_tools.api.views.marathon_dashboard.create_marathon_dashboard', autospec=True,
+    ) as mock_create_marathon_dashboard:
+        assert marathon_dashboard(request) == {'fake_cluster': []}
+        assert request.response.last_modified.timestamp() == 1500000000
+        assert mock_create_marathon_dashboard.call_count == 0
+
+        refresher.get_dashboard.return_value = None
+        assert marathon_dashboard(request) == mock_create_marathon_dashboard.return_value
@@ -0,0 +1,134 @@
+# Copyright 2015-2019 Yelp Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+
+import mock
+import pytest
+from pyramid import testing
+from pyramid.request import Request
+from pyramid.response import Response
+
+from paasta_tools.api import profiling
+from paasta_tools.api import settings
+from paasta_tools.api.tweens import profiling_tween_factory
+from paasta_tools.api.views.admin import slow_requests
+
+
+class FakeClient:
+    def fetch(self, path):
+        return f'fetched {path}'
+
+    async def fetch_async(self, path):
+        return f'fetched {path}'
+
+    def fail(self, path):
+        raise ValueError(path)
+
+
+@pytest.fixture
+def fake_outbound_calls():
+    with mock.patch.object(profiling, '_outbound_calls', []), mock.patch.object(profiling, '_originals', {}):
+        profiling.register_outbound_call('fake', FakeClient, 'fetch', lambda self, path: f'fetch {path}')
+        profiling.register_outbound_call('fake', FakeClient, 'fetch_async', lambda self, path: f'fetch_async {path}')
+        profiling.register_outbound_call('fake', FakeClient, 'fail', lambda self: 'fail')
+        profiling.instrument_outbound_calls()
+        profiling.instrument_outbound_calls()
+        try:
+            yield
+        finally:
+            profiling.uninstrument_outbound_calls()
+
+
+@pytest.fixture
+def mock_get_metrics_interface():
+    with mock.patch(
+        'paasta_tools.api.profiling.metrics_lib.get_metrics_interface', autospec=True,
+    ) as mock_get_metrics_interface:
+        yield mock_get_metrics_interface
+
+
+def test_span_without_profile():
+    with profiling.span('fake', 'nothing to record it in'):
+        pass
+
+
+def test_instrument_outbound_calls(fake_outbound_calls):
+    profile = profiling.RequestProfile('fake_route', 'GET', '/fake')
+    client = FakeClient()
+    with mock.patch.object(profiling._current, 'profile', profile, create=True):
+        assert client.fetch('/a') == 'fetched /a'
+        assert asyncio.get_event_loop().run_until_complete(client.fetch_async('/b')) == 'fetched /b'
+        with pytest.raises(ValueError):
+            client.fail('/c')
+        with profiling.span('custom', 'something else'):
+            pass
+
+    assert [(span.kind, span.name, span.error) for span in profile.spans] == [
+        ('fake', 'fetch /a', None),
+        ('fake', 'fetch_async /b', None),
+        # the describe function doesn't take a path, so the span is named after the function
+        ('fake', 'fail', 'ValueError'),
+        ('custom', 'something else', None),
+    ]
+    assert all(span.start >= 0 and span.duration >= 0 for span in profile.spans)
+
+    profiling.uninstrument_outbound_calls()
+    assert FakeClient.fetch.__name__ == 'fetch'
+    assert not hasattr(FakeClient.fetch, '__wrapped__')
+
+
+def test_request_profiler_keeps_slow_requests(mock_get_metrics_interface):
+    profiler = profiling.RequestProfiler({
+        'cprofile_sample_rate': 1,
+        'slow_request_seconds': 10,
+        'slow_request_dumps': 2,
+    })
+    with mock.patch('paasta_tools.api.profiling.time.time', autospec=True) as mock_time:
+        for duration in (1, 20, 11, 30):
+            mock_time.side_effect = [0, duration, duration]
+            profile = profiling.RequestProfile('fake_route', 'GET', f'/fake?duration={duration}')
+            assert profiler.profile(profile, lambda: Response(status=200)).status_code == 200
+
+    mock_timer = mock_get_metrics_interface.return_value.create_timer
+    mock_timer.assert_called_with('api.request', route='fake_route', method='GET')
+    assert mock_timer.return_value.stop.call_count == 4
+    assert [request['path'] for request in profiler.get_slow_requests()] == ['/fake?duration=30', '/fake?duration=11']
+    assert 'function calls' in profiler.get_slow_requests()[0]['profile']
+    assert profiling.get_current_profile() is None
+
+
+def test_request_profiler_doesnt_profile_unsampled_requests(mock_get_metrics_interface):
+    profiler = profiling.RequestProfiler({'slow_request_seconds': 0})
+    with mock.patch('paasta_tools.api.profiling.cProfile.Profile', autospec=True) as mock_profile:
+        profiler.profile(profiling.RequestProfile('fake_route', 'GET', '/fake'), lambda: Response())
+    assert mock_profile.call_count == 0
+    assert profiler.get_slow_requests()[0]['profile'] is None
+
+
+def test_profiling_tween_and_slow_requests(mock_get_metrics_interface):
+    config = testing.setUp()
+    config.add_route('metastatus', '/v1/metastatus')
+    handler = mock.Mock(return_value=Response(status=500))
+    profiler = profiling.RequestProfiler({'slow_request_seconds': 0})
+    with mock.patch.object(settings, 'request_profiler', profiler):
+        profiling_tween = profiling_tween_factory(handler, config.registry)
+        profiling_tween(Request.blank('/v1/metastatus?cmd_args=-v'))
+        profiling_tween(Request.blank('/v1/nonexistent'))
+        requests = slow_requests(testing.DummyRequest())['requests']
+    testing.tearDown()
+
+    assert sorted((request['route'], request['path'], request['status_code']) for request in requests) == [
+        ('metastatus', '/v1/metastatus?cmd_args=-v', 500),
+        ('unknown', '/v1/nonexistent', 500),
+    ]
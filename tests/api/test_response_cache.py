@@ -0,0 +1,162 @@
+# Copyright 2015-2019 Yelp Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import threading
+
+import mock
+import pytest
+from pyramid import testing
+from pyramid.request import Request
+from pyramid.response import Response
+
+from paasta_tools.api import settings
+from paasta_tools.api.response_cache import CachedResponse
+from paasta_tools.api.response_cache import ResponseCache
+from paasta_tools.api.tweens import response_cache_tween_factory
+from paasta_tools.api.views.cache_stats import cache_stats
+
+
+@pytest.fixture
+def mock_response_cache():
+    cache = ResponseCache({'metastatus': 10, 'version': 0})
+    with mock.patch.object(settings, 'response_cache', cache):
+        yield cache
+
+
+@pytest.fixture
+def tween(mock_response_cache):
+    config = testing.setUp()
+    config.add_route('metastatus', '/v1/metastatus')
+    config.add_route('version', '/v1/version')
+    handler = mock.Mock(
+        side_effect=lambda request: Response(json_body={'path': request.path_qs}, last_modified=1500000000),
+    )
+    yield response_cache_tween_factory(handler, config.registry), handler
+    testing.tearDown()
+
+
+def test_response_cache_get_caches_until_expired(mock_response_cache):
+    compute = mock.Mock(return_value=Response(json_body={'fake': 'body'}))
+    with mock.patch('paasta_tools.api.response_cache.time.time', autospec=True) as mock_time:
+        mock_time.return_value = 100
+        first = mock_response_cache.get(('metastatus', '/v1/metastatus'), compute)
+        mock_time.return_value = 109
+        second = mock_response_cache.get(('metastatus', '/v1/metastatus'), compute)
+        assert compute.call_count == 1
+        mock_time.return_value = 110
+        mock_response_cache.get(('metastatus', '/v1/metastatus'), compute)
+        assert compute.call_count == 2
+        assert mock_response_cache.get_stats() == {
+            'metastatus': {'ttl': 10, 'entries': 1, 'hits': 1, 'misses': 2, 'coalesced': 0, 'not_modified': 0},
+        }
+
+    assert isinstance(first, CachedResponse)
+    assert first == second
+    assert first.body == b'{"fake":"body"}'
+
+
+def test_response_cache_get_doesnt_cache_errors(mock_response_cache):
+    error = Response(status=500)
+    compute = mock.Mock(return_value=error)
+    assert mock_response_cache.get(('metastatus', '/v1/metastatus'), compute) is error
+    assert mock_response_cache.get(('metastatus', '/v1/metastatus'), compute) is error
+    assert compute.call_count == 2
+
+    compute.side_effect = ValueError
+    with pytest.raises(ValueError):
+        mock_response_cache.get(('metastatus', '/v1/metastatus'), compute)
+    # the failed computation must not leave other requests waiting for it
+    compute.side_effect = None
+    compute.return_value = Response(json_body={})
+    assert isinstance(mock_response_cache.get(('metastatus', '/v1/metastatus'), compute), CachedResponse)
+
+
+def test_response_cache_get_single_flight(mock_response_cache):
+    computing = threading.Event()
+    finish = threading.Event()
+
+    def compute():
+        computing.set()
+        finish.wait()
+        return Response(json_body={'fake': 'body'})
+
+    results = []
+    key = ('metastatus', '/v1/metastatus')
+    leader = threading.Thread(target=lambda: results.append(mock_response_cache.get(key, compute)))
+    leader.start()
+    computing.wait()
+    followers = [
+        threading.Thread(target=lambda: results.append(mock_response_cache.get(key, mock.Mock()))) for _ in range(3)
+    ]
+    for follower in followers:
+        follower.start()
+    while mock_response_cache.get_stats()['metastatus']['coalesced'] < 3:
+        pass
+    finish.set()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert len(results) == 4
+    assert all(result == results[0] for result in results)
+    stats = mock_response_cache.get_stats()['metastatus']
+    assert (stats['misses'], stats['coalesced'], stats['hits']) == (1, 3, 0)
+
+
+def test_response_cache_tween(tween):
+    response_cache_tween, handler = tween
+
+    response = response_cache_tween(Request.blank('/v1/metastatus?cmd_args=-vv'))
+    assert response.status_code == 200
+    assert response.json_body == {'path': '/v1/metastatus?cmd_args=-vv'}
+    assert response.etag
+    assert response.cache_control.max_age == 10
+
+    cached = response_cache_tween(Request.blank('/v1/metastatus?cmd_args=-vv'))
+    assert cached.body == response.body
+    assert cached.content_type == 'application/json'
+    assert cached.last_modified.timestamp() == 1500000000
+    assert handler.call_count == 1
+
+    response_cache_tween(Request.blank('/v1/metastatus?cmd_args=-v'))
+    assert handler.call_count == 2
+
+
+def test_response_cache_tween_if_none_match(tween, mock_response_cache):
+    response_cache_tween, handler = tween
+    etag = response_cache_tween(Request.blank('/v1/metastatus')).etag
+
+    not_modified = response_cache_tween(Request.blank('/v1/metastatus', if_none_match=f'"{etag}"'))
+    assert not_modified.status_code == 304
+    assert not_modified.body == b''
+    assert not_modified.etag == etag
+
+    modified = response_cache_tween(Request.blank('/v1/metastatus', if_none_match='"stale"'))
+    assert modified.status_code == 200
+    assert mock_response_cache.get_stats()['metastatus']['not_modified'] == 1
+
+
+def test_response_cache_tween_passes_through_uncached_routes(tween):
+    response_cache_tween, handler = tween
+    response_cache_tween(Request.blank('/v1/version'))
+    response_cache_tween(Request.blank('/v1/version'))
+    response_cache_tween(Request.blank('/v1/metastatus', method='POST'))
+    response_cache_tween(Request.blank('/v1/nonexistent'))
+    assert handler.call_count == 4
+
+
+def test_cache_stats(mock_response_cache):
+    assert cache_stats(testing.DummyRequest()) == {
+        'routes': {
+            'metastatus': {'ttl': 10, 'entries': 0, 'hits': 0, 'misses': 0, 'coalesced': 0, 'not_modified': 0},
+        },
+    }
@@ -11,14 +11,19 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
+import contextlib
 from datetime import datetime
 from datetime import timedelta
 
+import a_sync
 import asynctest
 import mock
+from kazoo.exceptions import BadVersionError
+from kazoo.exceptions import NodeExistsError
 from kazoo.exceptions import NoNodeError
+from kazoo.exceptions import RolledBackError
 from pytest import raises
-from requests.exceptions import Timeout
 
 from paasta_tools import marathon_tools
 from paasta_tools.autoscaling import autoscaling_service_lib
@@ -67,6 +72,20 @@ def test_zookeeper_pool():
         assert zk_client.stop.call_count == 1
 
 
+def test_create_autoscaling_lock_leaves_the_pooled_client_open():
+    with mock.patch(
+        'paasta_tools.autoscaling.autoscaling_service_lib.ZookeeperPool', autospec=True,
+    ) as mock_zookeeper_pool:
+        mock_zk = mock_zookeeper_pool.return_value.__enter__.return_value
+        with autoscaling_service_lib.create_autoscaling_lock('service', 'instance'):
+            mock_zk.Lock.assert_called_once_with('/autoscaling/service/instance/autoscaling.lock')
+            mock_zk.Lock.return_value.acquire.assert_called_once_with(timeout=1)
+        mock_zk.Lock.return_value.release.assert_called_once_with()
+        assert mock_zk.close.call_count == 0
+        # ZookeeperPool stops and closes the client when its last user leaves
+        assert mock_zookeeper_pool.return_value.__exit__.call_count == 1
+
+
 def test_get_zookeeper_instances_defaults_to_max_instances_when_no_zk_node():
     fake_marathon_config = marathon_tools.MarathonServiceConfig(
         service='service',
@@ -314,6 +333,222 @@ def test_mesos_cpu_metrics_provider():
         assert not mock_zk_client.return_value.set.called
 
 
+def test_mesos_cpu_metrics_provider_with_collected_metrics():
+    fake_marathon_service_config = marathon_tools.MarathonServiceConfig(
+        service='fake-service',
+        instance='fake-instance',
+        cluster='fake-cluster',
+        config_dict={},
+        branch_dict=None,
+    )
+    fake_system_paasta_config = mock.MagicMock()
+    fake_system_paasta_config.get_filter_bogus_mesos_cputime_enabled.return_value = False
+    fake_mesos_task = mock.MagicMock(stats=asynctest.CoroutineMock())
+    fake_mesos_task.__getitem__.return_value = 'fake-service.fake-instance'
+    current_time = datetime.now()
+    last_time = (current_time - timedelta(seconds=600)).strftime('%s')
+
+    zk_nodes = {
+        '/autoscaling/fake-service/fake-instance/cpu_last_time': last_time.encode('utf8'),
+        '/autoscaling/fake-service/fake-instance/cpu_data': b'0:fake-service.fake-instance',
+    }
+    mock_zk = mock.Mock(get_async=mock.Mock(side_effect=lambda path: mock.Mock(get=mock.Mock(
+        return_value=(zk_nodes[path], None),
+    ))))
+    collected_metrics = autoscaling_service_lib.AutoscalingMetricsCollection(mock_zk)
+
+    with mock.patch(
+        'paasta_tools.autoscaling.autoscaling_service_lib.datetime', autospec=True,
+    ) as mock_datetime:
+        # The stats are collected well before the decision to scale is made, which must not count the time in
+        # between as time the task had to use the cpu time it used by when its stats were fetched
+        mock_datetime.now.return_value = current_time
+        collected_metrics.add_mesos_tasks_stats({
+            'fake-service.fake-instance': {
+                'cpus_limit': 1.1,
+                'cpus_system_time_secs': 240,
+                'cpus_user_time_secs': 240,
+            },
+        })
+        mock_datetime.now.return_value = current_time + timedelta(seconds=300)
+        assert 0.8 == autoscaling_service_lib.mesos_cpu_metrics_provider(
+            fake_marathon_service_config,
+            fake_system_paasta_config,
+            [mock.Mock(id='fake-service.fake-instance')],
+            [fake_mesos_task],
+            collected_metrics=collected_metrics,
+        )
+
+    assert not fake_mesos_task.stats.called
+    assert mock_zk.get_async.call_args_list == [
+        mock.call('/autoscaling/fake-service/fake-instance/cpu_last_time'),
+        mock.call('/autoscaling/fake-service/fake-instance/cpu_data'),
+    ]
+    assert not mock_zk.get.called
+    assert mock_zk.set_async.call_args_list == [
+        mock.call('/autoscaling/fake-service/fake-instance/cpu_data', b'480.0:fake-service.fake-instance'),
+        mock.call('/autoscaling/fake-service/fake-instance/cpu_last_time', current_time.strftime('%s').encode('utf8')),
+    ]
+    assert not mock_zk.set.called
+
+
+def test_get_mesos_tasks_stats():
+    in_flight = 0
+    max_in_flight = 0
+
+    def make_task(task_id, stats=None, exception=None, delay=0):
+        async def get_stats():
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(in_flight, max_in_flight)
+            try:
+                await asyncio.sleep(delay)
+                if exception:
+                    raise exception
+                return stats
+            finally:
+                in_flight -= 1
+
+        task = mock.MagicMock(stats=get_stats)
+        task.__getitem__.return_value = task_id
+        return task
+
+    mesos_tasks = [make_task(f'task{i}', stats={'i': i}, delay=0.01) for i in range(5)] + [
+        make_task('failing', exception=Exception),
+        make_task('slow', stats={}, delay=10),
+    ]
+    assert a_sync.block(
+        autoscaling_service_lib.get_mesos_tasks_stats, mesos_tasks, concurrency=2, timeout=0.5,
+    ) == {
+        'task0': {'i': 0},
+        'task1': {'i': 1},
+        'task2': {'i': 2},
+        'task3': {'i': 3},
+        'task4': {'i': 4},
+        'failing': None,
+        'slow': None,
+    }
+    assert max_in_flight == 2
+
+
+def test_autoscaling_metrics_collection():
+    zk_nodes = {
+        '/autoscaling/service/mesos_cpu/cpu_last_time': b'123',
+    }
+
+    def get_async(path):
+        async_result = mock.Mock()
+        if path in zk_nodes:
+            async_result.get.return_value = (zk_nodes[path], None)
+        else:
+            async_result.get.side_effect = NoNodeError
+        return async_result
+
+    mock_zk = mock.Mock(get_async=mock.Mock(side_effect=get_async))
+    mesos_cpu_task = mock.MagicMock(stats=asynctest.CoroutineMock(return_value={'cpus_limit': 1}))
+    mesos_cpu_task.__getitem__.return_value = 'service.mesos_cpu.1'
+    http_task = mock.MagicMock(stats=asynctest.CoroutineMock())
+    http_task.__getitem__.return_value = 'service.http.1'
+
+    def make_config(instance, metrics_provider):
+        return marathon_tools.MarathonServiceConfig(
+            service='service',
+            cluster='cluster',
+            instance=instance,
+            config_dict={'autoscaling': {'metrics_provider': metrics_provider}},
+            branch_dict=None,
+        )
+
+    http_marathon_task = mock.Mock(host='fake_host', ports=[30101])
+
+    collected_metrics = autoscaling_service_lib.AutoscalingMetricsCollection(mock_zk)
+    with asynctest.patch(
+        'paasta_tools.autoscaling.autoscaling_service_lib.get_json_body_from_service', autospec=True,
+        return_value={'utilization': 0.5},
+    ) as mock_get_json_body_from_service:
+        collected_metrics.collect([
+            (make_config('mesos_cpu', 'mesos_cpu'), [], [mesos_cpu_task]),
+            (make_config('http', 'http'), [http_marathon_task], [http_task]),
+        ])
+        mock_get_json_body_from_service.assert_called_once_with('fake_host', 30101, 'status')
+        assert collected_metrics.get_http_utilization_for_tasks(
+            make_config('http', 'http'), [http_marathon_task], 'status', autoscaling_service_lib.utilization_mapper,
+        ) == [0.5]
+        assert mock_get_json_body_from_service.call_count == 1
+
+    # The autoscaling state is only read under the autoscaling lock of its service instance, not up front
+    assert not mock_zk.get_async.called
+    assert collected_metrics.mesos_tasks_stats == {'service.mesos_cpu.1': {'cpus_limit': 1}}
+    assert not http_task.stats.called
+    assert collected_metrics.read_zk_data([
+        '/autoscaling/service/mesos_cpu/cpu_last_time',
+        '/autoscaling/service/mesos_cpu/cpu_data',
+    ]) == [b'123', None]
+    assert collected_metrics.get_mesos_tasks_stats([mesos_cpu_task]) == (
+        {'service.mesos_cpu.1': {'cpus_limit': 1}},
+        collected_metrics.mesos_tasks_stats_times['service.mesos_cpu.1'],
+    )
+    assert mesos_cpu_task.stats.call_count == 1
+    assert not mock_zk.get.called
+
+    # Writes are only waited for when flushing, and nodes that don't exist yet get created
+    mock_zk.set_async.side_effect = lambda path, value: mock.Mock(get=mock.Mock(
+        side_effect=NoNodeError if path.endswith('cpu_data') else None,
+    ))
+    collected_metrics.set_zk_data('/autoscaling/service/mesos_cpu/cpu_last_time', b'456')
+    collected_metrics.set_zk_data('/autoscaling/service/mesos_cpu/cpu_data', b'1:task')
+    assert not mock_zk.set.called
+    collected_metrics.flush()
+    mock_zk.ensure_path.assert_called_once_with('/autoscaling/service/mesos_cpu/cpu_data')
+    mock_zk.set.assert_called_once_with('/autoscaling/service/mesos_cpu/cpu_data', b'1:task')
+    assert collected_metrics.pending_writes == []
+
+
+def test_autoscaling_metrics_collection_more_services_than_slots():
+    in_flight = set()
+    max_in_flight = 0
+
+    async def fake_get_json_body_from_service(host, port, endpoint):
+        nonlocal max_in_flight
+        in_flight.add(host)
+        max_in_flight = max(max_in_flight, len(in_flight))
+        await asyncio.sleep(0.05)
+        in_flight.discard(host)
+        return {'utilization': 0.5}
+
+    configs_with_tasks = [
+        (
+            marathon_tools.MarathonServiceConfig(
+                service=f'service{i}',
+                cluster='cluster',
+                instance='main',
+                config_dict={'autoscaling': {'metrics_provider': 'http'}},
+                branch_dict=None,
+            ),
+            [mock.Mock(host=f'service{i}_host', ports=[30101])],
+            [],
+        )
+        for i in range(4)
+    ]
+    collected_metrics = autoscaling_service_lib.AutoscalingMetricsCollection(mock.Mock())
+    with asynctest.patch(
+        'paasta_tools.autoscaling.autoscaling_service_lib.get_json_body_from_service', autospec=True,
+        side_effect=fake_get_json_body_from_service,
+    ), mock.patch.object(
+        autoscaling_service_lib, 'HTTP_METRICS_SERVICES_CONCURRENCY', 1,
+    ), mock.patch.object(
+        # Less than it takes to read from every service one after the other
+        autoscaling_service_lib, 'HTTP_METRICS_TIMEOUT_BUDGET', 0.12,
+    ):
+        collected_metrics.collect(configs_with_tasks)
+
+    assert max_in_flight == 1
+    # Waiting for their turn didn't count against the budget of the services read last
+    assert collected_metrics.http_utilization == {
+        (f'service{i}', 'main', 'status'): [0.5] for i in range(4)
+    }
+
+
 def test_mesos_cpu_metrics_provider_filter_bogus_values_big_cpu_limit():
     """
     +--------+--------------+--------------+---------+-------+----------------+-----------------------+
@@ -588,37 +823,61 @@ def test_mesos_cpu_metrics_provider_filter_no_bogus_values_10_percent_cpu_limit(
 
 
 def test_get_json_body_from_service():
+    mock_session = asynctest.MagicMock()
+    mock_session.get.return_value.__aenter__.return_value.json = asynctest.CoroutineMock(
+        return_value=mock.sentinel.json_body,
+    )
     with mock.patch(
-            'paasta_tools.autoscaling.autoscaling_service_lib.requests.get', autospec=True,
-    ) as mock_request_get:
-        mock_request_get.return_value = mock.Mock(json=mock.Mock(return_value=mock.sentinel.json_body))
-        assert autoscaling_service_lib.get_json_body_from_service(
-            'fake-host', 'fake-port', 'fake-endpoint',
+        'paasta_tools.autoscaling.autoscaling_service_lib.get_http_metrics_session', autospec=True,
+        return_value=(mock_session, asyncio.Semaphore()),
+    ):
+        assert a_sync.block(
+            autoscaling_service_lib.get_json_body_from_service, 'fake-host', 'fake-port', 'fake-endpoint',
         ) == mock.sentinel.json_body
-        mock_request_get.assert_called_once_with(
-            'http://fake-host:fake-port/fake-endpoint',
-            headers={'User-Agent': mock.ANY}, timeout=2,
-        )
+        mock_session.get.assert_called_once_with('http://fake-host:fake-port/fake-endpoint', timeout=2)
+
+
+def test_get_http_metrics_session():
+    loop = asyncio.new_event_loop()
+    try:
+        asyncio.set_event_loop(loop)
+        session, semaphore = autoscaling_service_lib.get_http_metrics_session()
+        assert autoscaling_service_lib.get_http_metrics_session() == (session, semaphore)
+        assert session.connector.limit == autoscaling_service_lib.HTTP_METRICS_CONCURRENCY
+    finally:
+        loop.close()
+        asyncio.set_event_loop(asyncio.new_event_loop())
+    # Sessions of closed loops are closed and dropped
+    other_session, _ = autoscaling_service_lib.get_http_metrics_session()
+    assert other_session is not session
+    assert session.closed
+    autoscaling_service_lib.close_http_metrics_sessions()
+    assert other_session.closed
 
 
 def test_get_http_utilization_for_all_tasks():
     fake_marathon_tasks = [mock.Mock(id='fake-service.fake-instance', host='fake_host', ports=[30101])]
     mock_json_mapper = mock.Mock(return_value=0.5)
 
-    with mock.patch('paasta_tools.autoscaling.autoscaling_service_lib.get_json_body_from_service', autospec=True):
+    with asynctest.patch(
+        'paasta_tools.autoscaling.autoscaling_service_lib.get_json_body_from_service', autospec=True,
+    ) as mock_get_json_body_from_service:
         assert autoscaling_service_lib.get_http_utilization_for_all_tasks(
             marathon_service_config=mock.Mock(),
             marathon_tasks=fake_marathon_tasks,
-            endpoint='fake-endpoint',
+            endpoint='/fake-endpoint',
             json_mapper=mock_json_mapper,
         ) == 0.5
+        mock_get_json_body_from_service.assert_called_once_with('fake_host', 30101, 'fake-endpoint')
 
 
 def test_get_http_utilization_for_all_tasks_timeout():
     fake_marathon_tasks = [mock.Mock(id='fake-service.fake-instance', host='fake_host', ports=[30101])]
-    mock_json_mapper = mock.Mock(side_effect=Timeout)
+    mock_json_mapper = mock.Mock(side_effect=asyncio.TimeoutError)
 
-    with mock.patch('paasta_tools.autoscaling.autoscaling_service_lib.get_json_body_from_service', autospec=True):
+    with asynctest.patch(
+        'paasta_tools.autoscaling.autoscaling_service_lib.get_json_body_from_service', autospec=True,
+    ):
         assert autoscaling_service_lib.get_http_utilization_for_all_tasks(
             marathon_service_config=mock.Mock(),
             marathon_tasks=fake_marathon_tasks,
@@ -641,7 +900,7 @@ def test_get_http_utilization_for_all_tasks_no_data():
 
     with mock.patch(
         'paasta_tools.autoscaling.autoscaling_service_lib.log.error', autospec=True,
-    ) as mock_log_error, mock.patch(
+    ) as mock_log_error, asynctest.patch(
         'paasta_tools.autoscaling.autoscaling_service_lib.get_json_body_from_service', autospec=True,
     ):
         with raises(autoscaling_service_lib.MetricsProviderNoDataError):
@@ -656,10 +915,36 @@ def test_get_http_utilization_for_all_tasks_no_data():
         )
 
 
+def test_get_http_utilization_for_tasks_timeout_budget():
+    fake_marathon_tasks = [
+        mock.Mock(id='fake-service.fake-instance', host=f'fake_host{i}', ports=[30101]) for i in range(3)
+    ]
+    hang = asyncio.Event()
+
+    async def fake_get_json_body_from_service(host, port, endpoint):
+        if host == 'fake_host1':
+            await hang.wait()
+        return {'utilization': 0.5}
+
+    with asynctest.patch(
+        'paasta_tools.autoscaling.autoscaling_service_lib.get_json_body_from_service', autospec=True,
+        side_effect=fake_get_json_body_from_service,
+    ):
+        assert a_sync.block(
+            autoscaling_service_lib.get_http_utilization_for_tasks,
+            mock.Mock(),
+            fake_marathon_tasks,
+            'fake-endpoint',
+            autoscaling_service_lib.utilization_mapper,
+            concurrency=2,
+            timeout_budget=0.1,
+        ) == [0.5, 1.0, 0.5]
+
+
 def test_http_metrics_provider():
     fake_marathon_tasks = [mock.Mock(id='fake-service.fake-instance', host='fake_host', ports=[30101])]
 
-    with mock.patch(
+    with asynctest.patch(
         'paasta_tools.autoscaling.autoscaling_service_lib.get_json_body_from_service',
         autospec=True,
     ) as mock_get_json_body_from_service:
@@ -670,10 +955,23 @@ def test_http_metrics_provider():
         ) == 0.5
 
 
+def test_http_metrics_provider_collected_metrics():
+    mock_collected_metrics = mock.Mock(get_http_utilization_for_tasks=mock.Mock(return_value=[0.2, None, 0.4]))
+    assert autoscaling_service_lib.http_metrics_provider(
+        marathon_service_config=mock.sentinel.config,
+        marathon_tasks=mock.sentinel.marathon_tasks,
+        endpoint='fake-endpoint',
+        collected_metrics=mock_collected_metrics,
+    ) == 0.30000000000000004
+    mock_collected_metrics.get_http_utilization_for_tasks.assert_called_once_with(
+        mock.sentinel.config, mock.sentinel.marathon_tasks, 'fake-endpoint', autoscaling_service_lib.utilization_mapper,
+    )
+
+
 def test_uwsgi_metrics_provider():
     fake_marathon_tasks = [mock.Mock(id='fake-service.fake-instance', host='fake_host', ports=[30101])]
 
-    with mock.patch(
+    with asynctest.patch(
         'paasta_tools.autoscaling.autoscaling_service_lib.get_json_body_from_service',
         autospec=True,
     ) as mock_get_json_body_from_service:
@@ -762,6 +1060,50 @@ def test_autoscale_marathon_instance():
         mock_meteorite.create_gauge.call_count == 3
 
 
+def test_autoscale_marathon_instance_flushes_under_the_lock():
+    fake_marathon_service_config = marathon_tools.MarathonServiceConfig(
+        service='fake-service',
+        instance='fake-instance',
+        cluster='fake-cluster',
+        config_dict={'min_instances': 1, 'max_instances': 10},
+        branch_dict=None,
+    )
+    mock_collected_metrics = mock.Mock()
+    events = []
+
+    @contextlib.contextmanager
+    def fake_create_autoscaling_lock(service, instance):
+        events.append('acquire')
+        try:
+            yield
+        finally:
+            events.append('release')
+
+    def fake_metrics_provider(**kwargs):
+        kwargs['collected_metrics'].set_zk_data('/fake/path', b'fake')
+        raise MetricsProviderNoDataError('no data')
+
+    mock_collected_metrics.flush.side_effect = lambda: events.append('flush')
+    with mock.patch(
+        'paasta_tools.autoscaling.autoscaling_service_lib.get_service_metrics_provider', autospec=True,
+        return_value=fake_metrics_provider,
+    ), mock.patch(
+        'paasta_tools.autoscaling.autoscaling_service_lib.create_autoscaling_lock', autospec=True,
+        side_effect=fake_create_autoscaling_lock,
+    ), mock.patch.object(
+        marathon_tools.MarathonServiceConfig, 'get_instances', autospec=True, return_value=1,
+    ), raises(MetricsProviderNoDataError):
+        autoscaling_service_lib.autoscale_marathon_instance(
+            fake_marathon_service_config,
+            mock.MagicMock(),
+            [mock.Mock()],
+            [mock.Mock()],
+            collected_metrics=mock_collected_metrics,
+        )
+    mock_collected_metrics.set_zk_data.assert_called_once_with('/fake/path', b'fake')
+    assert events == ['acquire', 'flush', 'release']
+
+
 def test_autoscale_marathon_instance_up_to_min_instances():
     current_instances = 5
     fake_marathon_service_config = marathon_tools.MarathonServiceConfig(
@@ -1175,6 +1517,7 @@ def test_autoscale_services_happy_path():
             autoscaling_service_lib.load_system_paasta_config(),
             mock_marathon_tasks,
             mock_mesos_tasks,
+            collected_metrics=mock.ANY,
         )
 
 
@@ -1473,6 +1816,7 @@ def test_get_utilization():
             marathon_tasks=mock_marathon_tasks,
             mesos_tasks=mock_mesos_tasks,
             log_utilization_data=mock_log_utilization_data,
+            collected_metrics=None,
             mock_param=2,
             metrics_provider='mock_provider',
         )
@@ -1648,7 +1992,7 @@ def test_serialize_and_deserialize_historical_load():
 
     serialized = autoscaling_service_lib.serialize_historical_load(fake_data)
     assert len(serialized) == 50 * autoscaling_service_lib.SIZE_PER_HISTORICAL_LOAD_RECORD
-    assert autoscaling_service_lib.deserialize_historical_load(serialized) == fake_data
+    assert autoscaling_service_lib.deserialize_historical_load(serialized).tolist() == fake_data
 
 
 def test_serialize_historical_load_trims_oldest_data():
@@ -1656,13 +2000,146 @@ def test_serialize_historical_load_trims_oldest_data():
     serialized_long = autoscaling_service_lib.serialize_historical_load(fake_data_long)
     assert len(serialized_long) == 1000000
     deserialized_long = autoscaling_service_lib.deserialize_historical_load(serialized_long)
-    assert deserialized_long[0] == (500, 62500)
-    assert deserialized_long[-1] == (62999, 1)
+    assert deserialized_long[0].tolist() == (500, 62500)
+    assert deserialized_long[-1].tolist() == (62999, 1)
+
+
+def test_deserialize_historical_load_ignores_partial_record():
+    serialized = autoscaling_service_lib.serialize_historical_load([(1, 2), (3, 4)])
+    assert autoscaling_service_lib.deserialize_historical_load(serialized[:-1]).tolist() == [(1, 2)]
+    assert autoscaling_service_lib.deserialize_historical_load(b'').tolist() == []
+
+
+class FakeZookeeper:
+    """Just enough of a KazooClient for HistoricalLoadRingBuffer, keeping track of what gets read and written"""
+
+    def __init__(self, nodes=None):
+        self.nodes = {path: (data, 0) for path, data in (nodes or {}).items()}
+        self.reads = []
+        self.writes = []
+
+    def get(self, path):
+        self.reads.append(path)
+        if path not in self.nodes:
+            raise NoNodeError()
+        data, version = self.nodes[path]
+        return data, mock.Mock(version=version)
+
+    def get_async(self, path):
+        return mock.Mock(get=lambda: self.get(path))
+
+    def ensure_path(self, path):
+        pass
+
+    def transaction(self):
+        zk = self
+
+        class Transaction:
+            def __init__(self):
+                self.operations = []
+
+            def create(self, path, value):
+                self.operations.append(('create', path, value, None))
+
+            def set_data(self, path, value, version=-1):
+                self.operations.append(('set', path, value, version))
+
+            def delete(self, path):
+                self.operations.append(('delete', path, None, None))
+
+            def commit(self):
+                for operation, path, value, version in self.operations:
+                    if operation == 'create' and path in zk.nodes:
+                        return [NodeExistsError()] + [RolledBackError()] * (len(self.operations) - 1)
+                    if operation in ('set', 'delete') and path not in zk.nodes:
+                        return [NoNodeError()] + [RolledBackError()] * (len(self.operations) - 1)
+                    if operation == 'set' and version not in (-1, zk.nodes[path][1]):
+                        return [BadVersionError()] + [RolledBackError()] * (len(self.operations) - 1)
+                for operation, path, value, version in self.operations:
+                    if operation == 'delete':
+                        del zk.nodes[path]
+                    else:
+                        zk.nodes[path] = (value, zk.nodes[path][1] + 1 if path in zk.nodes else 0)
+                        zk.writes.append((path, value))
+                return [True] * len(self.operations)
+
+        return Transaction()
+
+
+@mock.patch.object(autoscaling_service_lib.HistoricalLoadRingBuffer, 'RECORDS_PER_CHUNK', 4)
+@mock.patch.object(autoscaling_service_lib.HistoricalLoadRingBuffer, 'NUM_CHUNKS', 3)
+def test_historical_load_ring_buffer_appends_and_reads_incrementally():
+    zk = FakeZookeeper()
+    writer = autoscaling_service_lib.HistoricalLoadRingBuffer('/autoscaling/fake_service/fake_instance')
+    reader = autoscaling_service_lib.HistoricalLoadRingBuffer('/autoscaling/fake_service/fake_instance')
+    assert reader.read(zk).tolist() == []
+
+    appended = []
+    for i in range(30):
+        zk.writes = []
+        writer.append(zk, [(i, i * 10.0)])
+        appended.append((i, i * 10.0))
+        # Only the header and the chunk the record went in are written
+        assert [path for path, _ in zk.writes] == [
+            '/autoscaling/fake_service/fake_instance/historical_load_ring',
+            '/autoscaling/fake_service/fake_instance/historical_load_ring/%d' % (i // 4 % 3),
+        ]
+        # Two full chunks are kept besides the last one
+        expected = appended[(i // 4 - 2) * 4:] if i >= 8 else appended
+        assert writer.historical_load.tolist() == expected
+
+        if i % 5 == 0:
+            zk.reads = []
+            assert reader.read(zk).tolist() == expected
+            # The header, and the chunks with records appended since the last read
+            assert len(zk.reads) <= 3
+
+
+def test_historical_load_ring_buffer_migrates_single_blob():
+    old_historical_load = [(i, i * 2.0) for i in range(5000)]
+    zk = FakeZookeeper({
+        '/autoscaling/fake_service/fake_instance/historical_load':
+            autoscaling_service_lib.serialize_historical_load(old_historical_load),
+    })
+    ring_buffer = autoscaling_service_lib.HistoricalLoadRingBuffer('/autoscaling/fake_service/fake_instance')
+
+    assert ring_buffer.read(zk).tolist() == old_historical_load
+    assert '/autoscaling/fake_service/fake_instance/historical_load' not in zk.nodes
+    assert sorted(zk.nodes) == [
+        '/autoscaling/fake_service/fake_instance/historical_load_ring',
+        '/autoscaling/fake_service/fake_instance/historical_load_ring/0',
+        '/autoscaling/fake_service/fake_instance/historical_load_ring/1',
+    ]
+    other_ring_buffer = autoscaling_service_lib.HistoricalLoadRingBuffer('/autoscaling/fake_service/fake_instance')
+    assert other_ring_buffer.read(zk).tolist() == old_historical_load
+
 
+def test_historical_load_ring_buffer_append_conflict():
+    zk = FakeZookeeper()
+    ring_buffer = autoscaling_service_lib.HistoricalLoadRingBuffer('/autoscaling/fake_service/fake_instance')
+    other_ring_buffer = autoscaling_service_lib.HistoricalLoadRingBuffer('/autoscaling/fake_service/fake_instance')
+    ring_buffer.append(zk, [(1, 1.0)])
+    other_ring_buffer.append(zk, [(2, 2.0)])
+    with raises(BadVersionError):
+        ring_buffer.append(zk, [(3, 3.0)])
 
-@mock.patch('paasta_tools.autoscaling.autoscaling_service_lib.save_historical_load', autospec=True)
+    # Starts over from what's in zookeeper
+    ring_buffer.append(zk, [(3, 3.0)])
+    assert other_ring_buffer.read(zk).tolist() == [(1, 1.0), (2, 2.0), (3, 3.0)]
+
+
+@mock.patch('paasta_tools.autoscaling.autoscaling_service_lib.ZookeeperPool', autospec=True)
+def test_save_new_historical_load_ignores_conflicts(mock_zookeeper_pool):
+    with mock.patch.object(
+        autoscaling_service_lib.HistoricalLoadRingBuffer, 'append', autospec=True, side_effect=BadVersionError,
+    ) as mock_append:
+        autoscaling_service_lib.save_new_historical_load([(1, 1.0)], zk_path_prefix='/autoscaling/fake')
+    assert mock_append.call_count == 1
+
+
+@mock.patch('paasta_tools.autoscaling.autoscaling_service_lib.save_new_historical_load', autospec=True)
 @mock.patch('paasta_tools.autoscaling.autoscaling_service_lib.fetch_historical_load', autospec=True, return_value=[])
-def test_proportional_decision_policy(mock_save_historical_load, mock_fetch_historical_load):
+def test_proportional_decision_policy(mock_fetch_historical_load, mock_save_new_historical_load):
 
     common_kwargs = {
         'zookeeper_path': '/test',
@@ -1719,9 +2196,9 @@ def test_proportional_decision_policy(mock_save_historical_load, mock_fetch_hist
     )
 
 
-@mock.patch('paasta_tools.autoscaling.autoscaling_service_lib.save_historical_load', autospec=True)
+@mock.patch('paasta_tools.autoscaling.autoscaling_service_lib.save_new_historical_load', autospec=True)
 @mock.patch('paasta_tools.autoscaling.autoscaling_service_lib.fetch_historical_load', autospec=True, return_value=[])
-def test_proportional_decision_policy_nonzero_offset(mock_save_historical_load, mock_fetch_historical_load):
+def test_proportional_decision_policy_nonzero_offset(mock_fetch_historical_load, mock_save_new_historical_load):
     common_kwargs = {
         'zookeeper_path': '/test',
         'current_instances': 10,
@@ -1778,9 +2255,9 @@ def test_proportional_decision_policy_nonzero_offset(mock_save_historical_load,
     )
 
 
-@mock.patch('paasta_tools.autoscaling.autoscaling_service_lib.save_historical_load', autospec=True)
+@mock.patch('paasta_tools.autoscaling.autoscaling_service_lib.save_new_historical_load', autospec=True)
 @mock.patch('paasta_tools.autoscaling.autoscaling_service_lib.fetch_historical_load', autospec=True, return_value=[])
-def test_proportional_decision_policy_good_enough(mock_save_historical_load, mock_fetch_historical_load):
+def test_proportional_decision_policy_good_enough(mock_fetch_historical_load, mock_save_new_historical_load):
     assert 0 == autoscaling_service_lib.proportional_decision_policy(
         zookeeper_path='/test',
         current_instances=100,
@@ -1869,6 +2346,57 @@ def test_filter_autoscaling_tasks_considers_old_versions():
     assert actual == expected
 
 
+def test_autoscaling_task_index():
+    marathon_apps = [
+        mock.Mock(
+            tasks=[
+                mock.Mock(id='service.instance.git1.config1.1'),
+                mock.Mock(id='service.instance.git1.config1.2'),
+            ],
+            health_checks=[mock.Mock()],
+        ),
+        mock.Mock(
+            tasks=[
+                mock.Mock(id='service.instance2.git1.config1.3'),
+                mock.Mock(id='service.instance2.git1.config1.4'),
+            ],
+            health_checks=[mock.Mock()],
+        ),
+    ]
+    all_mesos_tasks = [
+        {'id': 'service.instance.git1.config1.2'},
+        {'id': 'service.instance2.git1.config1.3'},
+        {'id': 'other.instance.git1.config1.5'},
+    ]
+
+    def make_config(instance):
+        return marathon_tools.MarathonServiceConfig(
+            service='service',
+            cluster='cluster',
+            instance=instance,
+            config_dict={},
+            branch_dict=None,
+            soa_dir='/soa/dir',
+        )
+
+    task_index = autoscaling_service_lib.AutoscalingTaskIndex(marathon_apps, all_mesos_tasks)
+    with mock.patch(
+        'paasta_tools.autoscaling.autoscaling_service_lib.is_task_healthy',
+        return_value=True,
+        autospec=True,
+    ):
+        assert task_index.filter_autoscaling_tasks(make_config('instance')) == (
+            {task.id: task for task in marathon_apps[0].tasks},
+            [all_mesos_tasks[0]],
+        )
+        assert task_index.filter_autoscaling_tasks(make_config('instance2')) == (
+            {task.id: task for task in marathon_apps[1].tasks},
+            [all_mesos_tasks[1]],
+        )
+        with raises(autoscaling_service_lib.MetricsProviderNoDataError):
+            task_index.filter_autoscaling_tasks(make_config('instance3'))
+
+
 def test_autoscale_service_configs():
     fake_marathon_service_config = marathon_tools.MarathonServiceConfig(
         service='fake-service',
@@ -1917,4 +2445,5 @@ def test_autoscale_service_configs():
             mock_system_paasta_config,
             mock_marathon_tasks,
             mock_mesos_tasks,
+            collected_metrics=mock.ANY,
         )
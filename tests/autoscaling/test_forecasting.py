@@ -1,3 +1,5 @@
+import random
+
 from paasta_tools.autoscaling import forecasting
 
 
@@ -83,3 +85,75 @@ def test_linreg_forecast_policy():
         linreg_window_seconds=7,
         linreg_extrapolation_seconds=0,
     )
+
+
+def test_policies_take_historical_load_arrays():
+    historical_load = [(float(t), 100.0 + 20 * t) for t in range(1, 8)]
+    historical_load_array = forecasting.to_historical_load_array(historical_load)
+
+    assert forecasting.current_value_forecast_policy(historical_load_array) == 240
+    assert forecasting.moving_average_forecast_policy(historical_load_array, moving_average_window_seconds=5) == 190
+    assert forecasting.linreg_forecast_policy(
+        historical_load_array,
+        linreg_window_seconds=7,
+        linreg_extrapolation_seconds=[0, 10],
+    ) == 440
+
+
+def test_forecasts_match_pure_python():
+    random.seed(0)
+    historical_load = [(1500000000 + 30 * i + random.random(), random.uniform(0, 100)) for i in range(1000)]
+
+    windowed_values = [value for timestamp, value in historical_load if timestamp >= historical_load[-1][0] - 1800]
+    assert forecasting.moving_average_forecast_policy(historical_load) == sum(windowed_values) / len(windowed_values)
+
+    times = [timestamp for timestamp, value in historical_load]
+    loads = [value for timestamp, value in historical_load]
+    mean_time = sum(times) / len(times)
+    mean_load = sum(loads) / len(loads)
+    covariance = sum((t - mean_time) * (l - mean_load) for t, l in historical_load)
+    slope = covariance / sum((t - mean_time) ** 2 for t in times)
+    expected = slope * (times[-1] + 60) + mean_load - slope * mean_time
+    assert forecasting.linreg_forecast_policy(
+        historical_load,
+        linreg_window_seconds=100000,
+        linreg_extrapolation_seconds=60,
+    ) == expected
+
+
+def test_window_historical_load():
+    historical_load = forecasting.to_historical_load_array([(1, 10), (2, 20), (3, 30), (4, 40)])
+    assert forecasting.window_historical_load(historical_load, 2, 3).tolist() == [(2, 20), (3, 30)]
+    assert forecasting.window_historical_load(historical_load, 4.5, 5).tolist() == []
+
+    # The clock went backwards
+    historical_load = forecasting.to_historical_load_array([(3, 30), (1, 10), (2, 20), (4, 40)])
+    assert forecasting.window_historical_load(historical_load, 2, 3).tolist() == [(3, 30), (2, 20)]
+
+
+def test_append_historical_load():
+    historical_load = forecasting.append_historical_load([], 1, 10)
+    historical_load = forecasting.append_historical_load(historical_load, 2, 20)
+    assert historical_load.dtype == forecasting.HISTORICAL_LOAD_DTYPE
+    assert historical_load.tolist() == [(1, 10), (2, 20)]
+
+
+def test_exponential_smoothing_forecast_policy():
+    # The datapoint one half life ago weighs half as much as the current one
+    assert forecasting.exponential_smoothing_forecast_policy(
+        [(0, 40), (600, 100)],
+        exponential_smoothing_half_life_seconds=600,
+    ) == 80
+    assert forecasting.exponential_smoothing_forecast_policy([(0, 100)]) == 100
+    # Old spikes fade away
+    assert forecasting.exponential_smoothing_forecast_policy(
+        [(0, 1000)] + [(t, 100) for t in range(6000, 6060)],
+        exponential_smoothing_half_life_seconds=600,
+    ) < 101
+
+
+def test_percentile_forecast_policy():
+    historical_load = [(t, t * 10) for t in range(1, 102)]
+    assert forecasting.percentile_forecast_policy(historical_load, percentile_window_seconds=100, percentile=95) == 960
+    assert forecasting.percentile_forecast_policy(historical_load, percentile_window_seconds=100, percentile=50) == 510
+    assert forecasting.percentile_forecast_policy(historical_load, percentile_window_seconds=0, percentile=5) == 1010
@@ -13,13 +13,17 @@
 # limitations under the License.
 import contextlib
 import datetime
+import gzip
 import json
-from multiprocessing import Queue
+import os
 from queue import Empty
+from queue import Full
+from queue import Queue
 
 import isodate
 import mock
 import pytest
+import pytz
 from pytest import raises
 
 from paasta_tools.cli.cli import parse_args
@@ -315,6 +319,98 @@ def test_chronos_log_line_passes_filter_false_when_service_name_missing():
         assert not logs.chronos_log_line_passes_filter(line, levels, service, components, clusters, instances)
 
 
+@pytest.mark.parametrize(
+    'timestamp', [
+        '2016-06-08T06:31:52.706609135Z',
+        '2016-06-08T06:31:52.9999996Z',
+        '2016-06-08T06:31:52.0000005Z',
+        '2016-06-08T06:31:52.5',
+        '2016-06-08T06:31:52Z',
+        '2016-06-08T06:31:52-07:00',
+    ],
+)
+def test_parse_log_timestamp_matches_isodate(timestamp):
+    parsed = logs.parse_log_timestamp(timestamp)
+    assert parsed == isodate.parse_datetime(timestamp)
+    assert parsed.utcoffset() == isodate.parse_datetime(timestamp).utcoffset()
+
+
+def test_parse_log_timestamp_invalid():
+    with raises(ValueError):
+        logs.parse_log_timestamp('2016-13-08T06:31:52Z')
+    with raises(ValueError):
+        logs.parse_log_timestamp('not a timestamp')
+
+
+def test_log_record_decodes_once():
+    line = format_log_line('fake_level', 'fake_cluster', 'fake_service', 'fake_instance', 'build', 'fake message')
+    record = logs.LogRecord(line)
+    with mock.patch('paasta_tools.cli.cmds.logs.json.loads', autospec=True, side_effect=json.loads) as mock_loads:
+        assert logs.paasta_log_line_passes_filter(
+            record, ['fake_level'], 'fake_service', ['build'], ['fake_cluster'], ['fake_instance'],
+        )
+        assert record.sort_key == isodate.parse_datetime(json.loads(line)['timestamp']).replace(tzinfo=None)
+        assert 'fake message' in logs.prettify_log_line(record, ['fake_level'])
+    assert mock_loads.call_count == 1
+
+
+def test_log_record_sort_key():
+    assert logs.LogRecord('{"timestamp": "2015-07-22T10:38:46-07:00"}').sort_key == datetime.datetime(
+        2015, 7, 22, 17, 38, 46,
+    )
+    assert logs.LogRecord('{"timestamp": "2015-07-22T17:38:46.5"}').sort_key == datetime.datetime(
+        2015, 7, 22, 17, 38, 46, 500000,
+    )
+
+
+def test_log_record_sort_key_without_timestamp():
+    assert logs.LogRecord('{"timestamp": "invalid"}').sort_key == logs.LogRecord('{}').sort_key
+    assert logs.LogRecord('{}').sort_key < logs.LogRecord(
+        format_log_line('fake_level', 'fake_cluster', 'fake_service', 'fake_instance', 'build', 'fake message'),
+    ).sort_key
+
+
+def test_line_may_contain_any():
+    line = '{"cluster": "fake_cluster", "instance": "fake\\/instance"}'
+    assert logs.line_may_contain_any(line, None)
+    assert logs.line_may_contain_any(line, ['other_cluster', 'fake_cluster'])
+    assert not logs.line_may_contain_any(line, ['other_cluster'])
+    assert not logs.line_may_contain_any(line, [])
+    # values JSON encoding could change can't be looked for in the raw line
+    assert logs.line_may_contain_any(line, ['fake/instance'])
+
+
+def test_paasta_log_line_passes_filter_doesnt_decode_unmatched_lines():
+    line = format_log_line('fake_level', 'fake_cluster', 'fake_service', 'fake_instance', 'build', 'fake message')
+    with mock.patch('paasta_tools.cli.cmds.logs.json.loads', autospec=True) as mock_loads:
+        assert not logs.paasta_log_line_passes_filter(
+            line, ['fake_level'], 'fake_service', ['build'], ['other_cluster'], None,
+        )
+    assert mock_loads.call_count == 0
+
+
+def test_filter_log_lines_prefilters_before_parsing():
+    service = 'fake_service'
+    lines = [
+        b'2015-07-22T10:38:46-07:00 marathon line about fake_service.main',
+        b'2015-07-22T10:38:46-07:00 marathon line about other_service.main',
+    ]
+    with mock.patch(
+        'paasta_tools.cli.cmds.logs.format_job_id', autospec=True, return_value='fake_service.',
+    ), mock.patch(
+        'paasta_tools.cli.cmds.logs.parse_marathon_log_line', autospec=True,
+        side_effect=logs.parse_marathon_log_line,
+    ) as mock_parse:
+        records = list(logs.filter_log_lines(
+            lines, ['fake_level'], service, ['marathon'], ['fake_cluster'], None,
+            filter_fn=logs.marathon_log_line_passes_filter,
+            parse_fn=logs.parse_marathon_log_line,
+            prefilter_fn=logs.marathon_log_line_prefilter,
+        ))
+    assert mock_parse.call_count == 1
+    assert [record.get('message') for record in records] == [lines[0].decode('utf-8')]
+
+
 def test_extract_utc_timestamp_from_log_line_ok():
     fake_timestamp = '2015-07-22T10:38:46-07:00'
     fake_utc_timestamp = isodate.parse_datetime('2015-07-22T17:38:46.000000')
@@ -735,6 +831,98 @@ def test_scribereader_print_logs_by_time():
         assert mock_scribereader.get_stream_reader.call_count == 14 * 2
 
 
+def fake_log_records(*seconds):
+    return [
+        logs.LogRecord(json.dumps({'timestamp': '2016-06-08T06:31:%02dZ' % second, 'message': str(second)}))
+        for second in seconds
+    ]
+
+
+def test_reorder_log_records():
+    records = fake_log_records(1, 3, 2, 4, 6, 7, 5, 8)
+    assert [r.get('message') for r in logs.reorder_log_records(records, window=1)] == [
+        '1', '2', '3', '4', '6', '5', '7', '8',
+    ]
+    assert [r.get('message') for r in logs.reorder_log_records(records, window=2)] == [
+        '1', '2', '3', '4', '5', '6', '7', '8',
+    ]
+
+
+def test_merge_log_streams():
+    streams = [
+        lambda: fake_log_records(1, 4, 7),
+        lambda: fake_log_records(2, 5, 8, 9),
+        lambda: [],
+        lambda: fake_log_records(3, 6),
+    ]
+    assert [r.get('message') for r in logs.merge_log_streams(streams, buffer_size=1)] == [
+        str(second) for second in range(1, 10)
+    ]
+
+
+def test_merge_log_streams_raises_stream_errors():
+    def failing_stream():
+        yield from fake_log_records(1)
+        raise ValueError('fake error')
+
+    merged = logs.merge_log_streams([failing_stream, lambda: fake_log_records(2)])
+    with raises(ValueError):
+        list(merged)
+
+
+def test_merge_log_streams_bounds_buffered_records():
+    read = []
+
+    def stream():
+        for record in fake_log_records(*range(60)):
+            read.append(record)
+            yield record
+
+    with mock.patch.object(logs, 'LOG_REORDER_WINDOW', 0):
+        merged = logs.merge_log_streams([stream], buffer_size=5)
+        assert next(merged).get('message') == '0'
+        merged.close()
+    # what was merged, what waits in the buffer, and what waits to be put in the buffer
+    assert len(read) <= 1 + 5 + 1
+
+
+def test_scribereader_print_last_n_logs_merges_streams():
+    service = 'fake_service'
+    levels = ['debug']
+    clusters = ['fake_cluster1']
+    instances = ['main']
+    components = ['stdout']
+
+    def fake_stream_tailer(stream_name, host, port, use_kafka, lines):
+        offset = 0 if host == 'env1' else 1
+        return [
+            format_log_line(
+                'debug', 'fake_cluster1', service, 'main', 'stdout', 'line %d' % second, timestamp=(
+                    '2016-06-08T06:31:%02dZ' % second
+                ),
+            )
+            for second in range(offset, 10, 2)
+        ]
+
+    with mock.patch(
+        'paasta_tools.cli.cmds.logs.scribereader', autospec=True,
+    ) as mock_scribereader, mock.patch(
+        'paasta_tools.cli.cmds.logs.ScribeLogReader.determine_scribereader_envs', autospec=True,
+    ) as determine_scribereader_envs_patch, mock.patch(
+        'paasta_tools.cli.cmds.logs.print_log', autospec=True,
+    ) as print_log_patch:
+        determine_scribereader_envs_patch.return_value = ['env1', 'env2']
+        mock_scribereader.get_env_scribe_host.side_effect = lambda scribe_env, tail: {'host': scribe_env, 'port': 0}
+        mock_scribereader.get_stream_tailer.side_effect = fake_stream_tailer
+        logs.ScribeLogReader(cluster_map={}).print_last_n_logs(
+            service, 5, levels, components, clusters, instances, raw_mode=False,
+        )
+
+    assert [call[0][0].get('message') for call in print_log_patch.call_args_list] == [
+        'line %d' % second for second in range(10)
+    ]
+
+
 def test_tail_paasta_logs_ctrl_c_in_queue_get():
     service = 'fake_service'
     levels = ['fake_level1', 'fake_level2']
@@ -748,11 +936,11 @@ def test_tail_paasta_logs_ctrl_c_in_queue_get():
     ), mock.patch(
         'paasta_tools.cli.cmds.logs.log', autospec=True,
     ), mock.patch(
-        'paasta_tools.cli.cmds.logs.print_log', autospec=True,
+        'paasta_tools.cli.cmds.logs.print_logs', autospec=True,
     ), mock.patch(
         'paasta_tools.cli.cmds.logs.Queue', autospec=True,
     ) as queue_patch, mock.patch(
-        'paasta_tools.cli.cmds.logs.Process', autospec=True,
+        'paasta_tools.cli.cmds.logs.Thread', autospec=True,
     ), mock.patch(
         'paasta_tools.cli.cmds.logs.scribereader', autospec=True,
     ):
@@ -778,21 +966,21 @@ def test_tail_paasta_logs_ctrl_c_in_is_alive():
     ), mock.patch(
         'paasta_tools.cli.cmds.logs.log', autospec=True,
     ), mock.patch(
-        'paasta_tools.cli.cmds.logs.print_log', autospec=True,
+        'paasta_tools.cli.cmds.logs.print_logs', autospec=True,
     ), mock.patch(
         'paasta_tools.cli.cmds.logs.Queue', autospec=True,
     ) as queue_patch, mock.patch(
-        'paasta_tools.cli.cmds.logs.Process', autospec=True,
-    ) as process_patch, mock.patch(
+        'paasta_tools.cli.cmds.logs.Thread', autospec=True,
+    ) as thread_patch, mock.patch(
         'paasta_tools.cli.cmds.logs.scribereader', autospec=True,
     ):
         determine_scribereader_envs_patch.return_value = ['env1', 'env2']
         fake_queue = mock.MagicMock(spec_set=Queue())
         fake_queue.get.side_effect = Empty
         queue_patch.return_value = fake_queue
-        fake_process = mock.MagicMock()
-        fake_process.is_alive.side_effect = FakeKeyboardInterrupt
-        process_patch.return_value = fake_process
+        fake_thread = mock.MagicMock()
+        fake_thread.is_alive.side_effect = FakeKeyboardInterrupt
+        thread_patch.return_value = fake_thread
         scribe_log_reader = logs.ScribeLogReader(cluster_map={'env1': 'env1', 'env2': 'env2'})
         with reraise_keyboardinterrupt():
             scribe_log_reader.tail_logs(service, levels, components, clusters, instances)
@@ -813,39 +1001,32 @@ def test_tail_paasta_logs_aliveness_check():
     ), mock.patch(
         'paasta_tools.cli.cmds.logs.log', autospec=True,
     ), mock.patch(
-        'paasta_tools.cli.cmds.logs.print_log', autospec=True,
+        'paasta_tools.cli.cmds.logs.print_logs', autospec=True,
     ), mock.patch(
         'paasta_tools.cli.cmds.logs.Queue', autospec=True,
     ) as queue_patch, mock.patch(
-        'paasta_tools.cli.cmds.logs.Process', autospec=True,
-    ) as process_patch, mock.patch(
+        'paasta_tools.cli.cmds.logs.Thread', autospec=True,
+    ) as thread_patch, mock.patch(
         'paasta_tools.cli.cmds.logs.scribereader', autospec=True,
     ):
         determine_scribereader_envs_patch.return_value = ['env1', 'env2']
         fake_queue = mock.MagicMock(spec_set=Queue())
         fake_queue.get.side_effect = Empty
         queue_patch.return_value = fake_queue
-        fake_process = mock.MagicMock()
+        fake_queue.qsize.return_value = 0
+        fake_thread = mock.MagicMock()
         is_alive_responses = [
             # First time: simulate both threads being alive.
             True, True,
             # Second time: simulate first thread is alive but second thread is now dead.
             True, False,
-            # This gets us into the kill stanza, which calls is_alive() on each
-            # thread again. We'll recycle our answers from the previous calls
-            # to is_alive() where the first thread is alive but the second
-            # thread is dead.
-            True, False,
         ]
-        fake_process.is_alive.side_effect = is_alive_responses
-        process_patch.return_value = fake_process
+        fake_thread.is_alive.side_effect = is_alive_responses
+        thread_patch.return_value = fake_thread
         scribe_log_reader = logs.ScribeLogReader(cluster_map={'env1': 'env1', 'env2': 'env2'})
         scribe_log_reader.tail_logs(service, levels, components, clusters, instances)
         # is_alive() should be called on all the values we painstakingly provided above.
-        assert fake_process.is_alive.call_count == len(is_alive_responses)
-        # We only terminate the first thread, which is still alive. We don't
-        # terminate the second thread, which was already dead.
-        assert fake_process.terminate.call_count == 1
+        assert fake_thread.is_alive.call_count == len(is_alive_responses)
 
 
 def test_tail_paasta_logs_empty_clusters():
@@ -861,21 +1042,22 @@ def test_tail_paasta_logs_empty_clusters():
     ), mock.patch(
         'paasta_tools.cli.cmds.logs.log', autospec=True,
     ), mock.patch(
-        'paasta_tools.cli.cmds.logs.print_log', autospec=True,
-    ) as print_log_patch, mock.patch(
+        'paasta_tools.cli.cmds.logs.print_logs', autospec=True,
+    ) as print_logs_patch, mock.patch(
         'paasta_tools.cli.cmds.logs.Queue', autospec=True,
     ) as queue_patch, mock.patch(
-        'paasta_tools.cli.cmds.logs.Process', autospec=True,
-    ) as process_patch, mock.patch(
+        'paasta_tools.cli.cmds.logs.Thread', autospec=True,
+    ) as thread_patch, mock.patch(
         'paasta_tools.cli.cmds.logs.scribereader', autospec=True,
     ):
         determine_scribereader_envs_patch.return_value = []
         fake_queue = mock.MagicMock(spec_set=Queue())
         fake_queue.get.side_effect = Empty
+        fake_queue.qsize.return_value = 0
         queue_patch.return_value = fake_queue
         logs.ScribeLogReader(cluster_map={}).tail_logs(service, levels, components, clusters, instances)
-        assert process_patch.call_count == 0
-        assert print_log_patch.call_count == 0
+        assert thread_patch.call_count == 0
+        assert print_logs_patch.call_args_list == [mock.call([], levels, False)] * 2
 
 
 def test_tail_paasta_logs_empty_instances():
@@ -891,21 +1073,22 @@ def test_tail_paasta_logs_empty_instances():
     ), mock.patch(
         'paasta_tools.cli.cmds.logs.log', autospec=True,
     ), mock.patch(
-        'paasta_tools.cli.cmds.logs.print_log', autospec=True,
-    ) as print_log_patch, mock.patch(
+        'paasta_tools.cli.cmds.logs.print_logs', autospec=True,
+    ) as print_logs_patch, mock.patch(
         'paasta_tools.cli.cmds.logs.Queue', autospec=True,
     ) as queue_patch, mock.patch(
-        'paasta_tools.cli.cmds.logs.Process', autospec=True,
-    ) as process_patch, mock.patch(
+        'paasta_tools.cli.cmds.logs.Thread', autospec=True,
+    ) as thread_patch, mock.patch(
         'paasta_tools.cli.cmds.logs.scribereader', autospec=True,
     ):
         determine_scribereader_envs_patch.return_value = []
         fake_queue = mock.MagicMock(spec_set=Queue())
         fake_queue.get.side_effect = Empty
+        fake_queue.qsize.return_value = 0
         queue_patch.return_value = fake_queue
         logs.ScribeLogReader(cluster_map={}).tail_logs(service, levels, components, clusters, instances)
-        assert process_patch.call_count == 0
-        assert print_log_patch.call_count == 0
+        assert thread_patch.call_count == 0
+        assert print_logs_patch.call_args_list == [mock.call([], levels, False)] * 2
 
 
 def test_tail_paasta_logs_marathon():
@@ -921,12 +1104,12 @@ def test_tail_paasta_logs_marathon():
     ), mock.patch(
         'paasta_tools.cli.cmds.logs.log', autospec=True,
     ), mock.patch(
-        'paasta_tools.cli.cmds.logs.print_log', autospec=True,
+        'paasta_tools.cli.cmds.logs.print_logs', autospec=True,
     ), mock.patch(
         'paasta_tools.cli.cmds.logs.Queue', autospec=True,
     ) as queue_patch, mock.patch(
-        'paasta_tools.cli.cmds.logs.Process', autospec=True,
-    ) as process_patch, mock.patch(
+        'paasta_tools.cli.cmds.logs.Thread', autospec=True,
+    ) as thread_patch, mock.patch(
         'paasta_tools.cli.cmds.logs.parse_marathon_log_line', autospec=True,
     ), mock.patch(
         'paasta_tools.cli.cmds.logs.marathon_log_line_passes_filter', autospec=True,
@@ -940,7 +1123,68 @@ def test_tail_paasta_logs_marathon():
         queue_patch.return_value = fake_queue
 
         logs.ScribeLogReader(cluster_map={'env1': 'env1'}).tail_logs(service, levels, components, clusters, instances)
-        assert process_patch.call_count == 1
+        assert thread_patch.call_count == 1
+
+
+def test_tail_paasta_logs_quits_when_a_tailer_dies_next_to_a_noisy_one():
+    service = 'fake_service'
+    levels = ['fake_level1']
+    components = ['deploy', 'stdout']
+    clusters = ['fake_cluster']
+    instances = ['fake_instance']
+    record = logs.LogRecord(format_log_line(
+        'fake_level1', 'fake_cluster', service, 'fake_instance', 'deploy', 'fake message',
+    ))
+
+    def fake_scribe_tail(
+        self, scribe_env, stream_name, service, levels, components, clusters, instances, queue,
+        filter_fn, parse_fn=None, prefilter_fn=None,
+    ):
+        if 'app_output' in stream_name:
+            # a dead tailer
+            return
+        try:
+            while True:
+                queue.put(record, timeout=1)
+        except Full:
+            pass
+
+    with mock.patch(
+        'paasta_tools.cli.cmds.logs.ScribeLogReader.determine_scribereader_envs', autospec=True,
+        return_value=['env1'],
+    ), mock.patch(
+        'paasta_tools.cli.cmds.logs.ScribeLogReader.scribe_tail', autospec=True, side_effect=fake_scribe_tail,
+    ), mock.patch(
+        'paasta_tools.cli.cmds.logs.log', autospec=True,
+    ), mock.patch(
+        'paasta_tools.cli.cmds.logs.print_logs', autospec=True,
+    ) as print_logs_patch, mock.patch(
+        'paasta_tools.cli.cmds.logs.scribereader', autospec=True,
+    ), mock.patch.object(
+        logs, 'TAIL_QUEUE_SIZE', 50,
+    ), mock.patch.object(
+        logs, 'TAIL_PRINT_BATCH_SIZE', 20,
+    ):
+        logs.ScribeLogReader(cluster_map={'env1': 'env1'}).tail_logs(service, levels, components, clusters, instances)
+
+    batches = [call[0][0] for call in print_logs_patch.call_args_list]
+    assert all(len(batch) <= 50 for batch in batches)
+    assert batches[0] == [record] * len(batches[0])
+
+
+def test_print_logs():
+    lines = [
+        format_log_line('event', 'fake_cluster', 'fake_service', 'fake_instance', 'deploy', 'fake message %d' % i)
+        for i in range(3)
+    ]
+    with mock.patch('paasta_tools.cli.cmds.logs.paasta_print', autospec=True) as mock_paasta_print:
+        logs.print_logs([logs.LogRecord(line) for line in lines], ['event'])
+        logs.print_logs(lines, ['event'], raw_mode=True)
+        logs.print_logs([], ['event'])
+    assert mock_paasta_print.call_count == 2
+    pretty_lines = mock_paasta_print.call_args_list[0][0][0].split('\n')
+    assert [line.endswith('fake message %d' % i) for i, line in enumerate(pretty_lines)] == [True] * 3
+    assert mock_paasta_print.call_args_list[1] == mock.call(*lines, end=' ')
 
 
 def test_determine_scribereader_envs():
@@ -996,6 +1240,147 @@ def test_get_log_reader():
         assert isinstance(actual, logs.ScribeLogReader)
 
 
+def write_log_file(path, seconds, instance='main', compress=False):
+    lines = ''.join(
+        format_log_line(
+            'event', 'fake_cluster', 'fake_service', instance, 'deploy', 'line %d' % second,
+            timestamp=(datetime.datetime(2019, 1, 1) + datetime.timedelta(seconds=second)).isoformat() + 'Z',
+        ) + '\n'
+        for second in seconds
+    ).encode('utf-8')
+    with (gzip.open if compress else open)(str(path), 'ab') as f:
+        f.write(lines)
+
+
+def fake_log_time(second):
+    return pytz.utc.localize(datetime.datetime(2019, 1, 1) + datetime.timedelta(seconds=second))
+
+
+def test_log_file_index(tmpdir):
+    path = tmpdir.join('fake_service.log')
+    write_log_file(path, range(100))
+    with mock.patch.object(logs, 'LOG_FILE_INDEX_INTERVAL', 1000):
+        index = logs.LogFileIndex(str(path))
+        index.update()
+        assert index.indexed_size == path.size()
+        assert len(index.entries) > 5
+        assert tmpdir.join('fake_service.log.idx').check()
+
+        offset = index.find_offset(fake_log_time(50))
+        with open(str(path), 'rb') as f:
+            f.seek(offset)
+            seconds = [int(json.loads(line)['message'].split()[1]) for line in f]
+        assert 40 < seconds[0] < 50
+        assert index.find_offset(fake_log_time(-1)) == 0
+
+        # only what was appended gets indexed, by the next reader of the index
+        entries = index.entries
+        write_log_file(path, range(100, 200))
+        index = logs.LogFileIndex(str(path))
+        with mock.patch(
+            'paasta_tools.cli.cmds.logs.get_log_line_time', autospec=True, side_effect=logs.get_log_line_time,
+        ) as mock_get_log_line_time:
+            index.update()
+        assert mock_get_log_line_time.call_count == 100
+        assert index.entries[:len(entries)] == entries
+        assert index.indexed_size == path.size()
+
+        # a new file with the same name gets indexed from its start
+        path.remove()
+        write_log_file(path, range(10))
+        index = logs.LogFileIndex(str(path))
+        index.update()
+        assert index.indexed_size == path.size()
+
+
+def test_get_log_file_segments(tmpdir):
+    path = tmpdir.join('fake_service.log')
+    for i, name in enumerate(['fake_service.log.2.gz', 'fake_service.log.1', 'fake_service.log']):
+        tmpdir.join(name).write('')
+        os.utime(str(tmpdir.join(name)), (1500000000 + i, 1500000000 + i))
+    tmpdir.join('fake_service.log.idx').write('')
+    tmpdir.join('fake_service.logger').write('')
+    assert logs.get_log_file_segments(str(path)) == [
+        str(tmpdir.join('fake_service.log.2.gz')), str(tmpdir.join('fake_service.log.1')), str(path),
+    ]
+
+
+@pytest.fixture
+def file_log_reader(tmpdir):
+    write_log_file(tmpdir.join('fake_service-main.log.2.gz'), range(0, 100, 2), compress=True)
+    write_log_file(tmpdir.join('fake_service-main.log.1'), range(100, 200, 2))
+    write_log_file(tmpdir.join('fake_service-main.log'), range(200, 300, 2))
+    write_log_file(tmpdir.join('fake_service-canary.log'), range(1, 300, 2), instance='canary')
+    write_log_file(tmpdir.join('other_service-main.log'), range(300))
+    for i, name in enumerate(['fake_service-main.log.2.gz', 'fake_service-main.log.1', 'fake_service-main.log']):
+        mtime = fake_log_time(100 * i + 99).timestamp()
+        os.utime(str(tmpdir.join(name)), (mtime, mtime))
+    with mock.patch(
+        'paasta_tools.cli.cmds.logs.print_log', autospec=True,
+    ) as mock_print_log:
+        yield logs.FileLogReader(path_format=str(tmpdir.join('{service}-{instance}.log'))), mock_print_log
+
+
+def printed_messages(mock_print_log):
+    return [call[0][0].get('message') for call in mock_print_log.call_args_list]
+
+
+def test_file_log_reader_print_logs_by_time(file_log_reader):
+    reader, mock_print_log = file_log_reader
+    reader.print_logs_by_time(
+        'fake_service', fake_log_time(95), fake_log_time(205),
+        ['event'], ['deploy'], ['fake_cluster'], None, raw_mode=False,
+    )
+    assert printed_messages(mock_print_log) == ['line %d' % second for second in range(96, 205)]
+
+
+def test_file_log_reader_print_logs_by_time_skips_unneeded_segments(file_log_reader):
+    reader, mock_print_log = file_log_reader
+    with mock.patch(
+        'paasta_tools.cli.cmds.logs.gzip.open', autospec=True,
+    ) as mock_gzip_open:
+        reader.print_logs_by_time(
+            'fake_service', fake_log_time(150), fake_log_time(160),
+            ['event'], ['deploy'], ['fake_cluster'], ['main'], raw_mode=False,
+        )
+    assert mock_gzip_open.call_count == 0
+    assert printed_messages(mock_print_log) == ['line %d' % second for second in range(152, 160, 2)]
+
+
+def test_file_log_reader_print_last_n_logs(file_log_reader):
+    reader, mock_print_log = file_log_reader
+    reader.print_last_n_logs(
+        'fake_service', 60, ['event'], ['deploy'], ['fake_cluster'], ['main'], raw_mode=False,
+    )
+    assert printed_messages(mock_print_log) == ['line %d' % second for second in range(180, 300, 2)]
+
+
+def test_file_log_reader_tail_logs(file_log_reader, tmpdir):
+    reader, mock_print_log = file_log_reader
+
+    def fake_event_gen():
+        yield None
+        write_log_file(tmpdir.join('fake_service-main.log'), [300])
+        yield (None, ['IN_MODIFY'], str(tmpdir).encode(), b'fake_service-main.log')
+        write_log_file(tmpdir.join('other_service-main.log'), [300])
+        yield (None, ['IN_MODIFY'], str(tmpdir).encode(), b'other_service-main.log')
+        # rotation
+        tmpdir.join('fake_service-main.log').rename(tmpdir.join('fake_service-main.log.1'))
+        yield (None, ['IN_MOVED_TO'], str(tmpdir).encode(), b'fake_service-main.log.1')
+        write_log_file(tmpdir.join('fake_service-main.log'), [301])
+        yield (None, ['IN_CREATE'], str(tmpdir).encode(), b'fake_service-main.log')
+        write_log_file(tmpdir.join('fake_service-canary.log'), [302], instance='canary')
+        yield (None, ['IN_MODIFY'], str(tmpdir).encode(), b'fake_service-canary.log')
+        raise KeyboardInterrupt
+
+    with mock.patch('inotify.adapters.Inotify', autospec=True) as mock_inotify:
+        mock_inotify.return_value.event_gen.side_effect = fake_event_gen
+        reader.tail_logs('fake_service', ['event'], ['deploy'], ['fake_cluster'], None)
+
+    mock_inotify.return_value.add_watch.assert_called_once_with(str(tmpdir).encode(), mock.ANY)
+    assert printed_messages(mock_print_log) == ['line 300', 'line 301', 'line 302']
+
+
 def test_generate_start_end_time():
     start_time, end_time = logs.generate_start_end_time()
 
@@ -11,9 +11,12 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import concurrent.futures
+import threading
 from collections import namedtuple
 from typing import Any
 from typing import Dict
+from typing import List
 from typing import Set
 
 from bravado.exception import HTTPError
@@ -385,6 +388,46 @@ def test_cluster_status_serviceinit_and_api_method(
     assert mock_paasta_status_on_api_endpoint.call_count == 1
 
 
+@patch('paasta_tools.cli.cmds.status.get_paasta_api_client', autospec=True)
+@patch('paasta_tools.cli.cmds.status.paasta_status_on_api_endpoint', autospec=True)
+@patch('paasta_tools.cli.cmds.status.report_invalid_whitelist_values', autospec=True)
+def test_report_status_for_cluster_api_executor_keeps_deploy_order(
+    mock_report_invalid_whitelist_values,
+    mock_paasta_status_on_api_endpoint,
+    mock_get_paasta_api_client,
+    system_paasta_config,
+):
+    mock_report_invalid_whitelist_values.return_value = ''
+    instances = ['a_instance', 'b_instance', 'c_instance']
+    last_instance_done = threading.Event()
+
+    def fake_paasta_status_on_api_endpoint(cluster, service, instance, output, system_paasta_config, verbose, client):
+        assert client == mock_get_paasta_api_client.return_value
+        if instance == 'a_instance':
+            # Finishes after the others
+            assert last_instance_done.wait(timeout=10)
+        output.append(f'    instance: {instance}')
+        if instance == 'c_instance':
+            last_instance_done.set()
+        return 1 if instance == 'b_instance' else 0
+
+    mock_paasta_status_on_api_endpoint.side_effect = fake_paasta_status_on_api_endpoint
+    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as api_executor:
+        return_code, output = status.report_status_for_cluster(
+            service='fake_service',
+            cluster='a_cluster',
+            deploy_pipeline=[f'a_cluster.{instance}' for instance in instances],
+            actual_deployments={f'a_cluster.{instance}': 'sha' for instance in instances},
+            instance_whitelist={instance: KubernetesDeploymentConfig for instance in instances},
+            system_paasta_config=system_paasta_config,
+            api_executor=api_executor,
+        )
+
+    assert return_code == 1
+    assert [line for line in output if 'instance:' in line] == [f'    instance: {instance}' for instance in instances]
+    assert mock_get_paasta_api_client.call_count == 1
+
+
 @patch('paasta_tools.cli.cmds.status.execute_paasta_serviceinit_on_remote_master', autospec=True)
 @patch('paasta_tools.cli.cmds.status.report_invalid_whitelist_values', autospec=True)
 def test_report_status_for_cluster_obeys_instance_whitelist(
@@ -585,6 +628,7 @@ def test_status_calls_sergeants(
         system_paasta_config=system_paasta_config,
         verbose=False,
         use_api_endpoint=False,
+        api_executor=ANY,
     )
 
 
@@ -971,6 +1015,7 @@ def test_status_with_registration(
         system_paasta_config=system_paasta_config,
         verbose=args.verbose,
         use_api_endpoint=ANY,
+        api_executor=ANY,
     )
 
 
@@ -1008,6 +1053,36 @@ def test_paasta_status(system_paasta_config):
         )
 
 
+def test_paasta_status_on_api_endpoint_verbose_timing(system_paasta_config):
+    mock_client = Mock()
+    mock_client.service.status_instance.return_value.result.return_value = Mock(
+        git_sha='fake_git_sha', marathon=None, kubernetes=None, flinkcluster=None,
+    )
+    output: List[str] = []
+    paasta_status_on_api_endpoint(
+        cluster='fake_cluster',
+        service='fake_service',
+        instance='fake_instance',
+        output=output,
+        system_paasta_config=system_paasta_config,
+        verbose=1,
+        client=mock_client,
+    )
+    assert output[1].startswith('    Status API request took ')
+
+    output = []
+    paasta_status_on_api_endpoint(
+        cluster='fake_cluster',
+        service='fake_service',
+        instance='fake_instance',
+        output=output,
+        system_paasta_config=system_paasta_config,
+        verbose=0,
+        client=mock_client,
+    )
+    assert not any('Status API request took' in line for line in output)
+
+
 def test_paasta_status_exception(system_paasta_config):
     system_paasta_config = system_paasta_config
 
@@ -6,6 +6,7 @@ from paasta_tools.deployd.common import BaseServiceInstance
 from paasta_tools.deployd.common import exponential_back_off
 from paasta_tools.deployd.common import get_marathon_clients_from_config
 from paasta_tools.deployd.common import get_priority
+from paasta_tools.deployd.common import get_service_instance_apps_with_clients
 from paasta_tools.deployd.common import get_service_instances_needing_update
 from paasta_tools.deployd.common import PaastaPriorityQueue
 from paasta_tools.deployd.common import PaastaQueue
@@ -337,3 +338,18 @@ def test_get_marathon_clients_from_config():
         'paasta_tools.deployd.common.get_marathon_clients', autospec=True,
     ) as mock_marathon_clients:
         assert get_marathon_clients_from_config() == mock_marathon_clients.return_value
+
+
+def test_get_service_instance_apps_with_clients():
+    mock_client = mock.Mock()
+    mock_other_client = mock.Mock()
+    universe_app = mock.Mock(id='/universe.c137.gitdeadbeef.configf00')
+    # Listing apps by id prefix also finds the instances whose name starts with ours
+    longer_instance_app = mock.Mock(id='/universe.c1370.gitdeadbeef.configf00')
+    mock_client.list_apps.return_value = [universe_app, longer_instance_app]
+    mock_other_client.list_apps.return_value = []
+    mock_clients = mock.Mock(get_all_clients=mock.Mock(return_value=[mock_client, mock_other_client]))
+
+    assert get_service_instance_apps_with_clients(mock_clients, 'universe', 'c137') == [(universe_app, mock_client)]
+    mock_client.list_apps.assert_called_once_with(embed_tasks=True, app_id='/universe.c137')
+    mock_other_client.list_apps.assert_called_once_with(embed_tasks=True, app_id='/universe.c137')
@@ -104,46 +104,50 @@ class TestInbox(unittest.TestCase):
 
     def test_process_inbox(self):
         self.mock_inbox_q.get.side_effect = Empty
-        self.mock_inbox_q.empty.return_value = True
-        self.inbox.to_bounce = {}
         with mock.patch(
             'paasta_tools.deployd.master.Inbox.process_service_instance', autospec=True,
         ) as mock_process_service_instance, mock.patch(
             'paasta_tools.deployd.master.Inbox.process_to_bounce', autospec=True,
-        ) as mock_process_to_bounce, mock.patch(
-            'time.sleep', autospec=True,
-        ):
+        ) as mock_process_to_bounce:
             self.inbox.process_inbox()
-            self.mock_inbox_q.get.assert_called_with(block=False)
+            self.mock_inbox_q.get.assert_called_with(timeout=None)
             assert not mock_process_service_instance.called
-            assert not mock_process_to_bounce.called
+            assert mock_process_to_bounce.called
 
-            mock_si = mock.Mock()
-            self.mock_inbox_q.get.side_effect = None
-            self.mock_inbox_q.get.return_value = mock_si
-            self.mock_inbox_q.empty.return_value = False
+            mock_si_1 = mock.Mock()
+            mock_si_2 = mock.Mock()
+            self.mock_inbox_q.get.side_effect = [mock_si_1, mock_si_2, Empty]
             self.inbox.process_inbox()
-            mock_process_service_instance.assert_called_with(self.inbox, mock_si)
-            assert not mock_process_to_bounce.called
+            assert mock_process_service_instance.call_args_list == [
+                mock.call(self.inbox, mock_si_1),
+                mock.call(self.inbox, mock_si_2),
+            ]
+            assert self.mock_inbox_q.get.call_args_list[-2:] == [mock.call(block=False), mock.call(block=False)]
 
-            self.inbox.to_bounce = {'service.instance': mock_si}
-            self.mock_inbox_q.empty.return_value = True
-            self.inbox.process_inbox()
-            mock_process_service_instance.assert_called_with(self.inbox, mock_si)
-            assert mock_process_to_bounce.called
+    def test_seconds_until_next_bounce(self):
+        assert self.inbox.seconds_until_next_bounce() is None
+        with mock.patch(
+            'time.time', autospec=True, return_value=50,
+        ):
+            self.inbox.process_service_instance(mock.Mock(service='universe', instance='c137', bounce_by=60))
+            assert self.inbox.seconds_until_next_bounce() == 10
+            self.inbox.process_service_instance(mock.Mock(service='universe', instance='c138', bounce_by=10))
+            assert self.inbox.seconds_until_next_bounce() == 0
 
     def test_process_service_instance(self):
-        mock_service_instance = mock.Mock(service='universe', instance='c137')
+        mock_service_instance = mock.Mock(service='universe', instance='c137', bounce_by=10)
         with mock.patch(
             'paasta_tools.deployd.master.Inbox.should_add_to_bounce', autospec=True,
         ) as mock_should_add_to_bounce:
             mock_should_add_to_bounce.return_value = False
             self.inbox.process_service_instance(mock_service_instance)
             assert self.inbox.to_bounce == {}
+            assert self.inbox.bounce_heap == []
 
             mock_should_add_to_bounce.return_value = True
             self.inbox.process_service_instance(mock_service_instance)
             assert self.inbox.to_bounce == {'universe.c137': mock_service_instance}
+            assert self.inbox.bounce_heap == [(10, 0, 'universe.c137', mock_service_instance)]
 
     def test_should_add_to_bounce(self):
         mock_service_instance_1 = mock.Mock(bounce_by=10)
@@ -160,18 +164,37 @@ class TestInbox(unittest.TestCase):
             'time.time', autospec=True,
         ) as mock_time:
             mock_time.return_value = 50
-            mock_service_instance_1 = mock.Mock(bounce_by=10)
-            mock_service_instance_2 = mock.Mock(bounce_by=60)
-            self.inbox.to_bounce = {
-                'universe.c137': mock_service_instance_1,
-                'universe.c138': mock_service_instance_2,
-            }
+            mock_service_instance_1 = mock.Mock(service='universe', instance='c137', bounce_by=10)
+            mock_service_instance_2 = mock.Mock(service='universe', instance='c138', bounce_by=60)
+            self.inbox.process_service_instance(mock_service_instance_1)
+            self.inbox.process_service_instance(mock_service_instance_2)
             self.inbox.process_to_bounce()
             self.mock_bounce_q.put.assert_called_with(mock_service_instance_1.priority, mock_service_instance_1)
             assert self.mock_bounce_q.put.call_count == 1
+            assert self.inbox.to_bounce == {'universe.c138': mock_service_instance_2}
+
+            mock_time.return_value = 60
+            self.inbox.process_to_bounce()
+            self.mock_bounce_q.put.assert_called_with(mock_service_instance_2.priority, mock_service_instance_2)
+            assert self.mock_bounce_q.put.call_count == 2
+            assert self.inbox.to_bounce == {}
+            assert self.inbox.bounce_heap == []
+
+    def test_process_to_bounce_skips_superseded_entries(self):
+        with mock.patch(
+            'time.time', autospec=True, return_value=50,
+        ):
+            mock_service_instance_1 = mock.Mock(service='universe', instance='c137', bounce_by=40)
+            mock_service_instance_2 = mock.Mock(service='universe', instance='c137', bounce_by=20)
+            self.inbox.process_service_instance(mock_service_instance_1)
+            self.inbox.process_service_instance(mock_service_instance_2)
+            self.inbox.process_to_bounce()
+            self.mock_bounce_q.put.assert_called_once_with(mock_service_instance_2.priority, mock_service_instance_2)
+            assert self.inbox.bounce_heap == []
 
     def tearDown(self):
         self.inbox.to_bounce = {}
+        self.inbox.bounce_heap = []
 
 
 class TestDeployDaemon(unittest.TestCase):
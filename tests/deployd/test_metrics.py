@@ -17,10 +17,15 @@ class TestQueueMetrics(unittest.TestCase):
         self.metrics = metrics.QueueMetrics(self.mock_inbox, self.mock_bounce_q, "mock-cluster", mock_metrics_provider)
 
     def test_run(self):
-        with mock.patch('time.sleep', autospec=True, side_effect=LoopBreak):
+        with mock.patch('time.sleep', autospec=True, side_effect=LoopBreak), mock.patch(
+            'paasta_tools.deployd.metrics.emit_time_cache_metrics', autospec=True,
+        ) as mock_emit_time_cache_metrics:
             with raises(LoopBreak):
                 self.metrics.run()
             assert self.mock_gauge.set.call_count == 3
+            mock_emit_time_cache_metrics.assert_called_once_with(
+                self.metrics.metrics, paasta_cluster="mock-cluster",
+            )
 
 
 class LoopBreak(Exception):
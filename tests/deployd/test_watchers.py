@@ -298,7 +298,10 @@ class TestMaintenanceWatcher(unittest.TestCase):
     def setUp(self):
         self.mock_inbox_q = mock.Mock()
         self.mock_marathon_client = mock.Mock()
-        mock_config = mock.Mock(get_deployd_maintenance_polling_frequency=mock.Mock(return_value=20))
+        mock_config = mock.Mock(
+            get_deployd_maintenance_polling_frequency=mock.Mock(return_value=20),
+            get_deployd_use_marathon_state_mirror=mock.Mock(return_value=False),
+        )
         with mock.patch(
             'paasta_tools.deployd.watchers.get_marathon_clients_from_config', autospec=True,
         ):
@@ -409,6 +412,50 @@ class TestMaintenanceWatcher(unittest.TestCase):
             ]
             assert ret == expected
 
+    def test_get_at_risk_service_instances_from_marathon_state_mirror(self):
+        mock_config = mock.Mock(
+            get_deployd_maintenance_polling_frequency=mock.Mock(return_value=20),
+            get_deployd_use_marathon_state_mirror=mock.Mock(return_value=True),
+        )
+        with mock.patch(
+            'paasta_tools.deployd.watchers.get_marathon_clients_from_config', autospec=True,
+        ) as mock_get_marathon_clients_from_config, mock.patch(
+            'paasta_tools.deployd.watchers.MarathonStateMirror', autospec=True,
+        ) as mock_marathon_state_mirror_class:
+            watcher = MaintenanceWatcher(self.mock_inbox_q, "westeros-prod", config=mock_config)
+        mock_marathon_state_mirror_class.assert_called_once_with(
+            mock_get_marathon_clients_from_config.return_value.get_all_clients.return_value,
+        )
+        mock_marathon_state_mirror = mock_marathon_state_mirror_class.return_value
+        mock_marathon_state_mirror.get_marathon_apps_with_clients.return_value = [
+            (mock.Mock(tasks=[mock.Mock(host='host1', app_id='/universe.c137.configsha.gitsha')]), mock.Mock()),
+        ]
+
+        with mock.patch(
+            'paasta_tools.deployd.watchers.MaintenanceWatcher.get_new_draining_hosts', autospec=True,
+            return_value=[],
+        ), mock.patch(
+            'time.sleep', autospec=True, side_effect=LoopBreak,
+        ):
+            with raises(LoopBreak):
+                watcher.run()
+        mock_marathon_state_mirror.start.assert_called_once_with()
+
+        with mock.patch(
+            'paasta_tools.deployd.common.get_priority', autospec=True, return_value=0,
+        ), mock.patch(
+            'paasta_tools.deployd.watchers.get_marathon_apps_with_clients', autospec=True, return_value=[],
+        ) as mock_get_marathon_apps:
+            # The mirror hasn't listed every shard yet, so the apps are listed the usual way
+            mock_marathon_state_mirror.wait_until_ready.return_value = False
+            assert watcher.get_at_risk_service_instances(['host1']) == []
+            assert mock_get_marathon_apps.call_count == 1
+
+            mock_marathon_state_mirror.wait_until_ready.return_value = True
+            ret = watcher.get_at_risk_service_instances(['host1'])
+            assert [(si.service, si.instance) for si in ret] == [('universe', 'c137')]
+            assert mock_get_marathon_apps.call_count == 1
+
 
 class TestPublicConfigEventHandler(unittest.TestCase):
     def setUp(self):
@@ -79,8 +79,6 @@ class TestPaastaDeployWorker(unittest.TestCase):
         with mock.patch(
             'time.time', autospec=True, return_value=1,
         ), mock.patch(
-            'time.sleep', autospec=True,
-        ) as mock_sleep, mock.patch(
             'paasta_tools.deployd.workers.PaastaDeployWorker.process_service_instance', autospec=True,
         ) as mock_process_service_instance:
             mock_timers = mock.Mock()
@@ -90,14 +88,13 @@ class TestPaastaDeployWorker(unittest.TestCase):
                 bounce_timers=mock_timers,
             )
             mock_process_service_instance.return_value = mock_bounce_results
-            mock_sleep.side_effect = LoopBreak
             mock_si = mock.Mock(
                 service='universe',
                 instance='c137',
                 failures=0,
                 priority=0,
             )
-            self.mock_bounce_q.get.return_value = mock_si
+            self.mock_bounce_q.get.side_effect = [mock_si, LoopBreak]
             with raises(LoopBreak):
                 self.worker.run()
             mock_process_service_instance.assert_called_with(self.worker, mock_si)
@@ -109,6 +106,7 @@ class TestPaastaDeployWorker(unittest.TestCase):
                 bounce_timers=mock_timers,
             )
             mock_process_service_instance.return_value = mock_bounce_results
+            self.mock_bounce_q.get.side_effect = [mock_si, LoopBreak]
             mock_queued_si = BaseServiceInstance(
                 service='universe',
                 instance='c137',
@@ -129,7 +127,7 @@ class TestPaastaDeployWorker(unittest.TestCase):
                 failures=0,
                 priority=0,
             )
-            self.mock_bounce_q.get.return_value = mock_si
+            self.mock_bounce_q.get.side_effect = [mock_si, LoopBreak]
             mock_process_service_instance.side_effect = Exception
             mock_queued_si = BaseServiceInstance(
                 service='universe',
@@ -152,6 +150,8 @@ class TestPaastaDeployWorker(unittest.TestCase):
         with mock.patch(
             'paasta_tools.deployd.workers.marathon_tools.get_all_marathon_apps', autospec=True, return_value=[mock_app],
         ), mock.patch(
+            'paasta_tools.deployd.workers.get_service_instance_apps_with_clients', autospec=True,
+        ) as mock_get_service_instance_apps_with_clients, mock.patch(
             'paasta_tools.deployd.workers.PaastaDeployWorker.setup_timers', autospec=True,
         ) as mock_setup_timers, mock.patch(
             'paasta_tools.deployd.workers.deploy_marathon_service', autospec=True,
@@ -171,12 +171,17 @@ class TestPaastaDeployWorker(unittest.TestCase):
             assert ret == expected
             mock_setup_timers.assert_called_with(self.worker, mock_si)
             assert mock_setup_timers.return_value.setup_marathon.start.called
+            mock_get_service_instance_apps_with_clients.assert_called_with(
+                marathon_clients=self.worker.marathon_clients,
+                service='universe',
+                instance='c137',
+            )
             mock_deploy_marathon_service.assert_called_with(
                 service='universe',
                 instance='c137',
                 clients=self.worker.marathon_clients,
                 soa_dir=DEFAULT_SOA_DIR,
-                marathon_apps_with_clients=None,
+                marathon_apps_with_clients=mock_get_service_instance_apps_with_clients.return_value,
             )
             assert mock_setup_timers.return_value.setup_marathon.stop.called
             assert not mock_setup_timers.return_value.processed_by_worker.start.called
@@ -189,12 +194,17 @@ class TestPaastaDeployWorker(unittest.TestCase):
             assert ret == expected
             mock_setup_timers.assert_called_with(self.worker, mock_si)
             assert mock_setup_timers.return_value.setup_marathon.start.called
+            mock_get_service_instance_apps_with_clients.assert_called_with(
+                marathon_clients=self.worker.marathon_clients,
+                service='universe',
+                instance='c137',
+            )
             mock_deploy_marathon_service.assert_called_with(
                 service='universe',
                 instance='c137',
                 clients=self.worker.marathon_clients,
                 soa_dir=DEFAULT_SOA_DIR,
-                marathon_apps_with_clients=None,
+                marathon_apps_with_clients=mock_get_service_instance_apps_with_clients.return_value,
             )
             assert mock_setup_timers.return_value.setup_marathon.stop.called
             assert mock_setup_timers.return_value.processed_by_worker.start.called
@@ -0,0 +1,82 @@
+import asyncio
+
+import mock
+from aiohttp import web
+from pytest import mark
+
+from paasta_tools.mesos import session
+from paasta_tools.mesos.slave import MesosSlave
+
+
+def test_get_session_is_shared_per_loop():
+    config = {'response_timeout': 5}
+    loop1 = asyncio.new_event_loop()
+    loop2 = asyncio.new_event_loop()
+    try:
+        asyncio.set_event_loop(loop1)
+        session1 = session.get_session(config)
+        assert session.get_session(config) is session1
+        assert session1.connector.limit == session.DEFAULT_MAX_CONNECTIONS
+        assert session1.connector.limit_per_host == session.DEFAULT_MAX_CONNECTIONS_PER_HOST
+        other_config_session = session.get_session({
+            'response_timeout': 5,
+            'max_connections': 3,
+            'max_connections_per_host': 1,
+        })
+        assert other_config_session is not session1
+        assert other_config_session.connector.limit == 3
+
+        asyncio.set_event_loop(loop2)
+        session2 = session.get_session(config)
+        assert session2 is not session1
+
+        # Sessions of closed loops get cleaned up
+        loop1.close()
+        session.get_session(config)
+        assert session1.closed
+        assert other_config_session.closed
+        assert loop1 not in session._sessions
+
+        session.close_sessions()
+        assert session2.closed
+    finally:
+        asyncio.set_event_loop(None)
+        loop1.close()
+        loop2.close()
+
+
+@mark.asyncio
+async def test_fetch_reuses_connections():
+    peers = set()
+
+    async def handler(request):
+        peers.add(request.transport.get_extra_info('peername'))
+        return web.json_response({'path': request.path})
+
+    app = web.Application()
+    app.router.add_get('/state', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    mock_metrics = mock.Mock()
+    with mock.patch.object(session, '_metrics', mock_metrics):
+        slave = MesosSlave(
+            {'scheme': 'http', 'response_timeout': 5},
+            {'hostname': '127.0.0.1', 'pid': f'slave(1)@127.0.0.1:{port}'},
+        )
+        try:
+            for _ in range(5):
+                response = await slave.fetch('/state')
+                assert await response.json() == {'path': '/state'}
+        finally:
+            await runner.cleanup()
+            session.close_sessions()
+
+    assert len(peers) == 1
+    assert mock_metrics.create_timer.call_args_list == [
+        mock.call('mesos.request', component='slave', path='/state'),
+    ] * 5
+    assert mock_metrics.create_timer.return_value.stop.call_count == 5
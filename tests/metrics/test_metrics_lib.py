@@ -25,6 +25,23 @@ class TestNoMetrics(unittest.TestCase):
         counter.count()
 
 
+def test_emit_time_cache_metrics():
+    mock_metrics = mock.Mock()
+    mock_cache = mock.Mock()
+    mock_cache.name = 'paasta_tools.utils.fake_func'
+    mock_cache.stats.return_value = {'hits': 3, 'misses': 1, 'evictions': 0, 'size': 1}
+    with mock.patch(
+        'paasta_tools.metrics.metrics_lib.get_time_caches', autospec=True, return_value=[mock_cache],
+    ):
+        metrics_lib.emit_time_cache_metrics(mock_metrics, paasta_cluster='westeros-prod')
+    mock_metrics.create_gauge.assert_any_call(
+        'time_cache.hits', cache='paasta_tools.utils.fake_func', paasta_cluster='westeros-prod',
+    )
+    assert mock_metrics.create_gauge.return_value.set.call_args_list == [
+        mock.call(3), mock.call(1), mock.call(0), mock.call(1),
+    ]
+
+
 class TestMeteoriteMetrics(unittest.TestCase):
     def setUp(self):
         self.mock_meteorite = mock.Mock()
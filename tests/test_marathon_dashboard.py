@@ -12,7 +12,10 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import os
+
 import mock
+import service_configuration_lib
 
 from paasta_tools import marathon_dashboard
 from paasta_tools.marathon_tools import MarathonClients
@@ -80,3 +83,76 @@ def test_create_marathon_dashboard(mock_get_services_for_cluster, mock_pscl, moc
         soa_dir=soa_dir,
         marathon_clients=mock_clients,
     ) == expected_output
+
+
+def test_marathon_dashboard_refresher_only_refreshes_changed_services(tmpdir):
+    for service, instances in (('service_a', 'foo'), ('service_b', 'bar')):
+        tmpdir.mkdir(service).join('marathon-fake_cluster.yaml').write(f'{instances}: {{}}\n_template: {{}}\n')
+        os.utime(str(tmpdir.join(service, 'marathon-fake_cluster.yaml')), (0, 0))
+    tmpdir.join('not_a_service').write('')
+    refresher = marathon_dashboard.MarathonDashboardRefresher(
+        cluster='fake_cluster',
+        soa_dir=str(tmpdir),
+        marathon_clients=mock.Mock(),
+        system_paasta_config=SystemPaastaConfig(
+            {'dashboard_links': {'fake_cluster': {'Marathon RO': 'http://ro'}}}, 'fake_directory',
+        ),
+    )
+    assert refresher.get_dashboard() is None
+
+    with mock.patch(
+        'paasta_tools.marathon_dashboard.create_marathon_dashboard_for_service',
+        autospec=True,
+        side_effect=marathon_dashboard.create_marathon_dashboard_for_service,
+    ) as mock_create_marathon_dashboard_for_service, mock.patch(
+        'paasta_tools.marathon_dashboard.time.time', autospec=True, return_value=1000,
+    ), mock.patch.object(
+        # the paasta api turns the yaml cache off, as it would hide the changes
+        service_configuration_lib, '_use_yaml_cache', False,
+    ):
+        refresher.refresh()
+        assert refresher.get_dashboard() == (
+            {
+                'fake_cluster': [
+                    {'service': 'service_a', 'instance': 'foo', 'shard_url': 'http://ro'},
+                    {'service': 'service_b', 'instance': 'bar', 'shard_url': 'http://ro'},
+                ],
+            },
+            1000,
+        )
+        assert mock_create_marathon_dashboard_for_service.call_count == 2
+
+        refresher.refresh()
+        assert mock_create_marathon_dashboard_for_service.call_count == 2
+
+        tmpdir.join('service_b', 'marathon-fake_cluster.yaml').write('bar: {}\nbaz: {}\n')
+        os.utime(str(tmpdir.join('service_b', 'marathon-fake_cluster.yaml')), (1, 1))
+        tmpdir.join('service_a').remove()
+        refresher.refresh()
+        assert mock_create_marathon_dashboard_for_service.call_count == 3
+        assert refresher.get_dashboard()[0] == {
+            'fake_cluster': [
+                {'service': 'service_b', 'instance': 'bar', 'shard_url': 'http://ro'},
+                {'service': 'service_b', 'instance': 'baz', 'shard_url': 'http://ro'},
+            ],
+        }
+
+
+def test_marathon_dashboard_refresher_rereads_recently_modified_services(tmpdir):
+    tmpdir.mkdir('service_a').join('marathon-fake_cluster.yaml').write('foo: {}\n')
+    refresher = marathon_dashboard.MarathonDashboardRefresher(
+        cluster='fake_cluster',
+        soa_dir=str(tmpdir),
+        marathon_clients=mock.Mock(),
+        system_paasta_config=SystemPaastaConfig(
+            {'dashboard_links': {'fake_cluster': {'Marathon RO': 'http://ro'}}}, 'fake_directory',
+        ),
+    )
+    with mock.patch(
+        'paasta_tools.marathon_dashboard.create_marathon_dashboard_for_service',
+        autospec=True,
+        return_value=[],
+    ) as mock_create_marathon_dashboard_for_service:
+        refresher.refresh()
+        refresher.refresh()
+    assert mock_create_marathon_dashboard_for_service.call_count == 2
@@ -0,0 +1,294 @@
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+from socketserver import ThreadingMixIn
+
+import mock
+from marathon import MarathonClient
+from marathon import NotFoundError
+from marathon.models.app import MarathonApp
+from marathon.models.app import MarathonTask
+from marathon.models.events import EventFactory
+
+from paasta_tools import marathon_state_mirror
+
+
+def make_event(event_type, **kwargs):
+    return EventFactory().process(dict(eventType=event_type, timestamp='2019-01-01T00:00:00.000Z', **kwargs))
+
+
+def make_app(app_id, tasks=(), deployments=()):
+    return MarathonApp.from_json({
+        'id': app_id,
+        'tasks': [
+            {'id': task_id, 'appId': app_id, 'state': 'TASK_RUNNING', 'startedAt': '2019-01-01T00:00:00.000Z'}
+            for task_id in tasks
+        ],
+        'tasksRunning': len(tasks),
+        'tasksStaged': 0,
+        'deployments': [{'id': deployment_id} for deployment_id in deployments],
+    })
+
+
+def get_shard_mirror(apps):
+    mock_client = mock.Mock(servers=['http://marathon1'])
+    shard_mirror = marathon_state_mirror.MarathonShardMirror(mock_client)
+    shard_mirror.apps = {app.id: app for app in apps}
+    return shard_mirror
+
+
+def test_apply_status_update_new_task():
+    shard_mirror = get_shard_mirror([make_app('/universe.c137.gitabc.configdef', tasks=['task1'])])
+    shard_mirror.apply_event(make_event(
+        'status_update_event',
+        appId='/universe.c137.gitabc.configdef',
+        taskId='task2',
+        taskStatus='TASK_STAGING',
+        host='host2',
+        ports=[31000],
+        slaveId='slave2',
+        version='2019-01-01T00:00:00.000Z',
+    ))
+    app = shard_mirror.apps['/universe.c137.gitabc.configdef']
+    assert [task.id for task in app.tasks] == ['task1', 'task2']
+    assert app.tasks[1].host == 'host2'
+    assert app.tasks[1].started_at is None
+    assert (app.tasks_running, app.tasks_staged) == (1, 1)
+
+    shard_mirror.apply_event(make_event(
+        'status_update_event',
+        appId='/universe.c137.gitabc.configdef',
+        taskId='task2',
+        taskStatus='TASK_RUNNING',
+        host='host2',
+    ))
+    assert app.tasks[1].state == 'TASK_RUNNING'
+    assert app.tasks[1].started_at is not None
+    assert (app.tasks_running, app.tasks_staged) == (2, 0)
+
+
+def test_apply_status_update_terminal_state_removes_task():
+    shard_mirror = get_shard_mirror([make_app('/universe.c137.gitabc.configdef', tasks=['task1', 'task2'])])
+    shard_mirror.apply_event(make_event(
+        'status_update_event',
+        appId='/universe.c137.gitabc.configdef',
+        taskId='task1',
+        taskStatus='TASK_KILLED',
+    ))
+    app = shard_mirror.apps['/universe.c137.gitabc.configdef']
+    assert [task.id for task in app.tasks] == ['task2']
+    assert app.tasks_running == 1
+
+
+def test_apply_status_update_unknown_app_refetches():
+    shard_mirror = get_shard_mirror([])
+    new_app = make_app('/universe.c137.gitabc.configdef', tasks=['task1'])
+    shard_mirror.client.get_app.return_value = new_app
+    shard_mirror.apply_event(make_event(
+        'status_update_event',
+        appId='/universe.c137.gitabc.configdef',
+        taskId='task1',
+        taskStatus='TASK_RUNNING',
+    ))
+    shard_mirror.client.get_app.assert_called_once_with('/universe.c137.gitabc.configdef', embed_tasks=True)
+    assert shard_mirror.apps == {'/universe.c137.gitabc.configdef': new_app}
+
+
+def test_apply_api_post_event_refetches_app():
+    shard_mirror = get_shard_mirror([])
+    new_app = make_app('/universe.c137.gitabc.configdef')
+    shard_mirror.client.get_app.return_value = new_app
+    shard_mirror.apply_event(make_event(
+        'api_post_event',
+        appDefinition={'id': '/universe.c137.gitabc.configdef'},
+    ))
+    assert shard_mirror.apps == {'/universe.c137.gitabc.configdef': new_app}
+
+
+def test_refetch_app_removes_deleted_apps():
+    shard_mirror = get_shard_mirror([make_app('/universe.c137.gitabc.configdef')])
+    fake_response = mock.Mock(json=mock.Mock(return_value={'message': 'App not found'}))
+    fake_response.headers = {'content-type': 'application/json'}
+    shard_mirror.client.get_app.side_effect = NotFoundError(fake_response)
+    shard_mirror.refetch_app('/universe.c137.gitabc.configdef')
+    assert shard_mirror.apps == {}
+
+
+def test_apply_app_terminated_event():
+    shard_mirror = get_shard_mirror([make_app('/universe.c137.gitabc.configdef')])
+    shard_mirror.apply_event(make_event('app_terminated_event', appId='/universe.c137.gitabc.configdef'))
+    assert shard_mirror.apps == {}
+
+
+def test_apply_deployment_success_refetches_deployed_apps():
+    deployed_app = make_app('/universe.c137.gitabc.configdef', deployments=['deploy1'])
+    other_app = make_app('/universe.c138.gitabc.configdef', deployments=['deploy2'])
+    shard_mirror = get_shard_mirror([deployed_app, other_app])
+    with mock.patch.object(shard_mirror, 'refetch_app', autospec=True) as mock_refetch_app:
+        shard_mirror.apply_event(make_event('deployment_success', id='deploy1'))
+    mock_refetch_app.assert_called_once_with('/universe.c137.gitabc.configdef')
+
+
+def test_get_marathon_apps_with_clients():
+    mirror = marathon_state_mirror.MarathonStateMirror([mock.Mock(servers=['http://marathon1'])])
+    shard_mirror = mirror.shard_mirrors[0]
+    shard_mirror.apps = {
+        app.id: app for app in [
+            make_app('/universe.c137.gitabc.configdef'),
+            make_app('/fake-service.main.gitabc.configdef'),
+            make_app('/folder/universe.c137.gitabc.configdef'),
+        ]
+    }
+    assert sorted(app.id for app, client in mirror.get_marathon_apps_with_clients()) == [
+        '/fake-service.main.gitabc.configdef',
+        '/universe.c137.gitabc.configdef',
+    ]
+    apps_with_clients = mirror.get_marathon_apps_with_clients(service_name='universe')
+    assert [(app.id, client) for app, client in apps_with_clients] == [
+        ('/universe.c137.gitabc.configdef', shard_mirror.client),
+        ('/folder/universe.c137.gitabc.configdef', shard_mirror.client),
+    ]
+
+
+def test_open_event_stream_sends_auth_token():
+    mock_client = mock.Mock(servers=['http://marathon1/'], auth=None, auth_token='sekrit', timeout=10)
+    shard_mirror = marathon_state_mirror.MarathonShardMirror(mock_client, resync_interval=60)
+    shard_mirror.open_event_stream()
+    mock_client.sse_session.get.assert_called_once_with(
+        'http://marathon1/v2/events',
+        params={'event_type': list(marathon_state_mirror.MIRRORED_EVENT_TYPES)},
+        stream=True,
+        headers={'Accept': 'text/event-stream', 'Authorization': 'token=sekrit'},
+        auth=None,
+        timeout=(10, 60),
+    )
+
+
+class FakeMarathonServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeMarathonHandler)
+        self.apps = []
+        self.events = queue.Queue()
+        self.list_apps_calls = 0
+        self.requests = []
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self.server_address[1]
+
+
+class FakeMarathonHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith('/v2/events'):
+            self.server.requests.append('events')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            while True:
+                event = self.server.events.get()
+                if event is None:
+                    return
+                # Pad every event with an SSE comment so the client's 512 byte read returns straight away
+                self.wfile.write(('data: %s\n\n:%s\n' % (json.dumps(event), ' ' * 512)).encode('utf8'))
+                self.wfile.flush()
+        elif self.path.startswith('/v2/apps'):
+            self.server.requests.append('apps')
+            self.server.list_apps_calls += 1
+            body = json.dumps({'apps': self.server.apps}).encode('utf8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out waiting for the mirror"
+        time.true_slow_sleep(0.01)
+
+
+def fake_app_json(app_id, task_ids):
+    return {
+        'id': app_id,
+        'tasks': [{'id': task_id, 'appId': app_id, 'state': 'TASK_RUNNING'} for task_id in task_ids],
+        'tasksRunning': len(task_ids),
+    }
+
+
+def test_mirror_follows_event_stream_and_resyncs_on_reconnect():
+    server = FakeMarathonServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.apps = [fake_app_json('/universe.c137.gitabc.configdef', ['task1'])]
+    mirror = marathon_state_mirror.MarathonStateMirror(
+        [MarathonClient(servers=[server.url])],
+        reconnect_backoff=0.01,
+    )
+    try:
+        mirror.start()
+        assert mirror.wait_until_ready(timeout=5)
+
+        def task_ids():
+            return [task.id for app, _ in mirror.get_marathon_apps_with_clients() for task in app.tasks]
+        assert task_ids() == ['task1']
+
+        server.events.put({
+            'eventType': 'status_update_event',
+            'timestamp': '2019-01-01T00:00:00.000Z',
+            'appId': '/universe.c137.gitabc.configdef',
+            'taskId': 'task2',
+            'taskStatus': 'TASK_RUNNING',
+            'host': 'host2',
+        })
+        wait_for(lambda: task_ids() == ['task1', 'task2'])
+        assert isinstance(mirror.get_marathon_apps_with_clients()[0][0].tasks[1], MarathonTask)
+
+        # Drop the stream: the mirror should reconnect and do a full resync
+        server.apps = [
+            fake_app_json('/universe.c137.gitabc.configdef', ['task2']),
+            fake_app_json('/universe.c138.gitabc.configdef', ['task3']),
+        ]
+        server.events.put(None)
+        wait_for(lambda: sorted(task_ids()) == ['task2', 'task3'])
+        assert server.list_apps_calls == 2
+        # Every resync only lists the apps once the event stream is connected
+        assert server.requests == ['events', 'apps', 'events', 'apps']
+    finally:
+        mirror.stop()
+        server.events.put(None)
+        server.shutdown()
+        server.server_close()
+
+
+def test_mirror_resyncs_idle_shards():
+    server = FakeMarathonServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.apps = [fake_app_json('/universe.c137.gitabc.configdef', ['task1'])]
+    mirror = marathon_state_mirror.MarathonStateMirror(
+        [MarathonClient(servers=[server.url])],
+        resync_interval=0.2,
+        reconnect_backoff=5,
+    )
+    try:
+        mirror.start()
+        assert mirror.wait_until_ready(timeout=5)
+        # No events ever come, so reading the stream times out: the mirror reconnects and resyncs
+        # straight away rather than after reconnect_backoff
+        server.apps = [fake_app_json('/universe.c137.gitabc.configdef', ['task2'])]
+        wait_for(lambda: [
+            task.id for app, _ in mirror.get_marathon_apps_with_clients() for task in app.tasks
+        ] == ['task2'])
+        assert server.requests[:4] == ['events', 'apps', 'events', 'apps']
+    finally:
+        mirror.stop()
+        server.shutdown()
+        server.server_close()
@@ -21,6 +21,7 @@ from paasta_tools.marathon_tools import load_marathon_service_config
 from paasta_tools.marathon_tools import MarathonServiceConfig
 from paasta_tools.paasta_service_config_loader import PaastaServiceConfigLoader
 from paasta_tools.utils import DeploymentsJsonV2
+from paasta_tools.utils import SoaConfigIndex
 
 
 TEST_SERVICE_NAME = 'example_happyhour'
@@ -146,6 +147,20 @@ def test_marathon_instances(mock_read_extra_service_information):
     )
 
 
+@patch('paasta_tools.paasta_service_config_loader.read_extra_service_information', autospec=True)
+def test_marathon_instances_from_index(mock_read_extra_service_information, tmpdir):
+    tmpdir.join(TEST_SERVICE_NAME, f'marathon-{TEST_CLUSTER_NAME}.yaml').write(
+        'main: {}\ncanary: {}\n',
+        ensure=True,
+    )
+    index = SoaConfigIndex(tmpdir.strpath)
+    with patch('paasta_tools.utils.get_soa_config_index', autospec=True, return_value=index):
+        s = PaastaServiceConfigLoader(service=TEST_SERVICE_NAME, soa_dir=tmpdir.strpath)
+        assert list(s.instances(TEST_CLUSTER_NAME, MarathonServiceConfig)) == ['main', 'canary']
+        assert list(s.instances('other_cluster', MarathonServiceConfig)) == []
+    assert mock_read_extra_service_information.call_count == 0
+
+
 @patch('paasta_tools.paasta_service_config_loader.load_v2_deployments_json', autospec=True)
 @patch('paasta_tools.paasta_service_config_loader.read_extra_service_information', autospec=True)
 def test_marathon_instances_configs(
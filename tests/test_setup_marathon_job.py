@@ -14,6 +14,7 @@
 # limitations under the License.
 import asyncio
 import re
+import time
 from typing import Any
 from typing import Dict
 from typing import List
@@ -71,6 +72,7 @@ class TestSetupMarathonJob:
         service_instance_list=['what_is_love.bby_dont_hurt_me'],
         soa_dir='no_more',
         verbose=False,
+        parallelism=1,
     )
     fake_service_namespace_config = long_running_service_tools.ServiceNamespaceConfig({
         'mode': 'http',
@@ -111,7 +113,9 @@ class TestSetupMarathonJob:
             'paasta_tools.marathon_tools.get_all_marathon_apps', autospec=True,
         ) as get_all_marathon_apps_patch, mock.patch(
             'paasta_tools.setup_marathon_job.bounce_lib.bounce_lock_zookeeper', autospec=True,
-        ):
+        ), mock.patch(
+            'paasta_tools.setup_marathon_job.paasta_print', autospec=True,
+        ) as paasta_print_patch:
             mock_apps = mock.Mock()
             get_all_marathon_apps_patch.return_value = mock_apps
             load_system_paasta_config_patch.return_value.get_cluster = mock.Mock(return_value=self.fake_cluster)
@@ -133,6 +137,9 @@ class TestSetupMarathonJob:
                 soa_dir='no_more',
             )
             sys_exit_patch.assert_called_once_with(0)
+            timing_line = paasta_print_patch.call_args_list[0][0][0]
+            assert timing_line.startswith('what_is_love.bby_dont_hurt_me finished after ')
+            paasta_print_patch.assert_called_with('0 of 1 service.instances failed to deploy.')
 
     def test_main_failure(self):
         fake_clients = mock.MagicMock()
@@ -231,6 +238,66 @@ class TestSetupMarathonJob:
             )
             assert exc_info.value.code == 0
 
+    def test_deploy_service_instances_in_parallel(self):
+        def fake_deploy_marathon_service(service, instance, clients, soa_dir, marathon_apps_with_clients):
+            if instance == 'explodes':
+                raise ValueError('boom')
+            return (1 if instance == 'fails' else 0, None)
+
+        current_client = mock.Mock(spec=MarathonClient, session=mock.Mock())
+        previous_client = mock.Mock(spec=MarathonClient, session=mock.Mock())
+        clients = marathon_tools.MarathonClients(current=[current_client], previous=[previous_client])
+
+        # multiprocessing.Pool's housekeeping threads poll with time.sleep
+        with mock.patch(
+            'time.sleep', side_effect=time.true_slow_sleep, autospec=True,
+        ), mock.patch(
+            'paasta_tools.setup_marathon_job.deploy_marathon_service',
+            side_effect=fake_deploy_marathon_service,
+            autospec=True,
+        ):
+            results = setup_marathon_job.deploy_service_instances(
+                service_instance_list=['svc.works', 'svc.fails', 'svc.explodes', 'not_a_service_instance', 'svc.too'],
+                clients=clients,
+                soa_dir='fake_soa_dir',
+                marathon_apps_with_clients=[],
+                parallelism=3,
+            )
+        assert [(result.service_instance, result.failed) for result in results] == [
+            ('svc.works', False),
+            ('svc.fails', True),
+            ('svc.explodes', True),
+            ('not_a_service_instance', True),
+            ('svc.too', False),
+        ]
+        assert all(result.duration >= 0 for result in results)
+        assert setup_marathon_job._pool_deploy_args == ()
+        # The workers don't share the keep-alive connections the clients had open before forking
+        current_client.session.close.assert_called_once_with()
+        previous_client.session.close.assert_called_once_with()
+
+    def test_deploy_service_instances_sequential(self):
+        with mock.patch(
+            'paasta_tools.setup_marathon_job.deploy_marathon_service',
+            return_value=(0, None),
+            autospec=True,
+        ) as mock_deploy_marathon_service, mock.patch(
+            'paasta_tools.setup_marathon_job.multiprocessing', autospec=True,
+        ) as mock_multiprocessing:
+            results = setup_marathon_job.deploy_service_instances(
+                service_instance_list=['svc.main', 'svc.canary'],
+                clients=mock.sentinel.clients,
+                soa_dir='fake_soa_dir',
+                marathon_apps_with_clients=mock.sentinel.apps_with_clients,
+            )
+        assert [result.service_instance for result in results] == ['svc.main', 'svc.canary']
+        assert not any(result.failed for result in results)
+        assert not mock_multiprocessing.get_context.called
+        mock_deploy_marathon_service.assert_has_calls([
+            mock.call('svc', 'main', mock.sentinel.clients, 'fake_soa_dir', mock.sentinel.apps_with_clients),
+            mock.call('svc', 'canary', mock.sentinel.clients, 'fake_soa_dir', mock.sentinel.apps_with_clients),
+        ])
+
     def test_send_event(self):
         fake_service = 'fake_service'
         fake_instance = 'fake_instance'
@@ -11,7 +11,10 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import collections
+import csv
 import os
+import threading
 
 import mock
 import pytest
@@ -25,6 +28,7 @@ from paasta_tools.smartstack_tools import ip_port_hostname_from_svname
 from paasta_tools.smartstack_tools import match_backends_and_tasks
 from paasta_tools.smartstack_tools import SmartstackHost
 from paasta_tools.utils import DEFAULT_SYNAPSE_HAPROXY_URL_FORMAT
+from paasta_tools.utils import SystemPaastaConfig
 
 
 def test_load_smartstack_info_for_service(system_paasta_config):
@@ -102,8 +106,8 @@ def test_get_replication_for_service():
     with open(testdata, 'r') as fd:
         mock_haproxy_data = fd.read()
 
-    mock_response = mock.Mock()
-    mock_response.text = mock_haproxy_data
+    mock_response = mock.Mock(encoding=None)
+    mock_response.iter_lines.return_value = iter(mock_haproxy_data.splitlines())
     mock_get = mock.Mock(return_value=(mock_response))
 
     with mock.patch.object(requests.Session, 'get', mock_get):
@@ -122,6 +126,111 @@ def test_get_replication_for_service():
         assert expected == replication_result
 
 
+def test_haproxy_session_pool_reuses_sessions_per_host():
+    session_pool = smartstack_tools.HaproxySessionPool(pool_maxsize=2)
+    session = session_pool.get_session('host1')
+    assert session_pool.get_session('host1') is session
+    assert session_pool.get_session('host2') is not session
+    assert session.get_adapter('http://host1:3212/')._pool_maxsize == 2
+    session_pool.close()
+    assert session_pool.get_session('host1') is not session
+
+
+def test_haproxy_session_pool_maxsize_from_system_paasta_config():
+    with mock.patch(
+        'paasta_tools.smartstack_tools.optionally_load_system_paasta_config', autospec=True,
+        return_value=SystemPaastaConfig({'synapse_haproxy_pool_maxsize': 8}, '/fake/dir'),
+    ):
+        session = smartstack_tools.HaproxySessionPool().get_session('host1')
+    assert session.get_adapter('http://host1:3212/')._pool_maxsize == 8
+
+
+def test_retrieve_haproxy_csv_memoized():
+    def fake_get(self, uri, timeout, stream):
+        return mock.Mock(
+            encoding='utf-8',
+            iter_lines=mock.Mock(return_value=iter(['# pxname,svname,status,', 'service1,host1:31000,UP,'])),
+        )
+
+    with mock.patch.object(
+        requests.Session, 'get', side_effect=fake_get, autospec=True,
+    ) as mock_get:
+        def retrieve(host):
+            return list(smartstack_tools.retrieve_haproxy_csv(host, 3212, DEFAULT_SYNAPSE_HAPROXY_URL_FORMAT))
+
+        with smartstack_tools.memoize_haproxy_csv():
+            assert retrieve('host1') == retrieve('host1') == [
+                {'# pxname': 'service1', 'svname': 'host1:31000', 'status': 'UP', '': ''},
+            ]
+            with smartstack_tools.memoize_haproxy_csv():
+                retrieve('host1')
+            retrieve('host2')
+            assert mock_get.call_count == 2
+        retrieve('host1')
+        assert mock_get.call_count == 3
+
+
+def test_memoize_haproxy_csv_is_per_thread():
+    memos = []
+    with smartstack_tools.memoize_haproxy_csv():
+        memos.append(smartstack_tools._get_haproxy_csv_memo())
+        thread = threading.Thread(target=lambda: memos.append(smartstack_tools._get_haproxy_csv_memo()))
+        thread.start()
+        thread.join()
+    assert memos == [{}, None]
+    assert smartstack_tools._get_haproxy_csv_memo() is None
+
+
+def test_parse_haproxy_backends():
+    lines = [
+        '# pxname,svname,status,check_status,',
+        'service1,FRONTEND,OPEN,,',
+        'service1,10.0.0.1:31000_host1,UP,L7OK,',
+        'service1,10.0.0.2:31000_host2,DOWN 1/2,L7STS,',
+        '',
+        'service2,10.0.0.3:31000_host3,UP 1/3,L7OK,',
+        'service1,BACKEND,UP,,',
+        'service3,10.0.0.4:31000_host4,MAINT,,',
+    ]
+    backends = list(smartstack_tools.parse_haproxy_backends(lines))
+    assert [(b.pxname, b.svname, b.is_up()) for b in backends] == [
+        ('service1', '10.0.0.1:31000_host1', True),
+        ('service1', '10.0.0.2:31000_host2', False),
+        ('service2', '10.0.0.3:31000_host3', True),
+        ('service3', '10.0.0.4:31000_host4', False),
+    ]
+    assert backends[1].as_dict() == {
+        'pxname': 'service1',
+        'svname': '10.0.0.2:31000_host2',
+        'status': 'DOWN 1/2',
+        'check_status': 'L7STS',
+    }
+    assert [b.svname for b in smartstack_tools.parse_haproxy_backends(lines, services={'service2', 'service3'})] == [
+        '10.0.0.3:31000_host3',
+        '10.0.0.4:31000_host4',
+    ]
+    assert list(smartstack_tools.parse_haproxy_backends([])) == []
+
+
+def test_get_multiple_backends_matches_haproxy_snapshot():
+    testdir = os.path.dirname(os.path.realpath(__file__))
+    with open(os.path.join(testdir, 'haproxy_snapshot.txt'), 'r') as fd:
+        lines = fd.read().splitlines()
+    with mock.patch(
+        'paasta_tools.smartstack_tools.retrieve_haproxy_csv_lines', return_value=lines, autospec=True,
+    ):
+        backends = smartstack_tools.get_multiple_backends(['service1'], 'fake_host', 6666, '')
+
+    expected = []
+    for line in csv.DictReader(lines):
+        line['pxname'] = line.pop('# pxname')
+        line.pop('')
+        if line['pxname'] == 'service1' and line['svname'] not in ('FRONTEND', 'BACKEND'):
+            expected.append(line)
+    assert len(backends) == 19
+    assert backends == expected
+
+
 def test_get_registered_marathon_tasks():
     backends = [
         {"pxname": "servicename.main", "svname": "10.50.2.4:31000_box4", "status": "UP"},
@@ -236,14 +345,17 @@ def test_match_backends_and_tasks():
         assert sorted(actual, key=keyfunc) == sorted(expected, key=keyfunc)
 
 
-@mock.patch('paasta_tools.smartstack_tools.get_multiple_backends', autospec=True)
-def test_get_replication_for_all_services(mock_get_multiple_backends):
-    mock_get_multiple_backends.return_value = [
-        {"pxname": "servicename.main", "svname": "10.50.2.4:31000_box4", "status": "UP"},
-        {"pxname": "servicename.main", "svname": "10.50.2.5:31001_box5", "status": "UP"},
-        {"pxname": "servicename.main", "svname": "10.50.2.6:31001_box6", "status": "UP"},
-        {"pxname": "servicename.main", "svname": "10.50.2.6:31002_box7", "status": "UP"},
-        {"pxname": "servicename.main", "svname": "10.50.2.8:31000_box8", "status": "UP"},
+@mock.patch('paasta_tools.smartstack_tools.retrieve_haproxy_csv_lines', autospec=True)
+def test_get_replication_for_all_services(mock_retrieve_haproxy_csv_lines):
+    mock_retrieve_haproxy_csv_lines.return_value = [
+        '# pxname,svname,status,',
+        'servicename.main,10.50.2.4:31000_box4,UP,',
+        'servicename.main,10.50.2.5:31001_box5,UP,',
+        'servicename.main,10.50.2.6:31001_box6,UP,',
+        'servicename.main,10.50.2.6:31002_box7,UP,',
+        'servicename.main,10.50.2.8:31000_box8,UP,',
+        'servicename.main,BACKEND,UP,',
+        'servicename.canary,10.50.2.8:31001_box8,DOWN,',
     ]
     assert {'servicename.main': 5} == \
         smartstack_tools.get_replication_for_all_services('', 8888, '')
@@ -279,6 +391,53 @@ def test_get_replication_for_instance_mesos(
     )
 
 
+@mock.patch('paasta_tools.smartstack_tools.marathon_tools.load_service_namespace_config', autospec=True)
+@mock.patch('paasta_tools.smartstack_tools.get_replication_for_all_services', autospec=True)
+@mock.patch('paasta_tools.smartstack_tools.mesos_tools.filter_mesos_slaves_by_blacklist', autospec=True)
+def test_get_replication_for_instance_mesos_shares_work_between_instances(
+    mock_filter_mesos_slaves_by_blacklist,
+    mock_get_replication_for_all_services,
+    mock_load_service_namespace_config,
+    system_paasta_config,
+):
+    mock_filter_mesos_slaves_by_blacklist.side_effect = lambda slaves, blacklist, whitelist: [
+        slave for slave in slaves if [['region', slave['attributes']['region']]] != blacklist
+    ]
+    mock_mesos_slaves = [
+        {'hostname': 'host1', 'attributes': {'region': 'fake_region1', 'pool': 'default'}},
+        {'hostname': 'host2', 'attributes': {'region': 'fake_region2', 'pool': 'default'}},
+    ]
+    mock_get_replication_for_all_services.side_effect = lambda synapse_host, **kwargs: collections.Counter(
+        {'fake_service.main': 3, 'fake_service.canary': 1} if synapse_host == 'host1' else {'fake_service.main': 2},
+    )
+    mock_load_service_namespace_config.return_value.get_discover.return_value = 'region'
+    checker = smartstack_tools.MesosSmartstackReplicationChecker(
+        mesos_slaves=mock_mesos_slaves,
+        system_paasta_config=system_paasta_config,
+    )
+
+    def get_replication(instance, blacklist):
+        instance_config = mock.Mock(service='fake_service', instance=instance)
+        instance_config.get_monitoring_blacklist.return_value = blacklist
+        instance_config.get_pool.return_value = 'default'
+        return checker.get_replication_for_instance(instance_config)
+
+    assert get_replication('main', []) == {
+        'fake_region1': {'fake_service.main': 3},
+        'fake_region2': {'fake_service.main': 2},
+    }
+    assert get_replication('canary', []) == {
+        'fake_region1': {'fake_service.canary': 1},
+        'fake_region2': {'fake_service.canary': 0},
+    }
+    assert get_replication('other', [['region', 'fake_region2']]) == {
+        'fake_region1': {'fake_service.other': 0},
+    }
+    # Each location's CSV is fetched once, and the hosts are only grouped once per blacklist
+    assert mock_get_replication_for_all_services.call_count == 2
+    assert mock_filter_mesos_slaves_by_blacklist.call_count == 2
+
+
 def test_are_services_up_on_port():
     with mock.patch(
         'paasta_tools.smartstack_tools.get_multiple_backends', autospec=True,
@@ -416,6 +575,7 @@ def test_kube_get_allowed_locations_and_hosts(mock_kube_replication_checker):
         'paasta_tools.kubernetes_tools.get_nodes_grouped_by_attribute', autospec=True,
     ) as mock_get_nodes_grouped_by_attribute:
         mock_instance_config = mock.Mock(service="blah", instance="foo", soa_dir="/nail/thing")
+        mock_instance_config.get_monitoring_blacklist.return_value = []
         mock_node_1 = mock.MagicMock(
             metadata=mock.MagicMock(
                 labels={
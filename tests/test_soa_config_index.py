@@ -0,0 +1,39 @@
+import mock
+import pytest
+
+from paasta_tools import soa_config_index
+from paasta_tools.utils import get_soa_config_index_path
+from paasta_tools.utils import SoaConfigIndex
+
+
+@pytest.fixture
+def soa_dir(tmpdir):
+    soa_dir = tmpdir.join('soa')
+    soa_dir.join('service1', 'marathon-cluster.yaml').write('main: {}\n', ensure=True)
+    return soa_dir
+
+
+def test_rebuild_and_verify(soa_dir, tmpdir, capsys):
+    args = ['--soa-dir', soa_dir.strpath, '--index-dir', tmpdir.strpath]
+    soa_config_index.main(['rebuild'] + args)
+    index_path = get_soa_config_index_path(tmpdir.strpath, soa_dir.strpath)
+    index = SoaConfigIndex(soa_dir.strpath, index_path)
+    assert index.get_service_instance_list('service1', 'cluster') == [('service1', 'main')]
+
+    soa_config_index.main(['verify'] + args)
+    assert capsys.readouterr().out.endswith(f'{index_path} is up to date\n')
+
+    soa_dir.join('service2', 'adhoc-cluster.yaml').write('batch: {}\n', ensure=True)
+    with pytest.raises(SystemExit) as excinfo:
+        soa_config_index.main(['verify'] + args)
+    assert excinfo.value.code == 1
+    assert 'service2/adhoc-cluster.yaml is missing from the index' in capsys.readouterr().out
+
+
+def test_needs_an_index_dir(soa_dir):
+    with mock.patch(
+        'paasta_tools.soa_config_index.load_system_paasta_config', autospec=True,
+    ) as mock_load_system_paasta_config, pytest.raises(SystemExit) as excinfo:
+        mock_load_system_paasta_config.return_value.get_soa_config_index_dir.return_value = None
+        soa_config_index.main(['rebuild', '--soa-dir', soa_dir.strpath])
+    assert excinfo.value.code == 1
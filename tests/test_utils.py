@@ -12,7 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import datetime
+import io
 import json
+import multiprocessing
 import os
 import stat
 import sys
@@ -982,6 +984,146 @@ def test_get_services_for_cluster_ignores_underscore():
         assert expected == actual
 
 
+def write_soa_config(soa_dir, path, content):
+    config_file = soa_dir.join(path)
+    config_file.write(content, ensure=True)
+    # Old enough for the index to trust its mtime
+    old = time.time() - 60
+    os.utime(config_file.strpath, (old, old))
+    return config_file
+
+
+@pytest.fixture
+def soa_config_tree(tmpdir):
+    soa_dir = tmpdir.join('soa')
+    write_soa_config(soa_dir, 'service1/marathon-cluster.yaml', 'main: {}\ncanary: {}\n_template: {}\n')
+    write_soa_config(soa_dir, 'service1/tron-cluster.yaml', 'jobs:\n  job1:\n    actions:\n      action1: {}\n')
+    write_soa_config(soa_dir, 'service1/service.yaml', 'description: not an instance config\n')
+    write_soa_config(soa_dir, 'service2/kubernetes-cluster.yaml', 'main: {}\n')
+    write_soa_config(soa_dir, 'service2/marathon-other_cluster.yaml', 'main: {}\n')
+    return soa_dir
+
+
+def test_soa_config_index_lists_instances(soa_config_tree, tmpdir):
+    index = utils.SoaConfigIndex(soa_config_tree.strpath, tmpdir.join('index.json').strpath)
+    index.refresh()
+    assert index.get_indexed_services() == ['service1', 'service2']
+    assert index.get_service_instance_list('service1', 'cluster') == [
+        ('service1', 'main'),
+        ('service1', 'canary'),
+        ('service1', 'job1.action1'),
+    ]
+    assert index.get_service_instance_list('service1', 'cluster', 'marathon') == [
+        ('service1', 'main'),
+        ('service1', 'canary'),
+    ]
+    assert index.get_service_instance_list('service2', 'cluster') == [('service2', 'main')]
+    assert index.get_service_instance_list('service3', 'cluster') == []
+    assert index.get_keys('service1', 'marathon-cluster.yaml') == ['main', 'canary', '_template']
+    assert index.verify() == []
+
+
+def test_soa_config_index_only_parses_changed_files(soa_config_tree, tmpdir):
+    index_path = tmpdir.join('index.json').strpath
+    utils.SoaConfigIndex(soa_config_tree.strpath, index_path).refresh()
+
+    # A fresh index picks up the saved one, and has nothing to parse
+    index = utils.SoaConfigIndex(soa_config_tree.strpath, index_path)
+    with mock.patch.object(index, 'parse_config_file', wraps=index.parse_config_file) as mock_parse:
+        index.refresh()
+        assert mock_parse.call_count == 0
+
+        write_soa_config(soa_config_tree, 'service1/marathon-cluster.yaml', 'main: {}\n')
+        soa_config_tree.join('service2').remove()
+        index.refresh()
+        mock_parse.assert_called_once_with('service1', 'marathon-cluster.yaml')
+
+    assert index.get_indexed_services() == ['service1']
+    assert index.get_service_instance_list('service1', 'cluster', 'marathon') == [('service1', 'main')]
+    assert utils.SoaConfigIndex(soa_config_tree.strpath, index_path).services == index.services
+
+
+def test_soa_config_index_reparses_recently_modified_files(soa_config_tree):
+    index = utils.SoaConfigIndex(soa_config_tree.strpath)
+    soa_config_tree.join('service2/kubernetes-cluster.yaml').write('main: {}\n')
+    index.refresh()
+    with mock.patch.object(index, 'parse_config_file', wraps=index.parse_config_file) as mock_parse:
+        index.refresh()
+        mock_parse.assert_called_once_with('service2', 'kubernetes-cluster.yaml')
+
+
+def test_soa_config_index_verify(soa_config_tree):
+    index = utils.SoaConfigIndex(soa_config_tree.strpath)
+    index.refresh()
+    # Same size and mtime, so refreshing wouldn't notice
+    marathon_config = soa_config_tree.join('service1/marathon-cluster.yaml')
+    mtime = marathon_config.mtime()
+    marathon_config.write('niam: {}\ncanary: {}\n_template: {}\n')
+    os.utime(marathon_config.strpath, (mtime, mtime))
+    write_soa_config(soa_config_tree, 'service3/adhoc-cluster.yaml', 'batch: {}\n')
+    soa_config_tree.join('service2/kubernetes-cluster.yaml').remove()
+
+    assert index.verify() == [
+        'service1/marathon-cluster.yaml is out of date in the index',
+        'service3/adhoc-cluster.yaml is missing from the index',
+        "service2/kubernetes-cluster.yaml is in the index but doesn't exist",
+    ]
+
+
+def test_soa_config_index_save_failure_is_not_fatal(soa_config_tree, tmpdir):
+    index = utils.SoaConfigIndex(soa_config_tree.strpath, tmpdir.join('missing', 'index.json').strpath)
+    index.refresh()
+    assert index.dirty
+    assert index.get_service_instance_list('service2', 'cluster') == [('service2', 'main')]
+
+
+def test_soa_config_index_ignores_index_of_other_soa_dir(soa_config_tree, tmpdir):
+    index_path = tmpdir.join('index.json')
+    utils.SoaConfigIndex(soa_config_tree.strpath, index_path.strpath).refresh()
+    assert utils.SoaConfigIndex(tmpdir.strpath, index_path.strpath).services == {}
+    index_path.write('not json')
+    assert utils.SoaConfigIndex(soa_config_tree.strpath, index_path.strpath).services == {}
+
+
+def test_get_services_for_cluster_uses_index(soa_config_tree, tmpdir):
+    index = utils.SoaConfigIndex(soa_config_tree.strpath, tmpdir.join('index.json').strpath)
+    with mock.patch(
+        'paasta_tools.utils.get_soa_config_index', autospec=True, return_value=index,
+    ), mock.patch(
+        'paasta_tools.utils.get_service_instance_list', autospec=True,
+    ) as mock_get_service_instance_list:
+        assert utils.get_services_for_cluster('cluster', soa_dir=soa_config_tree.strpath) == [
+            ('service1', 'main'),
+            ('service1', 'canary'),
+            ('service1', 'job1.action1'),
+            ('service2', 'main'),
+        ]
+        assert utils.get_services_for_cluster('other_cluster', soa_dir=soa_config_tree.strpath) == [
+            ('service2', 'main'),
+        ]
+        assert mock_get_service_instance_list.call_count == 0
+        assert utils.get_service_instance_list_no_cache(
+            'service1', 'cluster', 'tron', soa_dir=soa_config_tree.strpath,
+        ) == [('service1', 'job1.action1')]
+
+
+def test_get_soa_config_index():
+    with mock.patch(
+        'paasta_tools.utils.optionally_load_system_paasta_config', autospec=True,
+    ) as mock_load_system_paasta_config, mock.patch.object(
+        utils, '_soa_config_indexes', {},
+    ):
+        mock_load_system_paasta_config.return_value.get_soa_config_index_dir.return_value = None
+        assert utils.get_soa_config_index('/nail/etc/services') is None
+
+        mock_load_system_paasta_config.return_value.get_soa_config_index_dir.return_value = '/nonexistent'
+        index = utils.get_soa_config_index('/nail/etc/services')
+        assert index.soa_dir == '/nail/etc/services'
+        assert index.index_path.startswith('/nonexistent/soa_config_index_')
+        assert utils.get_soa_config_index('/nail/etc/services') is index
+        assert utils.get_soa_config_index('/other/soa/dir') is not index
+
+
 def test_color_text():
     expected = f"{utils.PaastaColors.RED}hi{utils.PaastaColors.DEFAULT}"
     actual = utils.PaastaColors.color_text(utils.PaastaColors.RED, "hi")
@@ -2136,6 +2278,153 @@ class TestFileLogWriter:
             "Could not log to /dev/null: OSError: hurp durp -- would have logged: line\n",
         }
 
+    @pytest.fixture
+    def mock_flusher(self):
+        with mock.patch(
+            "paasta_tools.utils.threading.Thread", autospec=True,
+        ) as mock_thread, mock.patch(
+            "paasta_tools.utils.multiprocessing.util.Finalize", autospec=True,
+        ) as mock_finalize:
+            yield mock_thread, mock_finalize
+
+    def test_buffered_log_waits_for_flush(self, tmpdir, mock_flusher):
+        mock_thread, mock_finalize = mock_flusher
+        path = str(tmpdir.join('{service}.log'))
+        fw = utils.FileLogWriter(path, buffered=True)
+        fw.log('a', 'line1', 'build')
+        fw.log('b', 'line2', 'build')
+        fw.log('a', 'line3', 'build')
+
+        assert tmpdir.listdir() == []
+        mock_thread.assert_called_once_with(target=fw._flush_periodically, daemon=True)
+        mock_thread.return_value.start.assert_called_once_with()
+        mock_finalize.assert_called_once_with(None, fw.flush, exitpriority=0)
+
+        fw.flush()
+        a_lines = tmpdir.join('a.log').read().splitlines()
+        assert [json.loads(line)['message'] for line in a_lines] == ['line1', 'line3']
+        assert len(tmpdir.join('b.log').read().splitlines()) == 1
+
+    def test_buffered_log_signals_flusher_over_flush_bytes(self, tmpdir, mock_flusher):
+        fw = utils.FileLogWriter(str(tmpdir.join('log')), buffered=True, flush_bytes=1000)
+        fw.log('a', 'x' * 100, 'build')
+        assert not fw._flush_needed.is_set()
+        fw.log('a', 'x' * 1000, 'build')
+        assert fw._flush_needed.is_set()
+
+    def test_buffered_flush_coalesces_writes(self, tmpdir, mock_flusher):
+        path = str(tmpdir.join('log'))
+        fw = utils.FileLogWriter(path, buffered=True)
+        for i in range(100):
+            fw.log('a', 'x' * 100, 'build')
+        fw.log('a', 'y' * 10000, 'build')
+
+        with mock.patch('paasta_tools.utils.io.FileIO', autospec=True, side_effect=io.FileIO) as mock_FileIO:
+            fw.flush()
+            fw.log('a', 'z', 'build')
+            fw.flush()
+
+        # The file is opened once and kept open across flushes
+        mock_FileIO.assert_called_once_with(path, mode=fw.mode, closefd=True)
+        with open(path) as f:
+            lines = f.read().splitlines()
+        assert len(lines) == 102
+        assert all(json.loads(line)['message'] == 'x' * 100 for line in lines[:100])
+
+    def test_write_lines_chunks(self, mock_flusher):
+        fw = utils.FileLogWriter('/dev/null', buffered=True)
+        mock_file = mock.Mock()
+        with mock.patch.object(fw, '_get_file', return_value=mock_file, autospec=True):
+            fw._write_lines('/dev/null', [b'a' * 3000, b'b' * 1000, b'c' * 200, b'd' * 5000, b'e'])
+        assert mock_file.write.call_args_list == [
+            mock.call(b'a' * 3000 + b'b' * 1000),
+            mock.call(b'c' * 200),
+            mock.call(b'd' * 5000),
+            mock.call(b'e'),
+        ]
+
+    def test_buffered_flush_reopens_rotated_file(self, tmpdir, mock_flusher):
+        path = str(tmpdir.join('log'))
+        fw = utils.FileLogWriter(path, buffered=True)
+        fw.log('a', 'before', 'build')
+        fw.flush()
+        os.rename(path, path + '.1')
+        fw.log('a', 'after', 'build')
+        fw.flush()
+        fw.close()
+
+        assert json.loads(tmpdir.join('log.1').read())['message'] == 'before'
+        assert json.loads(tmpdir.join('log').read())['message'] == 'after'
+        assert fw._files == {}
+
+    def test_buffered_flush_raises_IOError(self, tmpdir, mock_flusher):
+        path = str(tmpdir.join('missing', 'log'))
+        fw = utils.FileLogWriter(path, buffered=True)
+        with mock.patch(
+            "paasta_tools.utils.format_log_line", return_value='line', autospec=True,
+        ), mock.patch(
+            "paasta_tools.utils.paasta_print", autospec=True,
+        ) as mock_print:
+            fw.log('a', 'line', 'build')
+            fw.flush()
+        mock_print.assert_called_once_with(
+            f"Could not log to {path}: FileNotFoundError: [Errno 2] No such file or directory: '{path}' "
+            "-- would have logged: line\n",
+            file=sys.stderr,
+        )
+
+    def test_buffered_log_after_fork(self, tmpdir, mock_flusher):
+        mock_thread, mock_finalize = mock_flusher
+        path = str(tmpdir.join('log'))
+        fw = utils.FileLogWriter(path, buffered=True)
+        fw.log('a', 'parent', 'build')
+        fw.flush()
+        fw.log('a', 'unflushed', 'build')
+        parent_file = fw._files[path]
+        # A thread of the parent held the lock when it forked
+        fw._buffer_lock.acquire()
+
+        with mock.patch('paasta_tools.utils.os.getpid', autospec=True, return_value=os.getpid() + 1):
+            fw.log('a', 'child', 'build')
+            fw.flush()
+
+        assert parent_file.closed
+        assert mock_thread.call_count == 2
+        assert mock_finalize.call_count == 2
+        assert [json.loads(line)['message'] for line in tmpdir.join('log').read().splitlines()] == ['parent', 'child']
+
+    def test_buffered_log_from_forked_pool_worker(self, tmpdir):
+        path = str(tmpdir.join('{service}.log'))
+        # multiprocessing.Pool's housekeeping threads poll with time.sleep
+        with mock.patch(
+            'time.sleep', side_effect=time.true_slow_sleep, autospec=True,
+        ), mock.patch.object(
+            utils, '_log_writer', utils.FileLogWriter(path, buffered=True, flush_interval=3600),
+        ):
+            with multiprocessing.get_context('fork').Pool(processes=2) as pool:
+                pool.map(_log_from_pool_worker, ['a', 'b'])
+                pool.close()
+                pool.join()
+
+        assert json.loads(tmpdir.join('a.log').read())['message'] == 'from worker'
+        assert json.loads(tmpdir.join('b.log').read())['message'] == 'from worker'
+
+    def test_flush_periodically(self, mock_flusher):
+        fw = utils.FileLogWriter('/dev/null', buffered=True, flush_interval=5)
+        fw._flush_needed.set()
+        with mock.patch.object(
+            fw._flush_needed, 'wait', autospec=True, side_effect=[True, False, StopIteration],
+        ) as mock_wait, mock.patch.object(fw, 'flush', autospec=True) as mock_flush:
+            with pytest.raises(StopIteration):
+                fw._flush_periodically()
+        assert mock_wait.call_args_list == [mock.call(5)] * 3
+        assert mock_flush.call_count == 2
+        assert not fw._flush_needed.is_set()
+
+
+def _log_from_pool_worker(service):
+    utils._log_writer.log(service, 'from worker', 'build')
+
 
 def test_deep_merge_dictionaries():
     overrides = {
@@ -2391,3 +2680,88 @@ def test_suggest_possibilities_one():
     expected = "FOOBAR?"
     actual = utils.suggest_possibilities(word='FOO', possibilities=["FOOBAR", "BAZ"])
     assert expected in actual
+
+
+def test_time_cache_ttl():
+    mock_func = mock.Mock(side_effect=lambda x: x * 2)
+    cached = utils.time_cache(ttl=10)(mock_func)
+    with mock.patch('paasta_tools.utils.time.time', autospec=True, return_value=100):
+        assert cached(1) == 2
+        assert cached(1) == 2
+    assert mock_func.call_count == 1
+    with mock.patch('paasta_tools.utils.time.time', autospec=True, return_value=111):
+        assert cached(1) == 2
+    assert mock_func.call_count == 2
+    assert cached(1, ttl=-1) == 2
+    assert mock_func.call_count == 3
+
+
+def test_time_cache_no_ttl_never_caches():
+    mock_func = mock.Mock(return_value='foo')
+    cached = utils.time_cache()(mock_func)
+    cached()
+    cached()
+    assert mock_func.call_count == 2
+
+
+def test_time_cache_maxsize_evicts_least_recently_used():
+    mock_func = mock.Mock(side_effect=lambda x: x)
+    cache = utils.time_cache(ttl=60, maxsize=2)
+    cached = cache(mock_func)
+    cached(1)
+    cached(2)
+    cached(1)
+    cached(3)
+    assert list(cache.configs.keys()) == [(1,), (3,)]
+    cached(1)
+    cached(2)
+    assert mock_func.call_count == 4
+    assert cache.stats() == {'hits': 2, 'misses': 4, 'evictions': 2, 'size': 2}
+
+
+def test_time_cache_watch_files_invalidates_on_mtime_change(tmpdir):
+    conf = tmpdir.join('marathon-westeros-prod.yaml')
+    conf.write('foo: bar')
+    conf.setmtime(1000)
+    cached = utils.time_cache(ttl=60, watch_files=lambda path: [path])(lambda path: open(path).read())
+    assert cached(conf.strpath) == 'foo: bar'
+    conf.write('foo: baz')
+    conf.setmtime(1000)
+    assert cached(conf.strpath) == 'foo: bar'
+    conf.setmtime(2000)
+    assert cached(conf.strpath) == 'foo: baz'
+
+
+def test_time_cache_does_not_cache_exceptions():
+    mock_func = mock.Mock(side_effect=[ValueError('oops'), 'foo'])
+    cached = utils.time_cache(ttl=60)(mock_func)
+    with raises(ValueError):
+        cached()
+    assert cached() == 'foo'
+    assert cached() == 'foo'
+    assert mock_func.call_count == 2
+
+
+def test_time_cache_concurrent_callers_share_one_fetch():
+    started = utils.threading.Event()
+    release = utils.threading.Event()
+    calls = []
+
+    def slow_fetch(key):
+        calls.append(key)
+        started.set()
+        release.wait()
+        return key.upper()
+
+    cached = utils.time_cache(ttl=60)(slow_fetch)
+    results: List[str] = []
+    threads = [utils.threading.Thread(target=lambda: results.append(cached('foo'))) for _ in range(5)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == ['foo']
+    assert results == ['FOO'] * 5
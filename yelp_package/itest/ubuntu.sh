@@ -41,6 +41,7 @@ setup_chronos_job
 chronos_rerun
 setup_marathon_job
 paasta_setup_tron_namespace
+paasta_soa_config_index
 synapse_srv_namespaces_fact"
 
 MARATHON_SERVICES="fake_service_uno.main